@@ -41,57 +41,92 @@ Server Usage:
     # API endpoints available at http://localhost:8000/docs
 """
 
-# Core data management and SQL-on-FHIR implementation
-from .datastore import FHIRDataStore, QueryResult
-from .dialects import DatabaseDialect, DuckDBDialect, PostgreSQLDialect
-from .view_runner import ViewRunner
+import importlib
 
-# FHIRPath public API for direct usage
-from .fhirpath import FHIRPath, SimpleFHIRPath, parse_fhirpath, fhirpath_to_sql, validate_fhirpath
+# Public attributes are imported on first access (PEP 562 module __getattr__),
+# so ``import fhir4ds`` stays cheap for short-lived jobs: the datastore,
+# dialects, ViewRunner, pipeline, server (fastapi/pydantic) and export
+# dependencies (pandas/pyarrow/openpyxl/psycopg2) load only when used.
+#
+# name -> (module, optional). Optional names resolve to None when their module
+# cannot be imported, e.g. the server when fastapi is not installed.
+_LAZY_IMPORTS = {
+    # Core data management and SQL-on-FHIR implementation
+    "FHIRDataStore": (".datastore.core", False),
+    "QueryResult": (".datastore.result", False),
+    "DatabaseDialect": (".dialects.base", False),
+    "DuckDBDialect": (".dialects.duckdb", False),
+    "PostgreSQLDialect": (".dialects.postgresql", False),
+    "ViewRunner": (".view_runner", False),
+    
+    # FHIRPath public API for direct usage
+    "FHIRPath": (".fhirpath.fhirpath", False),
+    "SimpleFHIRPath": (".fhirpath.fhirpath", False),
+    "parse_fhirpath": (".fhirpath.fhirpath", False),
+    "fhirpath_to_sql": (".fhirpath.fhirpath", False),
+    "validate_fhirpath": (".fhirpath.fhirpath", False),
+    
+    # User-friendly helper modules for simplified usage
+    "QuickConnect": (".datastore.connections", True),
+    "ConnectedDatabase": (".datastore.connections", True),
+    "ResultFormatter": (".datastore.formatters", True),
+    "BatchProcessor": (".datastore.batch", True),
+    
+    # Server module for API functionality
+    "create_app": (".server.app", True),
+    "FHIRAnalyticsServer": (".server.app", True),
+    "FHIRAnalyticsServerConfig": (".server.config", True),
+    
+    # View definition components for compatibility
+    "ViewDefinition": (".view_definition", True),
+    "Column": (".view_definition", True),
+    "SelectStructure": (".view_definition", True),
+    
+    # Utility modules for testing and performance analysis
+    "PerformanceTester": (".utils.performance", True),
+    "PerformanceMetrics": (".utils.performance", True),
+    "DatasetStats": (".utils.performance", True),
+    "quick_performance_test": (".utils.performance", True),
+    "comprehensive_performance_test": (".utils.performance", True),
+}
 
-# User-friendly helper modules for simplified usage
-try:
-    from .datastore import QuickConnect, ConnectedDatabase
-    from .datastore import ResultFormatter
-    from .datastore import BatchProcessor
-    HELPERS_AVAILABLE = True
-except ImportError:
-    QuickConnect = None
-    ConnectedDatabase = None
-    ResultFormatter = None
-    BatchProcessor = None
-    HELPERS_AVAILABLE = False
+# Availability flag -> module whose importability it reports
+_AVAILABILITY_FLAGS = {
+    "HELPERS_AVAILABLE": ".datastore.connections",
+    "SERVER_AVAILABLE": ".server.app",
+    "UTILS_AVAILABLE": ".utils.performance",
+}
+
+
+def _import_optional(module_name: str):
+    """Import a submodule, returning None if it or a dependency is missing."""
+    try:
+        return importlib.import_module(module_name, __name__)
+    except ImportError:
+        return None
+
+
+def __getattr__(name: str):
+    """Resolve lazily imported public attributes and availability flags."""
+    if name in _AVAILABILITY_FLAGS:
+        value = _import_optional(_AVAILABILITY_FLAGS[name]) is not None
+    elif name in _LAZY_IMPORTS:
+        module_name, optional = _LAZY_IMPORTS[name]
+        if optional:
+            module = _import_optional(module_name)
+            value = getattr(module, name, None) if module is not None else None
+        else:
+            value = getattr(importlib.import_module(module_name, __name__), name)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    
+    globals()[name] = value
+    return value
 
-# Server module for API functionality
-try:
-    from .server import create_app, FHIRAnalyticsServer, FHIRAnalyticsServerConfig
-    SERVER_AVAILABLE = True
-except ImportError:
-    create_app = None
-    FHIRAnalyticsServer = None
-    FHIRAnalyticsServerConfig = None
-    SERVER_AVAILABLE = False
 
-# Import view definition components for compatibility
-try:
-    from .view_definition import ViewDefinition, Column, SelectStructure
-except ImportError:
-    ViewDefinition = None
-    Column = None
-    SelectStructure = None
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
 
-# Utility modules for testing and performance analysis
-try:
-    from .utils import PerformanceTester, PerformanceMetrics, DatasetStats
-    from .utils import quick_performance_test, comprehensive_performance_test
-    UTILS_AVAILABLE = True
-except ImportError:
-    PerformanceTester = None
-    PerformanceMetrics = None
-    DatasetStats = None
-    quick_performance_test = None
-    comprehensive_performance_test = None
-    UTILS_AVAILABLE = False
 
 __version__ = "0.7.0"
 __all__ = [
@@ -0,0 +1,338 @@
+"""
+Concurrent Define Scheduling
+
+Runs the SQL of a library's define statements as a dependency DAG instead of
+one define after another. Defines whose upstream defines are available run
+concurrently, each on its own pooled connection:
+
+- a define read by two or more other defines is materialized once as a table
+  (``CREATE TABLE ... AS``) and read from there by its dependents
+- a define read by a single other define is inlined as a CTE of that define
+- dependent SQL refers to an upstream define by its relation name (the
+  normalized define name, as used for define CTEs), which the scheduler binds
+  with a WITH clause to the materialized table or the inlined SQL
+
+The scheduler runs SQL that already refers to upstream defines by relation
+name, such as the CTE fragments of the CTE pipeline, whose dependencies come
+from EnhancedDependencyDetector (see CTEPipelineEngine's define_scheduler).
+Every define's start, finish and duration is recorded, together with the
+critical path: the chain of materialized upstream defines that bounded the
+wall time.
+
+Materialized tables are ordinary tables with a per-run prefix rather than
+TEMP tables, since temporary tables are private to the connection that created
+them and dependents run on other pooled connections; they are dropped when
+the run ends.
+
+Usage:
+    scheduler = DefineScheduler(datastore.dialect.get_connection(), 'duckdb', max_workers=4)
+    result = scheduler.run(define_sql, dependencies)
+    result.critical_path, result.timings["denominator"].seconds
+"""
+
+import logging
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+_LEADING_WITH = re.compile(r'^\s*WITH\s+(RECURSIVE\s+)?', re.IGNORECASE)
+
+
+def define_relation_name(define_name: str) -> str:
+    """SQL identifier a define is referenced by (lower-case, non-alphanumerics as '_')."""
+    normalized = ''.join(c if c.isalnum() else '_' for c in define_name.strip('"\'')).lower()
+    if normalized and not normalized[0].isalpha():
+        normalized = 'define_' + normalized
+    return normalized or 'unknown_define'
+
+
+def topological_order(dependencies: Dict[str, Set[str]]) -> List[str]:
+    """Defines ordered so every define follows the defines it reads; ValueError on a cycle."""
+    order, state = [], {}
+
+    def visit(name: str, path: List[str]) -> None:
+        if state.get(name) == 'done':
+            return
+        if state.get(name) == 'visiting':
+            raise ValueError(f"Circular define dependency: {' -> '.join(path + [name])}")
+        state[name] = 'visiting'
+        for upstream in sorted(dependencies.get(name, ())):
+            visit(upstream, path + [name])
+        state[name] = 'done'
+        order.append(name)
+
+    for name in dependencies:
+        visit(name, [])
+    return order
+
+
+@dataclass
+class DefineTiming:
+    """When one define ran, relative to the start of the run (seconds)"""
+    name: str
+    started: float = 0.0
+    finished: float = 0.0
+    materialized: bool = False
+    critical_path_seconds: float = 0.0   # finish time if every define started as soon as allowed
+
+    @property
+    def seconds(self) -> float:
+        return self.finished - self.started
+
+
+@dataclass
+class ScheduleResult:
+    """Rows, timings and errors of one scheduled run"""
+    define_results: Dict[str, List[Dict[str, Any]]] = field(default_factory=dict)
+    timings: Dict[str, DefineTiming] = field(default_factory=dict)
+    errors: Dict[str, str] = field(default_factory=dict)
+    critical_path: List[str] = field(default_factory=list)
+    wall_seconds: float = 0.0
+
+    @property
+    def critical_path_seconds(self) -> float:
+        return self.timings[self.critical_path[-1]].critical_path_seconds if self.critical_path else 0.0
+
+    def get_summary(self) -> Dict[str, Any]:
+        """Execution summary statistics."""
+        busy = sum(timing.seconds for timing in self.timings.values())
+        return {
+            'defines': len(self.define_results),
+            'failed_defines': sorted(self.errors),
+            'materialized_defines': sorted(n for n, t in self.timings.items() if t.materialized),
+            'wall_seconds': self.wall_seconds,
+            'sequential_seconds': busy,
+            'critical_path': self.critical_path,
+            'critical_path_seconds': self.critical_path_seconds,
+        }
+
+
+class DefineScheduler:
+    """Executes define SQL concurrently in dependency order over pooled connections"""
+
+    def __init__(self, connection: Any, dialect: str = 'duckdb', max_workers: Optional[int] = None,
+                 connection_factory: Optional[Callable[[], Any]] = None, materialize_shared: bool = True):
+        """
+        Args:
+            connection: Database connection of the datastore
+            dialect: 'duckdb' or 'postgresql'
+            max_workers: Defines run at the same time (default: 4)
+            connection_factory: Opens one pooled connection per worker thread (default:
+                ``connection.cursor()`` on DuckDB, which duplicates the connection; other
+                dialects share ``connection`` and run one statement at a time unless a
+                factory, e.g. ``lambda: psycopg2.connect(dsn)``, is given)
+            materialize_shared: Materialize defines read by two or more defines
+        """
+        self.connection = connection
+        self.dialect = dialect.upper()
+        self.max_workers = max(1, max_workers or 4)
+        self.materialize_shared = materialize_shared
+        if connection_factory is None and self.dialect == 'DUCKDB':
+            connection_factory = connection.cursor
+        self.connection_factory = connection_factory
+        self._shared_lock = threading.Lock()
+
+    def run(self, define_sql: Dict[str, str], dependencies: Optional[Dict[str, Set[str]]] = None,
+            relation_names: Optional[Dict[str, str]] = None) -> ScheduleResult:
+        """
+        Execute every define, each as soon as the defines it reads are available.
+
+        Args:
+            define_sql: Dictionary of define name -> SQL
+            dependencies: Dictionary of define name -> names of the defines it reads
+            relation_names: Identifier each define is referenced by in dependent SQL
+                (default: define_relation_name)
+
+        Returns:
+            ScheduleResult with rows per define (empty for failed defines)
+        """
+        dependencies = {name: set(dependencies.get(name, ())) & set(define_sql) if dependencies else set()
+                        for name in define_sql}
+        order = topological_order(dependencies)
+        relations = {name: (relation_names or {}).get(name) or define_relation_name(name) for name in define_sql}
+        dependents = {name: [d for d in order if name in dependencies[d]] for name in order}
+        materialized = {name for name in order if self.materialize_shared and len(dependents[name]) >= 2}
+        prefix = f"_define_{uuid.uuid4().hex[:8]}_"
+        tables = {name: prefix + relations[name] for name in materialized}
+
+        # A define waits for its materialized upstream defines; inlined ones run inside it
+        waits_for = {name: self._materialized_upstream(name, dependencies, materialized) for name in order}
+        statements = {name: self._bind_upstream(name, define_sql, dependencies, materialized, relations, tables)
+                      for name in order}
+
+        result = ScheduleResult(define_results={name: [] for name in define_sql})
+        local = threading.local()
+        pooled: List[Any] = []
+        run_start = time.perf_counter()
+
+        def execute(name: str) -> None:
+            timing = DefineTiming(name, materialized=name in materialized)
+            timing.started = time.perf_counter() - run_start
+            try:
+                connection = getattr(local, 'connection', None)
+                if connection is None and self.connection_factory is not None:
+                    connection = local.connection = self.connection_factory()
+                    with self._shared_lock:
+                        pooled.append(connection)
+                if name in materialized:
+                    self._execute(connection, f"CREATE TABLE {tables[name]} AS {statements[name]}")
+                    rows = self._fetch(connection, f"SELECT * FROM {tables[name]}")
+                else:
+                    rows = self._fetch(connection, statements[name])
+                result.define_results[name] = rows
+            finally:
+                timing.finished = time.perf_counter() - run_start
+                result.timings[name] = timing
+
+        pending = list(order)
+        running = {}
+        failed: Set[str] = set()
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                while pending or running:
+                    for name in list(pending):
+                        blocked = waits_for[name] & failed
+                        if blocked:
+                            pending.remove(name)
+                            failed.add(name)
+                            result.errors[name] = f"Upstream define failed: {', '.join(sorted(blocked))}"
+                        elif not waits_for[name] & (set(pending) | set(running.values())):
+                            pending.remove(name)
+                            running[executor.submit(execute, name)] = name
+                    if not running:
+                        continue
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        name = running.pop(future)
+                        error = future.exception()
+                        if error is not None:
+                            failed.add(name)
+                            result.errors[name] = str(error)
+                            logger.error(f"Define '{name}' failed: {error}")
+        finally:
+            for table in tables.values():
+                try:
+                    self._execute(None, f"DROP TABLE IF EXISTS {table}")
+                except Exception as e:
+                    logger.warning(f"Failed to drop materialized define table {table}: {e}")
+            for connection in pooled:
+                connection.close()
+
+        result.wall_seconds = time.perf_counter() - run_start
+        result.critical_path = self._critical_path(order, waits_for, result.timings)
+        logger.info(f"Ran {len(order)} defines with {self.max_workers} workers in {result.wall_seconds:.3f}s "
+                    f"({len(materialized)} materialized, {len(failed)} failed)")
+        return result
+
+    @staticmethod
+    def _materialized_upstream(name: str, dependencies: Dict[str, Set[str]], materialized: Set[str]) -> Set[str]:
+        """Materialized defines read by this define, directly or through inlined defines."""
+        found, stack, seen = set(), list(dependencies[name]), set()
+        while stack:
+            upstream = stack.pop()
+            if upstream in seen:
+                continue
+            seen.add(upstream)
+            if upstream in materialized:
+                found.add(upstream)
+            else:
+                stack.extend(dependencies[upstream])
+        return found
+
+    @staticmethod
+    def _bind_upstream(name: str, define_sql: Dict[str, str], dependencies: Dict[str, Set[str]],
+                       materialized: Set[str], relations: Dict[str, str], tables: Dict[str, str]) -> str:
+        """The define's SQL with a CTE per upstream define it reads (transitively)."""
+        ctes: Dict[str, str] = {}
+
+        def bind(upstream: str) -> None:
+            if upstream in ctes:
+                return
+            if upstream in materialized:
+                ctes[upstream] = f"{relations[upstream]} AS (SELECT * FROM {tables[upstream]})"
+                return
+            for further in sorted(dependencies[upstream]):
+                bind(further)
+            ctes[upstream] = f"{relations[upstream]} AS ({_strip_statement(define_sql[upstream])})"
+
+        for upstream in sorted(dependencies[name]):
+            bind(upstream)
+        sql = _strip_statement(define_sql[name])
+        if not ctes:
+            return sql
+        with_clause = ',\n'.join(ctes.values())
+        leading_with = _LEADING_WITH.match(sql)
+        if leading_with:
+            return f"{leading_with.group(0)}{with_clause},\n{sql[leading_with.end():]}"
+        return f"WITH {with_clause}\n{sql}"
+
+    @staticmethod
+    def _critical_path(order: List[str], waits_for: Dict[str, Set[str]],
+                       timings: Dict[str, DefineTiming]) -> List[str]:
+        """Longest chain of define durations through the scheduling dependencies."""
+        previous: Dict[str, Optional[str]] = {}
+        for name in order:
+            timing = timings.get(name)
+            if timing is None:
+                continue
+            upstream = [u for u in waits_for[name] if u in timings]
+            slowest = max(upstream, key=lambda u: timings[u].critical_path_seconds, default=None)
+            start = timings[slowest].critical_path_seconds if slowest else 0.0
+            timing.critical_path_seconds = start + timing.seconds
+            previous[name] = slowest
+        if not previous:
+            return []
+        name = max(previous, key=lambda n: timings[n].critical_path_seconds)
+        path = []
+        while name is not None:
+            path.append(name)
+            name = previous[name]
+        return path[::-1]
+
+    def _execute(self, connection: Any, sql: str) -> None:
+        if connection is None:
+            with self._shared_lock:
+                self._cursor_execute(self.connection, sql)
+        elif self.dialect == 'DUCKDB':
+            connection.execute(sql)
+        else:
+            self._cursor_execute(connection, sql)
+
+    def _fetch(self, connection: Any, sql: str) -> List[Dict[str, Any]]:
+        if connection is None:
+            with self._shared_lock:
+                return self._cursor_fetch(self.connection, sql)
+        if self.dialect == 'DUCKDB':
+            cursor = connection.execute(sql)
+            columns = [desc[0] for desc in cursor.description] if cursor.description else []
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        return self._cursor_fetch(connection, sql)
+
+    @staticmethod
+    def _cursor_execute(connection: Any, sql: str) -> None:
+        cursor = connection.cursor()
+        try:
+            cursor.execute(sql)
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def _cursor_fetch(connection: Any, sql: str) -> List[Dict[str, Any]]:
+        cursor = connection.cursor()
+        try:
+            cursor.execute(sql)
+            columns = [desc[0] for desc in cursor.description] if cursor.description else []
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+
+
+def _strip_statement(sql: str) -> str:
+    """SQL without surrounding whitespace and trailing semicolons, for use as a subquery."""
+    return sql.strip().rstrip(';').rstrip()
@@ -5,7 +5,8 @@ This engine orchestrates CQL parsing, translation to FHIRPath, and execution
 using the existing FHIR4DS infrastructure.
 """
 
-from typing import Dict, Any, Optional, List
+from collections import OrderedDict
+from typing import Dict, Any, Optional, List, Tuple
 import logging
 
 # SQLGenerator removed - using pipeline system only
@@ -15,20 +16,31 @@ from .translator import CQLTranslator
 from .advanced_parser import AdvancedCQLParser
 from .advanced_translator import AdvancedCQLTranslator
 from .context import CQLContext, CQLContextManager, CQLEvaluationContext, CQLContextType
-from ..functions.clinical import ClinicalFunctions, TerminologyFunctions
+from ..functions.clinical import ClinicalFunctions, TerminologyFunctions, ClinicalLogicFunctions
 from ..functions.math_functions import CQLMathFunctionHandler
 from ..functions.nullological_functions import CQLNullologicalFunctionHandler
 from ..functions.datetime_functions import CQLDateTimeFunctionHandler
 from ..functions.interval_functions import CQLIntervalFunctionHandler
 from ..functions.collection_functions import CQLCollectionFunctionHandler
 from .unified_registry import UnifiedFunctionRegistry
-from .library_manager import CQLLibraryManager, LibraryMetadata, LibraryVersion
+from .library_manager import CQLLibraryManager, LibraryMetadata, LibraryVersion, get_shared_library_cache
+from .interim_rules import InterimDispatch, match_known_issue
+from ...datastore.codings import coded_rows_sql, coding_index_table
+from ...datastore.intervals import CLINICAL_TIME_ELEMENTS, interval_bounds_sql, interval_index_table
+from ...datastore.references import compartment_index_table, compartment_rows_sql, context_element_paths
+from ...datastore.side_tables import patient_id_sql
+from .temporal_join import TemporalJoinCompiler, parse_temporal_condition
+from .define_scheduler import define_relation_name
 from ..pipeline.converters.cql_converter import CQLToPipelineConverter
 from ...pipeline.core.base import SQLState, ExecutionContext
 from ...pipeline.core.compiler import PipelineCompiler
+from ...utils.tracing import span, SPAN_PARSE, SPAN_COMPILE, SPAN_SQL_GENERATION, ATTR_SQL_LENGTH, ATTR_DIALECT
 
 logger = logging.getLogger(__name__)
 
+# Maximum memoized expression translations per engine
+TRANSLATION_MEMO_SIZE = 2048
+
 class CQLEngine:
     """
     Clinical Quality Language (CQL) engine.
@@ -63,8 +75,9 @@ class CQLEngine:
         self.advanced_translator = AdvancedCQLTranslator(self.dialect_name)  # Phase 6: Advanced SQL generation
         self.libraries = {}  # Legacy library storage - maintained for compatibility
         
-        # Phase 6: Advanced library management system
-        self.library_manager = CQLLibraryManager(cache_size=50)
+        # Phase 6: Advanced library management system; compiled libraries are shared
+        # across engines in the process (see library_manager.configure_library_cache)
+        self.library_manager = CQLLibraryManager(cache=get_shared_library_cache(), dialect=self.dialect_name)
         
         # Enhanced context management
         self.context_manager = CQLContextManager()
@@ -117,6 +130,11 @@ class CQLEngine:
         # Configuration for processing mode
         self.use_pipeline_mode = True  # Enable pipeline mode by default
         
+        # Memoized expression translations, see _evaluate_expression
+        self._translation_memo: "OrderedDict[tuple, Tuple[str, bool]]" = OrderedDict()
+        self._translation_memo_hits = 0
+        self._translation_memo_misses = 0
+        
         logger.info(f"CQL Engine initialized with {'pipeline' if self.use_pipeline_mode else 'legacy'} processing mode")
     
     def set_define_operations_context(self, define_operations: dict) -> None:
@@ -135,6 +153,8 @@ class CQLEngine:
             dialect=self.dialect_name, 
             define_operations=define_operations
         )
+        # Define references may now translate differently
+        self.clear_translation_memo()
         logger.info(f"Pipeline converter AST converter now has {len(self.pipeline_converter.ast_converter.define_operations)} define operations")
         logger.debug(f"Define operations keys: {list(self.pipeline_converter.ast_converter.define_operations.keys())}")
     
@@ -158,16 +178,18 @@ class CQLEngine:
         
         try:
             # Step 1: Parse CQL expression to AST
-            lexer = CQLLexer(cql_expression)
-            tokens = lexer.tokenize()
-            self.parser.tokens = tokens
-            self.parser.current = 0
-            
-            # Parse to CQL AST
-            cql_ast = self.parser.parse_expression_or_fhirpath(cql_expression)
+            with span(SPAN_PARSE, {"fhir4ds.component": "cql"}):
+                lexer = CQLLexer(cql_expression)
+                tokens = lexer.tokenize()
+                self.parser.tokens = tokens
+                self.parser.current = 0
+                
+                # Parse to CQL AST
+                cql_ast = self.parser.parse_expression_or_fhirpath(cql_expression)
             
             # Step 2: Convert CQL AST directly to pipeline operations
-            pipeline_operation = self.pipeline_converter.convert(cql_ast)
+            with span(SPAN_COMPILE, {"fhir4ds.component": "cql"}):
+                pipeline_operation = self.pipeline_converter.convert(cql_ast)
             logger.debug(f"Pipeline operation type: {type(pipeline_operation).__name__}")
             
             # Step 3: Execute pipeline operation to generate SQL
@@ -306,43 +328,142 @@ class CQLEngine:
         Returns:
             SQL query string
         """
+        with span(SPAN_SQL_GENERATION, {"fhir4ds.component": "cql",
+                                        ATTR_DIALECT: self.dialect_name}) as sql_span:
+            sql = self._evaluate_expression(cql_expression, table_name, json_column)
+            sql_span.set_attribute(ATTR_SQL_LENGTH, len(sql) if isinstance(sql, str) else 0)
+            return sql
+    
+    def _evaluate_expression(self, cql_expression: str, table_name: str, json_column: str) -> str:
+        """
+        Translate a CQL expression to SQL (see evaluate_expression).
+        
+        Translations are memoized per (expression, context type, referenced parameter
+        values, dialect, table, JSON column, mode); the patient/population context
+        filter is applied to the memoized SQL on every call, so repeated evaluations,
+        e.g. per patient, cost a dictionary lookup.
+        """
+        key = self._translation_key(cql_expression, table_name, json_column)
+        memoized = self._translation_memo.get(key)
+        if memoized is not None:
+            self._translation_memo.move_to_end(key)
+            self._translation_memo_hits += 1
+            logger.debug(f"CQL Engine reusing translation: {cql_expression}")
+            sql, contextual = memoized
+        else:
+            self._translation_memo_misses += 1
+            sql, contextual = self._translate_expression(cql_expression, table_name, json_column)
+            # Errors are not memoized so transient failures can recover
+            if isinstance(sql, str) and not sql.lstrip().startswith("--"):
+                self._translation_memo[key] = (sql, contextual)
+                while len(self._translation_memo) > TRANSLATION_MEMO_SIZE:
+                    self._translation_memo.popitem(last=False)
+        
+        if contextual:
+            # Context filtering is the cheap, per-call final step
+            return self.context_manager.current_context.apply_context_to_query(sql, table_name)
+        return sql
+    
+    def _translation_key(self, cql_expression: str, table_name: str, json_column: str) -> tuple:
+        """Memo key: everything other than the patient/population filter that shapes the SQL."""
+        context = self.context_manager.current_context
+        parameters = tuple(sorted(
+            (name, repr(value)) for name, value in self.evaluation_context.parameters.items()
+            if name in cql_expression
+        ))
+        return (cql_expression, str(getattr(context, 'context_type', '')), parameters, self.dialect_name,
+                table_name, json_column, self.use_pipeline_mode, coding_index_table(self.dialect, table_name),
+                interval_index_table(self.dialect, table_name))
+    
+    def _terminology_condition(self, table_name: str, json_column: str, resource_type: str,
+                               terminology: str, extract) -> str:
+        """
+        Interim-translator filter for a ``[Type: "terminology"]`` retrieve: the display of
+        the code or category, or the code text. With a coding index every Coding is
+        matched through a semi-join; otherwise the first Coding is read from JSON.
+        """
+        text_match = f"{extract(json_column, '$.code.text')} = '{terminology}'"
+        codings_table = coding_index_table(self.dialect, table_name)
+        if codings_table:
+            rows = coded_rows_sql(codings_table, resource_type, ['code', 'category'], display=terminology)
+            return f"id IN ({rows}) OR {text_match}"
+        return (f"{extract(json_column, '$.code.coding[0].display')} = '{terminology}' OR {text_match} OR "
+                f"{extract(json_column, '$.category[0].coding[0].display')} = '{terminology}'")
+    
+    def _code_display_condition(self, table_name: str, json_column: str, alias: str,
+                                resource_type: str, display: str) -> str:
+        """Condition that the aliased resource's code has a Coding with this display."""
+        codings_table = coding_index_table(self.dialect, table_name)
+        if codings_table:
+            return f"{alias}.id IN ({coded_rows_sql(codings_table, resource_type, ['code'], display=display)})"
+        return f"json_extract_string({alias}.{json_column}, '$.code.coding[0].display') = '{display}'"
+    
+    def clear_translation_memo(self) -> None:
+        """Drop memoized expression translations (e.g. after changing defines or libraries)."""
+        self._translation_memo.clear()
+    
+    def get_translation_memo_stats(self) -> Dict[str, Any]:
+        """Translation memo size and hit statistics."""
+        lookups = self._translation_memo_hits + self._translation_memo_misses
+        return {
+            'size': len(self._translation_memo),
+            'max_size': TRANSLATION_MEMO_SIZE,
+            'hits': self._translation_memo_hits,
+            'misses': self._translation_memo_misses,
+            'hit_rate': self._translation_memo_hits / lookups if lookups else 0.0
+        }
+    
+    def _translate_expression(self, cql_expression: str, table_name: str, json_column: str) -> Tuple[str, bool]:
+        """
+        Translate a CQL expression without applying the evaluation context.
+        
+        Returns:
+            (SQL, whether the context filter should be applied to it)
+        """
         logger.info(f"CQL Engine evaluating: {cql_expression}")
         
         try:
             # Route through new pipeline converter if enabled
             if self.use_pipeline_mode:
                 try:
-                    return self.evaluate_expression_via_pipeline(cql_expression, table_name, json_column)
+                    return self.evaluate_expression_via_pipeline(cql_expression, table_name, json_column), False
                 except Exception as e:
                     logger.error(f"Pipeline mode failed: {e}, falling back to legacy mode")
                     import traceback
                     logger.debug(f"Pipeline failure traceback: {traceback.format_exc()}")
                     # Continue to legacy evaluation below
             
+            # With clauses relating the times of two resources compile to a range join
+            temporal_sql = self._try_temporal_join(cql_expression, table_name, json_column)
+            if temporal_sql:
+                return temporal_sql, False
+            
             # Check for direct function calls that can be routed through unified registry
             if self._is_direct_function_call(cql_expression):
-                return self._evaluate_function_via_registry(cql_expression, table_name, json_column)
+                return self._translate_function_via_registry(cql_expression, table_name, json_column)
             
             # Try interim pattern-based translation first for common failing patterns
-            if self._has_known_parsing_issues(cql_expression):
+            known_parsing_issues = self._has_known_parsing_issues(cql_expression)
+            if known_parsing_issues:
                 interim_result = self._try_interim_pattern_translation(cql_expression, table_name, json_column)
                 if interim_result and not interim_result.startswith("--"):
                     logger.info(f"Successfully translated via interim pattern matcher")
-                    return interim_result
+                    return interim_result, False
             
             # Check if this is an advanced CQL construct (Phase 6)
             # BUT first check if it matches our interim patterns (which take precedence)
-            if self._has_advanced_constructs(cql_expression) and not self._has_known_parsing_issues(cql_expression):
-                return self.evaluate_advanced_expression(cql_expression, table_name, json_column)
+            if self._has_advanced_constructs(cql_expression) and not known_parsing_issues:
+                return self._translate_advanced_expression(cql_expression, table_name, json_column)
             
             # Step 1: Parse CQL expression to AST
-            lexer = CQLLexer(cql_expression)
-            tokens = lexer.tokenize()
-            self.parser.tokens = tokens
-            self.parser.current = 0
-            
-            # Use the smart parsing method that detects CQL vs FHIRPath
-            cql_ast = self.parser.parse_expression_or_fhirpath(cql_expression)
+            with span(SPAN_PARSE, {"fhir4ds.component": "cql"}):
+                lexer = CQLLexer(cql_expression)
+                tokens = lexer.tokenize()
+                self.parser.tokens = tokens
+                self.parser.current = 0
+                
+                # Use the smart parsing method that detects CQL vs FHIRPath
+                cql_ast = self.parser.parse_expression_or_fhirpath(cql_expression)
             
             # Step 2: Translate CQL AST to FHIRPath AST
             fhirpath_ast = self.translator.translate_expression(cql_ast)
@@ -365,15 +486,15 @@ class CQLEngine:
                 )
                 
                 # Convert AST to pipeline and compile to SQL
-                pipeline = pipeline_bridge.ast_to_pipeline_converter.convert_ast_to_pipeline(fhirpath_ast)
-                compiled_sql = pipeline.compile(context, initial_state)
-                sql = compiled_sql.get_full_sql()
+                with span(SPAN_COMPILE, {"fhir4ds.component": "cql"}):
+                    pipeline = pipeline_bridge.ast_to_pipeline_converter.convert_ast_to_pipeline(fhirpath_ast)
+                    compiled_sql = pipeline.compile(context, initial_state)
+                    sql = compiled_sql.get_full_sql()
                 
-                # Step 4: Apply context filtering to generated SQL
-                context_filtered_sql = self.context_manager.current_context.apply_context_to_query(sql, table_name)
-                return context_filtered_sql
+                # Step 4: Context filtering is applied by the caller
+                return sql, True
             else:
-                return f"-- CQL Expression (no dialect): {cql_expression}"
+                return f"-- CQL Expression (no dialect): {cql_expression}", False
                 
         except Exception as e:
             logger.error(f"CQL evaluation failed: {e}")
@@ -381,9 +502,9 @@ class CQLEngine:
             interim_result = self._try_interim_pattern_translation(cql_expression, table_name, json_column)
             if interim_result and not interim_result.startswith("--"):
                 logger.info(f"Successfully translated via interim pattern matcher")
-                return interim_result
+                return interim_result, False
             # Final fallback: treat as comment
-            return f"-- CQL Expression (error: {e}): {cql_expression}"
+            return f"-- CQL Expression (error: {e}): {cql_expression}", False
     
     def _has_known_parsing_issues(self, cql_expression: str) -> bool:
         """
@@ -395,181 +516,34 @@ class CQLEngine:
         Returns:
             True if expression should use interim pattern translation
         """
+        return match_known_issue(cql_expression) is not None
+    
+    def _try_temporal_join(self, cql_expression: str, table_name: str, json_column: str) -> Optional[str]:
+        """
+        SQL for ``[A] X with [B] Y such that <time of X or Y> <relationship> <time of the other>``,
+        bare or as the body of a define, as a set-based range join (see temporal_join), or
+        None for any other expression.
+        """
         import re
         
-        # Define statements with complex constructs
-        if re.search(r'define\s+"[^"]+"\s*:\s*\[', cql_expression, re.IGNORECASE):
-            return True
-            
-        # Statistical functions with resource queries (including those with terminology and multiline)
-        if re.search(r'(stddev|stdev|variance|median|mode|count|sum|avg|average|min|max)\s*\(\s*\[.*?\]', cql_expression, re.IGNORECASE | re.DOTALL):
-            return True
-            
-        # Statistical functions within define statements
-        if re.search(r'define\s+"[^"]+"\s*:\s*(stddev|stdev|variance|median|mode|count|sum|avg|average|min|max)\s*\(', cql_expression, re.IGNORECASE | re.DOTALL):
-            return True
-            
-        # Resource queries with sorting
-        if re.search(r'\[.*?\]\s+\w+\s+sort\s+by', cql_expression, re.IGNORECASE):
-            return True
-            
-        # DateTime arithmetic expressions (e.g., DateTime(...) + 1 year, Date(...) - 3 months)
-        if re.search(r'(datetime|date|time)\s*\([^)]+\)\s*[+\-]\s*\d+\s*(year|month|day|hour|minute|second|years|months|days|hours|minutes|seconds)', cql_expression, re.IGNORECASE):
-            return True
-            
-        # Duration calculations (e.g., years between Date(2020) and Date(2023), years between Date(2020, 3) and Today())
-        if re.search(r'(year|month|day|hour|minute|second|years|months|days|hours|minutes|seconds)\s+between\s+(?:(datetime|date|time)\s*\([^)]+\)|(Today|Now|TimeOfDay)\s*\(\s*\))\s+and\s+(?:(datetime|date|time)\s*\([^)]+\)|(Today|Now|TimeOfDay)\s*\(\s*\))', cql_expression, re.IGNORECASE):
-            return True
-        
-        # Clinical age calculations (e.g., AgeInYears(Date(1990)))
-        if re.search(r'(AgeInYears|AgeInMonths|AgeInDays|AgeInHours|AgeInMinutes|AgeInSeconds)\s*\(\s*(datetime|date|time)\s*\([^)]+\)\s*\)', cql_expression, re.IGNORECASE):
-            return True
-        
-        # Temporal precision comparisons (e.g., Date(...) same day as DateTime(...))
-        if re.search(r'(datetime|date|time)\s*\([^)]+\)\s+(same\s+(day|month|year|hour|minute|second))\s+as\s+(datetime|date|time)\s*\([^)]+\)', cql_expression, re.IGNORECASE):
-            return True
-        
-        # Temporal relationship operators (e.g., Date(...) includes Date(...), DateTime(...) during Date(...))
-        if re.search(r'(datetime|date|time)\s*\([^)]+\)\s+(includes|during)\s+(datetime|date|time)\s*\([^)]+\)', cql_expression, re.IGNORECASE):
-            return True
-        
-        # Pattern 10: Complex object construction with statistical functions (e.g., { p25: Percentile(...), p50: Percentile(...) })
-        if re.search(r'define\s+"[^"]+"\s*:\s*\{[^}]*Percentile\s*\([^}]*Percentile\s*\(', cql_expression, re.IGNORECASE | re.DOTALL):
-            return True
-            
-        # Pattern 10: Let expressions with variable dependencies (e.g., [Patient] P let ... return { ... })
-        if re.search(r'define\s+"[^"]+"\s*:\s*\[[^\]]+\]\s+\w+\s+let\s+.*?return\s+\{', cql_expression, re.IGNORECASE | re.DOTALL):
-            return True
-        
-        # Pattern 11: Grouped statistical operations with CASE statements (e.g., let AgeGroup: case ... return { count: Count(...), avg: Avg(...) })
-        if re.search(r'define\s+"[^"]+"\s*:\s*\[[^\]]+\]\s+\w+\s+let\s+\w+:\s*case\s+.*?return\s+\{[^}]*(count|avg|stddev|median)[^}]*(count|avg|stddev|median)', cql_expression, re.IGNORECASE | re.DOTALL):
-            return True
-        
-        # Pattern 12: Time series aggregations with date extraction (e.g., let ObsMonth: month from O.effectiveDateTime return { count: Count(...), avg: Avg(...) })
-        if re.search(r'define\s+"[^"]+"\s*:\s*\[[^\]]+\]\s+\w+\s+let\s+\w+:\s*(year|month|day|hour)\s+from\s+.*?return\s+\{[^}]*(count|avg|min|max|stddev)[^}]*(count|avg|min|max|stddev)', cql_expression, re.IGNORECASE | re.DOTALL):
-            return True
-        
-        # Pattern 13: Sorting by computed values with let expressions (e.g., [Patient] P let RiskScore: AgeInYears(...) * 0.1 sort by RiskScore desc)
-        pattern13_match = re.search(r'define\s+"[^"]+"\s*:\s*\[[^\]]+\]\s+\w+\s+let\s+\w+:\s+.*?\s+sort\s+by\s+\w+', cql_expression, re.IGNORECASE | re.DOTALL)
-        if pattern13_match:
-            logger.debug(f"Pattern 13 detected in _has_known_parsing_issues: {pattern13_match.group()}")
-            return True
-        
-        # Pattern 15: Multiple let expressions with return statements (e.g., [Patient] P let Age: ..., BMI: ... return { id: P.id, age: Age })
-        pattern15_match = re.search(r'define\s+"[^"]+"\s*:\s*\[[^\]]+\]\s+\w+\s+let\s+.*?return\s+\{', cql_expression, re.IGNORECASE | re.DOTALL)
-        if pattern15_match:
-            logger.debug(f"Pattern 15 detected in _has_known_parsing_issues: {pattern15_match.group()[:100]}")
-            return True
-        
-        # Pattern 16: Duration calculations with DateTime/Date functions (e.g., months between DateTime(2023, 1, 1) and null, months between Date(2023) and Date(2024))
-        pattern16_match = re.search(r'define\s+"[^"]+"\s*:\s*(years|months|days|hours|minutes|seconds)\s+between\s+(DateTime|Date)\(', cql_expression, re.IGNORECASE | re.DOTALL)
-        if pattern16_match:
-            logger.debug(f"Pattern 16 detected in _has_known_parsing_issues: {pattern16_match.group()}")
-            return True
-        
-        # Pattern 17: Complex Clinical Priority Sorting with Multi-resource Relationships (e.g., with/without + let RiskLevel: case when ... where RiskLevel in {...})
-        pattern17_match = re.search(r'define\s+"[^"]+"\s*:\s*\[[^\]]+\]\s+\w+\s+.*?(with|without)\s+.*?let\s+.*?RiskLevel:\s*case\s+.*?where\s+RiskLevel\s+in\s+\{.*?\}', cql_expression, re.IGNORECASE | re.DOTALL)
-        if pattern17_match:
-            logger.debug(f"Pattern 17 detected in _has_known_parsing_issues: {pattern17_match.group()[:100]}")
-            return True
-        
-        # Pattern 20: Statistical aggregation combinations with let expressions and return objects (check this BEFORE Pattern 18)
-        # e.g., [Patient] P with [Condition] C ... let AgeCategory: ... return { patientCount: Count(P), avgAge: Avg(...) }
-        pattern20_match = re.search(r'define\s+"[^"]+"\s*:\s*\[[^\]]+\]\s+\w+\s+with\s+.*?let\s+.*?return\s+\{.*?(Count|Avg|Sum|Min|Max).*?\}', cql_expression, re.IGNORECASE | re.DOTALL)
-        if pattern20_match:
-            logger.debug(f"Pattern 20 detected in _has_known_parsing_issues: {pattern20_match.group()[:100]}")
-            return True
-        
-        # Pattern 24: Mixed WITH/WITHOUT Clauses (check BEFORE Pattern 23 and 18)
-        # e.g., [Patient] P with [Condition: "Diabetes"] D such that ... without [Condition: "Hypertension"] H such that ...
-        pattern24_match = re.search(r'define\s+"[^"]+"\s*:\s*\[[^\]]+\]\s+\w+\s+with\s+\[[^\]]+\]\s+\w+\s+such\s+that.*?without\s+\[[^\]]+\]\s+\w+\s+such\s+that', cql_expression, re.IGNORECASE | re.DOTALL)
-        if pattern24_match:
-            logger.debug(f"Pattern 24 detected in _has_known_parsing_issues: {pattern24_match.group()[:100]}")
-            return True
-        
-        # Pattern 25: Nested let expressions within return objects (Phase 9.1)
-        # e.g., [Patient] P let BaseAge: ... return { id: P.id, ageGroup: (let AgeCategory: if BaseAge < 18 then 'Child' ... return AgeCategory) }
-        pattern25_match = re.search(r'define\s+"[^"]+"\s*:\s*\[[^\]]+\]\s+\w+\s+let\s+.*?return\s+\{[^}]*?\(\s*let\s+.*?return\s+.*?\)[^}]*?\}', cql_expression, re.IGNORECASE | re.DOTALL)
-        if pattern25_match:
-            logger.debug(f"Pattern 25 detected in _has_known_parsing_issues: {pattern25_match.group()[:100]}")
-            return True
-        
-        # Pattern 26: Complex multi-construct queries (Phase 9.2)
-        # e.g., [Patient] P with [Condition] C1 ... with [Observation] O1 ... without [Condition: "X"] C2 ... let Score: ... where Score > 100 return {...}
-        pattern26_match = re.search(r'define\s+"[^"]+"\s*:\s*\[[^\]]+\]\s+\w+\s+with\s+.*?with\s+.*?without\s+.*?let\s+.*?where\s+.*?return\s+\{', cql_expression, re.IGNORECASE | re.DOTALL)
-        if pattern26_match:
-            logger.debug(f"Pattern 26 detected in _has_known_parsing_issues: {pattern26_match.group()[:100]}")
-            return True
-        
-        # Pattern 23: Multiple WITH Clause Intersections (check BEFORE Pattern 19 and 18)
-        # e.g., [Patient] P with [Condition: "Diabetes"] D such that ... with [Condition: "Hypertension"] H such that ...
-        pattern23_match = re.search(r'define\s+"[^"]+"\s*:\s*\[[^\]]+\]\s+\w+\s+with\s+\[[^\]]+\]\s+\w+\s+such\s+that.*?with\s+\[[^\]]+\]\s+\w+\s+such\s+that', cql_expression, re.IGNORECASE | re.DOTALL)
-        if pattern23_match:
-            logger.debug(f"Pattern 23 detected in _has_known_parsing_issues: {pattern23_match.group()[:100]}")
-            return True
-        
-        # Pattern 19: Nested Collection Transformations with EXISTS (check BEFORE Pattern 18)
-        # e.g., [Patient] P with [Condition] C such that C.subject.reference = 'Patient/' + P.id and C.code.coding.exists(...)
-        pattern19_match = re.search(r'define\s+"[^"]+"\s*:\s*\[[^\]]+\]\s+\w+\s+with\s+\[[^\]]+\]\s+\w+\s+such\s+that.*?and\s+.*?\..*?\.exists\(.*?\)', cql_expression, re.IGNORECASE | re.DOTALL)
-        if pattern19_match:
-            logger.debug(f"Pattern 19 detected in _has_known_parsing_issues: {pattern19_match.group()[:100]}")
-            return True
-        
-        # Pattern 18: Multi-resource WITH clauses with complex conditions (more general - check after Pattern 19 and 20)
-        # e.g., [Patient] P with [Condition] C such that C.subject.reference = 'Patient/' + P.id
-        pattern18_match = re.search(r'define\s+"[^"]+"\s*:\s*\[[^\]]+\]\s+\w+\s+with\s+\[[^\]]+\]\s+\w+\s+such\s+that', cql_expression, re.IGNORECASE | re.DOTALL)
-        if pattern18_match:
-            logger.debug(f"Pattern 18 detected in _has_known_parsing_issues: {pattern18_match.group()[:100]}")
-            return True
-        
-        # Pattern 21: Set operations with custom equality (e.g., [Patient] P1 intersect [Patient] P2 where ...)
-        pattern21_match = re.search(r'define\s+"[^"]+"\s*:\s*\[[^\]]+\]\s+\w+\s+(intersect|union|except)\s+\[[^\]]+\]\s+\w+\s+where', cql_expression, re.IGNORECASE | re.DOTALL)
-        if pattern21_match:
-            logger.debug(f"Pattern 21 detected in _has_known_parsing_issues: {pattern21_match.group()[:100]}")
-            return True
-        
-        # Pattern 21: Resource queries with WHERE, SORT BY, and RETURN clauses (e.g., [Patient] P where ... sort by ... return { ... })
-        pattern21_match = re.search(r'define\s+"[^"]+"\s*:\s*\[[^\]]+\]\s+\w+\s+where\s+.*?sort\s+by\s+.*?return\s+\{', cql_expression, re.IGNORECASE | re.DOTALL)
-        if pattern21_match:
-            logger.debug(f"Pattern 21 detected in _has_known_parsing_issues: {pattern21_match.group()[:100]}")
-            return True
-        
-        # Pattern 9.5: Simple tuple construction (NEW - Phase 1.1)
-        # Route simple literal tuples to interim pattern handler for proper CQLTuple processing
-        if re.search(r'define\s+"[^"]+"\s*:\s*\{\s*\w+:\s*[\'"\d]', cql_expression, re.IGNORECASE):
-            # Check if it's a simple literal tuple (no function calls, no resource queries)
-            tuple_match = re.search(r'define\s+"[^"]+"\s*:\s*\{\s*([^}]+)\s*\}', cql_expression, re.IGNORECASE | re.DOTALL)
-            if tuple_match:
-                tuple_body = tuple_match.group(1)
-                has_functions = bool(re.search(r'\w+\s*\([^)]*\)', tuple_body, re.IGNORECASE))
-                has_resource_queries = bool(re.search(r'\[[^\]]+\]', tuple_body, re.IGNORECASE))
-                
-                if not has_functions and not has_resource_queries:
-                    logger.debug(f"Routing simple tuple to interim pattern handler")
-                    return True
-        
-        # Pattern 9.6: Simple list construction (NEW - Phase 1.3)
-        # Route simple literal lists to interim pattern handler for proper CQLList processing
-        # Examples: define "SimpleList": { 'a', 'b', 'c' } or define "Numbers": { 1, 2, 3 }
-        if re.search(r'define\s+"[^"]+"\s*:\s*\{\s*[\'"\d][^:]*?\}', cql_expression, re.IGNORECASE):
-            # Check if it's a simple literal list (no field:value pairs, no functions, no resource queries)
-            list_match = re.search(r'define\s+"[^"]+"\s*:\s*\{\s*([^}]+)\s*\}', cql_expression, re.IGNORECASE | re.DOTALL)
-            if list_match:
-                list_body = list_match.group(1)
-                
-                # Check if it contains colon (indicates tuple, not list)
-                has_colons = ':' in list_body
-                has_functions = bool(re.search(r'\w+\s*\([^)]*\)', list_body, re.IGNORECASE))
-                has_resource_queries = bool(re.search(r'\[[^\]]+\]', list_body, re.IGNORECASE))
-                
-                # Must be a comma-separated list of values without colons
-                if not has_colons and not has_functions and not has_resource_queries:
-                    # Verify it looks like a list (comma-separated values)
-                    if ',' in list_body:
-                        logger.debug(f"Routing simple list to interim pattern handler")
-                        return True
-            
-        return False
+        if not self.dialect:
+            return None
+        match = re.match(r'\s*(?:define\s+"[^"]+"\s*:\s*)?\[([^\]]+)\]\s+(\w+)\s+with\s+\[([^\]]+)\]\s+(\w+)'
+                         r'\s+such\s+that\s+(.*?)\s*$', cql_expression, re.IGNORECASE | re.DOTALL)
+        if not match:
+            return None
+        primary_resource, primary_alias, secondary_resource, secondary_alias, condition = match.groups()
+        temporal = parse_temporal_condition(condition)
+        if not temporal:
+            return None
+        primary_type, primary_display = re.match(r'\s*(\w+)(?:\s*:\s*"([^"]+)")?', primary_resource).groups()
+        secondary_type, secondary_display = re.match(r'\s*(\w+)(?:\s*:\s*"([^"]+)")?', secondary_resource).groups()
+        sql = TemporalJoinCompiler(self.dialect, table_name, json_column).compile(
+            primary_type, primary_alias, secondary_type, secondary_alias, temporal,
+            primary_display=primary_display, related_display=secondary_display)
+        if sql:
+            logger.debug(f"Generated temporal join SQL for WITH clause: {sql[:100]}...")
+        return sql
     
     def _try_interim_pattern_translation(self, cql_expression: str, table_name: str = "fhir_resources", 
                                        json_column: str = "resource") -> str:
@@ -590,11 +564,11 @@ class CQLEngine:
         import re
         
         logger.debug(f"Attempting interim pattern translation for: {cql_expression[:100]}...")
+        interim = InterimDispatch(cql_expression)
         
         # Pattern 1: Define statements with resource queries and sorting (handles multi-line)
         # Example: define "Name": [Resource] P sort by P.field desc, P.other asc
-        define_with_sort_pattern = r'define\s+"([^"]+)"\s*:\s*\[(\w+)(?:\s*:\s*"[^"]+")?\]\s*(\w+)?\s*sort\s+by\s+(.+?)(?=\s*$)'
-        match = re.search(define_with_sort_pattern, cql_expression, re.IGNORECASE | re.DOTALL)
+        match = interim.search('define_with_sort')
         if match:
             define_name, resource_type, alias, sort_criteria = match.groups()
             
@@ -644,7 +618,7 @@ class CQLEngine:
             terminology_match = re.search(r'\[(\w+)\s*:\s*"([^"]+)"\]', cql_expression, re.IGNORECASE)
             if terminology_match:
                 terminology = terminology_match.group(2)
-                where_sql += f" AND ({self._json_extract(json_column, '$.code.coding[0].display')} = '{terminology}' OR {self._json_extract(json_column, '$.code.text')} = '{terminology}' OR {self._json_extract(json_column, '$.category[0].coding[0].display')} = '{terminology}')"
+                where_sql += f" AND ({self._terminology_condition(table_name, json_column, resource_type, terminology, self._json_extract)})"
             
             sql = f"""SELECT {json_column}
 FROM {table_name}
@@ -654,10 +628,42 @@ ORDER BY {sort_clause}"""
             logger.debug(f"Generated interim SQL for define with sort: {sql[:100]}...")
             return sql
         
+        # Pattern 1b: First/Last of a sorted resource query, per patient
+        # Example: define "Most Recent HbA1c": Last([Observation: "HbA1c"] O sort by effective)
+        match = interim.search('first_last')
+        if match:
+            define_name, position, resource_type, terminology, alias, where_clause, sort_criteria = match.groups()
+            alias = alias or resource_type[0]
+            
+            # One sorted pass over the retrieve: ROW_NUMBER() per patient instead of a
+            # sorted LIMIT 1 subquery per patient. Last is First of the reversed order.
+            order_items = []
+            for sort_item in sort_criteria.split(','):
+                descending = bool(re.search(r'\s(desc|descending)\s*$', sort_item, re.IGNORECASE))
+                field_expr = re.sub(r'\s+(asc|ascending|desc|descending)\s*$', '', sort_item.strip(), flags=re.IGNORECASE)
+                if position.lower() == 'last':
+                    descending = not descending
+                order_items.append(f"{self._sort_key_sql(json_column, resource_type, alias, field_expr)} "
+                                   f"{'DESC' if descending else 'ASC'} NULLS LAST")
+            
+            where_sql = f"{self._json_extract(json_column, '$.resourceType')} = '{resource_type}'"
+            if terminology:
+                where_sql += f" AND ({self._terminology_condition(table_name, json_column, resource_type, terminology, self._json_extract)})"
+            if where_clause:
+                where_sql += f" AND {self._convert_simple_cql_where_to_sql(where_clause, alias, json_column)}"
+            
+            source = f"SELECT {json_column} FROM {table_name} WHERE {where_sql}"
+            patient = patient_id_sql(self.dialect, f"src.{json_column}", [resource_type])
+            first = ClinicalLogicFunctions.first_per_partition(source, patient, ", ".join(order_items))
+            sql = f"""SELECT {json_column}
+FROM ({first}) first_per_patient"""
+            
+            logger.debug(f"Generated interim SQL for {position} of sorted query: {sql[:100]}...")
+            return sql
+        
         # Pattern 2: Statistical functions with resource queries
         # Example: StdDev([Patient] P return P.age)
-        statistical_pattern = r'(stddev|stdev|variance|median|mode|count|sum|avg|average|min|max)\s*\(\s*\[(\w+)(?:\s*:\s*"[^"]+")?\]\s*(\w+)?\s*(where\s+[^)]+)?\s*(return\s+[^)]+)?\s*\)'
-        match = re.search(statistical_pattern, cql_expression, re.IGNORECASE | re.DOTALL)
+        match = interim.search('statistical')
         if match:
             func_name, resource_type, alias, where_clause, return_clause = match.groups()
             
@@ -691,8 +697,7 @@ WHERE {where_sql}"""
         
         # Pattern 4: Statistical functions within define statements
         # Example: define "Blood Pressure Standard Deviation": StdDev([Observation: "Systolic Blood Pressure"] O return O.valueQuantity.value)
-        define_statistical_pattern = r'define\s+"[^"]+"\s*:\s*(stddev|stdev|variance|median|mode|count|sum|avg|average|min|max)\s*\(\s*\[(\w+)(?:\s*:\s*"[^"]+")?\]\s*(\w+)?\s*(where\s+[^)]+)?\s*(return\s+[^)]+)?\s*\)'
-        match = re.search(define_statistical_pattern, cql_expression, re.IGNORECASE | re.DOTALL)
+        match = interim.search('define_statistical')
         if match:
             func_name, resource_type, alias, where_clause, return_clause = match.groups()
             
@@ -717,7 +722,7 @@ WHERE {where_sql}"""
             if terminology_match:
                 terminology = terminology_match.group(2)
                 # Add terminology filtering to SQL - try multiple common FHIR paths
-                where_sql += f" AND ({self._json_extract(json_column, '$.code.coding[0].display')} = '{terminology}' OR {self._json_extract(json_column, '$.code.text')} = '{terminology}' OR {self._json_extract(json_column, '$.category[0].coding[0].display')} = '{terminology}')"
+                where_sql += f" AND ({self._terminology_condition(table_name, json_column, resource_type, terminology, self._json_extract)})"
             
             if where_clause:
                 # Simple where clause conversion
@@ -734,8 +739,7 @@ WHERE {where_sql}"""
         
         # Pattern 3: Basic resource retrieval
         # Example: [Patient]
-        basic_retrieve_pattern = r'^\s*\[(\w+)\]\s*$'
-        match = re.search(basic_retrieve_pattern, cql_expression, re.IGNORECASE)
+        match = interim.search('basic_retrieve')
         if match:
             resource_type = match.group(1)  
             sql = f"""SELECT {json_column}
@@ -747,8 +751,7 @@ WHERE {self._json_extract(json_column, '$.resourceType')} = '{resource_type}'"""
         
         # Pattern 5: DateTime arithmetic expressions 
         # Example: define "Year Addition": DateTime(2023, 1, 15, 10, 30, 0) + 1 year
-        datetime_arithmetic_pattern = r'define\s+"([^"]+)"\s*:\s*(datetime|date|time)\s*\(([^)]+)\)\s*([+\-])\s*(\d+)\s*(year|month|day|hour|minute|second|years|months|days|hours|minutes|seconds)'
-        match = re.search(datetime_arithmetic_pattern, cql_expression, re.IGNORECASE | re.DOTALL)
+        match = interim.search('datetime_arithmetic')
         if match:
             define_name, func_name, args, operator, amount, unit = match.groups()
             
@@ -791,8 +794,7 @@ WHERE {self._json_extract(json_column, '$.resourceType')} = '{resource_type}'"""
         # Pattern 6: Duration calculations
         # Example: define "Age": years between Date(2020) and Date(2023)
         # Also handles: years between Date(2020, 3) and Today()
-        duration_calculation_pattern = r'define\s+"([^"]+)"\s*:\s*(year|month|day|hour|minute|second|years|months|days|hours|minutes|seconds)\s+between\s+(?:(datetime|date|time)\s*\(([^)]+)\)|(Today|Now|TimeOfDay)\s*\(\s*\))\s+and\s+(?:(datetime|date|time)\s*\(([^)]+)\)|(Today|Now|TimeOfDay)\s*\(\s*\))'
-        match = re.search(duration_calculation_pattern, cql_expression, re.IGNORECASE | re.DOTALL)
+        match = interim.search('duration_calculation')
         if match:
             # The groups are: define_name, duration_unit, start_func, start_args, start_special, end_func, end_args, end_special
             groups = match.groups()
@@ -881,8 +883,7 @@ WHERE {self._json_extract(json_column, '$.resourceType')} = '{resource_type}'"""
         
         # Pattern 7: Clinical age calculations
         # Example: define "Age": AgeInYears(Date(1990))
-        clinical_age_pattern = r'define\s+"([^"]+)"\s*:\s*(AgeInYears|AgeInMonths|AgeInDays|AgeInHours|AgeInMinutes|AgeInSeconds)\s*\(\s*(datetime|date|time)\s*\(([^)]+)\)\s*\)'
-        match = re.search(clinical_age_pattern, cql_expression, re.IGNORECASE | re.DOTALL)
+        match = interim.search('clinical_age')
         if match:
             define_name, age_func, date_func, date_args = match.groups()
             
@@ -934,8 +935,7 @@ WHERE {self._json_extract(json_column, '$.resourceType')} = '{resource_type}'"""
         
         # Pattern 8: Temporal precision comparisons
         # Example: define "Same Day": Date(2023, 6, 15) same day as DateTime(2023, 6, 15, 14, 30)
-        temporal_comparison_pattern = r'define\s+"([^"]+)"\s*:\s*(datetime|date|time)\s*\(([^)]+)\)\s+(same\s+(day|month|year|hour|minute|second))\s+as\s+(datetime|date|time)\s*\(([^)]+)\)'
-        match = re.search(temporal_comparison_pattern, cql_expression, re.IGNORECASE | re.DOTALL)
+        match = interim.search('temporal_comparison')
         if match:
             define_name, left_func, left_args, comparison_phrase, precision_unit, right_func, right_args = match.groups()
             
@@ -995,8 +995,7 @@ WHERE {self._json_extract(json_column, '$.resourceType')} = '{resource_type}'"""
         # Pattern 9: Temporal relationship operators
         # Example: define "Month Includes Day": Date(2023, 6) includes Date(2023, 6, 15)
         # Example: define "DateTime During Date": DateTime(2023, 6, 15, 14, 30) during Date(2023, 6, 15)
-        temporal_relationship_pattern = r'define\s+"([^"]+)"\s*:\s*(datetime|date|time)\s*\(([^)]+)\)\s+(includes|during)\s+(datetime|date|time)\s*\(([^)]+)\)'
-        match = re.search(temporal_relationship_pattern, cql_expression, re.IGNORECASE | re.DOTALL)
+        match = interim.search('temporal_relationship')
         if match:
             define_name, left_func, left_args, relationship_op, right_func, right_args = match.groups()
             
@@ -1076,8 +1075,7 @@ WHERE {self._json_extract(json_column, '$.resourceType')} = '{resource_type}'"""
         # Pattern 9.5: Simple Tuple Construction (NEW - Phase 1.1)
         # Handle simple literal tuple construction like: define "Simple Tuple": { name: 'John', age: 25 }
         # This should be handled BEFORE complex object construction patterns
-        simple_tuple_pattern = r'define\s+"([^"]+)"\s*:\s*\{\s*([^}]+)\s*\}'
-        tuple_match = re.search(simple_tuple_pattern, cql_expression, re.IGNORECASE | re.DOTALL)
+        tuple_match = interim.search('simple_tuple')
         if tuple_match:
             define_name, tuple_body = tuple_match.groups()
             
@@ -1120,8 +1118,7 @@ WHERE {self._json_extract(json_column, '$.resourceType')} = '{resource_type}'"""
         
         # Pattern 9.6: Simple List Construction (NEW - Phase 1.3)
         # Handle simple literal list construction like: define "SimpleList": { 'a', 'b', 'c' }
-        simple_list_pattern = r'define\s+"([^"]+)"\s*:\s*\{\s*([^}]+)\s*\}'
-        list_match = re.search(simple_list_pattern, cql_expression, re.IGNORECASE | re.DOTALL)
+        list_match = interim.search('simple_list')
         if list_match:
             define_name, list_body = list_match.groups()
             
@@ -1190,8 +1187,7 @@ WHERE {self._json_extract(json_column, '$.resourceType')} = '{resource_type}'"""
         # Pattern 10: Complex Object Construction and Let Expressions
         # Part A: Object/Tuple construction with multiple statistical functions
         # Example: { p25: Percentile([Observation: "BMI"] O return O.valueQuantity.value, 25), p50: Percentile(..., 50) }
-        object_construction_pattern = r'define\s+"([^"]+)"\s*:\s*\{\s*([^}]+)\s*\}'
-        match = re.search(object_construction_pattern, cql_expression, re.IGNORECASE | re.DOTALL)
+        match = interim.search('object_construction')
         if match:
             define_name, object_body = match.groups()
             
@@ -1223,8 +1219,7 @@ WHERE {self._json_extract_string('r.resource', '$.resourceType')} = '{resource_t
         
         # Part B: Let expressions with variable dependencies  
         # Example: [Patient] P let PatientAge: AgeInYears(P.birthDate), BMI: P.extension... return { ... }
-        let_expression_pattern = r'define\s+"([^"]+)"\s*:\s*\[([^\]]+)\]\s+(\w+)\s+let\s+(.*?)return\s+\{([^}]+)\}'  
-        match = re.search(let_expression_pattern, cql_expression, re.IGNORECASE | re.DOTALL)
+        match = interim.search('let_expression')
         if match:
             define_name, resource_type, alias, let_clause, return_clause = match.groups()
             
@@ -1252,8 +1247,7 @@ WHERE bmi IS NOT NULL"""
         
         # Pattern 11: Grouped statistical operations with CASE statements
         # Example: [Patient] P let AgeGroup: case when AgeInYears(...) < 18 then 'Pediatric' ... return { count: Count(P), avg: Avg(...) }
-        grouped_stats_pattern = r'define\s+"([^"]+)"\s*:\s*\[([^\]]+)\]\s+(\w+)\s+let\s+(\w+):\s*case\s+(.*?)return\s+\{([^}]+)\}'
-        match = re.search(grouped_stats_pattern, cql_expression, re.IGNORECASE | re.DOTALL)
+        match = interim.search('grouped_stats')
         if match:
             define_name, resource_type, alias, group_var, case_clause, return_clause = match.groups()
             
@@ -1286,8 +1280,7 @@ GROUP BY age_group"""
         
         # Pattern 12: Time series aggregations with date extraction  
         # Example: [Observation: "Vital Signs"] O let ObsMonth: month from O.effectiveDateTime return { month: ObsMonth, count: Count(O), avgValue: Avg(...) }
-        time_series_pattern = r'define\s+"([^"]+)"\s*:\s*\[([^:]+):\s*"([^"]+)"\]\s+(\w+)\s+let\s+(\w+):\s*(year|month|day|hour)\s+from\s+[^r]+return\s+\{([^}]+)\}'
-        match = re.search(time_series_pattern, cql_expression, re.IGNORECASE | re.DOTALL)
+        match = interim.search('time_series')
         if match:
             define_name, resource_type, code, alias, time_var, time_unit, return_clause = match.groups()
             
@@ -1321,9 +1314,7 @@ ORDER BY time_period"""
         
         # Pattern 13: Sorting by computed values with let expressions
         # Example: [Patient] P let RiskScore: AgeInYears(P.birthDate) * 0.1 sort by RiskScore desc, P.id asc
-        computed_sort_pattern = r'define\s+"([^"]+)"\s*:\s*\[([^\]]+)(?:\s*:\s*"[^"]+")?\]\s+(\w+)\s+let\s+(\w+):\s+(.*?)\s+sort\s+by\s+(.+)'
-        match = re.search(computed_sort_pattern, cql_expression, re.IGNORECASE | re.DOTALL)
-        logger.debug(f"Checking Pattern 13 with regex: {computed_sort_pattern}")
+        match = interim.search('computed_sort')
         logger.debug(f"Pattern 13 match result: {match}")
         if match:
             define_name, resource_type, alias, computed_var, computation, sort_clause = match.groups()
@@ -1387,7 +1378,7 @@ ORDER BY time_period"""
                 terminology_match = re.search(r'\[(\w+)\s*:\s*"([^"]+)"\]', cql_expression, re.IGNORECASE)
                 if terminology_match:
                     terminology = terminology_match.group(2)
-                    where_sql += f" AND ({self._json_extract_string(json_column, '$.code.coding[0].display')} = '{terminology}' OR {self._json_extract_string(json_column, '$.code.text')} = '{terminology}' OR {self._json_extract_string(json_column, '$.category[0].coding[0].display')} = '{terminology}')"
+                    where_sql += f" AND ({self._terminology_condition(table_name, json_column, resource_type, terminology, self._json_extract_string)})"
                 
                 # Build SQL with computed values and proper sorting
                 sql = f"""WITH computed_values AS (
@@ -1406,9 +1397,7 @@ ORDER BY {sort_clause_sql}"""
         
         # Pattern 25: Nested let expressions within return objects (Phase 9.1 - check BEFORE Pattern 15)
         # Example: [Patient] P let BaseAge: AgeInYears(P.birthDate) return { id: P.id, ageGroup: (let AgeCategory: if BaseAge < 18 then 'Child' ... return AgeCategory) }
-        nested_let_pattern = r'define\s+"([^"]+)"\s*:\s*\[([^\]]+)(?:\s*:\s*"[^"]+")?\]\s+(\w+)\s+let\s+(.*?)\s+return\s+\{(.*?)\}'
-        match = re.search(nested_let_pattern, cql_expression, re.IGNORECASE | re.DOTALL)
-        logger.debug(f"Checking Pattern 25 with regex: {nested_let_pattern}")
+        match = interim.search('nested_let')
         logger.debug(f"Pattern 25 match result: {match}")
         
         # Check if this is specifically Pattern 25 (has nested let within return object)
@@ -1522,9 +1511,7 @@ FROM outer_step"""
         
         # Pattern 15: Multiple let expressions with return statements
         # Example: [Patient] P let Age: AgeInYears(P.birthDate), BMI: P.extension.where(url='bmi').valueDecimal return { id: P.id, age: Age, bmi: BMI }
-        multiple_let_pattern = r'define\s+"([^"]+)"\s*:\s*\[([^\]]+)(?:\s*:\s*"[^"]+")?\]\s+(\w+)\s+let\s+(.*?)\s+return\s+\{([^}]+)\}'
-        match = re.search(multiple_let_pattern, cql_expression, re.IGNORECASE | re.DOTALL)
-        logger.debug(f"Checking Pattern 15 with regex: {multiple_let_pattern}")
+        match = interim.search('multiple_let')
         logger.debug(f"Pattern 15 match result: {match}")
         if match:
             define_name, resource_type, alias, let_expressions, return_fields = match.groups()
@@ -1640,9 +1627,7 @@ FROM {final_step} final"""
         
         # Pattern 16: Duration calculations with DateTime/Date functions
         # Example: months between DateTime(2023, 1, 1) and null, months between Date(2023) and Date(2024)
-        duration_pattern = r'define\s+"([^"]+)"\s*:\s*(years|months|days|hours|minutes|seconds)\s+between\s+(.+?)\s+and\s+(.+?)(?:\s*$)'
-        match = re.search(duration_pattern, cql_expression, re.IGNORECASE | re.DOTALL)
-        logger.debug(f"Checking Pattern 16 with regex: {duration_pattern}")
+        match = interim.search('duration')
         logger.debug(f"Pattern 16 match result: {match}")
         if match:
             define_name, duration_unit, start_expr, end_expr = match.groups()
@@ -1735,8 +1720,7 @@ FROM {final_step} final"""
         
         # Pattern 17: Complex Clinical Priority Sorting with Multi-resource Relationships (CHECK FIRST - before Pattern 20)
         # Example: [Patient] P with [Condition: "Diabetes"] D without [Condition: "Hypertension"] H let RiskLevel: case when ... where RiskLevel in {'High', 'Very High'} return {...}
-        complex_priority_pattern = r'define\s+"([^"]+)"\s*:\s*\[([^\]]+)\]\s+(\w+)\s+(.*?)\s+let\s+(.*?)\s+RiskLevel:\s*case\s+(.*?)\s+end\s+(.*?)\s+where\s+RiskLevel\s+in\s+\{([^}]+)\}\s+return\s+\{([^}]+)\}'
-        match = re.search(complex_priority_pattern, cql_expression, re.IGNORECASE | re.DOTALL)
+        match = interim.search('complex_priority')
         if match:
             define_name, resource_type, alias, with_without_clauses, other_lets, case_clauses, extra_clauses, priority_filter, return_clause = match.groups()
             logger.debug(f"Pattern 17 detected: Complex clinical priority sorting for {resource_type}")
@@ -1761,7 +1745,7 @@ FROM {final_step} final"""
                     
                     if res_code:
                         exists_condition += f"""
-          AND json_extract_string({with_alias.lower()}.{json_column}, '$.code.coding[0].display') = '{res_code}'"""
+          AND {self._code_display_condition(table_name, json_column, with_alias.lower(), res_type, res_code)}"""
                     
                     # Handle subject reference condition
                     if 'subject.reference' in with_condition and f'{alias}.id' in with_condition:
@@ -1787,7 +1771,7 @@ FROM {final_step} final"""
                     
                     if res_code:
                         not_exists_condition += f"""
-          AND json_extract_string({without_alias.lower()}.{json_column}, '$.code.coding[0].display') = '{res_code}'"""
+          AND {self._code_display_condition(table_name, json_column, without_alias.lower(), res_type, res_code)}"""
                     
                     # Handle subject reference condition
                     if 'subject.reference' in without_condition and f'{alias}.id' in without_condition:
@@ -1875,8 +1859,7 @@ WHERE risk_level IN ('{priority_filter_sql}')"""
         
         # Pattern 26: Complex multi-construct queries (Phase 9.2 - CHECK BEFORE Pattern 20)
         # Example: [Patient] P with [Condition] C1 ... with [Observation] O1 ... without [Condition: "X"] C2 ... let Score: ... where Score > 100 return {...}
-        complex_pattern = r'define\s+"([^"]+)"\s*:\s*\[([^\]]+)\]\s+(\w+)\s+(.*?with.*?with.*?without.*?)let\s+(.*?)\s+where\s+(.*?)\s+return\s+\{(.*?)\}'
-        match = re.search(complex_pattern, cql_expression, re.IGNORECASE | re.DOTALL)
+        match = interim.search('complex')
         if match:
             define_name, primary_resource, primary_alias, clauses_section, let_expressions, where_clause, return_obj = match.groups()
             logger.debug(f"Pattern 26 detected: complex multi-construct query - {define_name}")
@@ -1946,7 +1929,7 @@ WHERE risk_level IN ('{priority_filter_sql}')"""
                 
                 if resource_code:
                     not_exists += f"""
-          AND json_extract_string({without_alias.lower()}.{json_column}, '$.code.coding[0].display') = '{resource_code}'"""
+          AND {self._code_display_condition(table_name, json_column, without_alias.lower(), resource_type, resource_code)}"""
                 
                 not_exists += f"""
           AND json_extract_string({without_alias.lower()}.{json_column}, '$.subject.reference') = CONCAT('{primary_resource}/', json_extract_string({primary_alias.lower()}.{json_column}, '$.id'))
@@ -2001,8 +1984,7 @@ WHERE {' AND '.join(where_conditions)}
         
         # Pattern 20: Statistical aggregation combinations with let expressions and return objects (CHECK AFTER Pattern 17)
         # Example: [Patient] P with [Condition] C ... let AgeCategory: if AgeInYears(P.birthDate) > 65 then 'Senior' else 'Non-Senior' ... return { ageCategory: AgeCategory, patientCount: Count(P), avgAge: Avg(AgeInYears(P.birthDate)) }
-        aggregation_pattern = r'define\s+"([^"]+)"\s*:\s*\[([^\]]+)\]\s+(\w+)\s+with\s+\[([^\]]+)\]\s+(\w+)\s+such\s+that\s+(.*?)let\s+(.*?)return\s+\{(.*?)\}'
-        match = re.search(aggregation_pattern, cql_expression, re.IGNORECASE | re.DOTALL)
+        match = interim.search('aggregation')
         if match:
             define_name, primary_resource, primary_alias, secondary_resource, secondary_alias, condition, let_expressions, return_obj = match.groups()
             logger.debug(f"Pattern 20 detected: {define_name} with let expressions and return aggregations")
@@ -2065,8 +2047,7 @@ GROUP BY {group_by_clause}"""
         
         # Pattern 19: Nested Collection Transformations with EXISTS (CHECK FIRST - before Pattern 18)
         # Example: [Patient] P with [Condition] C such that C.subject.reference = 'Patient/' + P.id and C.code.coding.exists(coding | coding.code = '73211009')
-        nested_collection_pattern = r'define\s+"([^"]+)"\s*:\s*\[([^\]]+)\]\s+(\w+)\s+with\s+\[([^\]]+)\]\s+(\w+)\s+such\s+that\s+(.*?)and\s+(.*?\..*?\.exists\(.*?\))(?:\s*$)'
-        match = re.search(nested_collection_pattern, cql_expression, re.IGNORECASE | re.DOTALL)
+        match = interim.search('nested_collection')
         if match:
             define_name, primary_resource, primary_alias, secondary_resource, secondary_alias, basic_condition, exists_condition = match.groups()
             logger.debug(f"Pattern 19 detected: nested collection with EXISTS - {primary_resource} {primary_alias}, {secondary_resource} {secondary_alias}")
@@ -2108,8 +2089,7 @@ GROUP BY json_extract_string({primary_alias.lower()}.{json_column}, '$.id'), jso
         
         # Pattern 24: Mixed WITH/WITHOUT Clauses (CHECK FIRST - before Pattern 23 and 18)
         # Example: [Patient] P with [Condition: "Diabetes"] D such that ... without [Condition: "Hypertension"] H such that ...
-        mixed_with_without_pattern = r'define\s+"([^"]+)"\s*:\s*\[([^\]]+)\]\s+(\w+)\s+with\s+\[([^\]]+)\]\s+(\w+)\s+such\s+that\s+(.*?)without\s+\[([^\]]+)\]\s+(\w+)\s+such\s+that\s+(.*?)(?:\s*$)'
-        match = re.search(mixed_with_without_pattern, cql_expression, re.IGNORECASE | re.DOTALL)
+        match = interim.search('mixed_with_without')
         if match:
             define_name, primary_resource, primary_alias, with_resource, with_alias, with_condition, without_resource, without_alias, without_condition = match.groups()
             logger.debug(f"Pattern 24 detected: mixed WITH/WITHOUT clauses - {primary_resource} with {with_resource} without {without_resource}")
@@ -2133,7 +2113,7 @@ GROUP BY json_extract_string({primary_alias.lower()}.{json_column}, '$.id'), jso
             
             if with_resource_code:
                 with_exists += f"""
-          AND json_extract_string({with_alias.lower()}.{json_column}, '$.code.coding[0].display') = '{with_resource_code}'"""
+          AND {self._code_display_condition(table_name, json_column, with_alias.lower(), with_resource_type, with_resource_code)}"""
             
             # Handle subject reference in WITH condition
             if 'subject.reference' in with_condition and f'{primary_alias}.id' in with_condition:
@@ -2149,7 +2129,7 @@ GROUP BY json_extract_string({primary_alias.lower()}.{json_column}, '$.id'), jso
             
             if without_resource_code:
                 without_not_exists += f"""
-          AND json_extract_string({without_alias.lower()}.{json_column}, '$.code.coding[0].display') = '{without_resource_code}'"""
+          AND {self._code_display_condition(table_name, json_column, without_alias.lower(), without_resource_type, without_resource_code)}"""
             
             # Handle subject reference in WITHOUT condition
             if 'subject.reference' in without_condition and f'{primary_alias}.id' in without_condition:
@@ -2172,8 +2152,7 @@ WHERE json_extract_string({primary_alias.lower()}.{json_column}, '$.resourceType
         
         # Pattern 23: Multiple WITH Clause Intersections (CHECK FIRST - before single WITH Pattern 18)
         # Example: [Patient] P with [Condition: "Diabetes"] D such that ... with [Condition: "Hypertension"] H such that ...
-        multiple_with_pattern = r'define\s+"([^"]+)"\s*:\s*\[([^\]]+)\]\s+(\w+)\s+with\s+\[([^\]]+)\]\s+(\w+)\s+such\s+that\s+(.*?)with\s+\[([^\]]+)\]\s+(\w+)\s+such\s+that\s+(.*?)(?:\s*$)'
-        match = re.search(multiple_with_pattern, cql_expression, re.IGNORECASE | re.DOTALL)
+        match = interim.search('multiple_with')
         if match:
             define_name, primary_resource, primary_alias, first_resource, first_alias, first_condition, second_resource, second_alias, second_condition = match.groups()
             logger.debug(f"Pattern 23 detected: multiple WITH clauses - {primary_resource} with {first_resource} and {second_resource}")
@@ -2193,7 +2172,7 @@ WHERE json_extract_string({primary_alias.lower()}.{json_column}, '$.resourceType
             
             if first_resource_code:
                 first_exists += f"""
-          AND json_extract_string({first_alias.lower()}.{json_column}, '$.code.coding[0].display') = '{first_resource_code}'"""
+          AND {self._code_display_condition(table_name, json_column, first_alias.lower(), first_resource_type, first_resource_code)}"""
             
             # Handle subject reference in first condition
             if 'subject.reference' in first_condition and f'{primary_alias}.id' in first_condition:
@@ -2215,7 +2194,7 @@ WHERE json_extract_string({primary_alias.lower()}.{json_column}, '$.resourceType
             
             if second_resource_code:
                 second_exists += f"""
-          AND json_extract_string({second_alias.lower()}.{json_column}, '$.code.coding[0].display') = '{second_resource_code}'"""
+          AND {self._code_display_condition(table_name, json_column, second_alias.lower(), second_resource_type, second_resource_code)}"""
             
             # Handle subject reference in second condition
             if 'subject.reference' in second_condition and f'{primary_alias}.id' in second_condition:
@@ -2239,8 +2218,7 @@ WHERE json_extract_string({primary_alias.lower()}.{json_column}, '$.resourceType
         
         # Pattern 18: Multi-resource WITH clauses with complex conditions (simpler case - after Pattern 23)
         # Example: [Patient] P with [Condition] C such that C.subject.reference = 'Patient/' + P.id
-        with_pattern = r'define\s+"([^"]+)"\s*:\s*\[([^\]]+)\]\s+(\w+)\s+with\s+\[([^\]]+)\]\s+(\w+)\s+such\s+that\s+(.*?)(?:sort\s+by|$)'
-        match = re.search(with_pattern, cql_expression, re.IGNORECASE | re.DOTALL)
+        match = interim.search('with')
         if match:
             define_name, primary_resource, primary_alias, secondary_resource, secondary_alias, condition = match.groups()
             logger.debug(f"Pattern 18 detected: primary={primary_resource} {primary_alias}, secondary={secondary_resource} {secondary_alias}, condition={condition}")
@@ -2314,8 +2292,7 @@ GROUP BY json_extract_string({primary_alias.lower()}.{json_column}, '$.id'), jso
         
         # Pattern 21: Set operations with custom equality  
         # Example: [Patient] P1 intersect [Patient] P2 where Upper(P1.name.first().family) = Upper(P2.name.first().family) and P1.id != P2.id
-        set_pattern = r'define\s+"([^"]+)"\s*:\s*\[([^\]]+)\]\s+(\w+)\s+(intersect|union|except)\s+\[([^\]]+)\]\s+(\w+)\s+where\s+(.*?)(?:\s*$)'
-        match = re.search(set_pattern, cql_expression, re.IGNORECASE | re.DOTALL)
+        match = interim.search('set')
         if match:
             define_name, resource1, alias1, operation, resource2, alias2, condition = match.groups()
             logger.debug(f"Pattern 21 detected: {operation} operation between {resource1} {alias1} and {resource2} {alias2}")
@@ -2378,8 +2355,7 @@ WHERE json_extract_string({alias1.lower()}.{json_column}, '$.resourceType') = '{
         
         # Pattern 21: Resource queries with WHERE, SORT BY, and RETURN clauses
         # Example: [Patient] P where AgeInYears(P.birthDate) between 18 and 80 sort by P.id return { id: P.id, age: AgeInYears(P.birthDate), ageGroup: case ... }
-        query_pattern = r'define\s+"([^"]+)"\s*:\s*\[([^\]]+)\]\s+(\w+)\s+where\s+(.*?)\s+sort\s+by\s+(.*?)\s+return\s+\{(.*?)\}'
-        match = re.search(query_pattern, cql_expression, re.IGNORECASE | re.DOTALL)
+        match = interim.search('query')
         if match:
             define_name, resource_type, alias, where_clause, sort_clause, return_obj = match.groups()
             logger.debug(f"Pattern 21 detected: {resource_type} query with WHERE, SORT BY, and RETURN")
@@ -2487,6 +2463,18 @@ FROM {table_name} {alias.lower()}
         
         return json_path
     
+    def _sort_key_sql(self, json_column: str, resource_type: str, alias: str, field_expr: str) -> str:
+        """
+        Sort key for a ``sort by`` field. The resource's clinical time element
+        (``effective``, ``period`` ...) sorts by the start of its normalized interval,
+        whichever choice type holds it; other fields sort by their JSON text.
+        """
+        json_path = self._convert_cql_field_to_json_path(field_expr, alias)
+        time_element = CLINICAL_TIME_ELEMENTS.get(resource_type, ('',))[0].replace('[x]', '')
+        if json_path[2:] == time_element:
+            return interval_bounds_sql(self.dialect, json_column, resource_type)[0]
+        return self._json_extract(json_column, json_path)
+    
     def _convert_cql_computation_to_sql(self, computation: str, alias: str, json_column: str) -> str:
         """Convert CQL computation expression to SQL."""
         import re
@@ -2788,10 +2776,10 @@ FROM {table_name} {alias.lower()}
         
         return False
     
-    def _evaluate_function_via_registry(self, cql_expression: str, table_name: str = "fhir_resources", 
-                                      json_column: str = "resource") -> str:
+    def _translate_function_via_registry(self, cql_expression: str, table_name: str = "fhir_resources", 
+                                         json_column: str = "resource") -> Tuple[str, bool]:
         """
-        Evaluate function call using unified registry for direct routing.
+        Translate function call using unified registry for direct routing.
         
         Args:
             cql_expression: CQL function call expression
@@ -2799,7 +2787,7 @@ FROM {table_name} {alias.lower()}
             json_column: JSON column name
             
         Returns:
-            SQL query string from registry function handler
+            (SQL query string, whether the context filter should be applied to it)
         """
         import re
         
@@ -2845,7 +2833,7 @@ FROM {table_name} {alias.lower()}
                         # Wrap in basic SELECT for complete query
                         final_sql = f"SELECT {sql} as result"
                         logger.info(f"Successfully generated SQL via registry: {final_sql[:100]}...")
-                        return final_sql
+                        return final_sql, False
                         
                 except Exception as e:
                     logger.warning(f"Direct function call failed: {e}, falling back to normal parsing")
@@ -2857,12 +2845,13 @@ FROM {table_name} {alias.lower()}
         except Exception as e:
             logger.warning(f"Registry-based evaluation failed: {e}, falling back to normal parsing")
             # Remove the direct function call flag and use normal parsing
-            return self._evaluate_via_normal_parsing(cql_expression, table_name, json_column)
+            return self._translate_via_normal_parsing(cql_expression, table_name, json_column)
     
-    def _evaluate_via_normal_parsing(self, cql_expression: str, table_name: str = "fhir_resources", 
-                                   json_column: str = "resource") -> str:
+    def _translate_via_normal_parsing(self, cql_expression: str, table_name: str = "fhir_resources", 
+                                      json_column: str = "resource") -> Tuple[str, bool]:
         """
-        Evaluate expression using normal CQL parsing pipeline.
+        Translate expression using normal CQL parsing pipeline, without applying the
+        evaluation context (the caller filters after the memo lookup).
         
         Args:
             cql_expression: CQL expression string
@@ -2870,7 +2859,7 @@ FROM {table_name} {alias.lower()}
             json_column: JSON column name
             
         Returns:
-            SQL query string
+            (SQL query string, whether the context filter should be applied to it)
         """
         try:
             # Standard CQL parsing pipeline
@@ -2907,15 +2896,14 @@ FROM {table_name} {alias.lower()}
                 compiled_sql = pipeline.compile(context, initial_state)
                 sql = compiled_sql.get_full_sql()
                 
-                # Apply context filtering
-                context_filtered_sql = self.context_manager.current_context.apply_context_to_query(sql, table_name)
-                return context_filtered_sql
+                # Context filtering is applied by the caller
+                return sql, True
             else:
-                return f"-- CQL Expression (no dialect): {cql_expression}"
+                return f"-- CQL Expression (no dialect): {cql_expression}", False
                 
         except Exception as e:
             logger.error(f"Normal CQL parsing failed: {e}")
-            return f"-- CQL Expression (error: {e}): {cql_expression}"
+            return f"-- CQL Expression (error: {e}): {cql_expression}", False
     
     def evaluate_advanced_expression(self, cql_expression: str, table_name: str = "fhir_resources", 
                                    json_column: str = "resource") -> str:
@@ -2930,6 +2918,14 @@ FROM {table_name} {alias.lower()}
         Returns:
             SQL query string for advanced constructs
         """
+        sql, contextual = self._translate_advanced_expression(cql_expression, table_name, json_column)
+        if contextual:
+            return self.context_manager.current_context.apply_context_to_query(sql, table_name)
+        return sql
+    
+    def _translate_advanced_expression(self, cql_expression: str, table_name: str,
+                                       json_column: str) -> Tuple[str, bool]:
+        """Translate an advanced expression; returns (SQL, whether to apply the context filter)."""
         logger.info(f"CQL Engine evaluating advanced expression: {cql_expression}")
         
         try:
@@ -2938,14 +2934,10 @@ FROM {table_name} {alias.lower()}
                 interim_result = self._try_interim_pattern_translation(cql_expression, table_name, json_column)
                 if interim_result and not interim_result.startswith("--"):
                     logger.info(f"Successfully translated via interim pattern matcher in advanced evaluation")
-                    return interim_result
-            
-            # Use advanced translator for Phase 6 constructs
-            sql = self.advanced_translator.translate_advanced_cql(cql_expression)
+                    return interim_result, False
             
-            # Apply context filtering if needed
-            context_filtered_sql = self.context_manager.current_context.apply_context_to_query(sql, table_name)
-            return context_filtered_sql
+            # Use advanced translator for Phase 6 constructs; context filtering is applied by the caller
+            return self.advanced_translator.translate_advanced_cql(cql_expression), True
             
         except (ValueError, SyntaxError, AttributeError) as e:
             # Re-raise validation errors so they can be caught by tests
@@ -2954,7 +2946,7 @@ FROM {table_name} {alias.lower()}
         except Exception as e:
             # Other implementation errors return as comments
             logger.error(f"Advanced CQL evaluation failed: {e}")
-            return f"-- Advanced CQL Expression (error: {e}): {cql_expression}"
+            return f"-- Advanced CQL Expression (error: {e}): {cql_expression}", False
     
     def load_library(self, library_name: str, library_content: str, 
                     metadata: Optional[LibraryMetadata] = None) -> Dict[str, Any]:
@@ -2970,6 +2962,8 @@ FROM {table_name} {alias.lower()}
             Parsed library information
         """
         logger.info(f"Loading CQL library: {library_name} with advanced management")
+        # Expressions may reference the library's definitions
+        self.clear_translation_memo()
         
         try:
             # Use advanced library manager for loading
@@ -3148,7 +3142,32 @@ FROM {table_name} {alias.lower()}
         
         logger.info(f"Population SQL generation completed: {len(population_queries)} queries generated")
         return population_queries
-    
+
+    def evaluate_defines_parallel(self, define_statements: dict, executor) -> dict:
+        """
+        Evaluate define statements over the population in patient buckets on worker processes.
+
+        SQL is generated once with generate_population_sql() and run by the executor per
+        bucket; rows are merged in a deterministic order.
+
+        Args:
+            define_statements: Dictionary of define name -> CQL expression
+            executor: fhir4ds.cql.core.parallel.BucketedExecutor for the population database
+
+        Returns:
+            Dictionary of define name -> list of result rows (empty for defines whose
+            SQL could not be generated)
+        """
+        population_queries = self.generate_population_sql(define_statements)
+        runnable = {name: sql for name, sql in population_queries.items()
+                    if not sql.lstrip().startswith('--')}
+        for name in population_queries.keys() - runnable.keys():
+            logger.warning(f"Skipping parallel evaluation of '{name}': no SQL was generated")
+
+        define_results = {name: [] for name in population_queries}
+        define_results.update(executor.evaluate_defines(runnable))
+        return define_results
+
     def _generate_base_population_cte(self) -> str:
         """
         Generate base population CTE with patient demographics and filtering.
@@ -3206,12 +3225,30 @@ FROM {table_name} {alias.lower()}
         # Common resource types used in quality measures
         common_resources = ['Condition', 'Encounter', 'MedicationDispense', 'Observation', 'Procedure']
         
+        compartments_table = compartment_index_table(self.dialect, 'fhir_resources')
+        
         for resource_type in common_resources:
-            cte_sql = f"""
+            if compartments_table:
+                # Patient ids parsed at load time, joined on the row id; resources without
+                # a patient reference keep a NULL patient_id, as without the index
+                rows = compartment_rows_sql(compartments_table, resource_type, context_element_paths(resource_type))
+                cte_sql = f"""
         {resource_type.lower()}_resources AS (
             SELECT 
-                json_extract(resource, '$.subject.reference') as patient_reference,
-                SUBSTR(json_extract(resource, '$.subject.reference'), 9) as patient_id,
+                'Patient/' || rc.patient_id as patient_reference,
+                rc.patient_id,
+                r.resource
+            FROM fhir_resources r
+            LEFT JOIN ({rows}) rc ON rc.row_id = r.id
+            WHERE {self._json_extract("r.resource", "$.resourceType")} = '{resource_type}'
+        )"""
+            else:
+                patient_id = patient_id_sql(self.dialect, "resource", [resource_type])
+                cte_sql = f"""
+        {resource_type.lower()}_resources AS (
+            SELECT 
+                'Patient/' || {patient_id} as patient_reference,
+                {patient_id} as patient_id,
                 resource
             FROM fhir_resources
             WHERE {self._json_extract("resource", "$.resourceType")} = '{resource_type}'
@@ -3306,16 +3343,7 @@ ORDER BY patient_id;"""
         Returns:
             SQL-safe identifier
         """
-        # Remove quotes and special characters, replace spaces with underscores
-        normalized = define_name.strip('"\'')
-        normalized = ''.join(c if c.isalnum() else '_' for c in normalized)
-        normalized = normalized.lower()
-        
-        # Ensure it starts with a letter
-        if normalized and not normalized[0].isalpha():
-            normalized = 'define_' + normalized
-        
-        return normalized or 'unknown_define'
+        return define_relation_name(define_name)
     
     def set_parameter(self, name: str, value: Any):
         """Set a CQL parameter value."""
@@ -3475,6 +3503,7 @@ ORDER BY patient_id;"""
             },
             'libraries': list(self.libraries.keys()),
             'terminology': self.get_terminology_cache_stats(),
+            'translation_memo': self.get_translation_memo_stats(),
             'pipeline_mode': self.use_pipeline_mode
         }
         
@@ -0,0 +1,264 @@
+"""
+Interim Pattern Rules
+
+Rule tables for CQLEngine's interim pattern translator:
+
+- KNOWN_ISSUE_RULES decide whether an expression is routed to the interim
+  translator at all (first match wins)
+- TRANSLATION_RULES are the shapes the interim translator recognises, looked up
+  by name in the translator's own order
+
+Every rule is compiled once at import and lists the literal tokens any match must
+contain. An expression is scanned once for the tokens of all rules, and a rule
+only runs its regex when all of its tokens are present, so an expression is never
+tested against shapes it cannot match (most rules need `define`, `[` or a
+keyword such as `during`, `between` or `with`).
+"""
+
+import logging
+import re
+from typing import Callable, Dict, FrozenSet, Match, NamedTuple, Optional, Pattern, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+_FLAGS = re.IGNORECASE | re.DOTALL
+
+# Token groups; a match contains at least one member of each group
+AGGREGATES = ('stddev', 'stdev', 'variance', 'median', 'mode', 'count', 'sum', 'avg', 'average', 'min', 'max')
+TIME_UNITS = ('year', 'month', 'day', 'hour', 'minute', 'second')  # also cover the plural units
+DATE_CONSTRUCTORS = ('date', 'time')  # also cover DateTime, Today, Now and TimeOfDay
+SET_OPERATORS = ('intersect', 'union', 'except')
+
+# Non-ASCII characters that IGNORECASE matching treats as ASCII letters
+_CASE_EQUIVALENTS = str.maketrans({'İ': 'i', 'ı': 'i', 'ſ': 's', 'K': 'k'})
+
+Token = Union[str, Tuple[str, ...]]
+
+
+class InterimRule(NamedTuple):
+    """A precompiled interim pattern and the tokens every match contains"""
+    name: str
+    pattern: Pattern
+    tokens: Tuple[Token, ...]  # a string must be present; for a tuple, one of its members
+    accept: Optional[Callable[[str], bool]] = None  # extra check on the expression after a match
+
+    def is_candidate(self, features: FrozenSet[str]) -> bool:
+        """True when the expression has every token this rule's pattern needs."""
+        for token in self.tokens:
+            if isinstance(token, str):
+                if token not in features:
+                    return False
+            elif features.isdisjoint(token):
+                return False
+        return True
+
+
+def _is_simple_literal_tuple(expression: str) -> bool:
+    """Tuple of literal fields only (no function calls, no resource queries)."""
+    tuple_match = _LITERAL_BLOCK.search(expression)
+    if not tuple_match:
+        return False
+    tuple_body = tuple_match.group(2)
+    return not _FUNCTION_CALL.search(tuple_body) and not _RETRIEVE.search(tuple_body)
+
+
+def _is_simple_literal_list(expression: str) -> bool:
+    """Comma-separated literal values (no field:value pairs, functions or resource queries)."""
+    list_match = _LITERAL_BLOCK.search(expression)
+    if not list_match:
+        return False
+    list_body = list_match.group(2)
+    return (':' not in list_body and ',' in list_body
+            and not _FUNCTION_CALL.search(list_body) and not _RETRIEVE.search(list_body))
+
+
+_LITERAL_BLOCK = re.compile(r'define\s+"([^"]+)"\s*:\s*\{\s*([^}]+)\s*\}', _FLAGS)
+_FUNCTION_CALL = re.compile(r'\w+\s*\([^)]*\)', re.IGNORECASE)
+_RETRIEVE = re.compile(r'\[[^\]]+\]', re.IGNORECASE)
+
+# Every `define "X": [Resource] ...` shape (let, with/without, sort, set operations,
+# where/sort/return) is routed by the first rule, so only the shapes without a
+# leading retrieve need rules of their own.
+KNOWN_ISSUE_RULES: Tuple[InterimRule, ...] = (
+    InterimRule('define_retrieve', re.compile(r'define\s+"[^"]+"\s*:\s*\[', re.IGNORECASE),
+                ('define', '[')),
+    InterimRule('statistical_retrieve',
+                re.compile(r'(stddev|stdev|variance|median|mode|count|sum|avg|average|min|max)\s*\(\s*\[.*?\]', _FLAGS),
+                (AGGREGATES, '(', '[', ']')),
+    InterimRule('define_statistical',
+                re.compile(r'define\s+"[^"]+"\s*:\s*(stddev|stdev|variance|median|mode|count|sum|avg|average|min|max)\s*\(', _FLAGS),
+                ('define', AGGREGATES, '(')),
+    InterimRule('retrieve_sort', re.compile(r'\[.*?\]\s+\w+\s+sort\s+by', re.IGNORECASE),
+                ('[', 'sort', 'by')),
+    InterimRule('datetime_arithmetic',
+                re.compile(r'(datetime|date|time)\s*\([^)]+\)\s*[+\-]\s*\d+\s*(year|month|day|hour|minute|second|years|months|days|hours|minutes|seconds)', re.IGNORECASE),
+                (DATE_CONSTRUCTORS, ('+', '-'), TIME_UNITS)),
+    InterimRule('duration_between',
+                re.compile(r'(year|month|day|hour|minute|second|years|months|days|hours|minutes|seconds)\s+between\s+(?:(datetime|date|time)\s*\([^)]+\)|(Today|Now|TimeOfDay)\s*\(\s*\))\s+and\s+(?:(datetime|date|time)\s*\([^)]+\)|(Today|Now|TimeOfDay)\s*\(\s*\))', re.IGNORECASE),
+                (TIME_UNITS, 'between', 'and', ('date', 'time', 'today', 'now'))),
+    InterimRule('age_of_date',
+                re.compile(r'(AgeInYears|AgeInMonths|AgeInDays|AgeInHours|AgeInMinutes|AgeInSeconds)\s*\(\s*(datetime|date|time)\s*\([^)]+\)\s*\)', re.IGNORECASE),
+                ('agein', DATE_CONSTRUCTORS)),
+    InterimRule('same_precision',
+                re.compile(r'(datetime|date|time)\s*\([^)]+\)\s+(same\s+(day|month|year|hour|minute|second))\s+as\s+(datetime|date|time)\s*\([^)]+\)', re.IGNORECASE),
+                ('same', 'as', DATE_CONSTRUCTORS, TIME_UNITS)),
+    InterimRule('includes_during',
+                re.compile(r'(datetime|date|time)\s*\([^)]+\)\s+(includes|during)\s+(datetime|date|time)\s*\([^)]+\)', re.IGNORECASE),
+                (('includes', 'during'), DATE_CONSTRUCTORS)),
+    InterimRule('percentile_object',
+                re.compile(r'define\s+"[^"]+"\s*:\s*\{[^}]*Percentile\s*\([^}]*Percentile\s*\(', _FLAGS),
+                ('define', '{', 'percentile')),
+    InterimRule('duration_of_dates',
+                re.compile(r'define\s+"[^"]+"\s*:\s*(years|months|days|hours|minutes|seconds)\s+between\s+(DateTime|Date)\(', _FLAGS),
+                ('define', 'between', 'date')),
+    InterimRule('simple_tuple', re.compile(r'define\s+"[^"]+"\s*:\s*\{\s*\w+:\s*[\'"\d]', re.IGNORECASE),
+                ('define', '{', ':'), _is_simple_literal_tuple),
+    InterimRule('simple_list', re.compile(r'define\s+"[^"]+"\s*:\s*\{\s*[\'"\d][^:]*?\}', re.IGNORECASE),
+                ('define', '{', ','), _is_simple_literal_list),
+)
+
+_DEFINE_RETRIEVE = ('define', '[')
+
+TRANSLATION_RULES: Dict[str, InterimRule] = {rule.name: rule for rule in (
+    InterimRule('define_with_sort',
+                re.compile(r'define\s+"([^"]+)"\s*:\s*\[(\w+)(?:\s*:\s*"[^"]+")?\]\s*(\w+)?\s*sort\s+by\s+(.+?)(?=\s*$)', _FLAGS),
+                _DEFINE_RETRIEVE + ('sort', 'by')),
+    InterimRule('first_last',
+                re.compile(r'define\s+"([^"]+)"\s*:\s*(First|Last)\s*\(\s*\[(\w+)(?:\s*:\s*"([^"]+)")?\]\s*(\w+)?\s+(?:where\s+(.+?)\s+)?sort\s+by\s+(.+?)\s*\)\s*$', _FLAGS),
+                _DEFINE_RETRIEVE + (('first', 'last'), 'sort', 'by', ')')),
+    InterimRule('statistical',
+                re.compile(r'(stddev|stdev|variance|median|mode|count|sum|avg|average|min|max)\s*\(\s*\[(\w+)(?:\s*:\s*"[^"]+")?\]\s*(\w+)?\s*(where\s+[^)]+)?\s*(return\s+[^)]+)?\s*\)', _FLAGS),
+                (AGGREGATES, '(', '[', ']', ')')),
+    InterimRule('define_statistical',
+                re.compile(r'define\s+"[^"]+"\s*:\s*(stddev|stdev|variance|median|mode|count|sum|avg|average|min|max)\s*\(\s*\[(\w+)(?:\s*:\s*"[^"]+")?\]\s*(\w+)?\s*(where\s+[^)]+)?\s*(return\s+[^)]+)?\s*\)', _FLAGS),
+                _DEFINE_RETRIEVE + (AGGREGATES, '(', ')')),
+    InterimRule('basic_retrieve', re.compile(r'^\s*\[(\w+)\]\s*$', re.IGNORECASE),
+                ('[', ']')),
+    InterimRule('datetime_arithmetic',
+                re.compile(r'define\s+"([^"]+)"\s*:\s*(datetime|date|time)\s*\(([^)]+)\)\s*([+\-])\s*(\d+)\s*(year|month|day|hour|minute|second|years|months|days|hours|minutes|seconds)', _FLAGS),
+                ('define', DATE_CONSTRUCTORS, ('+', '-'), TIME_UNITS)),
+    InterimRule('duration_calculation',
+                re.compile(r'define\s+"([^"]+)"\s*:\s*(year|month|day|hour|minute|second|years|months|days|hours|minutes|seconds)\s+between\s+(?:(datetime|date|time)\s*\(([^)]+)\)|(Today|Now|TimeOfDay)\s*\(\s*\))\s+and\s+(?:(datetime|date|time)\s*\(([^)]+)\)|(Today|Now|TimeOfDay)\s*\(\s*\))', _FLAGS),
+                ('define', TIME_UNITS, 'between', 'and')),
+    InterimRule('clinical_age',
+                re.compile(r'define\s+"([^"]+)"\s*:\s*(AgeInYears|AgeInMonths|AgeInDays|AgeInHours|AgeInMinutes|AgeInSeconds)\s*\(\s*(datetime|date|time)\s*\(([^)]+)\)\s*\)', _FLAGS),
+                ('define', 'agein', DATE_CONSTRUCTORS)),
+    InterimRule('temporal_comparison',
+                re.compile(r'define\s+"([^"]+)"\s*:\s*(datetime|date|time)\s*\(([^)]+)\)\s+(same\s+(day|month|year|hour|minute|second))\s+as\s+(datetime|date|time)\s*\(([^)]+)\)', _FLAGS),
+                ('define', 'same', 'as', DATE_CONSTRUCTORS, TIME_UNITS)),
+    InterimRule('temporal_relationship',
+                re.compile(r'define\s+"([^"]+)"\s*:\s*(datetime|date|time)\s*\(([^)]+)\)\s+(includes|during)\s+(datetime|date|time)\s*\(([^)]+)\)', _FLAGS),
+                ('define', ('includes', 'during'), DATE_CONSTRUCTORS)),
+    InterimRule('simple_tuple', _LITERAL_BLOCK, ('define', '{', '}')),
+    InterimRule('simple_list', _LITERAL_BLOCK, ('define', '{', '}')),
+    InterimRule('object_construction', _LITERAL_BLOCK, ('define', '{', '}')),
+    InterimRule('let_expression',
+                re.compile(r'define\s+"([^"]+)"\s*:\s*\[([^\]]+)\]\s+(\w+)\s+let\s+(.*?)return\s+\{([^}]+)\}', _FLAGS),
+                _DEFINE_RETRIEVE + ('let', 'return', '{')),
+    InterimRule('grouped_stats',
+                re.compile(r'define\s+"([^"]+)"\s*:\s*\[([^\]]+)\]\s+(\w+)\s+let\s+(\w+):\s*case\s+(.*?)return\s+\{([^}]+)\}', _FLAGS),
+                _DEFINE_RETRIEVE + ('let', 'case', 'return', '{')),
+    InterimRule('time_series',
+                re.compile(r'define\s+"([^"]+)"\s*:\s*\[([^:]+):\s*"([^"]+)"\]\s+(\w+)\s+let\s+(\w+):\s*(year|month|day|hour)\s+from\s+[^r]+return\s+\{([^}]+)\}', _FLAGS),
+                _DEFINE_RETRIEVE + ('let', 'from', 'return', '{')),
+    InterimRule('computed_sort',
+                re.compile(r'define\s+"([^"]+)"\s*:\s*\[([^\]]+)(?:\s*:\s*"[^"]+")?\]\s+(\w+)\s+let\s+(\w+):\s+(.*?)\s+sort\s+by\s+(.+)', _FLAGS),
+                _DEFINE_RETRIEVE + ('let', 'sort', 'by')),
+    InterimRule('nested_let',
+                re.compile(r'define\s+"([^"]+)"\s*:\s*\[([^\]]+)(?:\s*:\s*"[^"]+")?\]\s+(\w+)\s+let\s+(.*?)\s+return\s+\{(.*?)\}', _FLAGS),
+                _DEFINE_RETRIEVE + ('let', 'return', '{')),
+    InterimRule('multiple_let',
+                re.compile(r'define\s+"([^"]+)"\s*:\s*\[([^\]]+)(?:\s*:\s*"[^"]+")?\]\s+(\w+)\s+let\s+(.*?)\s+return\s+\{([^}]+)\}', _FLAGS),
+                _DEFINE_RETRIEVE + ('let', 'return', '{')),
+    InterimRule('duration',
+                re.compile(r'define\s+"([^"]+)"\s*:\s*(years|months|days|hours|minutes|seconds)\s+between\s+(.+?)\s+and\s+(.+?)(?:\s*$)', _FLAGS),
+                ('define', TIME_UNITS, 'between', 'and')),
+    InterimRule('complex_priority',
+                re.compile(r'define\s+"([^"]+)"\s*:\s*\[([^\]]+)\]\s+(\w+)\s+(.*?)\s+let\s+(.*?)\s+RiskLevel:\s*case\s+(.*?)\s+end\s+(.*?)\s+where\s+RiskLevel\s+in\s+\{([^}]+)\}\s+return\s+\{([^}]+)\}', _FLAGS),
+                _DEFINE_RETRIEVE + ('let', 'risklevel', 'case', 'where', 'return')),
+    InterimRule('complex',
+                re.compile(r'define\s+"([^"]+)"\s*:\s*\[([^\]]+)\]\s+(\w+)\s+(.*?with.*?with.*?without.*?)let\s+(.*?)\s+where\s+(.*?)\s+return\s+\{(.*?)\}', _FLAGS),
+                _DEFINE_RETRIEVE + ('without', 'let', 'where', 'return')),
+    InterimRule('aggregation',
+                re.compile(r'define\s+"([^"]+)"\s*:\s*\[([^\]]+)\]\s+(\w+)\s+with\s+\[([^\]]+)\]\s+(\w+)\s+such\s+that\s+(.*?)let\s+(.*?)return\s+\{(.*?)\}', _FLAGS),
+                _DEFINE_RETRIEVE + ('with', 'such', 'that', 'let', 'return')),
+    InterimRule('nested_collection',
+                re.compile(r'define\s+"([^"]+)"\s*:\s*\[([^\]]+)\]\s+(\w+)\s+with\s+\[([^\]]+)\]\s+(\w+)\s+such\s+that\s+(.*?)and\s+(.*?\..*?\.exists\(.*?\))(?:\s*$)', _FLAGS),
+                _DEFINE_RETRIEVE + ('with', 'such', 'that', '.exists(')),
+    InterimRule('mixed_with_without',
+                re.compile(r'define\s+"([^"]+)"\s*:\s*\[([^\]]+)\]\s+(\w+)\s+with\s+\[([^\]]+)\]\s+(\w+)\s+such\s+that\s+(.*?)without\s+\[([^\]]+)\]\s+(\w+)\s+such\s+that\s+(.*?)(?:\s*$)', _FLAGS),
+                _DEFINE_RETRIEVE + ('without', 'such', 'that')),
+    InterimRule('multiple_with',
+                re.compile(r'define\s+"([^"]+)"\s*:\s*\[([^\]]+)\]\s+(\w+)\s+with\s+\[([^\]]+)\]\s+(\w+)\s+such\s+that\s+(.*?)with\s+\[([^\]]+)\]\s+(\w+)\s+such\s+that\s+(.*?)(?:\s*$)', _FLAGS),
+                _DEFINE_RETRIEVE + ('with', 'such', 'that')),
+    InterimRule('with',
+                re.compile(r'define\s+"([^"]+)"\s*:\s*\[([^\]]+)\]\s+(\w+)\s+with\s+\[([^\]]+)\]\s+(\w+)\s+such\s+that\s+(.*?)(?:sort\s+by|$)', _FLAGS),
+                _DEFINE_RETRIEVE + ('with', 'such', 'that')),
+    InterimRule('set',
+                re.compile(r'define\s+"([^"]+)"\s*:\s*\[([^\]]+)\]\s+(\w+)\s+(intersect|union|except)\s+\[([^\]]+)\]\s+(\w+)\s+where\s+(.*?)(?:\s*$)', _FLAGS),
+                _DEFINE_RETRIEVE + (SET_OPERATORS, 'where')),
+    InterimRule('query',
+                re.compile(r'define\s+"([^"]+)"\s*:\s*\[([^\]]+)\]\s+(\w+)\s+where\s+(.*?)\s+sort\s+by\s+(.*?)\s+return\s+\{(.*?)\}', _FLAGS),
+                _DEFINE_RETRIEVE + ('where', 'sort', 'by', 'return', '{')),
+)}
+
+
+def _vocabulary(*rule_sets) -> Tuple[str, ...]:
+    tokens = set()
+    for rules in rule_sets:
+        for rule in rules:
+            for token in rule.tokens:
+                tokens.update((token,) if isinstance(token, str) else token)
+    return tuple(sorted(tokens))
+
+
+_VOCABULARY = _vocabulary(KNOWN_ISSUE_RULES, TRANSLATION_RULES.values())
+
+
+def expression_features(expression: str) -> FrozenSet[str]:
+    """The rule tokens present in an expression (case-insensitive)."""
+    folded = expression if expression.isascii() else expression.translate(_CASE_EQUIVALENTS)
+    folded = folded.lower()
+    return frozenset(token for token in _VOCABULARY if token in folded)
+
+
+def match_known_issue(expression: str, features: Optional[FrozenSet[str]] = None) -> Optional[str]:
+    """
+    Name of the first known-issue rule matching an expression, or None.
+
+    Args:
+        expression: CQL expression
+        features: expression_features(expression), if already computed
+    """
+    if features is None:
+        features = expression_features(expression)
+    for rule in KNOWN_ISSUE_RULES:
+        if not rule.is_candidate(features) or not rule.pattern.search(expression):
+            continue
+        if rule.accept is not None and not rule.accept(expression):
+            continue
+        logger.debug(f"Interim rule '{rule.name}' matched: {expression[:100]}")
+        return rule.name
+    return None
+
+
+class InterimDispatch:
+    """Runs TRANSLATION_RULES against one expression, skipping rules it cannot match"""
+
+    def __init__(self, expression: str, features: Optional[FrozenSet[str]] = None):
+        self.expression = expression
+        self.features = features if features is not None else expression_features(expression)
+        self._matches: Dict[Pattern, Optional[Match]] = {}
+
+    def candidates(self) -> Tuple[str, ...]:
+        """Names of the translation rules this expression could match, in order."""
+        return tuple(name for name, rule in TRANSLATION_RULES.items() if rule.is_candidate(self.features))
+
+    def search(self, name: str) -> Optional[Match]:
+        """Search with the named rule; None without running the regex when it can't match."""
+        rule = TRANSLATION_RULES[name]
+        if not rule.is_candidate(self.features):
+            return None
+        if rule.pattern not in self._matches:
+            self._matches[rule.pattern] = rule.pattern.search(self.expression)
+        return self._matches[rule.pattern]
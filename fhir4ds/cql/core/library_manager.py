@@ -12,10 +12,13 @@ Phase 6: Library Management System Implementation
 """
 
 import logging
-from functools import lru_cache
-from weakref import WeakValueDictionary
+import pickle
+import sqlite3
+import sys
+import threading
+from collections import OrderedDict
 from typing import Dict, List, Optional, Any, Set, Tuple
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from packaging import version
 import json
 import hashlib
@@ -39,6 +42,9 @@ class LibraryVersionError(LibraryError):
 
 logger = logging.getLogger(__name__)
 
+# Default memory budget for compiled libraries
+DEFAULT_LIBRARY_CACHE_BYTES = 256 * 1024 * 1024
+
 
 @dataclass
 class LibraryVersion:
@@ -260,84 +266,253 @@ class DependencyResolver:
         return errors
 
 
+class PersistentLibraryStore:
+    """
+    File-backed tier for compiled libraries.
+    
+    Entries are pickled LoadedLibrary objects (parsed AST, define operations and
+    translated, dialect-specific SQL) in a SQLite table keyed by library cache key,
+    fhir4ds version and dialect, so a worker restart loads precompiled libraries
+    instead of reparsing CQL. Only point the store at files this process writes:
+    entries are unpickled on load.
+    """
+    
+    TABLE_NAME = "fhir4ds_compiled_libraries"
+    
+    def __init__(self, path: str, version: Optional[str] = None):
+        """
+        Open (or create) a persistent library store.
+        
+        Args:
+            path: SQLite database file for the libraries
+            version: fhir4ds version to key entries by (defaults to installed version)
+        """
+        from ... import __version__
+        self.path = str(path)
+        self.version = version or __version__
+        self._lock = threading.RLock()
+        self._connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._connection.execute(f"""
+            CREATE TABLE IF NOT EXISTS {self.TABLE_NAME} (
+                cache_key TEXT NOT NULL,
+                fhir4ds_version TEXT NOT NULL,
+                dialect TEXT NOT NULL,
+                library BLOB NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (cache_key, fhir4ds_version, dialect)
+            )
+        """)
+        self._connection.commit()
+    
+    def load(self, cache_key: str, dialect: str) -> Optional[LoadedLibrary]:
+        """Load a compiled library, or None if not stored for this version and dialect."""
+        with self._lock:
+            row = self._connection.execute(
+                f"SELECT library FROM {self.TABLE_NAME} "
+                f"WHERE cache_key = ? AND fhir4ds_version = ? AND dialect = ?",
+                (cache_key, self.version, dialect.upper())
+            ).fetchone()
+        if row is None:
+            return None
+        try:
+            return pickle.loads(row[0])
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable persisted library {cache_key}: {e}")
+            return None
+    
+    def save(self, cache_key: str, dialect: str, library: LoadedLibrary) -> None:
+        """Persist a compiled library, replacing any previous entry for the key."""
+        try:
+            payload = pickle.dumps(library, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            # Libraries holding unpicklable objects stay in memory only
+            logger.debug(f"Library {cache_key} not persisted: {e}")
+            return
+        with self._lock:
+            self._connection.execute(
+                f"INSERT OR REPLACE INTO {self.TABLE_NAME} "
+                f"(cache_key, fhir4ds_version, dialect, library) VALUES (?, ?, ?, ?)",
+                (cache_key, self.version, dialect.upper(), payload)
+            )
+            self._connection.commit()
+    
+    def clear(self) -> None:
+        """Delete every persisted library."""
+        with self._lock:
+            self._connection.execute(f"DELETE FROM {self.TABLE_NAME}")
+            self._connection.commit()
+    
+    def count(self) -> int:
+        """Number of persisted libraries for the current version."""
+        with self._lock:
+            return self._connection.execute(
+                f"SELECT COUNT(*) FROM {self.TABLE_NAME} WHERE fhir4ds_version = ?",
+                (self.version,)
+            ).fetchone()[0]
+    
+    def close(self) -> None:
+        """Close the underlying SQLite connection."""
+        with self._lock:
+            self._connection.close()
+
+
 class LibraryCache:
-    """Caches loaded libraries using standard library LRU cache with WeakValueDictionary for memory management."""
+    """
+    LRU cache of compiled libraries bounded by entry count and approximate bytes.
     
-    def __init__(self, max_size: int = 100):
+    Entries are held by strong reference and keyed by (cache key, dialect), where
+    the cache key is the library name plus a content hash. With a
+    PersistentLibraryStore attached, misses fall through to the store and new
+    libraries are written through to it.
+    """
+    
+    def __init__(self, max_size: int = 100, max_bytes: int = DEFAULT_LIBRARY_CACHE_BYTES,
+                 store: Optional[PersistentLibraryStore] = None):
+        """
+        Args:
+            max_size: Maximum number of cached libraries
+            max_bytes: Memory budget for cached libraries (approximate, in bytes)
+            store: Optional on-disk tier
+        """
         self.max_size = max_size
-        # Use WeakValueDictionary for automatic memory cleanup
-        self._cache: WeakValueDictionary[str, LoadedLibrary] = WeakValueDictionary()
-        # Track access statistics manually since functools.lru_cache doesn't work with methods
+        self.max_bytes = max_bytes
+        self.store = store
+        self._cache: "OrderedDict[Tuple[str, str], LoadedLibrary]" = OrderedDict()
+        self._sizes: Dict[Tuple[str, str], int] = {}
+        self._bytes = 0
+        self._lock = threading.RLock()
         self._hits = 0
         self._misses = 0
-        self._access_order: List[str] = []
-        
-        # Create internal LRU cache function
-        self._lru_cache = lru_cache(maxsize=max_size)(self._cache_lookup)
-    
-    def _cache_lookup(self, key: str) -> Optional[LoadedLibrary]:
-        """Internal cache lookup function for LRU cache."""
-        return self._cache.get(key)
-    
-    def get(self, key: str) -> Optional[LoadedLibrary]:
-        """Get library from cache with LRU eviction and statistics tracking."""
-        result = self._lru_cache(key)
-        if result is not None:
-            self._hits += 1
-            # Update access order for statistics
-            if key in self._access_order:
-                self._access_order.remove(key)
-            self._access_order.append(key)
-        else:
+        self._disk_hits = 0
+        self._evictions = 0
+    
+    def get(self, key: str, dialect: str = 'duckdb') -> Optional[LoadedLibrary]:
+        """Get a compiled library, loading it from the on-disk tier on a memory miss."""
+        entry_key = (key, dialect.upper())
+        with self._lock:
+            library = self._cache.get(entry_key)
+            if library is not None:
+                self._cache.move_to_end(entry_key)
+                self._hits += 1
+                return library
+        
+        if self.store is not None:
+            library = self.store.load(key, dialect)
+            if library is not None:
+                with self._lock:
+                    self._disk_hits += 1
+                self._insert(entry_key, library)
+                return library
+        
+        with self._lock:
             self._misses += 1
-        return result
+        return None
     
-    def put(self, key: str, library: LoadedLibrary):
-        """Add library to cache with automatic LRU eviction."""
-        # Store in weak reference dictionary for memory management
-        self._cache[key] = library
-        
-        # Clear the LRU cache to reset with new data
-        self._lru_cache.cache_clear()
-        
-        # Recreate the LRU cache with updated max size
-        self._lru_cache = lru_cache(maxsize=self.max_size)(self._cache_lookup)
-        
-        # Update access order
-        if key in self._access_order:
-            self._access_order.remove(key)
-        self._access_order.append(key)
-        
-        # Maintain manual size limit for WeakValueDictionary
-        while len(self._access_order) > self.max_size:
-            oldest_key = self._access_order.pop(0)
-            if oldest_key in self._cache:
-                del self._cache[oldest_key]
+    def put(self, key: str, library: LoadedLibrary, dialect: str = 'duckdb'):
+        """Add a compiled library, evicting least recently used entries over budget."""
+        self._insert((key, dialect.upper()), library)
+        if self.store is not None:
+            self.store.save(key, dialect, library)
+    
+    def _insert(self, entry_key: Tuple[str, str], library: LoadedLibrary):
+        size = _approximate_size(library)
+        with self._lock:
+            if entry_key in self._cache:
+                self._bytes -= self._sizes.pop(entry_key)
+                del self._cache[entry_key]
+            self._cache[entry_key] = library
+            self._sizes[entry_key] = size
+            self._bytes += size
+            
+            # Always keep the newest entry, even if it alone exceeds the budget
+            while len(self._cache) > 1 and (len(self._cache) > self.max_size or self._bytes > self.max_bytes):
+                evicted, _ = self._cache.popitem(last=False)
+                self._bytes -= self._sizes.pop(evicted)
+                self._evictions += 1
+                logger.debug(f"Evicted compiled library {evicted[0]} ({evicted[1]}) from cache")
     
     def clear(self):
-        """Clear all cached libraries and reset statistics."""
-        self._cache.clear()
-        self._access_order.clear()
-        self._lru_cache.cache_clear()
-        self._hits = 0
-        self._misses = 0
+        """Clear the in-memory cache and reset statistics (the on-disk tier is kept)."""
+        with self._lock:
+            self._cache.clear()
+            self._sizes.clear()
+            self._bytes = 0
+            self._hits = 0
+            self._misses = 0
+            self._disk_hits = 0
+            self._evictions = 0
     
     def stats(self) -> Dict[str, Any]:
-        """Get comprehensive cache statistics including LRU cache info."""
-        lru_info = self._lru_cache.cache_info()
-        return {
-            'size': len(self._cache),
-            'max_size': self.max_size,
-            'libraries': list(self._cache.keys()),
-            'access_order': self._access_order.copy(),
-            'hits': self._hits,
-            'misses': self._misses,
-            'hit_rate': self._hits / (self._hits + self._misses) if (self._hits + self._misses) > 0 else 0.0,
-            'lru_hits': lru_info.hits,
-            'lru_misses': lru_info.misses,
-            'lru_maxsize': lru_info.maxsize,
-            'lru_currsize': lru_info.currsize
-        }
+        """Get cache statistics."""
+        with self._lock:
+            lookups = self._hits + self._disk_hits + self._misses
+            return {
+                'size': len(self._cache),
+                'max_size': self.max_size,
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'libraries': [key for key, _ in self._cache.keys()],
+                'access_order': [key for key, _ in self._cache.keys()],
+                'hits': self._hits,
+                'disk_hits': self._disk_hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+                'hit_rate': (self._hits + self._disk_hits) / lookups if lookups > 0 else 0.0,
+                'persisted': self.store.count() if self.store is not None else 0
+            }
+
+
+_shared_library_cache: Optional[LibraryCache] = None
+
+
+def get_shared_library_cache() -> LibraryCache:
+    """Process-wide compiled library cache shared by CQL engines."""
+    global _shared_library_cache
+    if _shared_library_cache is None:
+        _shared_library_cache = LibraryCache()
+    return _shared_library_cache
+
+
+def configure_library_cache(max_size: int = 100, max_bytes: int = DEFAULT_LIBRARY_CACHE_BYTES,
+                            path: Optional[str] = None) -> LibraryCache:
+    """
+    Replace the process-wide compiled library cache.
+    
+    Args:
+        max_size: Maximum number of cached libraries
+        max_bytes: Memory budget for cached libraries (approximate, in bytes)
+        path: Optional SQLite file for the on-disk tier
+        
+    Returns:
+        The new shared cache
+    """
+    global _shared_library_cache
+    store = PersistentLibraryStore(path) if path else None
+    _shared_library_cache = LibraryCache(max_size=max_size, max_bytes=max_bytes, store=store)
+    return _shared_library_cache
+
+
+def _approximate_size(obj: Any) -> int:
+    """Approximate deep size of an object graph in bytes."""
+    seen = set()
+    stack = [obj]
+    total = 0
+    while stack:
+        current = stack.pop()
+        if id(current) in seen:
+            continue
+        seen.add(id(current))
+        total += sys.getsizeof(current, 64)
+        if isinstance(current, (str, bytes, bytearray, int, float, bool, type(None))):
+            continue
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset)):
+            stack.extend(current)
+        elif hasattr(current, '__dict__') and not isinstance(current, type):
+            stack.append(vars(current))
+    return total
 
 
 class CQLLibraryManager:
@@ -348,16 +523,21 @@ class CQLLibraryManager:
     parameter management, and cross-library function calls.
     """
     
-    def __init__(self, cache_size: int = 100):
+    def __init__(self, cache_size: int = 100, cache: Optional[LibraryCache] = None,
+                 dialect: str = 'duckdb'):
         """
         Initialize the library manager.
         
         Args:
-            cache_size: Maximum number of libraries to cache
+            cache_size: Maximum number of libraries to cache (when no cache is given)
+            cache: Compiled library cache to use, e.g. get_shared_library_cache() to
+                share compiled libraries across managers
+            dialect: Dialect libraries are translated for
         """
         self.libraries: Dict[str, LoadedLibrary] = {}
         self.resolver = DependencyResolver()
-        self.cache = LibraryCache(cache_size)
+        self.cache = cache if cache is not None else LibraryCache(cache_size)
+        self.dialect = dialect
         self.library_paths: List[str] = []  # Search paths for libraries
         
     def add_library_path(self, path: str):
@@ -386,12 +566,13 @@ class CQLLibraryManager:
             # Generate cache key
             cache_key = self._generate_cache_key(name, content)
             
-            # Check cache first
-            cached_lib = self.cache.get(cache_key)
+            # Check cache first; parameter values and resolution state stay per manager
+            cached_lib = self.cache.get(cache_key, self.dialect)
             if cached_lib:
                 logger.debug(f"Library '{name}' loaded from cache")
-                self.libraries[name] = cached_lib
-                return cached_lib
+                loaded_lib = replace(cached_lib, parameter_values={}, dependencies_resolved=False)
+                self.libraries[name] = loaded_lib
+                return loaded_lib
             
             # Create metadata if not provided
             if metadata is None:
@@ -415,7 +596,7 @@ class CQLLibraryManager:
             
             # Store in libraries and cache
             self.libraries[name] = loaded_lib
-            self.cache.put(cache_key, loaded_lib)
+            self.cache.put(cache_key, replace(loaded_lib, parameter_values={}), self.dialect)
             
             logger.info(f"Successfully loaded library '{name}' version {metadata.version}")
             return loaded_lib
@@ -694,7 +875,7 @@ class CQLLibraryManager:
             
             # Step 3: Translate the AST to executable format
             logger.debug(f"Translating CQL library {name}")
-            translator = CQLTranslator(dialect=getattr(self, 'dialect', 'duckdb'))
+            translator = CQLTranslator(dialect=self.dialect)
             translated = translator.translate_library(ast)
             
             # Step 4: Convert define statements to pipeline operations
@@ -0,0 +1,210 @@
+"""
+Parallel CQL Population Evaluation
+
+Evaluates CQL-generated SQL over a population in patient buckets on worker
+processes instead of one query on one connection. The patient id space is
+split into hash buckets; each worker opens its own read-only connection and
+shadows the resource table with a temporary view holding only its bucket's
+patient compartments, so the generated SQL runs unchanged:
+
+- Patient resources belong to the bucket of their id
+- resources whose primary patient reference (subject, patient, beneficiary ...
+  per fhir4ds.datastore.compartments) is a Patient belong to that patient's
+  bucket
+- resources outside any patient compartment (Organization, Medication,
+  ValueSet ...) are visible in every bucket
+
+Per-bucket results are merged deterministically: rows are concatenated in
+bucket order and stably sorted by ``patient_id`` when the rows carry one, and
+population counts are summed via MeasureScoring.merge_population_results.
+Patient-context defines therefore match the single-connection results.
+
+Usage:
+    executor = BucketedExecutor('/data/fhir.duckdb', workers=8)
+    rows = executor.execute(sql)
+
+    engine = CQLEngine(dialect='duckdb')
+    define_results = engine.evaluate_defines_parallel(defines, executor)
+
+    cte_engine.execute_cql_library(library, 'MyLib', parallel=executor)
+"""
+
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from ...datastore.compartments import PATIENT_COMPARTMENT_REFERENCES
+
+logger = logging.getLogger(__name__)
+
+def _types_by_element() -> Dict[str, List[str]]:
+    """Primary patient reference element -> resource types using it."""
+    elements: Dict[str, List[str]] = {}
+    for resource_type, (element,) in PATIENT_COMPARTMENT_REFERENCES.items():
+        elements.setdefault(element, []).append(resource_type)
+    return elements
+
+
+def patient_key_sql(dialect: str, json_col: str) -> str:
+    """SQL expression for the id of the patient whose compartment a resource belongs to."""
+    postgresql = dialect.upper() == 'POSTGRESQL'
+    if postgresql:
+        resource_type = f"{json_col} ->> 'resourceType'"
+        resource_id = f"{json_col} ->> 'id'"
+    else:
+        resource_type = f"json_extract_string({json_col}, '$.resourceType')"
+        resource_id = f"json_extract_string({json_col}, '$.id')"
+
+    branches = []
+    for element, resource_types in _types_by_element().items():
+        reference = (f"{json_col} -> '{element}' ->> 'reference'" if postgresql
+                     else f"json_extract_string({json_col}, '$.{element}.reference')")
+        types = ', '.join(f"'{rt}'" for rt in resource_types)
+        branches.append(f"WHEN {resource_type} IN ({types}) THEN {reference}")
+    reference = f"CASE {' '.join(branches)} END"
+
+    if postgresql:
+        patient = f"substring({reference} FROM '^Patient/(.+)$')"
+    else:
+        patient = f"NULLIF(regexp_extract({reference}, '^Patient/(.+)$', 1), '')"
+    return f"CASE WHEN {resource_type} = 'Patient' THEN {resource_id} ELSE {patient} END"
+
+
+def bucket_filter_sql(dialect: str, json_col: str, bucket: int, bucket_count: int) -> str:
+    """
+    WHERE condition keeping one bucket's patient compartments plus shared resources.
+
+    Rows without a patient key are visible in every bucket so that joins against them
+    see the same rows as on a single connection; per-patient counts must therefore
+    leave them out (see count_populations()).
+    """
+    key = patient_key_sql(dialect, json_col)
+    if dialect.upper() == 'POSTGRESQL':
+        bucket_expr = f"mod(abs(hashtext({key})::bigint), {bucket_count})"
+    else:
+        bucket_expr = f"hash({key}) % {bucket_count}"
+    return f"(({key}) IS NULL OR {bucket_expr} = {bucket})"
+
+
+def _connect_bucket(database: str, dialect: str, table_name: str, json_col: str,
+                    bucket: int, bucket_count: int):
+    """Open a read-only connection whose ``table_name`` only shows one bucket."""
+    condition = bucket_filter_sql(dialect, json_col, bucket, bucket_count)
+    if dialect.upper() == 'POSTGRESQL':
+        import psycopg2
+        connection = psycopg2.connect(database)
+        connection.set_session(readonly=True)
+        cursor = connection.cursor()
+        cursor.execute("SELECT current_schema()")
+        schema = cursor.fetchone()[0]
+        # pg_temp is searched before the current schema, so the view shadows the table
+        cursor.execute(f"CREATE TEMP VIEW {table_name} AS SELECT * FROM {schema}.{table_name} WHERE {condition}")
+        return connection, cursor
+
+    import duckdb
+    connection = duckdb.connect(database, read_only=True)
+    catalog = connection.execute("SELECT current_database()").fetchone()[0]
+    # Temporary objects resolve before the main schema, so the view shadows the table
+    connection.execute(f"CREATE TEMP VIEW {table_name} AS "
+                       f"SELECT * FROM {catalog}.main.{table_name} WHERE {condition}")
+    return connection, connection
+
+
+def _execute_bucket(database: str, dialect: str, table_name: str, json_col: str,
+                    bucket: int, bucket_count: int, queries: List[str]) -> List[Tuple[List[str], List[tuple]]]:
+    """Worker: run every query against one bucket; returns (columns, rows) per query."""
+    connection, cursor = _connect_bucket(database, dialect, table_name, json_col, bucket, bucket_count)
+    try:
+        results = []
+        for sql in queries:
+            cursor.execute(sql)
+            columns = [desc[0] for desc in cursor.description] if cursor.description else []
+            results.append((columns, cursor.fetchall()))
+        return results
+    finally:
+        connection.close()
+
+
+class BucketedExecutor:
+    """Runs population SQL per patient bucket in worker processes and merges the results"""
+
+    def __init__(self, database: str, dialect: str = 'duckdb', workers: Optional[int] = None,
+                 buckets: Optional[int] = None, table_name: str = 'fhir_resources',
+                 json_col: str = 'resource'):
+        """
+        Args:
+            database: DuckDB database file or PostgreSQL connection string; workers open
+                their own read-only connections, so a DuckDB file must not be held open
+                for writing by another process
+            dialect: 'duckdb' or 'postgresql'
+            workers: Worker processes (default: CPU count; 1 evaluates buckets in-process)
+            buckets: Patient hash buckets (default: one per worker)
+            table_name: FHIR resources table referenced by the generated SQL
+            json_col: JSON column storing FHIR resources
+        """
+        if database == ':memory:':
+            raise ValueError("Parallel evaluation needs a database file or server that workers can open")
+        self.database = database
+        self.dialect = dialect.upper()
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.buckets = max(1, buckets or self.workers)
+        self.table_name = table_name
+        self.json_col = json_col
+
+    def execute_many(self, queries: List[str]) -> List[Tuple[List[str], List[tuple]]]:
+        """Run each query over every bucket; returns merged (columns, rows) per query."""
+        tasks = [(self.database, self.dialect, self.table_name, self.json_col, bucket, self.buckets, queries)
+                 for bucket in range(self.buckets)]
+        if self.workers == 1 or self.buckets == 1:
+            per_bucket = [_execute_bucket(*task) for task in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=min(self.workers, self.buckets)) as executor:
+                per_bucket = list(executor.map(_execute_bucket, *zip(*tasks)))
+
+        merged = []
+        for index in range(len(queries)):
+            columns = next((result[index][0] for result in per_bucket if result[index][0]), [])
+            rows = [row for result in per_bucket for row in result[index][1]]
+            merged.append((columns, self._order_rows(columns, rows)))
+        logger.info(f"Evaluated {len(queries)} queries over {self.buckets} patient buckets "
+                    f"with {min(self.workers, self.buckets)} workers")
+        return merged
+
+    def execute(self, sql: str) -> List[Dict[str, Any]]:
+        """Run one query over every bucket and return merged rows as dictionaries."""
+        columns, rows = self.execute_many([sql])[0]
+        return [dict(zip(columns, row)) for row in rows]
+
+    def evaluate_defines(self, define_sql: Dict[str, str]) -> Dict[str, List[Dict[str, Any]]]:
+        """Run the SQL of each define over every bucket; rows keyed by define name."""
+        names = list(define_sql)
+        results = self.execute_many([define_sql[name] for name in names])
+        return {name: [dict(zip(columns, row)) for row in rows]
+                for name, (columns, rows) in zip(names, results)}
+
+    def count_populations(self, criteria_sql: Dict[str, str]) -> Dict[str, Any]:
+        """
+        Distinct member patients per criterion, merged from per-bucket partial counts.
+
+        Rows with no patient key (shared resources, which every bucket sees) are not
+        counted; a patient's rows are all in one bucket, so partial counts add up.
+        """
+        from ..measures.scoring import MeasureScoring
+
+        key = patient_key_sql(self.dialect, f"population.{self.json_col}")
+        names = list(criteria_sql)
+        results = self.execute_many([f"SELECT COUNT(DISTINCT {key}) FROM ({criteria_sql[name]}) AS population "
+                                     f"WHERE {key} IS NOT NULL" for name in names])
+        # One count row per bucket, in bucket order
+        partials = [{'populations': {name: {'count': rows[bucket][0]} for name, (_, rows) in zip(names, results)}}
+                    for bucket in range(self.buckets)]
+        return MeasureScoring().merge_population_results(partials)
+
+    @staticmethod
+    def _order_rows(columns: List[str], rows: List[tuple]) -> List[tuple]:
+        """Stable sort by patient_id (NULLs last) so the merge does not depend on scheduling."""
+        if 'patient_id' not in columns:
+            return rows
+        index = columns.index('patient_id')
+        return sorted(rows, key=lambda row: (row[index] is None, str(row[index]) if row[index] is not None else ''))
@@ -0,0 +1,213 @@
+"""
+Temporal Joins for CQL Interval Relationships
+
+Compiles ``with``/``without`` clauses whose ``such that`` condition relates the
+times of two resources, e.g.
+
+    [Encounter] E with [Observation: "HbA1c"] O such that O.effective during E.period
+
+into one set-based range join instead of a per-row predicate over JSON-extracted
+timestamps evaluated for every pair of resources. Each side is first reduced to
+(row_id, patient_id, start_ts, end_ts):
+
+- from the datastore's interval index when one is enabled
+  (fhir4ds.datastore.intervals), otherwise
+- normalized inline from the resource JSON with the same rules
+
+and the two sides are joined on patient_id plus the range predicate of the
+relationship. The planner hashes on patient_id and checks the range predicate
+per patient (DuckDB) or probes the GiST-indexed tsrange column (PostgreSQL), so
+the cost grows with the resources per patient rather than with the product of
+the two populations.
+
+Without the interval index, rows are keyed by the resource's logical id rather
+than the table's id column, which lake views (FHIRDataStore.with_lake) do not
+have; coded retrieves on such tables match the code display in the JSON.
+
+Times are each resource's clinically relevant time (CLINICAL_TIME_ELEMENTS), so a
+condition is only rewritten when the element it names on each side is that time
+(``O.effective``, ``E.period``); ``O.issued during E.period``, or a type whose
+time spans two elements (Condition onset to abatement), is left to the regular
+translation. Related resources must share the patient compartment, as in CQL's
+Patient context; besides the temporal relationship a condition may only equate
+the two resources' subject or patient references.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+from ...datastore.codings import coded_rows_sql, coding_index_table
+from ...datastore.intervals import CLINICAL_TIME_ELEMENTS, interval_bounds_sql, interval_index_table
+from ...datastore.side_tables import patient_id_sql, sql_literal
+
+# Range predicate of "a <relationship> b" over closed [start_ts, end_ts] intervals
+TEMPORAL_RELATIONSHIPS = {
+    'during': "{a}.start_ts >= {b}.start_ts AND {a}.end_ts <= {b}.end_ts",
+    'included in': "{a}.start_ts >= {b}.start_ts AND {a}.end_ts <= {b}.end_ts",
+    'includes': "{a}.start_ts <= {b}.start_ts AND {a}.end_ts >= {b}.end_ts",
+    'overlaps': "{a}.start_ts <= {b}.end_ts AND {a}.end_ts >= {b}.start_ts",
+    'before': "{a}.end_ts < {b}.start_ts",
+    'after': "{a}.start_ts > {b}.end_ts",
+    'starts during': "{a}.start_ts >= {b}.start_ts AND {a}.start_ts <= {b}.end_ts",
+    'ends during': "{a}.end_ts >= {b}.start_ts AND {a}.end_ts <= {b}.end_ts",
+}
+
+# PostgreSQL range operators for the interval index's tsrange column
+RANGE_OPERATORS = {
+    'during': '<@', 'included in': '<@', 'includes': '@>', 'overlaps': '&&', 'before': '<<', 'after': '>>',
+}
+
+_RELATIONSHIP = '|'.join(sorted((r.replace(' ', r'\s+') for r in TEMPORAL_RELATIONSHIPS), key=len, reverse=True))
+_TEMPORAL_CONDITION = re.compile(rf'^(\w+)\.([\w.]+)\s+({_RELATIONSHIP})\s+(\w+)\.([\w.]+)$', re.IGNORECASE)
+_PATIENT_REFERENCE = re.compile(
+    r'^\w+\.(?:subject|patient)\.reference\s*=\s*\w+\.(?:subject|patient)\.reference$', re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class TemporalCondition:
+    """
+    ``left.element <relationship> right.element`` between two query aliases; an
+    element of None stands for the resource's clinical time.
+    """
+    left_alias: str
+    relationship: str
+    right_alias: str
+    left_element: Optional[str] = None
+    right_element: Optional[str] = None
+
+    def element(self, alias: str) -> Optional[str]:
+        """Element the condition relates on the given alias."""
+        return self.left_element if alias == self.left_alias else self.right_element
+
+
+def parse_temporal_condition(condition: str) -> Optional[TemporalCondition]:
+    """
+    The temporal relationship of a ``such that`` condition, or None.
+
+    Conjuncts equating the resources' subject or patient references
+    (``O.subject.reference = E.subject.reference``) are implied by the same-patient
+    join and skipped; any other conjunct, including other references such as
+    ``O.encounter.reference``, makes the condition unsupported.
+    """
+    temporal = None
+    for part in re.split(r'\s+and\s+', condition.strip(), flags=re.IGNORECASE):
+        match = _TEMPORAL_CONDITION.match(part.strip())
+        if match and temporal is None:
+            left, left_element, relationship, right, right_element = match.groups()
+            temporal = TemporalCondition(left, ' '.join(relationship.lower().split()), right,
+                                         left_element, right_element)
+        elif not _PATIENT_REFERENCE.match(part.strip()):
+            return None
+    return temporal
+
+
+class TemporalJoinCompiler:
+    """Compiles temporal with/without clauses to range joins"""
+
+    def __init__(self, dialect, table_name: str = "fhir_resources", json_column: str = "resource"):
+        self.dialect = dialect
+        self.table_name = table_name
+        self.json_column = json_column
+        self.interval_table = interval_index_table(dialect, table_name)
+        self.codings_table = coding_index_table(dialect, table_name)
+
+    @staticmethod
+    def supports(resource_type: str) -> bool:
+        """Whether resources of this type have a clinical time to relate."""
+        return resource_type in CLINICAL_TIME_ELEMENTS
+
+    @staticmethod
+    def is_clinical_time(resource_type: str, element: Optional[str]) -> bool:
+        """Whether an element path (``effective``, ``period``) is the type's clinical time."""
+        if element is None:
+            return True
+        start, end = CLINICAL_TIME_ELEMENTS[resource_type]
+        return end is None and element == start.replace('[x]', '')
+
+    def interval_source(self, resource_type: str, code_display: Optional[str] = None) -> str:
+        """SELECT of (row_id, patient_id, start_ts, end_ts[, period]) for one resource type."""
+        if self.interval_table:
+            code_filter = ""
+            if code_display and self.codings_table:
+                rows = coded_rows_sql(self.codings_table, resource_type, ['code'], display=code_display)
+                code_filter = f" AND row_id IN ({rows})"
+            elif code_display:
+                code_filter = f" AND row_id IN (SELECT id FROM {self.table_name} " \
+                              f"WHERE {self.resource_filter(resource_type, code_display)})"
+            return (f"SELECT * FROM {self.interval_table} "
+                    f"WHERE resource_type = {sql_literal(resource_type)}{code_filter}")
+
+        json_col = self.json_column
+        start, end = interval_bounds_sql(self.dialect, json_col, resource_type)
+        resource_filter = self.resource_filter(resource_type, code_display)
+        return (f"SELECT row_id, patient_id, start_ts, end_ts FROM ("
+                f"SELECT {self.row_key()} AS row_id, "
+                f"{patient_id_sql(self.dialect, json_col, [resource_type])} AS patient_id, "
+                f"{start} AS start_ts, {end} AS end_ts FROM {self.table_name} WHERE {resource_filter}"
+                f") t WHERE start_ts IS NOT NULL AND row_id IS NOT NULL")
+
+    def row_key(self) -> str:
+        """
+        Key the primary and related rows are matched by: the table's id column,
+        which the interval index refers to, or without the index the resource's
+        logical id, so tables without an id column (lake views) work too.
+        """
+        if self.interval_table:
+            return "id"
+        return self.dialect.extract_json_field(self.json_column, '$.id')
+
+    def predicate(self, relationship: str, a: str, b: str) -> str:
+        """Range predicate for ``a <relationship> b`` over interval sources aliased a and b."""
+        operator = RANGE_OPERATORS.get(relationship)
+        if operator and self.interval_table and self.dialect.name.upper() == 'POSTGRESQL':
+            return f"{a}.period {operator} {b}.period"
+        return TEMPORAL_RELATIONSHIPS[relationship].format(a=a, b=b)
+
+    def matching_rows_sql(self, primary_type: str, primary_alias: str, related_type: str, related_alias: str,
+                          condition: TemporalCondition, primary_display: Optional[str] = None,
+                          related_display: Optional[str] = None) -> str:
+        """Row ids of the primary resources with a related resource satisfying the condition."""
+        sides = {primary_alias: 'p', related_alias: 'r'}
+        predicate = self.predicate(condition.relationship, sides[condition.left_alias], sides[condition.right_alias])
+        return (f"SELECT DISTINCT p.row_id FROM ({self.interval_source(primary_type, primary_display)}) p "
+                f"JOIN ({self.interval_source(related_type, related_display)}) r "
+                f"ON r.patient_id = p.patient_id AND {predicate}")
+
+    def compile(self, primary_type: str, primary_alias: str, related_type: str, related_alias: str,
+                condition: TemporalCondition, exclude: bool = False, primary_display: Optional[str] = None,
+                related_display: Optional[str] = None) -> Optional[str]:
+        """
+        SQL selecting the primary resources with (or, with exclude, without) a related
+        resource satisfying a temporal condition; None if the clause is not temporal
+        between the two aliases, a resource type has no clinical time or the condition
+        relates another element.
+        """
+        if {condition.left_alias, condition.right_alias} != {primary_alias, related_alias} or \
+                primary_alias == related_alias:
+            return None
+        if not (self.supports(primary_type) and self.supports(related_type)):
+            return None
+        if not (self.is_clinical_time(primary_type, condition.element(primary_alias)) and
+                self.is_clinical_time(related_type, condition.element(related_alias))):
+            return None
+
+        rows = self.matching_rows_sql(primary_type, primary_alias, related_type, related_alias,
+                                      condition, primary_display, related_display)
+        membership = "NOT IN" if exclude else "IN"
+        return (f"SELECT {self.json_column}\nFROM {self.table_name}\n"
+                f"WHERE {self.resource_filter(primary_type, primary_display)}\n"
+                f"  AND {self.row_key()} {membership} ({rows})")
+
+    def resource_filter(self, resource_type: str, code_display: Optional[str] = None) -> str:
+        """Base table condition for a ``[Type]`` or ``[Type: "display"]`` retrieve."""
+        json_col = self.json_column
+        condition = f"{self.dialect.extract_json_field(json_col, '$.resourceType')} = {sql_literal(resource_type)}"
+        if code_display:
+            if self.codings_table:
+                rows = coded_rows_sql(self.codings_table, resource_type, ['code'], display=code_display)
+                condition += f" AND id IN ({rows})"
+            else:
+                display = self.dialect.extract_json_field(json_col, '$.code.coding[0].display')
+                condition += f" AND {display} = {sql_literal(code_display)}"
+        return condition
@@ -952,7 +952,40 @@ class TerminologyFunctions:
             logger.error(f"Failed to generate SQL for valueset {valueset_url}: {e}")
             # Return safe fallback that doesn't break query execution
             return f"({code_expr} IS NOT NULL AND {system_expr} IS NOT NULL AND FALSE /* ValueSet error: {e} */)"
-    
+
+    def in_valueset_rows_sql(self, row_id_expr: str, valueset_url: str, codings_table: str,
+                             resource_type: str = None, element_paths: List[str] = None,
+                             version: str = None) -> str:
+        """
+        Generate SQL for valueset membership of whole resources using a coding index.
+
+        The expansion is joined to the coding index (see fhir4ds.datastore.codings) on
+        system and code, so a resource matches when any Coding of the indexed elements
+        is in the valueset.
+
+        Args:
+            row_id_expr: SQL expression for the resource row id
+            valueset_url: ValueSet URL
+            codings_table: Coding index table
+            resource_type: Restrict to one resource type (optional)
+            element_paths: Restrict to these coded elements, e.g. ['code'] (optional)
+            version: Specific version of ValueSet (optional)
+
+        Returns:
+            SQL expression for valueset membership check
+        """
+        from ...datastore.codings import valueset_rows_sql
+
+        if not self._is_safe_sql_expression(row_id_expr):
+            logger.error(f"Potentially unsafe SQL expression detected: row_id_expr='{row_id_expr}'")
+            return "(FALSE /* Unsafe SQL expressions rejected */)"
+
+        codes = self.expand_valueset(valueset_url, version)
+        if not codes:
+            logger.warning(f"No codes found in valueset {valueset_url}")
+            return f"({row_id_expr} IS NULL AND FALSE)"
+        return f"{row_id_expr} IN ({valueset_rows_sql(codings_table, codes, resource_type, element_paths)})"
+
     def _generate_small_valueset_sql(self, codes: List[Dict], code_expr: str, system_expr: str) -> str:
         """Generate SQL for small valuesets using OR conditions with parameterized queries."""
         # Validate input expressions to prevent SQL injection
@@ -1356,63 +1389,117 @@ class ClinicalLogicFunctions:
     """
     
     @staticmethod
-    def most_recent(observations: List[Any], date_field: str = "effectiveDateTime") -> str:
+    def first_per_partition(source: str, partition_by: str, order_by: str, row_alias: str = "src") -> str:
+        """
+        First row of each partition of a source query, in one sorted pass.
+
+        Args:
+            source: SQL query producing the rows
+            partition_by: SQL expression over ``row_alias`` grouping the rows (e.g. the patient id)
+            order_by: ORDER BY list over ``row_alias``; the first row per partition is kept
+            row_alias: Alias of the source rows in partition_by and order_by
+
+        Returns:
+            SQL query of the source columns plus ``partition_key``, one row per partition
+        """
+        return f"""
+        SELECT ranked.* FROM (
+            SELECT {row_alias}.*, ROW_NUMBER() OVER (PARTITION BY partition_key ORDER BY {order_by}) AS partition_position
+            FROM (SELECT {row_alias}.*, {partition_by} AS partition_key FROM ({source}) {row_alias}) {row_alias}
+        ) ranked
+        WHERE ranked.partition_position = 1
+        """.strip()
+
+    @staticmethod
+    def most_recent(observations: List[Any], date_field: str = "effectiveDateTime",
+                    partition_by: Optional[str] = None) -> str:
         """
         Get most recent observation from a list.
         
         Args:
             observations: List of observations
             date_field: Field containing the date
+            partition_by: SQL expression over ``obs`` (e.g. the patient id); when given, the
+                most recent observation of every partition is selected in one pass
             
         Returns:
-            SQL expression for most recent observation
+            SQL expression for most recent observation, or with partition_by a query
+            with one row per partition
         """
         logger.debug("Generating most recent observation query")
         
+        order_by = f"DATE(json_extract_string(obs.value, '$.{date_field}')) DESC NULLS LAST"
+        if partition_by:
+            return ClinicalLogicFunctions.first_per_partition(observations, partition_by, order_by, "obs")
+        
         # Generate SQL that gets the observation with the latest date
         return f"""
         (SELECT obs.* FROM ({observations}) obs 
-         ORDER BY DATE(json_extract_string(obs.value, '$.{date_field}')) DESC 
+         ORDER BY {order_by} 
          LIMIT 1)
         """.strip()
     
     @staticmethod
-    def latest_value(measurements: List[Any], value_field: str = "valueQuantity.value") -> str:
+    def latest_value(measurements: List[Any], value_field: str = "valueQuantity.value",
+                     partition_by: Optional[str] = None, date_field: str = "effectiveDateTime") -> str:
         """
         Get the latest measured value from a series.
         
         Args:
             measurements: List of measurements
             value_field: Field containing the value
+            partition_by: SQL expression over ``meas`` (e.g. the patient id); when given, the
+                latest value of every partition is selected in one pass
+            date_field: Field containing the date
             
         Returns:
-            SQL expression for latest value
+            SQL expression for latest value, or with partition_by a query of
+            (partition_key, value) rows
         """
         logger.debug("Generating latest value query")
         
+        value = f"json_extract_string(meas.value, '$.{value_field}')"
+        order_by = f"DATE(json_extract_string(meas.value, '$.{date_field}')) DESC NULLS LAST"
+        if partition_by:
+            latest = ClinicalLogicFunctions.first_per_partition(measurements, partition_by, order_by, "meas")
+            return f"SELECT latest.partition_key, json_extract_string(latest.value, '$.{value_field}') AS value " \
+                   f"FROM ({latest}) latest"
+        
         return f"""
-        (SELECT json_extract_string(meas.value, '$.{value_field}') 
+        (SELECT {value} 
          FROM ({measurements}) meas 
-         ORDER BY DATE(json_extract_string(meas.value, '$.effectiveDateTime')) DESC 
+         ORDER BY {order_by} 
          LIMIT 1)
         """.strip()
     
     @staticmethod
-    def average_value(measurements: List[Any], value_field: str = "valueQuantity.value") -> str:
+    def average_value(measurements: List[Any], value_field: str = "valueQuantity.value",
+                      partition_by: Optional[str] = None) -> str:
         """
         Calculate average value from measurements.
         
         Args:
             measurements: List of measurements
             value_field: Field containing the value
+            partition_by: SQL expression over ``meas`` (e.g. the patient id); when given, the
+                average of every partition is computed in one grouped pass
             
         Returns:
-            SQL expression for average value
+            SQL expression for average value, or with partition_by a query of
+            (partition_key, value) rows
         """
         logger.debug("Generating average value calculation")
         
+        average = f"AVG(CAST(json_extract_string(meas.value, '$.{value_field}') AS DECIMAL))"
+        if partition_by:
+            return f"""
+        SELECT {partition_by} AS partition_key, {average} AS value
+        FROM ({measurements}) meas
+        GROUP BY {partition_by}
+        """.strip()
+        
         return f"""
-        (SELECT AVG(CAST(json_extract_string(meas.value, '$.{value_field}') AS DECIMAL))
+        (SELECT {average}
          FROM ({measurements}) meas)
         """.strip()
     
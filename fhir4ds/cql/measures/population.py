@@ -12,6 +12,9 @@ from datetime import datetime, date
 import duckdb
 import json
 
+from ...dialects.profiles import profile_scope
+from ..core.parallel import patient_key_sql
+
 logger = logging.getLogger(__name__)
 
 class PopulationType(Enum):
@@ -222,22 +225,38 @@ class QualityMeasureDefinition:
         
         return issues
 
+def criteria_patients_sql(criteria_sql: str, dialect: str = 'DUCKDB', json_column: str = 'resource') -> str:
+    """
+    Distinct ids of the patients whose compartments the criteria rows belong to.
+    
+    Rows outside any patient compartment (no patient key) are not members.
+    """
+    key = patient_key_sql(dialect, f"population.{json_column}")
+    return (f"SELECT DISTINCT {key} AS patient_id FROM ({criteria_sql}) AS population "
+            f"WHERE {key} IS NOT NULL")
+
+
 class PopulationEvaluator:
     """
     Evaluates quality measure populations using CQL engine.
     """
     
-    def __init__(self, cql_engine, db_connection=None):
+    def __init__(self, cql_engine, db_connection=None, dialect: Optional[str] = None):
         """
         Initialize with CQL engine and optional database connection.
         
         Args:
             cql_engine: CQL engine for expression evaluation
             db_connection: Database connection for executing SQL (creates new if None)
+            dialect: Dialect of db_connection, 'DUCKDB' or 'POSTGRESQL' (default: detected
+                from the connection)
         """
         self.cql_engine = cql_engine
         self.evaluation_cache = {}
         self.db_connection = db_connection or duckdb.connect(':memory:')
+        if dialect is None:
+            dialect = 'POSTGRESQL' if type(self.db_connection).__module__.startswith('psycopg2') else 'DUCKDB'
+        self.dialect_name = dialect.upper()
         self._setup_database()
     
     def _setup_database(self):
@@ -293,6 +312,7 @@ class PopulationEvaluator:
         """
         try:
             logger.debug(f"Executing SQL: {sql_query[:100]}...")
+            self._record_workload(sql_query)
             
             # Execute the query
             cursor = self.db_connection.execute(sql_query)
@@ -314,13 +334,19 @@ class PopulationEvaluator:
             return []
         
     def evaluate_measure(self, measure: QualityMeasureDefinition, 
-                        patient_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+                        patient_ids: Optional[List[str]] = None,
+                        parallel=None, profile: Optional[str] = None) -> Dict[str, Any]:
         """
         Evaluate quality measure for given patients or population.
         
         Args:
             measure: Quality measure definition
             patient_ids: Optional list of patient IDs (None for population-level)
+            parallel: Optional fhir4ds.cql.core.parallel.BucketedExecutor; population-level
+                criteria are then translated to SQL and counted per patient bucket on
+                worker processes
+            profile: Optional execution profile (e.g. 'batch') applied to db_connection
+                during evaluation; previous settings are restored afterwards
             
         Returns:
             Evaluation results with population counts and patient lists
@@ -340,10 +366,14 @@ class PopulationEvaluator:
         # Set context for evaluation
         if patient_ids:
             # Patient-level evaluation
-            results = self._evaluate_patient_level(measure, patient_ids)
+            with profile_scope(self.db_connection, self.dialect_name, profile):
+                results = self._evaluate_patient_level(measure, patient_ids)
+        elif parallel is not None:
+            results = self._evaluate_population_level_parallel(measure, parallel)
         else:
             # Population-level evaluation
-            results = self._evaluate_population_level(measure)
+            with profile_scope(self.db_connection, self.dialect_name, profile):
+                results = self._evaluate_population_level(measure)
         
         return results
     
@@ -411,7 +441,13 @@ class PopulationEvaluator:
         return results
     
     def _evaluate_population_level(self, measure: QualityMeasureDefinition) -> Dict[str, Any]:
-        """Evaluate measure at population level using real SQL execution."""
+        """
+        Evaluate measure at population level using real SQL execution.
+        
+        Each criterion is translated to SQL and its members are the distinct patients
+        whose compartments the resulting rows belong to, exactly as in the parallel
+        per-bucket evaluation (_evaluate_population_level_parallel).
+        """
         self.cql_engine.set_population_context()
         
         results = {
@@ -420,39 +456,95 @@ class PopulationEvaluator:
             'populations': {}
         }
         
-        criteria_order = measure.get_evaluation_order()
-        
-        for criteria in criteria_order:
+        for criteria in measure.get_evaluation_order():
+            sql = self.cql_engine.evaluate_expression(criteria.criteria_expression)
+            if not self._is_valid_sql(sql):
+                results['populations'][criteria.name] = self._population_result(
+                    criteria, '', error=f"SQL generation failed: {str(sql)[:200]}")
+                continue
             try:
-                # Use the real evaluation method
-                criteria_result = self.evaluate_population_criteria(criteria)
-                
-                results['populations'][criteria.name] = {
-                    'type': criteria.population_type.value,
-                    'count': criteria_result.get('count', 0),
-                    'patient_count': criteria_result.get('patient_count', 0),
-                    'description': criteria.description,
-                    'sql_query': criteria_result.get('sql_generated', ''),
-                    'evaluation_successful': criteria_result.get('evaluation_successful', False),
-                    'matching_patients': criteria_result.get('matching_patients', []),
-                    'sql_results_sample': criteria_result.get('sql_results', [])
-                }
-                
-                if not criteria_result.get('evaluation_successful', False):
-                    results['populations'][criteria.name]['error'] = criteria_result.get('error', 'Unknown error')
-                
+                self._record_workload(sql)
+                rows = self.db_connection.execute(self.criteria_patients_sql(sql)).fetchall()
+                results['populations'][criteria.name] = self._population_result(
+                    criteria, sql, sorted(row[0] for row in rows))
             except Exception as e:
                 logger.error(f"Error evaluating population {criteria.name}: {e}")
-                results['populations'][criteria.name] = {
-                    'type': criteria.population_type.value,
-                    'count': 0,
-                    'patient_count': 0,
-                    'error': str(e),
-                    'evaluation_successful': False
-                }
+                results['populations'][criteria.name] = self._population_result(criteria, sql, error=str(e))
         
         return results
     
+    def _evaluate_population_level_parallel(self, measure: QualityMeasureDefinition,
+                                            executor) -> Dict[str, Any]:
+        """Evaluate each population criterion per patient bucket and merge the member patients."""
+        self.cql_engine.set_population_context()
+        
+        criteria_order = measure.get_evaluation_order()
+        criteria_sql = {}
+        errors = {}
+        for criteria in criteria_order:
+            sql = self.cql_engine.evaluate_expression(criteria.criteria_expression,
+                                                      executor.table_name, executor.json_col)
+            if self._is_valid_sql(sql):
+                criteria_sql[criteria.name] = sql
+            else:
+                errors[criteria.name] = f"SQL generation failed: {str(sql)[:200]}"
+        
+        # Every patient's rows are in its own bucket, so the merged ids are distinct;
+        # rows outside any patient compartment are in every bucket and are not counted
+        names = list(criteria_sql)
+        for name in names:
+            self._record_workload(criteria_sql[name], executor.table_name)
+        merged = executor.execute_many([self.criteria_patients_sql(criteria_sql[name], executor.json_col)
+                                        for name in names]) if names else []
+        patients = {name: [row[0] for row in rows] for name, (_, rows) in zip(names, merged)}
+        
+        results = {
+            'measure_id': measure.measure_id,
+            'evaluation_type': 'population-level',
+            'buckets': executor.buckets,
+            'populations': {}
+        }
+        for criteria in criteria_order:
+            results['populations'][criteria.name] = self._population_result(
+                criteria, criteria_sql.get(criteria.name, ''), patients.get(criteria.name),
+                errors.get(criteria.name))
+        
+        return results
+    
+    def _record_workload(self, sql: str, table_name: str = 'fhir_resources') -> None:
+        """Record executed criteria SQL with the table's index advisor, if its datastore records workload."""
+        advisors = getattr(getattr(self.cql_engine, 'dialect', None), 'index_advisors', None)
+        advisor = advisors.get(table_name) if advisors else None
+        if advisor is not None:
+            advisor.record_query(sql)
+    
+    def criteria_patients_sql(self, criteria_sql: str, json_column: str = 'resource') -> str:
+        """Distinct ids of the patients whose compartments the criteria rows belong to."""
+        return criteria_patients_sql(criteria_sql, self.dialect_name, json_column)
+    
+    @staticmethod
+    def _is_valid_sql(sql: Any) -> bool:
+        return isinstance(sql, str) and bool(sql.strip()) and not sql.lstrip().startswith('--')
+    
+    @staticmethod
+    def _population_result(criteria: PopulationCriteria, sql: str,
+                           patient_ids: Optional[List[str]] = None,
+                           error: Optional[str] = None) -> Dict[str, Any]:
+        """Population result for a criterion from its sorted member patient ids."""
+        patient_ids = patient_ids if error is None else []
+        result = {
+            'type': criteria.population_type.value,
+            'count': len(patient_ids),
+            'patient_count': len(patient_ids),
+            'description': criteria.description,
+            'sql_query': sql,
+            'evaluation_successful': error is None,
+            'matching_patients': patient_ids[:10]  # First 10 for display
+        }
+        if error is not None:
+            result['error'] = error
+        return result
+    
     def _evaluate_criteria_directly(self, criteria: PopulationCriteria, patient_id: str) -> bool:
         """
         Evaluate criteria directly using the simplified approach when SQL generation fails.
@@ -606,15 +698,16 @@ class PopulationEvaluator:
                 
                 if meets_criteria:
                     count += 1
-                    patient_list.append(patient_id)
+                    if len(patient_list) < 10:
+                        patient_list.append(patient_id)
             
             return {
                 'criteria_name': criteria.name,
                 'sql_generated': f"-- Simplified evaluation for {criteria.name}: {criteria.criteria_expression}",
                 'evaluation_successful': True,
                 'count': count,
-                'patient_count': len(patient_list),
-                'matching_patients': patient_list[:10],  # First 10 for display
+                'patient_count': count,
+                'matching_patients': patient_list,  # First 10 for display
                 'sql_results': [{'patient_count': count, 'criteria': criteria.name}],
                 'total_sql_results': count
             }
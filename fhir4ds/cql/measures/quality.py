@@ -11,6 +11,7 @@ from datetime import datetime
 
 from .population import QualityMeasureDefinition, PopulationEvaluator, QualityMeasureBuilder
 from .scoring import MeasureScoring, MeasureReport
+from .stratification import stratified_counts
 
 logger = logging.getLogger(__name__)
 
@@ -211,6 +212,114 @@ class QualityMeasureEngine:
             }
         }
     
+    def evaluate_measure_stratified(self, measure_id: str, membership_sql: str,
+                                    dialect=None,
+                                    stratifiers: Optional[Dict[str, str]] = None,
+                                    supplemental_data: Optional[Dict[str, str]] = None,
+                                    evaluation_config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Evaluate a quality measure with its stratifiers and supplemental data elements.
+
+        The overall counts and the counts of every stratum and supplemental data value
+        come from one GROUP BY GROUPING SETS query over the per-patient membership
+        relation, which has a column per population of the measure (named like the
+        population criteria). Strata are then scored in one vectorized pass.
+
+        Args:
+            measure_id: ID of measure to evaluate
+            membership_sql: Per-patient population membership query
+            dialect: Database dialect to run on (default: the CQL engine's dialect)
+            stratifiers: Stratifier -> SQL expression over the membership relation ``m``
+                (default: a column per stratifier of the measure)
+            supplemental_data: Supplemental data element -> SQL expression over ``m``
+                (default: a column per supplemental data element of the measure)
+            evaluation_config: Configuration for evaluation
+
+        Returns:
+            Complete evaluation results including stratified scores and report
+        """
+        if measure_id not in self.measures:
+            raise ValueError(f"Measure {measure_id} not found. Available measures: {list(self.measures.keys())}")
+
+        measure = self.measures[measure_id]
+        config = evaluation_config or {}
+        dialect = dialect or getattr(self.cql_engine, 'dialect', None)
+        if dialect is None:
+            raise ValueError("A dialect is required to evaluate the membership query")
+
+        def columns(names) -> Dict[str, str]:
+            return {name: 'm."{}"'.format(name.replace('"', '""')) for name in names}
+
+        stratifiers = stratifiers if stratifiers is not None else columns(measure.stratifiers)
+        supplemental_data = supplemental_data if supplemental_data is not None else columns(measure.supplemental_data)
+        groupings = {('stratifier', code): expression for code, expression in stratifiers.items()}
+        groupings.update({('supplemental_data', code): expression for code, expression in supplemental_data.items()})
+
+        # Step 1: Overall, stratum and supplemental data counts in one query
+        counts = stratified_counts(dialect, membership_sql, list(measure.populations), groupings)
+        population_results = {
+            'evaluation_type': 'population_stratified',
+            'patient_count': counts.patient_count,
+            'populations': {
+                name: {
+                    'count': counts.counts.get(name, 0),
+                    'description': criteria.description,
+                    'type': criteria.population_type.value,
+                    'evaluation_successful': True
+                }
+                for name, criteria in measure.populations.items()
+            }
+        }
+
+        # Step 2: Score the measure, then every stratum in one vectorized pass
+        scoring_config = config.get('scoring', {})
+        scoring_results = self.measure_scoring.calculate_score(
+            population_results,
+            measure.scoring_method,
+            scoring_config
+        )
+        strata = {code: {value: stratum_counts for value, _, stratum_counts in counts.strata[('stratifier', code)]}
+                  for code in stratifiers}
+        stratum_scores = self.measure_scoring.score_strata(strata, measure.scoring_method, scoring_config)
+
+        population_results['stratifiers'] = {
+            code: {
+                value: {
+                    'patient_count': patients,
+                    'populations': stratum_counts,
+                    'scoring': stratum_scores[code][value]
+                }
+                for value, patients, stratum_counts in counts.strata[('stratifier', code)]
+            }
+            for code in stratifiers
+        }
+        population_results['supplemental_data'] = {
+            code: {
+                value: {'patient_count': patients, 'populations': stratum_counts}
+                for value, patients, stratum_counts in counts.strata[('supplemental_data', code)]
+            }
+            for code in supplemental_data
+        }
+
+        # Step 3: Generate report
+        report_config = config.get('reporting', {})
+        report = self._generate_population_report(measure, population_results, scoring_results, report_config)
+
+        return {
+            'measure_id': measure.measure_id,
+            'evaluation_type': 'population_stratified',
+            'population_results': population_results,
+            'scoring_results': scoring_results,
+            'report': report,
+            'metadata': {
+                'evaluation_timestamp': datetime.now().isoformat(),
+                'patient_count': counts.patient_count,
+                'stratifier_count': len(stratifiers),
+                'supplemental_data_count': len(supplemental_data),
+                'optimization_applied': True
+            }
+        }
+
     def evaluate_multiple_measures(self, measure_ids: List[str],
                                   patient_ids: Optional[List[str]] = None,
                                   evaluation_config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
@@ -502,6 +611,10 @@ class QualityMeasureEngine:
             }
         }
         
+        # Supplemental data element counts (stratifiers are reported as 'stratification')
+        if 'supplemental_data' in population_results:
+            population_report['supplemental_data'] = population_results['supplemental_data']
+        
         return population_report
     
     def get_population_performance_stats(self, measure_id: str) -> Dict[str, Any]:
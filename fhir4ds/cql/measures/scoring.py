@@ -11,6 +11,8 @@ from enum import Enum
 from datetime import datetime, date
 import statistics
 
+import numpy as np
+
 logger = logging.getLogger(__name__)
 
 class ScoringMethod(Enum):
@@ -66,7 +68,116 @@ class MeasureScoring:
             logger.error(f"Error calculating score: {e}")
             return {'error': f"Scoring calculation failed: {str(e)}"}
     
-    def _score_proportion_measure(self, population_results: Dict[str, Any], 
+    def merge_population_results(self, partial_results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Merge population results evaluated over disjoint patient partitions (shards).
+
+        Counts and sums add up, observations and patient lists concatenate in partition
+        order, and a population is successful only if every partition evaluated it.
+
+        Args:
+            partial_results: Population results with a 'populations' dict each
+
+        Returns:
+            Population results for the whole population, ready for calculate_score()
+        """
+        merged: Dict[str, Dict[str, Any]] = {}
+        observations = []
+        for partial in partial_results:
+            observations.extend(partial.get('observations', []))
+            for name, population in partial.get('populations', {}).items():
+                target = merged.setdefault(name, {'count': 0})
+                for key, value in population.items():
+                    if key in ('count', 'patient_count', 'sum'):
+                        target[key] = target.get(key, 0) + (value or 0)
+                    elif key in ('matching_patients', 'patients'):
+                        target.setdefault(key, []).extend(value)
+                    elif key == 'evaluation_successful':
+                        target[key] = target.get(key, True) and value
+                    elif key == 'error':
+                        target.setdefault('errors', []).append(value)
+                    else:
+                        target.setdefault(key, value)
+
+        result = {'populations': merged}
+        if observations:
+            result['observations'] = observations
+        return result
+
+    def score_strata(self, strata: Dict[str, Dict[str, Dict[str, int]]],
+                     scoring_method: Union[str, ScoringMethod],
+                     measure_config: Optional[Dict[str, Any]] = None) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """
+        Score every stratum of every stratifier.
+
+        Proportion measures are scored in one vectorized pass over all strata, with
+        the Wilson confidence interval computed per stratum when requested; other
+        scoring methods score each stratum with calculate_score().
+
+        Args:
+            strata: Stratifier -> stratum value -> population name -> member count
+            scoring_method: Scoring method to use
+            measure_config: Additional configuration for scoring
+
+        Returns:
+            Stratifier -> stratum value -> score calculation results
+        """
+        config = measure_config or {}
+        cells = [(stratifier, value, {'populations': {name: {'count': count} for name, count in counts.items()}})
+                 for stratifier, values in strata.items() for value, counts in values.items()]
+        scored: Dict[str, Dict[str, Dict[str, Any]]] = {stratifier: {} for stratifier in strata}
+
+        method = scoring_method.value if isinstance(scoring_method, ScoringMethod) else str(scoring_method).lower()
+        if method != ScoringMethod.PROPORTION.value or not cells:
+            for stratifier, value, population_results in cells:
+                scored[stratifier][value] = self.calculate_score(population_results, scoring_method, config)
+            return scored
+
+        keys = [('numerator', 'Numerator'), ('denominator', 'Denominator'),
+                ('initial_population', 'Initial Population'),
+                ('denominator_exclusion', 'Denominator Exclusion'),
+                ('denominator_exception', 'Denominator Exception'),
+                ('numerator_exclusion', 'Numerator Exclusion')]
+        counts = np.array([[self._get_population_count(population_results['populations'], key, alt_key)
+                            for key, alt_key in keys] for _, _, population_results in cells], dtype=np.int64)
+        numerator, denominator, initial_pop, denom_exclusions, denom_exceptions, num_exclusions = counts.T
+        adjusted_denominator = denominator - denom_exclusions - denom_exceptions
+        adjusted_numerator = numerator - num_exclusions
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scores = np.where(adjusted_denominator != 0, adjusted_numerator / adjusted_denominator, np.nan)
+
+        intervals = None
+        if config.get('calculate_confidence_interval', False):
+            intervals = self._calculate_proportion_confidence_intervals(
+                adjusted_numerator, adjusted_denominator, config.get('confidence_level', 0.95)
+            )
+
+        for index, (stratifier, value, _) in enumerate(cells):
+            score = None if np.isnan(scores[index]) else float(scores[index])
+            percentage = None if score is None else score * 100
+            result = {
+                'scoring_method': 'proportion',
+                'score': score,
+                'percentage': percentage,
+                'populations': {
+                    'initial_population': int(initial_pop[index]),
+                    'denominator': int(denominator[index]),
+                    'denominator_exclusions': int(denom_exclusions[index]),
+                    'denominator_exceptions': int(denom_exceptions[index]),
+                    'adjusted_denominator': int(adjusted_denominator[index]),
+                    'numerator': int(numerator[index]),
+                    'numerator_exclusions': int(num_exclusions[index]),
+                    'adjusted_numerator': int(adjusted_numerator[index])
+                },
+                'performance_rate': percentage,
+                'eligible_population': int(adjusted_denominator[index])
+            }
+            if intervals is not None:
+                result['confidence_interval'] = intervals[index]
+            scored[stratifier][value] = result
+        return scored
+
+    def _score_proportion_measure(self, population_results: Dict[str, Any],
                                  config: Dict[str, Any]) -> Dict[str, Any]:
         """
         Score proportion-based quality measures.
@@ -302,6 +413,39 @@ class MeasureScoring:
             'method': 'wilson'
         }
 
+    def _calculate_proportion_confidence_intervals(self, numerators: np.ndarray, denominators: np.ndarray,
+                                                   confidence_level: float = 0.95) -> List[Dict[str, float]]:
+        """
+        Calculate Wilson score intervals for many proportions at once.
+
+        Vectorized form of _calculate_proportion_confidence_interval(), with the same
+        result per (numerator, denominator) pair.
+        """
+        numerators = np.asarray(numerators, dtype=np.float64)
+        denominators = np.asarray(denominators, dtype=np.float64)
+        z_scores = {0.90: 1.645, 0.95: 1.96, 0.99: 2.576}
+        z = z_scores.get(confidence_level, 1.96)
+
+        scored = denominators != 0
+        n = np.where(scored, denominators, 1.0)
+        p = numerators / n
+        center = (p + z**2/(2*n)) / (1 + z**2/n)
+        margin = z * np.sqrt((p*(1-p) + z**2/(4*n)) / n) / (1 + z**2/n)
+        lower = np.maximum(0, center - margin)
+        upper = np.minimum(1, center + margin)
+
+        return [
+            {
+                'lower': float(lower[index]),
+                'upper': float(upper[index]),
+                'lower_percentage': float(lower[index]) * 100,
+                'upper_percentage': float(upper[index]) * 100,
+                'confidence_level': confidence_level,
+                'method': 'wilson'
+            } if scored[index] else {'lower': 0, 'upper': 0, 'method': 'wilson'}
+            for index in range(len(denominators))
+        ]
+
 class MeasureReport:
     """
     Quality measure report generator.
@@ -0,0 +1,99 @@
+"""
+CQL Measure Stratification - Population counts for all strata in one aggregate query.
+
+Stratifiers (age band, gender, payer) and supplemental data elements partition the
+per-patient population membership relation, one row per patient with a column per
+population that is true when the patient is a member:
+
+    SELECT patient_id, "Initial Population", "Denominator", "Numerator", gender ...
+
+Rather than re-evaluating every population per stratum, the membership relation is
+aggregated once with GROUP BY GROUPING SETS: the empty grouping set gives the overall
+counts and one grouping set per stratifier gives the counts of each of its strata.
+"""
+
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Prefix of the columns holding the value of each grouping
+STRATUM_ALIAS = "fhir4ds_stratum"
+
+
+@dataclass
+class StratifiedCounts:
+    """Overall and per-stratum patient and population member counts."""
+    patient_count: int = 0
+    counts: Dict[str, int] = field(default_factory=dict)
+    # Grouping code -> [(stratum value or None, patient count, column -> member count)]
+    strata: Dict[str, List[Tuple[Optional[str], int, Dict[str, int]]]] = field(default_factory=dict)
+
+
+def member_sql(column: str) -> str:
+    """Membership condition of a population column of the membership relation ``m``."""
+    quoted = column.replace('"', '""')
+    return f'COALESCE(CAST(m."{quoted}" AS BOOLEAN), FALSE)'
+
+
+def stratified_counts_sql(membership_sql: str, member_columns: List[str],
+                          groupings: Dict[str, str]) -> str:
+    """
+    Aggregate over the membership relation ``m`` with one grouping set per grouping.
+
+    Each grouping's value is projected under its own alias, so groupings with the
+    same expression (e.g. a stratifier that is also a supplemental data element)
+    remain separate grouping sets. Each grouping contributes its stratum value and
+    GROUPING() flag; rows are the overall counts (all flags set) followed by the
+    strata of each grouping, NULL stratum last.
+
+    Args:
+        membership_sql: Population membership query
+        member_columns: Population columns to count the members of
+        groupings: Grouping code -> SQL expression over ``m`` (e.g. {"gender": "m.gender"})
+    """
+    keys = [f"{STRATUM_ALIAS}_{index}" for index in range(len(groupings))]
+    selected = [f"m.{key}, GROUPING(m.{key})" for key in keys]
+    selected += ["COUNT(*)"] + [f"SUM(CASE WHEN {member_sql(column)} THEN 1 ELSE 0 END)"
+                                for column in member_columns]
+    if not keys:
+        return f"SELECT {', '.join(selected)} FROM ({membership_sql}) m"
+    projected = ', '.join(f"CAST({expression} AS VARCHAR) AS {key}"
+                          for expression, key in zip(groupings.values(), keys))
+    grouping_sets = ', '.join(['()'] + [f"(m.{key})" for key in keys])
+    order = ', '.join(f"{2 * index + 2} DESC, {2 * index + 1} NULLS LAST" for index in range(len(keys)))
+    return (f"SELECT {', '.join(selected)} FROM (SELECT m.*, {projected} FROM ({membership_sql}) m) m "
+            f"GROUP BY GROUPING SETS ({grouping_sets}) ORDER BY {order}")
+
+
+def stratified_counts(dialect: Any, membership_sql: str, member_columns: List[str],
+                      groupings: Dict[str, str]) -> StratifiedCounts:
+    """
+    Overall and per-stratum counts from a single GROUPING SETS query.
+
+    Args:
+        dialect: Database dialect the membership query runs on
+        membership_sql: Population membership query
+        member_columns: Population columns to count the members of
+        groupings: Grouping code -> SQL expression over the membership relation ``m``
+
+    Returns:
+        StratifiedCounts with every grouping code present (possibly without strata)
+    """
+    codes = list(groupings)
+    rows = dialect.execute_query(stratified_counts_sql(membership_sql, member_columns, groupings))
+    result = StratifiedCounts(strata={code: [] for code in codes})
+    offset = 2 * len(codes)
+    for row in rows or []:
+        patients = int(row[offset] or 0)
+        counts = {column: int(count or 0) for column, count in zip(member_columns, row[offset + 1:])}
+        grouped = [index for index in range(len(codes)) if not row[2 * index + 1]]
+        if not grouped:
+            result.patient_count, result.counts = patients, counts
+        else:
+            value = row[2 * grouped[0]]
+            result.strata[codes[grouped[0]]].append((None if value is None else str(value), patients, counts))
+    logger.debug(f"Counted {sum(len(s) for s in result.strata.values())} strata "
+                 f"over {len(codes)} groupings in one query")
+    return result
@@ -134,6 +134,16 @@ class CQLRetrieveOperation(PipelineOperation[SQLState]):
             return "1=1"  # No filtering
         
         try:
+            # Value sets join the coding index when the datastore maintains one
+            codings_table = self._coding_index_table(input_state, context)
+            if codings_table and self._is_valueset_reference(self.terminology):
+                from ...functions.clinical import TerminologyFunctions
+                terminology = TerminologyFunctions(terminology_client=context.terminology_client)
+                return terminology.in_valueset_rows_sql(
+                    'id', self.terminology, codings_table,
+                    resource_type=self.resource_type, element_paths=[self.code_path]
+                )
+            
             # Check if terminology client has SQL generation method
             if hasattr(context.terminology_client, 'generate_filter_sql'):
                 return context.terminology_client.generate_filter_sql(
@@ -164,6 +174,15 @@ class CQLRetrieveOperation(PipelineOperation[SQLState]):
         """
         json_column = input_state.json_column
         
+        codings_table = self._coding_index_table(input_state, context)
+        if codings_table:
+            # Hash semi-join on the coding index matches any Coding, not just the first
+            from ....datastore.codings import coded_rows_sql
+            rows = coded_rows_sql(codings_table, self.resource_type, [self.code_path], code=self.terminology)
+            text = context.dialect.extract_json_field(json_column, f'$.{self.code_path}.text')
+            escaped = self.terminology.replace("'", "''")
+            return f"id IN ({rows}) OR {text} = '{escaped}'"
+        
         if context.dialect.name.upper() == 'DUCKDB':
             return f"""
             json_extract({json_column}, '$.{self.code_path}.coding[0].code') = '{self.terminology}'
@@ -175,6 +194,20 @@ class CQLRetrieveOperation(PipelineOperation[SQLState]):
             OR ({json_column} -> '{self.code_path}' ->> 'text') = '{self.terminology}'
             """
     
+    @staticmethod
+    def _coding_index_table(input_state: SQLState, context: ExecutionContext) -> Optional[str]:
+        """Coding index table of the retrieved resource table, if one is maintained."""
+        from ....datastore.codings import coding_index_table
+        return coding_index_table(context.dialect, input_state.base_table)
+    
+    @staticmethod
+    def _is_valueset_reference(terminology: str) -> bool:
+        """Whether the retrieve terminology names a value set (canonical URL or OID)."""
+        if terminology.startswith(('http://', 'https://', 'urn:oid:')):
+            return True
+        parts = terminology.split('.')
+        return len(parts) > 2 and all(part.isdigit() for part in parts)
+    
     def _build_retrieve_sql(self, input_state: SQLState, filter_condition: str,
                            context: ExecutionContext) -> str:
         """
@@ -7,8 +7,28 @@ This module provides handlers for FHIR resources commonly used with CQL:
 - Workflow engine for integrated CQL execution
 """
 
-from .library_handler import FHIRLibraryHandler
-from .parameters_handler import ParametersHandler
-from .workflow_engine import CQLWorkflowEngine
+import importlib
 
-__all__ = ['FHIRLibraryHandler', 'ParametersHandler', 'CQLWorkflowEngine']
\ No newline at end of file
+# Imported on first attribute access, so the MeasureReport modules can be used
+# without loading the workflow engine and the CTE pipeline
+_LAZY_IMPORTS = {
+    "FHIRLibraryHandler": ".library_handler",
+    "ParametersHandler": ".parameters_handler",
+    "CQLWorkflowEngine": ".workflow_engine",
+}
+
+
+def __getattr__(name):
+    """Import public attributes on first access (PEP 562)."""
+    if name not in _LAZY_IMPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY_IMPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
+
+__all__ = ['FHIRLibraryHandler', 'ParametersHandler', 'CQLWorkflowEngine']
@@ -368,14 +368,15 @@ class SubjectListMeasureReport(FHIRMeasureReport):
     
     def add_stratification(self, 
                           stratifier_code: str,
-                          stratum_value: str,
+                          stratum_value: Optional[str],
                           population_results: Dict[str, int]) -> None:
         """
         Add stratification results.
         
         Args:
             stratifier_code: Code identifying the stratifier (e.g., 'gender', 'age-group')
-            stratum_value: Value for this stratum (e.g., 'male', '18-65')
+            stratum_value: Value for this stratum (e.g., 'male', '18-65'); None for the
+                stratum of subjects without a value
             population_results: Population counts for this stratum
         """
         # Ensure we have at least one group
@@ -413,8 +414,10 @@ class SubjectListMeasureReport(FHIRMeasureReport):
                 "count": count
             })
         
-        stratum = {
-            "value": {
+        if stratum_value is None:
+            value = {"text": "null"}
+        else:
+            value = {
                 "coding": [
                     {
                         "system": "http://example.org/stratifier-values",
@@ -422,7 +425,9 @@ class SubjectListMeasureReport(FHIRMeasureReport):
                         "display": stratum_value.replace('-', ' ').title()
                     }
                 ]
-            },
+            }
+        stratum = {
+            "value": value,
             "population": stratum_populations
         }
         
@@ -451,6 +451,31 @@ class MeasureReportGenerator:
         else:
             return reports
     
+    def write_reports(self, dialect: Any, membership_sql: str, output: Any,
+                      stratifiers: Optional[Dict[str, str]] = None) -> int:
+        """
+        Stream MeasureReports computed in SQL from a per-patient membership query to a
+        file, without collecting per-patient results in Python.
+        
+        Individual-only configurations without bundle output are written as NDJSON, all
+        others as a Bundle JSON document (see sql_measure_report.SQLMeasureReportGenerator).
+        
+        Args:
+            dialect: Database dialect the membership query runs on
+            membership_sql: Query with patient_id and one boolean column per population define
+            output: File path or writable text stream
+            stratifiers: Stratifier code -> SQL expression over the membership relation ``m``
+            
+        Returns:
+            Number of reports (NDJSON) or Bundle entries written
+        """
+        from .sql_measure_report import SQLMeasureReportGenerator
+        
+        generator = SQLMeasureReportGenerator(self.config, dialect)
+        if self.config.is_individual_report_enabled() and not self.config.requires_bundle_output():
+            return generator.write_individual_reports(membership_sql, output)
+        return generator.write_bundle(membership_sql, output, stratifiers)
+    
     def _create_bundle(self, reports: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Create Bundle resource containing MeasureReports."""
         from .fhir_measure_report import Bundle
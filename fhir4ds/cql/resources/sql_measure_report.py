@@ -0,0 +1,280 @@
+"""
+SQL MeasureReport Generator - Streams MeasureReports from a per-patient membership query.
+
+The dictionary-based generators (measure_report_generator.py) walk per-patient CQL
+results in Python. This generator instead takes the population membership
+relation as SQL, one row per patient:
+
+    SELECT patient_id, "Initial Population", "Denominator", "Numerator" ...
+
+(the shape of the CTE pipeline's monolithic query), with a column per define that
+is true when the patient is in the population. Population counts and stratum
+counts come from one GROUP BY GROUPING SETS aggregate (measures/stratification.py);
+subject lists and individual reports are written from cursor batches
+(dialect.stream_query), so no more than one batch of patients is held in Python:
+
+- write_individual_reports(): one individual MeasureReport per line (NDJSON)
+- write_bundle(): a Bundle JSON document with the subject-list MeasureReport, a
+  List resource per population when subject details are configured, and the
+  individual reports when configured
+"""
+
+import json
+import logging
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, IO, Iterator, List, Optional, TYPE_CHECKING, Tuple, Union
+
+from ...datastore.result import STREAM_BATCH_SIZE
+from ..measures.stratification import StratifiedCounts, member_sql, stratified_counts
+from .fhir_measure_report import Bundle, FHIRReference, IndividualMeasureReport, SubjectListMeasureReport
+from .measure_report_generator import SubjectListMeasureReportGenerator
+
+if TYPE_CHECKING:
+    from .measure_report_config import MeasureReportConfig
+
+logger = logging.getLogger(__name__)
+
+Output = Union[str, Path, IO[str]]
+
+
+class SQLMeasureReportGenerator:
+    """
+    Generates MeasureReports from a population membership query.
+
+    Columns of the membership query are mapped to population types with
+    MeasureReportConfig.get_population_type(); unmapped columns (other than
+    patient_id) are ignored unless used by a stratifier.
+    """
+
+    def __init__(self, config: 'MeasureReportConfig', dialect: Any, batch_size: int = STREAM_BATCH_SIZE):
+        """
+        Initialize the generator.
+
+        Args:
+            config: MeasureReport configuration
+            dialect: Database dialect the membership query runs on
+            batch_size: Rows fetched from the cursor per batch
+        """
+        self.config = config
+        self.dialect = dialect
+        self.batch_size = batch_size
+        self._report_helpers = SubjectListMeasureReportGenerator(config)
+
+    def population_columns(self, membership_sql: str) -> Dict[str, str]:
+        """Membership query column -> FHIR population type, in column order."""
+        description, batches = self.dialect.stream_query(f"SELECT * FROM ({membership_sql}) m LIMIT 0", 1)
+        for _ in batches:
+            pass
+        populations = {}
+        for column in (desc[0] for desc in description or []):
+            population_type = self.config.get_population_type(column)
+            if population_type and population_type not in populations.values():
+                populations[column] = population_type
+        return populations
+
+    def measure_counts(self, membership_sql: str, stratifiers: Optional[Dict[str, str]] = None,
+                       populations: Optional[Dict[str, str]] = None) -> StratifiedCounts:
+        """
+        Overall and per-stratum counts, keyed by population type, from one GROUPING SETS query.
+
+        Args:
+            membership_sql: Population membership query
+            stratifiers: Stratifier code -> SQL expression over the membership relation
+                ``m`` (e.g. {"gender": "m.gender"})
+            populations: Column -> population type (default: population_columns())
+        """
+        populations = populations if populations is not None else self.population_columns(membership_sql)
+        counts = stratified_counts(self.dialect, membership_sql, list(populations), stratifiers or {})
+
+        def by_type(column_counts: Dict[str, int]) -> Dict[str, int]:
+            return {populations[column]: count for column, count in column_counts.items()}
+
+        return StratifiedCounts(
+            patient_count=counts.patient_count,
+            counts=by_type(counts.counts),
+            strata={code: [(value, patients, by_type(stratum)) for value, patients, stratum in strata]
+                    for code, strata in counts.strata.items()}
+        )
+
+    def population_counts(self, membership_sql: str,
+                          populations: Optional[Dict[str, str]] = None) -> Tuple[int, Dict[str, int]]:
+        """
+        Patient count and population type -> member count, from one aggregate query.
+        """
+        counts = self.measure_counts(membership_sql, populations=populations)
+        return counts.patient_count, counts.counts
+
+    def stratum_counts(self, membership_sql: str, stratifiers: Dict[str, str],
+                       populations: Optional[Dict[str, str]] = None
+                       ) -> Dict[str, List[Tuple[Optional[str], Dict[str, int]]]]:
+        """
+        Per stratifier, (stratum value, population type -> member count) for every stratum;
+        the value is None for patients without one.
+
+        All stratifiers are counted by the same GROUPING SETS query (see measure_counts()).
+        """
+        strata = self.measure_counts(membership_sql, stratifiers, populations).strata
+        return {code: [(value, counts) for value, _, counts in code_strata] for code, code_strata in strata.items()}
+
+    def subject_list_report(self, membership_sql: str, stratifiers: Optional[Dict[str, str]] = None,
+                            populations: Optional[Dict[str, str]] = None,
+                            counts: Optional[StratifiedCounts] = None) -> SubjectListMeasureReport:
+        """Subject-list MeasureReport with counts, measure score and strata computed in SQL."""
+        populations = populations if populations is not None else self.population_columns(membership_sql)
+        if counts is None:
+            counts = self.measure_counts(membership_sql, stratifiers, populations)
+
+        report = SubjectListMeasureReport(
+            measure=self._measure_reference(),
+            status=self.config.status,
+            period=self._report_helpers._create_period() if self.config.reporting_period else None,
+            improvementNotation=self._report_helpers._create_improvement_notation()
+            if self.config.improvement_notation else None
+        )
+        for population_type, count in counts.counts.items():
+            report.add_population_result(population_type, count)
+            if self.config.include_subject_details and count:
+                report.group[0].population[-1].subjectResults = FHIRReference(
+                    reference=f"List/{self._subject_list_id(report, population_type)}",
+                    display=f"{count} subjects"
+                )
+        self._report_helpers._add_measure_scores(report, counts.counts)
+
+        for code, strata in counts.strata.items():
+            for value, _, stratum_counts in strata:
+                report.add_stratification(code, value, stratum_counts)
+        return report
+
+    def write_individual_reports(self, membership_sql: str, output: Output) -> int:
+        """
+        Write one individual MeasureReport per patient as NDJSON.
+
+        Returns:
+            Number of reports written
+        """
+        populations = self.population_columns(membership_sql)
+        written = 0
+        with self._open_output(output) as stream:
+            for report in self._individual_reports(membership_sql, populations):
+                stream.write(json.dumps(report, separators=(',', ':')))
+                stream.write('\n')
+                written += 1
+        logger.info(f"Streamed {written} individual MeasureReports")
+        return written
+
+    def write_bundle(self, membership_sql: str, output: Output,
+                     stratifiers: Optional[Dict[str, str]] = None) -> int:
+        """
+        Write a Bundle JSON document with the configured reports.
+
+        Entries are the subject-list MeasureReport (if enabled), followed by a List of
+        the member patients per population (if subject details are enabled), followed
+        by the individual MeasureReports (if enabled). Lists and individual reports
+        are written while rows are read from the cursor.
+
+        Returns:
+            Number of Bundle entries written
+        """
+        populations = self.population_columns(membership_sql)
+        measure_counts = self.measure_counts(membership_sql, stratifiers, populations)
+        patient_count, counts = measure_counts.patient_count, measure_counts.counts
+
+        summary = None
+        if self.config.is_subject_list_report_enabled():
+            summary = self.subject_list_report(membership_sql, stratifiers, populations, measure_counts)
+        subject_lists = []
+        if summary is not None and self.config.include_subject_details:
+            subject_lists = [(column, population_type) for column, population_type in populations.items()
+                             if counts[population_type]]
+        individual_count = patient_count if self.config.is_individual_report_enabled() else 0
+
+        bundle = Bundle(type=self.config.bundle_type)
+        bundle.total = (summary is not None) + len(subject_lists) + individual_count
+        written = 0
+        with self._open_output(output) as stream:
+            self._write_open(stream, bundle.to_dict(), 'entry')
+            if summary is not None:
+                self._write_entry(stream, summary.to_dict(), written)
+                written += 1
+            for column, population_type in subject_lists:
+                stream.write(',' if written else '')
+                self._write_subject_list(stream, membership_sql, column, self._subject_list_id(summary, population_type))
+                written += 1
+            if individual_count:
+                for report in self._individual_reports(membership_sql, populations):
+                    self._write_entry(stream, report, written)
+                    written += 1
+            stream.write(']}')
+        logger.info(f"Streamed Bundle with {written} entries for {patient_count} patients")
+        return written
+
+    def _individual_reports(self, membership_sql: str, populations: Dict[str, str]) -> Iterator[Dict[str, Any]]:
+        """Individual MeasureReport dictionaries built from membership rows, one batch at a time."""
+        date = datetime.now().isoformat()
+        period = self._report_helpers._create_period() if self.config.reporting_period else None
+        notation = self._report_helpers._create_improvement_notation() if self.config.improvement_notation else None
+        members = ', '.join(f"CASE WHEN {member_sql(column)} THEN 1 ELSE 0 END" for column in populations)
+        sql = f"SELECT m.patient_id{', ' + members if members else ''} FROM ({membership_sql}) m ORDER BY m.patient_id"
+
+        _, batches = self.dialect.stream_query(sql, self.batch_size)
+        for batch in batches:
+            for row in batch:
+                report = IndividualMeasureReport(
+                    patient_reference=f"Patient/{row[0]}",
+                    measure=self._measure_reference(),
+                    status=self.config.status,
+                    date=date,
+                    period=period,
+                    improvementNotation=notation
+                )
+                for population_type, member in zip(populations.values(), row[1:]):
+                    report.add_population_result(population_type, int(member))
+                if self.config.include_evaluated_resources:
+                    report.add_evaluated_resource(f"Patient/{row[0]}")
+                yield report.to_dict()
+
+    def _write_subject_list(self, stream: IO[str], membership_sql: str, column: str, list_id: str) -> None:
+        """Write one Bundle entry holding a List of the members of a population."""
+        list_resource = {"resourceType": "List", "id": list_id, "status": "current", "mode": "snapshot"}
+        stream.write(f'{{"fullUrl":"List/{list_id}","resource":')
+        self._write_open(stream, list_resource, 'entry')
+        sql = (f"SELECT m.patient_id FROM ({membership_sql}) m "
+               f"WHERE {member_sql(column)} ORDER BY m.patient_id")
+        _, batches = self.dialect.stream_query(sql, self.batch_size)
+        first = True
+        for batch in batches:
+            items = ','.join(json.dumps({"item": {"reference": f"Patient/{row[0]}"}}) for row in batch)
+            if items:
+                stream.write(items if first else ',' + items)
+                first = False
+        stream.write(']}}')
+
+    @staticmethod
+    def _write_entry(stream: IO[str], resource: Dict[str, Any], index: int) -> None:
+        entry = {"fullUrl": f"{resource['resourceType']}/{resource['id']}", "resource": resource}
+        stream.write((',' if index else '') + json.dumps(entry, separators=(',', ':')))
+
+    @staticmethod
+    def _write_open(stream: IO[str], obj: Dict[str, Any], array_key: str) -> None:
+        """Write a JSON object up to an opened array under array_key (closed by the caller with ']}')."""
+        obj = {key: value for key, value in obj.items() if key != array_key}
+        stream.write(json.dumps(obj, separators=(',', ':'))[:-1] + f',"{array_key}":[')
+
+    @contextmanager
+    def _open_output(self, output: Output) -> Iterator[IO[str]]:
+        if hasattr(output, 'write'):
+            yield output
+            return
+        output_path = Path(output)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(output_path, 'w', encoding='utf-8') as stream:
+            yield stream
+
+    def _measure_reference(self) -> str:
+        return self.config.measure_reference or "Measure/unknown"
+
+    @staticmethod
+    def _subject_list_id(report: SubjectListMeasureReport, population_type: str) -> str:
+        return f"subjects-{population_type}-{report.id}"
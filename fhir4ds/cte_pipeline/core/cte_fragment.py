@@ -8,12 +8,19 @@ A CTEFragment represents a single CTE that corresponds to one CQL define stateme
 containing all the information needed to generate optimized SQL for both DuckDB and PostgreSQL.
 """
 
-from dataclasses import dataclass, field
-from typing import List, Optional, Dict, Any
+from dataclasses import dataclass, field, replace
+from typing import Callable, List, Optional, Dict, Any, Set
 import logging
+import re
+
+from ...datastore.compartments import PATIENT_COMPARTMENT_REFERENCES
+from ...dialects.base import decide_cte_materialization
 
 logger = logging.getLogger(__name__)
 
+# Single-quoted SQL string literal ('' escapes a quote), e.g. 'conds' or '$.denominator'
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+
 
 @dataclass(frozen=True)
 class CTEFragment:
@@ -49,6 +56,9 @@ class CTEFragment:
     define_name: str = ""               # Original CQL define name
     result_type: str = "boolean"        # Expected result type (boolean, integer, etc.)
     
+    # Materialization hint from the dependency graph (None = let the planner decide)
+    materialized: Optional[bool] = None
+    
     def to_sql(self, dialect: str) -> str:
         """
         Generate SQL for this CTE fragment using existing dialect patterns.
@@ -76,8 +86,11 @@ class CTEFragment:
             where_clause = f"WHERE {' AND '.join(self.where_conditions)}"
         
         # Build complete CTE
+        hint = ""
+        if self.materialized is not None:
+            hint = "MATERIALIZED " if self.materialized else "NOT MATERIALIZED "
         cte_sql = f"""
-        {self.name} AS (
+        {self.name} AS {hint}(
             SELECT {select_clause}
             FROM {self.from_clause}
             {where_clause}
@@ -86,6 +99,25 @@ class CTEFragment:
         logger.debug(f"Generated CTE SQL for {self.name}: {len(cte_sql)} characters")
         return cte_sql.strip()
     
+    def get_body_sql(self, dialect: str) -> str:
+        """SQL of the CTE body alone, e.g. for EXPLAIN row estimates."""
+        cte_sql = replace(self, materialized=None).to_sql(dialect)
+        return cte_sql[cte_sql.index('(') + 1:cte_sql.rindex(')')].strip()
+    
+    def referenced_ctes(self, cte_names: Set[str]) -> Set[str]:
+        """
+        Names from ``cte_names`` this fragment reads: its declared dependencies
+        plus any CTE named in its FROM, WHERE or SELECT SQL outside string literals.
+        """
+        referenced = set(self.dependencies) & cte_names
+        sql_text = ' '.join([self.from_clause, *self.where_conditions, *self.select_fields])
+        sql_text = _STRING_LITERAL.sub(' ', sql_text)
+        for token in re.findall(r'[A-Za-z_][A-Za-z0-9_]*', sql_text):
+            if token in cte_names:
+                referenced.add(token)
+        referenced.discard(self.name)
+        return referenced
+    
     def get_patient_id_sql(self, dialect: str) -> str:
         """
         Get patient ID extraction SQL using existing patterns from workflow_engine.py.
@@ -108,17 +140,16 @@ class CTEFragment:
             else:  # PostgreSQL
                 return "jsonb_extract_path_text(resource, 'id')"
         else:
-            # Subject reference extraction (existing pattern for all other resources)
+            # Patient reference element of the resource type (subject, patient, beneficiary ...)
+            fields = PATIENT_COMPARTMENT_REFERENCES.get(self.resource_type, ('subject',))
             if dialect_upper == 'DUCKDB':
-                return """CASE 
-                    WHEN json_extract_string(resource, '$.subject.reference') LIKE 'Patient/%'
-                    THEN REPLACE(json_extract_string(resource, '$.subject.reference'), 'Patient/', '')
-                    ELSE NULL
-                END"""
+                references = [f"json_extract_string(resource, '$.{f}.reference')" for f in fields]
             else:  # PostgreSQL
-                return """CASE 
-                    WHEN jsonb_extract_path_text(resource, 'subject', 'reference') LIKE 'Patient/%'
-                    THEN REPLACE(jsonb_extract_path_text(resource, 'subject', 'reference'), 'Patient/', '')
+                references = [f"jsonb_extract_path_text(resource, '{f}', 'reference')" for f in fields]
+            reference = references[0] if len(references) == 1 else f"COALESCE({', '.join(references)})"
+            return f"""CASE 
+                    WHEN {reference} LIKE 'Patient/%'
+                    THEN SUBSTR({reference}, 9)
                     ELSE NULL
                 END"""
     
@@ -283,4 +314,40 @@ class CTEFragment:
         select_fields = [f"{patient_id_sql} as patient_id", "true as result"]
         object.__setattr__(fragment, 'select_fields', select_fields)
         
-        return fragment
\ No newline at end of file
+        return fragment
+
+
+def plan_cte_materialization(fragments: List[CTEFragment],
+                             estimate_rows: Optional[Callable[[CTEFragment], Optional[int]]] = None
+                             ) -> List[CTEFragment]:
+    """
+    Set each fragment's materialization hint from the dependency graph.
+
+    A fragment's reference count is the number of other fragments that read it
+    plus one for the monolithic query's final SELECT, which reads every define.
+    Shared CTEs (such as the patient population) are materialized and computed
+    once; single-use CTEs are inlined. ``estimate_rows`` optionally returns an
+    EXPLAIN row estimate for a shared fragment (see
+    ``DatabaseDialect.estimate_row_count``); very large ones get no hint.
+
+    Args:
+        fragments: CTE fragments of one monolithic query
+        estimate_rows: Optional callable returning a row estimate per fragment
+
+    Returns:
+        Fragments (copies) with ``materialized`` set, in the original order
+    """
+    names = {fragment.name for fragment in fragments}
+    reference_counts = {name: 1 for name in names}
+    for fragment in fragments:
+        for referenced in fragment.referenced_ctes(names):
+            reference_counts[referenced] += 1
+
+    planned = []
+    for fragment in fragments:
+        count = reference_counts[fragment.name]
+        rows = estimate_rows(fragment) if estimate_rows and count >= 2 else None
+        decision = decide_cte_materialization(count, rows)
+        logger.debug(f"CTE {fragment.name}: {count} references, ~{rows} rows, materialized={decision}")
+        planned.append(replace(fragment, materialized=decision))
+    return planned
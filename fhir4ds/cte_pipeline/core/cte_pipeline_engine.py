@@ -22,9 +22,14 @@ import logging
 import time
 from datetime import datetime
 
-from .cte_fragment import CTEFragment
+from .cte_fragment import CTEFragment, plan_cte_materialization
 from .cql_to_cte_converter import CQLToCTEConverter
 from ..builders.cte_query_builder import CTEQueryBuilder, CompiledCTEQuery
+from ...dialects.profiles import profile_scope
+from ...utils.tracing import (
+    span, SPAN_PARSE, SPAN_COMPILE, SPAN_SQL_GENERATION, SPAN_DB_EXECUTE, SPAN_FETCH, SPAN_FORMAT,
+    ATTR_SQL_LENGTH, ATTR_ROW_COUNT, ATTR_DIALECT
+)
 
 logger = logging.getLogger(__name__)
 
@@ -102,7 +107,9 @@ class CTEPipelineEngine:
     def __init__(self, 
                  dialect: str,
                  database_connection: Any,
-                 terminology_client: Optional[Any] = None):
+                 terminology_client: Optional[Any] = None,
+                 estimate_cte_rows: bool = False,
+                 define_scheduler: Optional[Any] = None):
         """
         Initialize CTE Pipeline Engine.
         
@@ -110,10 +117,16 @@ class CTEPipelineEngine:
             dialect: Database dialect ('duckdb' or 'postgresql')
             database_connection: Database connection object
             terminology_client: Optional terminology service client
+            estimate_cte_rows: Use EXPLAIN row estimates in CTE materialization decisions
+            define_scheduler: Optional fhir4ds.cql.core.define_scheduler.DefineScheduler; when
+                the monolithic query fails, its CTEs then run as a dependency DAG of separate
+                queries, independent ones concurrently
         """
         self.dialect = dialect.upper()
         self.database_connection = database_connection
         self.terminology_client = terminology_client
+        self.estimate_cte_rows = estimate_cte_rows
+        self.define_scheduler = define_scheduler
         
         # Initialize core components
         self.cql_converter = CQLToCTEConverter(dialect, terminology_client)
@@ -134,7 +147,9 @@ class CTEPipelineEngine:
     def execute_cql_library(self, 
                            library_content: str,
                            library_id: str,
-                           context: Optional[ExecutionContext] = None) -> ExecutionResult:
+                           context: Optional[ExecutionContext] = None,
+                           parallel: Optional[Any] = None,
+                           profile: Optional[str] = None) -> ExecutionResult:
         """
         Execute complete CQL library using monolithic CTE approach.
         
@@ -145,6 +160,11 @@ class CTEPipelineEngine:
             library_content: Complete CQL library text
             library_id: Unique library identifier
             context: Optional execution context
+            parallel: Optional fhir4ds.cql.core.parallel.BucketedExecutor; the monolithic
+                query then runs per patient bucket on worker processes instead of on
+                database_connection
+            profile: Optional execution profile (e.g. 'batch') applied to database_connection
+                while the monolithic query runs; previous settings are restored afterwards
             
         Returns:
             ExecutionResult with comprehensive results from single query
@@ -158,26 +178,44 @@ class CTEPipelineEngine:
         
         try:
             # Phase 1: Parse CQL and extract define statements
-            define_statements = self._extract_define_statements(library_content)
+            with span(SPAN_PARSE, {"fhir4ds.component": "cte_pipeline", "fhir4ds.library_id": library_id}):
+                define_statements = self._extract_define_statements(library_content)
             logger.debug(f"Extracted {len(define_statements)} define statements from library")
             
             # Phase 2: Convert CQL defines to CTE fragments
-            cte_fragments = self._convert_defines_to_ctes(define_statements, context)
+            with span(SPAN_COMPILE, {"fhir4ds.component": "cte_pipeline",
+                                     "fhir4ds.defines": len(define_statements)}):
+                cte_fragments = self._convert_defines_to_ctes(define_statements, context)
             logger.debug(f"Converted {len(cte_fragments)} CQL defines to CTE fragments")
             
             # Phase 3: Build monolithic query
-            compiled_query = self._build_monolithic_query(define_statements, cte_fragments)
+            with span(SPAN_SQL_GENERATION, {"fhir4ds.component": "cte_pipeline"}) as sql_span:
+                compiled_query = self._build_monolithic_query(define_statements, cte_fragments)
+                sql_span.set_attributes({ATTR_SQL_LENGTH: len(compiled_query.main_sql),
+                                         "fhir4ds.ctes": len(compiled_query.fragments)})
             logger.info(f"Built monolithic query with {len(compiled_query.fragments)} CTEs")
             
             # Phase 4: Execute single comprehensive query
-            execution_results = self._execute_monolithic_query(compiled_query, context)
+            if parallel is not None:
+                execution_results = self._execute_monolithic_query_parallel(compiled_query, parallel)
+            else:
+                with profile_scope(self.database_connection, self.dialect, profile):
+                    try:
+                        execution_results = self._execute_monolithic_query(compiled_query, context)
+                    except Exception as e:
+                        if self.define_scheduler is None:
+                            raise
+                        logger.warning(f"Monolithic query failed ({e}); running its CTEs as a define DAG")
+                        execution_results = self._execute_fragments_scheduled(compiled_query)
             
             # Phase 5: Process and format results
             total_execution_time = time.time() - start_time
-            result = self._format_execution_results(
-                library_id, define_statements, execution_results, 
-                compiled_query, total_execution_time, context
-            )
+            with span(SPAN_FORMAT, {"fhir4ds.component": "cte_pipeline",
+                                    ATTR_ROW_COUNT: len(execution_results)}):
+                result = self._format_execution_results(
+                    library_id, define_statements, execution_results, 
+                    compiled_query, total_execution_time, context
+                )
             
             # Update execution statistics
             self._update_execution_stats(result)
@@ -302,6 +340,11 @@ class CTEPipelineEngine:
         Returns:
             Compiled monolithic query ready for execution
         """
+        # Materialize shared CTEs once, inline single-use ones
+        cte_fragments = plan_cte_materialization(
+            cte_fragments, self._estimate_fragment_rows if self.estimate_cte_rows else None
+        )
+        
         # Add all fragments to query builder
         for fragment in cte_fragments:
             self.query_builder.add_fragment(fragment)
@@ -336,17 +379,21 @@ class CTEPipelineEngine:
         try:
             # Execute single comprehensive query
             cursor = self.database_connection.cursor()
-            cursor.execute(compiled_query.main_sql)
-            results = cursor.fetchall()
-            
-            # Get column names
-            column_names = [desc[0] for desc in cursor.description]
-            
-            # Convert to dictionaries
-            formatted_results = []
-            for row in results:
-                row_dict = dict(zip(column_names, row))
-                formatted_results.append(row_dict)
+            with span(SPAN_DB_EXECUTE, {ATTR_DIALECT: self.dialect.lower(),
+                                        ATTR_SQL_LENGTH: len(compiled_query.main_sql)}):
+                cursor.execute(compiled_query.main_sql)
+            with span(SPAN_FETCH) as fetch_span:
+                results = cursor.fetchall()
+                
+                # Get column names
+                column_names = [desc[0] for desc in cursor.description]
+                
+                # Convert to dictionaries
+                formatted_results = []
+                for row in results:
+                    row_dict = dict(zip(column_names, row))
+                    formatted_results.append(row_dict)
+                fetch_span.set_attribute(ATTR_ROW_COUNT, len(formatted_results))
             
             logger.info(f"Monolithic query returned {len(formatted_results)} results")
             return formatted_results
@@ -355,6 +402,71 @@ class CTEPipelineEngine:
             logger.error(f"Failed to execute monolithic query: {str(e)}")
             raise
     
+    def _execute_monolithic_query_parallel(self, compiled_query: CompiledCTEQuery,
+                                           executor: Any) -> List[Dict[str, Any]]:
+        """
+        Execute the monolithic CTE query once per patient bucket on worker processes.
+        
+        Each worker sees only its bucket's patients, so the per-bucket rows partition
+        the single-connection result; the executor merges them ordered by patient_id.
+        """
+        logger.info(f"Executing monolithic query with {len(compiled_query.fragments)} CTEs "
+                    f"over {executor.buckets} patient buckets")
+        with span(SPAN_DB_EXECUTE, {ATTR_DIALECT: self.dialect.lower(),
+                                    ATTR_SQL_LENGTH: len(compiled_query.main_sql),
+                                    "fhir4ds.buckets": executor.buckets}) as execute_span:
+            results = executor.execute(compiled_query.main_sql)
+            execute_span.set_attribute(ATTR_ROW_COUNT, len(results))
+        return results
+    
+    def _execute_fragments_scheduled(self, compiled_query: CompiledCTEQuery) -> List[Dict[str, Any]]:
+        """
+        Execute the monolithic query's CTEs as separate queries with the define scheduler.
+
+        Each CTE body runs once its upstream CTEs are available, shared CTEs are
+        materialized once, and the per-define (patient_id, result) rows are merged
+        into the monolithic query's row shape: one row per patient with a column
+        per define. A define with several rows for a patient is aggregated: boolean
+        defines are true if any row is, others get the list of their results.
+        """
+        fragments = {fragment.name: fragment for fragment in compiled_query.fragments}
+        names = set(fragments)
+        scheduled = self.define_scheduler.run(
+            {name: fragment.get_body_sql(self.dialect) for name, fragment in fragments.items()},
+            {name: fragment.referenced_ctes(names) for name, fragment in fragments.items()},
+            relation_names={name: name for name in fragments}
+        )
+        summary = scheduled.get_summary()
+        logger.info(f"Scheduled {summary['defines']} CTEs in {summary['wall_seconds']:.3f}s "
+                    f"(critical path {' -> '.join(summary['critical_path'])}: "
+                    f"{summary['critical_path_seconds']:.3f}s)")
+        if scheduled.errors:
+            raise RuntimeError(f"Scheduled CTE execution failed: {scheduled.errors}")
+
+        results_by_patient: Dict[Any, Dict[str, List[Any]]] = {}
+        for name, rows in scheduled.define_results.items():
+            define_name = fragments[name].define_name
+            if not define_name:
+                continue
+            for row in rows:
+                patient_results = results_by_patient.setdefault(row.get('patient_id'), {})
+                patient_results.setdefault(define_name, []).append(row.get('result'))
+
+        boolean_defines = {fragment.define_name for fragment in fragments.values()
+                           if fragment.result_type in ('boolean', 'population')}
+        merged_rows = []
+        for patient_id, patient_results in results_by_patient.items():
+            merged = {'patient_id': patient_id}
+            for define_name, values in patient_results.items():
+                if len(values) == 1:
+                    merged[define_name] = values[0]
+                elif define_name in boolean_defines:
+                    merged[define_name] = any(bool(value) for value in values)
+                else:
+                    merged[define_name] = values
+            merged_rows.append(merged)
+        return merged_rows
+    
     def _format_execution_results(self, 
                                  library_id: str,
                                  define_statements: Dict[str, str],
@@ -423,6 +535,21 @@ class CTEPipelineEngine:
             successful_defines=len([d for d in define_results.values() if d])
         )
     
+    def _estimate_fragment_rows(self, fragment: CTEFragment) -> Optional[int]:
+        """
+        EXPLAIN row estimate for a fragment that reads only base tables.
+        
+        Fragments reading other CTEs cannot be explained on their own and
+        return None, as does any EXPLAIN failure.
+        """
+        if fragment.dependencies:
+            return None
+        if self.dialect == 'POSTGRESQL':
+            from ...dialects.postgresql import PostgreSQLDialect as dialect_class
+        else:
+            from ...dialects.duckdb import DuckDBDialect as dialect_class
+        return dialect_class.explain_row_count(self.database_connection, fragment.get_body_sql(self.dialect))
+    
     def _create_fallback_fragment(self, define_name: str, cql_expression: str) -> CTEFragment:
         """
         Create fallback CTE fragment for failed conversions.
@@ -500,7 +627,8 @@ class CTEPipelineEngine:
 
 def create_cte_pipeline_engine(dialect: str, 
                               database_connection: Any,
-                              terminology_client: Optional[Any] = None) -> CTEPipelineEngine:
+                              terminology_client: Optional[Any] = None,
+                              estimate_cte_rows: bool = False) -> CTEPipelineEngine:
     """
     Factory function to create CTE Pipeline Engine.
     
@@ -508,6 +636,7 @@ def create_cte_pipeline_engine(dialect: str,
         dialect: Database dialect ('duckdb' or 'postgresql')
         database_connection: Database connection object
         terminology_client: Optional terminology service client
+        estimate_cte_rows: Use EXPLAIN row estimates in CTE materialization decisions
         
     Returns:
         Configured CTE Pipeline Engine ready for use
@@ -515,5 +644,6 @@ def create_cte_pipeline_engine(dialect: str,
     return CTEPipelineEngine(
         dialect=dialect,
         database_connection=database_connection,
-        terminology_client=terminology_client
+        terminology_client=terminology_client,
+        estimate_cte_rows=estimate_cte_rows
     )
\ No newline at end of file
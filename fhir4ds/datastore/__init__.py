@@ -9,11 +9,35 @@ Centralized data management for FHIR analytics including:
 - Result formatting (ResultFormatter)
 """
 
-from .core import FHIRDataStore
-from .result import QueryResult
-from .connections import QuickConnect, ConnectedDatabase
-from .batch import BatchProcessor, BatchResult, BatchSummary, create_batch_processor
-from .formatters import ResultFormatter
+import importlib
+
+# Submodules are imported on first attribute access; connections pulls in
+# ViewRunner and the FHIRPath pipeline, formatters the export libraries.
+_LAZY_IMPORTS = {
+    "FHIRDataStore": ".core",
+    "QueryResult": ".result",
+    "QuickConnect": ".connections",
+    "ConnectedDatabase": ".connections",
+    "BatchProcessor": ".batch",
+    "BatchResult": ".batch",
+    "BatchSummary": ".batch",
+    "create_batch_processor": ".batch",
+    "ResultFormatter": ".formatters",
+}
+
+
+def __getattr__(name):
+    """Import public attributes on first access (PEP 562)."""
+    if name not in _LAZY_IMPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY_IMPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
 
 __all__ = [
     # Core classes
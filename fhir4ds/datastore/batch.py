@@ -7,16 +7,22 @@ Includes utilities for:
 - Progress monitoring with real-time updates
 - Error handling and recovery
 - Result aggregation and analysis
+- Fused execution that scans each resource type once for all of its views
 """
 
 import json
+import re
 import time
 import logging
+import threading
+import uuid
 from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 from typing import Dict, List, Any, Optional, Union, Callable, Iterator
 from dataclasses import dataclass
 from datetime import datetime
 
+from ..dialects.base import QueryCancelledError
+
 # Optional imports for progress display
 try:
     from tqdm import tqdm
@@ -26,6 +32,9 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# Prefix of the temporary per-resource-type scan tables used by fused batches
+SCAN_TABLE_PREFIX = "fhir4ds_scan_"
+
 
 @dataclass
 class BatchResult:
@@ -107,7 +116,8 @@ class BatchProcessor:
     """
     
     def __init__(self, database_connection, max_workers: int = 4, 
-                 show_progress: bool = True, timeout: Optional[float] = None):
+                 show_progress: bool = True, timeout: Optional[float] = None,
+                 profile: Optional[str] = None):
         """
         Initialize batch processor.
         
@@ -115,12 +125,24 @@ class BatchProcessor:
             database_connection: Connected database instance (ConnectedDatabase)
             max_workers: Maximum number of parallel workers
             show_progress: Whether to show progress bar
-            timeout: Optional timeout for individual queries (seconds)
+            timeout: Optional statement timeout for individual queries (seconds); a query
+                running longer is interrupted on the database and reported as failed
+            profile: Optional execution profile ('batch', ...) applied for each batch run,
+                see fhir4ds.dialects.profiles
         """
         self.database = database_connection
         self.max_workers = max_workers
         self.show_progress = show_progress
         self.timeout = timeout
+        self.profile = profile
+        
+        # Fetch results inside execute_batch while a profile is applied
+        self._fetch_eagerly = False
+        
+        # Results currently executing, for cancel()
+        self._cancel_requested = False
+        self._inflight = set()
+        self._inflight_lock = threading.Lock()
         
         # Query queue for incremental batch building
         self.query_queue = []  # List of (name, view_definition) tuples
@@ -144,12 +166,13 @@ class BatchProcessor:
         """Clear all queries from the batch queue."""
         self.query_queue.clear()
     
-    def execute_queued(self, parallel: bool = True) -> List[BatchResult]:
+    def execute_queued(self, parallel: bool = True, fused: bool = False) -> List[BatchResult]:
         """
         Execute all queries currently in the queue.
         
         Args:
             parallel: Whether to execute in parallel (True) or sequentially (False)
+            fused: Share one scan per resource type across the queued views
             
         Returns:
             List of BatchResult objects with execution results
@@ -159,7 +182,7 @@ class BatchProcessor:
         
         # Extract just the ViewDefinitions for execution
         view_definitions = [vd for name, vd in self.query_queue]
-        results = self.execute_batch(view_definitions, parallel)
+        results = self.execute_batch(view_definitions, parallel, fused=fused)
         
         # Update results with query names
         for i, (name, _) in enumerate(self.query_queue):
@@ -184,13 +207,20 @@ class BatchProcessor:
         return self.execute_queued(parallel)
     
     def execute_batch(self, view_definitions: List[Dict[str, Any]], 
-                     parallel: bool = True) -> List[BatchResult]:
+                     parallel: bool = True, fused: bool = False,
+                     profile: Optional[str] = None) -> List[BatchResult]:
         """
         Execute multiple ViewDefinitions in batch.
         
         Args:
             view_definitions: List of FHIR ViewDefinition dictionaries
             parallel: Whether to execute in parallel (True) or sequentially (False)
+            fused: Scan each resource type once into a temporary table and run all
+                of its views against it (see _execute_fused). Results are fetched
+                eagerly; with ``parallel`` the views of a resource type run concurrently.
+            profile: Execution profile for this run, overriding the processor's. Results
+                are fetched eagerly so every query runs under the profile, and the
+                previous session settings are restored afterwards.
             
         Returns:
             List of BatchResult objects with execution results
@@ -206,12 +236,22 @@ class BatchProcessor:
         start_time = time.time()
         batch_start = datetime.now()
         
-        logger.info(f"Starting batch execution: {len(view_definitions)} queries, parallel={parallel}")
-        
-        if parallel and self.max_workers > 1:
-            results = self._execute_parallel(view_definitions)
-        else:
-            results = self._execute_sequential(view_definitions)
+        logger.info(f"Starting batch execution: {len(view_definitions)} queries, "
+                    f"parallel={parallel}, fused={fused}")
+        
+        profile = profile or self.profile
+        self._cancel_requested = False
+        with self.database.datastore.dialect.execution_profile(profile):
+            self._fetch_eagerly = profile is not None
+            try:
+                if fused:
+                    results = self._execute_fused(view_definitions, parallel)
+                elif parallel and self.max_workers > 1:
+                    results = self._execute_parallel(view_definitions)
+                else:
+                    results = self._execute_sequential(view_definitions)
+            finally:
+                self._fetch_eagerly = False
         
         # Update statistics
         total_time = time.time() - start_time
@@ -242,8 +282,8 @@ class BatchProcessor:
                 future = executor.submit(self._execute_single, view_def, i)
                 future_to_index[future] = i
             
-            # Collect results as they complete
-            for future in as_completed(future_to_index, timeout=self.timeout):
+            # Collect results as they complete; statements enforce their own timeout
+            for future in as_completed(future_to_index):
                 index = future_to_index[future]
                 try:
                     result = future.result()
@@ -287,8 +327,13 @@ class BatchProcessor:
         timestamp = datetime.now().isoformat()
         
         try:
+            if self._cancel_requested:
+                raise QueryCancelledError("Batch was cancelled")
+            
             # Execute the ViewDefinition
             result = self.database.execute(view_definition)
+            if self._fetch_eagerly or self.timeout:
+                self._fetch_cancellable(result)
             execution_time = time.time() - start_time
             
             return BatchResult(
@@ -311,6 +356,154 @@ class BatchProcessor:
                 index=index
             )
     
+    def _fetch_cancellable(self, result) -> None:
+        """Fetch a result under the statement timeout, tracked so cancel() can interrupt it."""
+        with self._inflight_lock:
+            self._inflight.add(result)
+        try:
+            result.fetchall(timeout=self.timeout)
+        finally:
+            with self._inflight_lock:
+                self._inflight.discard(result)
+    
+    def cancel(self) -> int:
+        """
+        Cancel the queries of a running batch (e.g. from another thread when the
+        client has gone away). Running statements are interrupted on the database
+        and queries that have not started yet are skipped.
+        
+        Returns:
+            Number of statements interrupted
+        """
+        self._cancel_requested = True
+        with self._inflight_lock:
+            inflight = list(self._inflight)
+        return sum(1 for result in inflight if result.cancel())
+    
+    def _execute_fused(self, view_definitions: List[Dict[str, Any]], parallel: bool = True) -> List[BatchResult]:
+        """
+        Execute ViewDefinitions grouped by resource type with one shared scan per group.
+        
+        For every resource type targeted by two or more views, the matching rows
+        are copied once into a temporary table in the shredded layout of that type
+        (fhir4ds.datastore.shredding): the typed columns are extracted from the
+        JSON once, and each view's SQL reads them, and the resource JSON for any
+        other path, from that table instead of the full resource table. The views
+        of a group run in parallel when ``parallel`` is set, and results are
+        fetched before the temporary table is dropped. Resource types with a
+        single view run as usual.
+        
+        Scan table names carry a per-batch suffix so concurrent batches on the
+        same connection do not share tables.
+        """
+        results = [None] * len(view_definitions)
+        groups = {}
+        for i, view_def in enumerate(view_definitions):
+            groups.setdefault(view_def.get('resource'), []).append(i)
+        batch_id = uuid.uuid4().hex[:8]
+        
+        progress = None
+        if self.show_progress and TQDM_AVAILABLE:
+            progress = tqdm(total=len(view_definitions), desc="Executing queries",
+                          unit="query", leave=True)
+        
+        executor = ThreadPoolExecutor(max_workers=self.max_workers) \
+            if parallel and self.max_workers > 1 else None
+        try:
+            for resource_type, indexes in groups.items():
+                scan_runner = None
+                if resource_type and len(indexes) > 1:
+                    try:
+                        scan_runner = self._create_scan_runner(resource_type, batch_id)
+                    except Exception as e:
+                        logger.warning(f"Shared scan for {resource_type} failed, running views individually: {e}")
+                
+                def run(i: int) -> BatchResult:
+                    if scan_runner:
+                        return self._execute_on_scan_table(view_definitions[i], i, scan_runner)
+                    return self._execute_single(view_definitions[i], i)
+                
+                try:
+                    group_results = executor.map(run, indexes) if executor else map(run, indexes)
+                    for i, result in zip(indexes, group_results):
+                        results[i] = result
+                        if progress:
+                            progress.update(1)
+                finally:
+                    if scan_runner:
+                        self._execute_ddl(f"DROP TABLE IF EXISTS {scan_runner.table_name}")
+        finally:
+            if executor:
+                executor.shutdown()
+        
+        if progress:
+            progress.close()
+        
+        return results
+    
+    def _create_scan_runner(self, resource_type: str, batch_id: str):
+        """Copy one resource type into a temporary shredded table and return a ViewRunner reading it."""
+        from ..view_runner import ViewRunner
+        from .shredding import build_table_layout, shredded_table_sql
+        
+        datastore = self.database.datastore
+        scan_table = build_table_layout(
+            resource_type,
+            f"{SCAN_TABLE_PREFIX}{re.sub(r'[^a-z0-9_]', '_', resource_type.lower())}_{batch_id}"
+        )
+        
+        start_time = time.time()
+        self._execute_ddl(shredded_table_sql(datastore.dialect, datastore.table_name, datastore.json_col,
+                                             scan_table, temporary=True))
+        logger.info(f"Created shared scan table {scan_table.table_name} with {len(scan_table.columns)} "
+                    f"typed columns in {time.time() - start_time:.2f}s")
+        return ViewRunner(datastore=datastore, source_table=scan_table)
+    
+    def _execute_on_scan_table(self, view_definition: Dict[str, Any], index: int,
+                               scan_runner) -> BatchResult:
+        """Execute and fetch a single ViewDefinition against a shared scan table."""
+        start_time = time.time()
+        timestamp = datetime.now().isoformat()
+        
+        try:
+            if self._cancel_requested:
+                raise QueryCancelledError("Batch was cancelled")
+            
+            result = scan_runner.execute_view_definition(view_definition)
+            self._fetch_cancellable(result)
+            
+            return BatchResult(
+                view_definition=view_definition,
+                result=result,
+                execution_time=time.time() - start_time,
+                timestamp=timestamp,
+                index=index
+            )
+        
+        except Exception as e:
+            logger.error(f"Query {index} failed: {str(e)}")
+            
+            return BatchResult(
+                view_definition=view_definition,
+                error=str(e),
+                execution_time=time.time() - start_time,
+                timestamp=timestamp,
+                index=index
+            )
+    
+    def _execute_ddl(self, sql: str) -> None:
+        """Run a statement on the datastore's own connection (temp tables are session-local)."""
+        dialect = self.database.datastore.dialect
+        connection = dialect.get_connection()
+        if dialect.name.upper() == 'POSTGRESQL':
+            cursor = connection.cursor()
+            try:
+                cursor.execute(sql)
+            finally:
+                cursor.close()
+        else:
+            connection.execute(sql)
+    
     def execute_and_export_batch(self, view_definitions: List[Dict[str, Any]], 
                                 output_path: str, format: str = "excel",
                                 sheet_names: Optional[List[str]] = None,
@@ -430,7 +623,7 @@ class BatchProcessor:
 
 
 def create_batch_processor(database_connection, max_workers: int = 4, 
-                          show_progress: bool = True) -> BatchProcessor:
+                          show_progress: bool = True, profile: Optional[str] = None) -> BatchProcessor:
     """
     Factory function to create a BatchProcessor instance.
     
@@ -438,6 +631,7 @@ def create_batch_processor(database_connection, max_workers: int = 4,
         database_connection: Connected database instance
         max_workers: Maximum number of parallel workers
         show_progress: Whether to show progress indicators
+        profile: Optional execution profile applied for each batch run
         
     Returns:
         Configured BatchProcessor instance
@@ -448,4 +642,4 @@ def create_batch_processor(database_connection, max_workers: int = 4,
         >>> processor = create_batch_processor(db, max_workers=8)
         >>> results = processor.execute_batch(view_definitions)
     """
-    return BatchProcessor(database_connection, max_workers, show_progress)
\ No newline at end of file
+    return BatchProcessor(database_connection, max_workers, show_progress, profile=profile)
\ No newline at end of file
@@ -0,0 +1,190 @@
+"""
+Resource Coding Index
+
+Optional side table that explodes every Coding of the commonly queried coded
+elements into one row, so code-based retrieves and value-set membership become
+semi-joins on plain columns instead of JSON path scans over every resource:
+
+    resource_codings(row_id, resource_type, patient_id, element_path, system, code, display)
+
+- row_id is the ``id`` of the resource row in the base table
+- element_path is the coded element (``code``, ``category``, ``valueCodeableConcept`` ...)
+- every Coding of the element is indexed, not just ``coding[0]``
+- patient_id is taken from the patient compartment reference (see
+  fhir4ds.datastore.compartments.PATIENT_COMPARTMENT_REFERENCES)
+
+The index is kept current by the datastore's load paths: each load indexes the
+rows whose id is above the last indexed id. Compilers find the index through
+``dialect.coding_index_tables`` and fall back to JSON filters without it.
+
+Usage:
+    datastore = FHIRDataStore.with_duckdb()
+    datastore.enable_coding_index()
+    datastore.load_resources(resources)
+    # [Condition: "Diabetes"] and in-ValueSet retrieves now join resource_codings
+"""
+
+import logging
+from typing import Dict, Iterable, List, Optional
+
+from .side_tables import IncrementalSideTable, sql_literal
+
+logger = logging.getLogger(__name__)
+
+# Coded elements per resource type: "CodeableConcept", "CodeableConcept[]" for
+# repeating elements, or "Coding" for elements holding a bare Coding
+CODED_ELEMENTS = {
+    'Condition': {
+        'code': 'CodeableConcept', 'category': 'CodeableConcept[]', 'clinicalStatus': 'CodeableConcept',
+        'verificationStatus': 'CodeableConcept', 'severity': 'CodeableConcept',
+    },
+    'Observation': {
+        'code': 'CodeableConcept', 'category': 'CodeableConcept[]',
+        'valueCodeableConcept': 'CodeableConcept', 'interpretation': 'CodeableConcept[]',
+    },
+    'Procedure': {'code': 'CodeableConcept', 'category': 'CodeableConcept', 'reasonCode': 'CodeableConcept[]'},
+    'Encounter': {'class': 'Coding', 'type': 'CodeableConcept[]', 'reasonCode': 'CodeableConcept[]'},
+    'MedicationRequest': {
+        'medicationCodeableConcept': 'CodeableConcept', 'category': 'CodeableConcept[]',
+        'reasonCode': 'CodeableConcept[]',
+    },
+    'MedicationAdministration': {'medicationCodeableConcept': 'CodeableConcept'},
+    'MedicationDispense': {'medicationCodeableConcept': 'CodeableConcept'},
+    'MedicationStatement': {'medicationCodeableConcept': 'CodeableConcept'},
+    'Medication': {'code': 'CodeableConcept'},
+    'DiagnosticReport': {'code': 'CodeableConcept', 'category': 'CodeableConcept[]'},
+    'Immunization': {'vaccineCode': 'CodeableConcept'},
+    'AllergyIntolerance': {'code': 'CodeableConcept', 'clinicalStatus': 'CodeableConcept'},
+    'ServiceRequest': {'code': 'CodeableConcept', 'category': 'CodeableConcept[]'},
+    'Coverage': {'type': 'CodeableConcept'},
+    'CarePlan': {'category': 'CodeableConcept[]'},
+    'DocumentReference': {'type': 'CodeableConcept', 'category': 'CodeableConcept[]'},
+    'Claim': {'type': 'CodeableConcept'},
+    'ExplanationOfBenefit': {'type': 'CodeableConcept'},
+}
+
+CODING_COLUMNS = ('system', 'code', 'display')
+
+
+def coding_index_name(table_name: str) -> str:
+    """Name of the coding index table for a resource table."""
+    return 'resource_codings' if table_name == 'fhir_resources' else f"{table_name}_codings"
+
+
+def coding_index_table(dialect, table_name: str) -> Optional[str]:
+    """The coding index table registered for a resource table, or None."""
+    return getattr(dialect, 'coding_index_tables', {}).get(table_name)
+
+
+def coded_rows_sql(codings_table: str, resource_type: Optional[str] = None,
+                   element_paths: Optional[Iterable[str]] = None, code: Optional[str] = None,
+                   system: Optional[str] = None, display: Optional[str] = None) -> str:
+    """
+    Subquery selecting the row ids with a matching Coding, for ``id IN (...)``.
+
+    Args:
+        codings_table: Coding index table
+        resource_type: Restrict to one resource type
+        element_paths: Restrict to these coded elements (e.g. ['code'])
+        code, system, display: Coding fields to match
+    """
+    conditions = []
+    if resource_type:
+        conditions.append(f"resource_type = {sql_literal(resource_type)}")
+    if element_paths:
+        conditions.append(f"element_path IN ({', '.join(sql_literal(p) for p in element_paths)})")
+    for column, value in (('code', code), ('system', system), ('display', display)):
+        if value is not None:
+            conditions.append(f"{column} = {sql_literal(value)}")
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    return f"SELECT row_id FROM {codings_table}{where}"
+
+
+def valueset_rows_sql(codings_table: str, codes: List[Dict[str, str]], resource_type: Optional[str] = None,
+                      element_paths: Optional[Iterable[str]] = None) -> str:
+    """
+    Subquery selecting the row ids with a Coding in an expanded value set.
+
+    The expansion becomes a VALUES list hash-joined to the index on (system, code).
+
+    Args:
+        codings_table: Coding index table
+        codes: Expansion entries with 'system' and 'code'
+        resource_type: Restrict to one resource type
+        element_paths: Restrict to these coded elements
+    """
+    pairs = dict.fromkeys((c['system'], c['code']) for c in codes if c.get('system') and c.get('code'))
+    if not pairs:
+        return f"SELECT row_id FROM {codings_table} WHERE FALSE"
+    values = ', '.join(f"({sql_literal(s)}, {sql_literal(c)})" for s, c in pairs)
+    conditions = []
+    if resource_type:
+        conditions.append(f"rc.resource_type = {sql_literal(resource_type)}")
+    if element_paths:
+        conditions.append(f"rc.element_path IN ({', '.join(sql_literal(p) for p in element_paths)})")
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    return (f"SELECT rc.row_id FROM {codings_table} rc "
+            f"JOIN (VALUES {values}) AS vs(system, code) ON rc.system = vs.system AND rc.code = vs.code{where}")
+
+
+class CodingIndex(IncrementalSideTable):
+    """Builds and incrementally maintains the coding index of a datastore"""
+
+    def __init__(self, datastore, resource_types: Optional[Iterable[str]] = None):
+        """
+        Args:
+            datastore: FHIRDataStore whose base table is indexed
+            resource_types: Resource types to index (default: all in CODED_ELEMENTS)
+        """
+        super().__init__(datastore, coding_index_name(datastore.table_name))
+        resource_types = list(resource_types or CODED_ELEMENTS)
+        unknown = [rt for rt in resource_types if rt not in CODED_ELEMENTS]
+        if unknown:
+            raise ValueError(f"No coded elements known for resource types: {', '.join(unknown)}")
+        self.resource_types = resource_types
+
+    def create_table_statements(self) -> List[str]:
+        statements = [f"CREATE TABLE {self.table_name} (row_id INTEGER, resource_type VARCHAR, "
+                      f"patient_id VARCHAR, element_path VARCHAR, system VARCHAR, code VARCHAR, display VARCHAR)"]
+        if self.is_postgresql:
+            statements.append(f"CREATE INDEX {self.table_name}_code_idx ON {self.table_name} (code, system)")
+        return statements
+
+    def populate_sql(self, low: int, high: int) -> str:
+        """INSERT indexing the Codings of base table rows with low < id <= high."""
+        selects = []
+        for rt in self.resource_types:
+            for element, element_type in CODED_ELEMENTS[rt].items():
+                source, not_null = self._codings_source(element, element_type)
+                fields = ', '.join(self._coding_field(f) for f in CODING_COLUMNS)
+                selects.append(
+                    f"SELECT r.row_id, r.resource_type, r.patient_id, {sql_literal(element)}, {fields} "
+                    f"FROM new_rows r{source} WHERE r.resource_type = {sql_literal(rt)}{not_null}"
+                )
+        return (f"INSERT INTO {self.table_name} WITH new_rows AS MATERIALIZED "
+                f"({self.new_rows_sql(low, high, self.resource_types)}) " + "\nUNION ALL\n".join(selects))
+
+    def _codings_source(self, element: str, element_type: str):
+        """FROM-clause suffix yielding one ``c.coding`` per Coding, and any extra filter."""
+        if element_type == 'Coding':
+            path = f'$.{element}'
+        elif element_type.endswith('[]'):
+            path = f'$.{element}[*].coding[*]'
+        else:
+            path = f'$.{element}.coding[*]'
+
+        if self.is_postgresql:
+            return f" CROSS JOIN LATERAL jsonb_path_query(r.resource, '{path}') AS c(coding)", ""
+        if element_type == 'Coding':
+            # A bare Coding is one (possibly absent) object rather than a list
+            return f", unnest([json_extract(r.resource, '{path}')]) AS c(coding)", " AND c.coding IS NOT NULL"
+        return f", unnest(json_extract(r.resource, '{path}')) AS c(coding)", ""
+
+    def _coding_field(self, field_name: str) -> str:
+        if self.is_postgresql:
+            return f"(c.coding ->> '{field_name}')"
+        return f"json_extract_string(c.coding, '$.{field_name}')"
+
+    def describe(self) -> Dict[str, List[str]]:
+        """Indexed coded elements per resource type."""
+        return {rt: list(CODED_ELEMENTS[rt]) for rt in self.resource_types}
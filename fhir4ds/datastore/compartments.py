@@ -0,0 +1,81 @@
+"""
+Patient Compartment Definition
+
+The single definition of which reference elements place a resource in a
+patient's compartment, shared by everything that assigns resources to patients:
+sharding (fhir4ds.datastore.sharding), the compartment and reference indexes
+(fhir4ds.datastore.references), the patient keys of CQL/CTE SQL and parallel
+patient buckets (fhir4ds.cql.core.parallel).
+
+- PATIENT_COMPARTMENT: every compartment element per resource type, per the FHIR
+  R4 Patient CompartmentDefinition (a resource can be in several compartments)
+- PATIENT_COMPARTMENT_REFERENCES: the primary patient element per resource type,
+  derived from PATIENT_COMPARTMENT as its first element when that is a single
+  top-level reference; it names the one patient a resource belongs to for
+  routing, bucketing and the CQL Patient context
+"""
+
+from typing import Dict, Tuple
+
+# Reference elements that place a resource in a patient's compartment, per the
+# FHIR R4 Patient CompartmentDefinition; "[]" marks a repeating element
+PATIENT_COMPARTMENT = {
+    'Account': ('subject[]',),
+    'AllergyIntolerance': ('patient', 'recorder', 'asserter'),
+    'Appointment': ('participant[].actor',),
+    'Basic': ('subject', 'author'),
+    'CarePlan': ('subject',),
+    'CareTeam': ('subject', 'participant[].member'),
+    'Claim': ('patient', 'payee.party'),
+    'ClinicalImpression': ('subject',),
+    'Communication': ('subject', 'sender', 'recipient[]'),
+    'Composition': ('subject', 'author[]', 'attester[].party'),
+    'Condition': ('subject', 'asserter'),
+    'Consent': ('patient',),
+    'Coverage': ('beneficiary', 'policyHolder', 'subscriber', 'payor[]'),
+    'DetectedIssue': ('patient',),
+    'Device': ('patient',),
+    'DeviceRequest': ('subject', 'performer'),
+    'DiagnosticReport': ('subject',),
+    'DocumentReference': ('subject', 'author[]'),
+    'Encounter': ('subject',),
+    'EpisodeOfCare': ('patient',),
+    'ExplanationOfBenefit': ('patient', 'payee.party'),
+    'FamilyMemberHistory': ('patient',),
+    'Flag': ('subject',),
+    'Goal': ('subject',),
+    'ImagingStudy': ('subject',),
+    'Immunization': ('patient',),
+    'List': ('subject', 'source'),
+    'MedicationAdministration': ('subject', 'performer[].actor'),
+    'MedicationDispense': ('subject', 'receiver[]'),
+    'MedicationRequest': ('subject',),
+    'MedicationStatement': ('subject',),
+    'NutritionOrder': ('patient',),
+    'Observation': ('subject', 'performer[]'),
+    'Patient': ('link[].other',),
+    'Procedure': ('subject', 'performer[].actor'),
+    'QuestionnaireResponse': ('subject', 'author'),
+    'RelatedPerson': ('patient',),
+    'RiskAssessment': ('subject',),
+    'Schedule': ('actor[]',),
+    'ServiceRequest': ('subject', 'performer[]'),
+    'Specimen': ('subject',),
+    'SupplyDelivery': ('patient',),
+    'VisionPrescription': ('patient',),
+}
+
+
+def _primary_element(elements: Tuple[str, ...]) -> Tuple[str, ...]:
+    """The first element when it is a single, top-level reference (else none)."""
+    first = elements[0] if elements else ''
+    return (first,) if first and '[]' not in first and '.' not in first else ()
+
+
+# Resource type -> (primary patient reference element,); Patient resources are
+# their own key and are not listed
+PATIENT_COMPARTMENT_REFERENCES: Dict[str, Tuple[str, ...]] = {
+    resource_type: _primary_element(elements)
+    for resource_type, elements in PATIENT_COMPARTMENT.items()
+    if resource_type != 'Patient' and _primary_element(elements)
+}
@@ -14,6 +14,7 @@ from urllib.parse import urlparse
 from .core import FHIRDataStore
 from ..view_runner import ViewRunner
 from .formatters import ResultFormatter
+from .result import STREAM_BATCH_SIZE
 from .batch import BatchProcessor
 
 
@@ -43,13 +44,18 @@ class QuickConnect:
     """
     
     @staticmethod
-    def duckdb(database_path: Union[str, Path], initialize_table: bool = True) -> 'ConnectedDatabase':
+    def duckdb(database_path: Union[str, Path], initialize_table: bool = True,
+               plan_cache_path: Optional[str] = None, profile: Optional[str] = None,
+               record_workload: bool = False) -> 'ConnectedDatabase':
         """
         Create a DuckDB connection with automatic FHIR table initialization.
         
         Args:
             database_path: Path to DuckDB database file (will be created if doesn't exist)
             initialize_table: Whether to automatically create FHIR resources table
+            plan_cache_path: Optional SQLite file persisting compiled ViewDefinition SQL
+            profile: Optional execution profile for the session ('interactive', 'batch', 'bulk-load')
+            record_workload: Record the JSON paths queries filter on, for apply_index_recommendations()
             
         Returns:
             ConnectedDatabase: Ready-to-use database connection
@@ -68,19 +74,28 @@ class QuickConnect:
         # Create datastore
         datastore = FHIRDataStore.with_duckdb(
             database=database_path,
-            initialize_table=initialize_table
+            initialize_table=initialize_table,
+            plan_cache_path=plan_cache_path,
+            record_workload=record_workload
         )
+        if profile:
+            datastore.dialect.apply_execution_profile(profile)
         
         return ConnectedDatabase(datastore, connection_type="DuckDB", database_path=database_path)
     
     @staticmethod
-    def postgresql(connection_string: str, initialize_table: bool = True) -> 'ConnectedDatabase':
+    def postgresql(connection_string: str, initialize_table: bool = True,
+                   plan_cache_path: Optional[str] = None, profile: Optional[str] = None,
+                   record_workload: bool = False) -> 'ConnectedDatabase':
         """
         Create a PostgreSQL connection with automatic FHIR table initialization.
         
         Args:
             connection_string: PostgreSQL connection string
             initialize_table: Whether to automatically create FHIR resources table
+            plan_cache_path: Optional SQLite file persisting compiled ViewDefinition SQL
+            profile: Optional execution profile for the session ('interactive', 'batch', 'bulk-load')
+            record_workload: Record the JSON paths queries filter on, for apply_index_recommendations()
             
         Returns:
             ConnectedDatabase: Ready-to-use database connection
@@ -96,8 +111,12 @@ class QuickConnect:
         # Create datastore
         datastore = FHIRDataStore.with_postgresql(
             conn_str=connection_string,
-            initialize_table=initialize_table
+            initialize_table=initialize_table,
+            plan_cache_path=plan_cache_path,
+            record_workload=record_workload
         )
+        if profile:
+            datastore.dialect.apply_execution_profile(profile)
         
         return ConnectedDatabase(datastore, connection_type="PostgreSQL", connection_string=connection_string)
     
@@ -139,12 +158,13 @@ class QuickConnect:
             raise ValueError(f"Cannot auto-detect database type from: {connection_str}")
     
     @staticmethod
-    def memory(initialize_table: bool = True) -> 'ConnectedDatabase':
+    def memory(initialize_table: bool = True, profile: Optional[str] = None) -> 'ConnectedDatabase':
         """
         Create an in-memory DuckDB database for testing and experimentation.
         
         Args:
             initialize_table: Whether to automatically create FHIR resources table
+            profile: Optional execution profile for the session
             
         Returns:
             ConnectedDatabase: Ready-to-use in-memory database
@@ -157,6 +177,8 @@ class QuickConnect:
             database=":memory:",
             initialize_table=initialize_table
         )
+        if profile:
+            datastore.dialect.apply_execution_profile(profile)
         
         return ConnectedDatabase(datastore, connection_type="DuckDB (Memory)", database_path=":memory:")
     
@@ -331,6 +353,29 @@ class ConnectedDatabase:
         self._resources_loaded += count
         return count
     
+    def apply_index_recommendations(self, min_frequency: int = 2, max_indexes: int = 10,
+                                    min_benefit: float = 0.1, drop_unused: bool = True,
+                                    dry_run: bool = False) -> Dict[str, Any]:
+        """
+        Build indexes for the JSON paths queries run through this database filter on
+        (requires ``record_workload=True`` when connecting).
+        
+        Candidates are validated with EXPLAIN and kept only if they lower the
+        planner cost by at least ``min_benefit``; see FHIRDataStore.apply_index_recommendations.
+        
+        Returns:
+            Report with 'candidates', 'created' and 'dropped'
+            
+        Example:
+            >>> db.execute(view_definition)
+            >>> report = db.apply_index_recommendations()
+            >>> print(report['created'])
+        """
+        return self.datastore.apply_index_recommendations(
+            min_frequency=min_frequency, max_indexes=max_indexes, min_benefit=min_benefit,
+            drop_unused=drop_unused, dry_run=dry_run
+        )
+    
     def test_connection(self) -> bool:
         """
         Test if the database connection is working.
@@ -404,6 +449,9 @@ class ConnectedDatabase:
         """
         Execute ViewDefinition and export results to CSV.
         
+        Files are written batch by batch from the cursor unless include_metadata is set
+        (the metadata header needs the row count up front).
+        
         Args:
             view_definition: FHIR ViewDefinition resource as dictionary
             output_path: File path to save CSV (optional - returns string if None)
@@ -419,15 +467,21 @@ class ConnectedDatabase:
     
     def execute_to_excel(self, view_definitions: Union[Dict[str, Any], List[Dict[str, Any]]], 
                         output_path: str, sheet_names: Optional[List[str]] = None,
-                        include_metadata: bool = True):
+                        include_metadata: bool = True, parallel: bool = False,
+                        batch_size: int = STREAM_BATCH_SIZE):
         """
         Execute ViewDefinition(s) and export results to Excel with multiple sheets.
         
+        Rows are streamed from the cursor into a write-only workbook, and results
+        larger than a worksheet roll over onto additional sheets.
+        
         Args:
             view_definitions: Single ViewDefinition or list of ViewDefinitions
             output_path: File path to save Excel file
             sheet_names: Optional list of sheet names
             include_metadata: Whether to include metadata sheet
+            parallel: Execute the next sheet's query while the current sheet is written
+            batch_size: Rows fetched from the cursor per write
             
         Example:
             >>> # Single sheet
@@ -447,7 +501,8 @@ class ConnectedDatabase:
             result = self.execute(view_def)
             results.append(result)
         
-        ResultFormatter.to_excel(results, output_path, sheet_names, include_metadata)
+        ResultFormatter.stream_to_excel(results, output_path, sheet_names, include_metadata,
+                                        batch_size=batch_size, parallel=parallel)
     
     def execute_to_parquet(self, view_definition: Dict[str, Any], output_path: str,
                           compression: str = 'snappy', include_metadata: bool = True):
@@ -466,7 +521,8 @@ class ConnectedDatabase:
     # Batch processing methods
     def execute_batch(self, view_definitions: List[Dict[str, Any]], 
                      parallel: bool = True, max_workers: int = 4, 
-                     show_progress: bool = True):
+                     show_progress: bool = True, fused: bool = False,
+                     profile: Optional[str] = None):
         """
         Execute multiple ViewDefinitions in batch with parallel processing.
         
@@ -475,6 +531,9 @@ class ConnectedDatabase:
             parallel: Whether to execute in parallel (True) or sequentially (False)
             max_workers: Maximum number of parallel workers
             show_progress: Whether to show progress indicators
+            fused: Scan each resource type once and run all of its views against
+                that scan (results are fetched eagerly)
+            profile: Execution profile applied for this batch only (e.g. 'batch')
             
         Returns:
             List of BatchResult objects with execution results
@@ -485,7 +544,7 @@ class ConnectedDatabase:
             >>> print(f"Executed {len(successful)} queries successfully")
         """
         processor = BatchProcessor(self, max_workers=max_workers, show_progress=show_progress)
-        return processor.execute_batch(view_definitions, parallel=parallel)
+        return processor.execute_batch(view_definitions, parallel=parallel, fused=fused, profile=profile)
     
     def execute_and_export_batch(self, view_definitions: List[Dict[str, Any]], 
                                 output_path: str, format: str = "excel",
@@ -519,13 +578,15 @@ class ConnectedDatabase:
             view_definitions, output_path, format, sheet_names, parallel
         )
     
-    def create_batch_processor(self, max_workers: int = 4, show_progress: bool = True) -> BatchProcessor:
+    def create_batch_processor(self, max_workers: int = 4, show_progress: bool = True,
+                               profile: Optional[str] = None) -> BatchProcessor:
         """
         Create a BatchProcessor instance for advanced batch operations.
         
         Args:
             max_workers: Maximum number of parallel workers
             show_progress: Whether to show progress indicators
+            profile: Execution profile applied for each batch run
             
         Returns:
             Configured BatchProcessor instance
@@ -535,7 +596,23 @@ class ConnectedDatabase:
             >>> results = processor.execute_batch(view_definitions)
             >>> stats = processor.get_processor_stats()
         """
-        return BatchProcessor(self, max_workers=max_workers, show_progress=show_progress)
+        return BatchProcessor(self, max_workers=max_workers, show_progress=show_progress, profile=profile)
+    
+    def use_profile(self, profile: str) -> 'ConnectedDatabase':
+        """
+        Apply an execution profile to this session until another one is applied.
+        
+        Args:
+            profile: Profile name ('interactive', 'batch', 'bulk-load' or a registered one)
+            
+        Returns:
+            Self, for chaining
+            
+        Example:
+            >>> db.use_profile("bulk-load").load_from_json_file("bundle.json")
+        """
+        self.datastore.dialect.apply_execution_profile(profile)
+        return self
     
     # Database object creation methods
     def create_view(self, view_definition: Dict[str, Any], view_name: str, 
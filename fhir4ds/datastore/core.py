@@ -17,6 +17,7 @@ from typing import Dict, List, Any, Optional, Union
 # Import dialects from the dialects package
 from ..dialects import DatabaseDialect, DuckDBDialect, PostgreSQLDialect
 from .result import QueryResult
+from .index_advisor import IndexAdvisor
 
 logger = logging.getLogger(__name__)
 
@@ -28,7 +29,8 @@ class FHIRDataStore:
     """
     
     def __init__(self, dialect: Optional[DatabaseDialect] = None, table_name: str = "fhir_resources", 
-                 json_col: str = "resource", initialize_table: bool = True):
+                 json_col: str = "resource", initialize_table: bool = True,
+                 plan_cache_path: Optional[str] = None, record_workload: bool = False):
         """
         Initialize FHIR data store.
         
@@ -37,6 +39,12 @@ class FHIRDataStore:
             table_name: Name of the FHIR resources table
             json_col: Name of the JSON column storing FHIR resources
             initialize_table: Whether to initialize/recreate the table
+            plan_cache_path: Optional SQLite file for persisting compiled ViewDefinition
+                SQL across processes (e.g. next to the database file)
+            record_workload: Record the JSON paths executed queries filter on, for
+                recommend_indexes() / apply_index_recommendations(). Off by default, as
+                every recorded query is scanned for JSON paths; ViewDefinitions and CQL
+                measure criteria run against this table are recorded too.
         """
         # Import here to avoid circular imports
         self.dialect = dialect or DuckDBDialect()
@@ -44,6 +52,35 @@ class FHIRDataStore:
         self.json_col = json_col
         self.logger = logger
         
+        # Compiled ViewDefinition SQL, persisted when a plan cache path is given
+        self.plan_cache = None
+        if plan_cache_path:
+            from ..pipeline.core.advanced_features import QueryPlanCache, PersistentPlanStore
+            self.plan_cache = QueryPlanCache(persistent_store=PersistentPlanStore(plan_cache_path))
+            self.logger.info(f"Persistent plan cache enabled: {plan_cache_path}")
+        
+        # JSON path usage of executed queries, feeding the index advisor
+        self.index_advisor = IndexAdvisor(self.dialect, table_name, json_col) if record_workload else None
+        if self.index_advisor is not None:
+            self.dialect.index_advisors[table_name] = self.index_advisor
+        
+        # Typed per-resource-type tables, see enable_shredded_storage()
+        self.shredded_storage = None
+        
+        # Exploded Codings for code and value-set retrieves, see enable_coding_index()
+        self.coding_index = None
+        
+        # Normalized clinical time intervals for temporal joins, see enable_interval_index()
+        self.interval_index = None
+        
+        # Patient compartment membership and parsed references, see
+        # enable_compartment_index() and enable_reference_index()
+        self.compartment_index = None
+        self.reference_index = None
+        
+        # Parquet/NDJSON sources behind the resource table, see with_lake()
+        self.lake = None
+        
         # Initialize the FHIR table only if requested
         if initialize_table:
             self._initialize_table()
@@ -80,6 +117,7 @@ class FHIRDataStore:
             if use_bulk_load and file_size_mb <= max_file_size_mb:
                 try:
                     loaded = self.dialect.bulk_load_json(file_path, self.table_name, self.json_col)
+                    self._resources_changed()
                     if loaded > 0:
                         self.logger.info(f"Bulk loaded {loaded} resources from {file_path}")
                         continue
@@ -95,11 +133,13 @@ class FHIRDataStore:
     def load_resource(self, resource: Dict[str, Any]) -> None:
         """Load a single FHIR resource"""
         self.dialect.insert_resource(resource, self.table_name, self.json_col)
+        self._resources_changed()
     
     def load_resources(self, resources: List[Dict[str, Any]]) -> 'FHIRDataStore':
         """Load multiple FHIR resources and return self for chaining"""
         for resource in resources:
-            self.load_resource(resource)
+            self.dialect.insert_resource(resource, self.table_name, self.json_col)
+        self._resources_changed()
         return self
     
     def insert_resources(self, resources: List[Dict[str, Any]]) -> None:
@@ -136,6 +176,7 @@ class FHIRDataStore:
                 resources, self.table_name, self.json_col, 
                 parallel=parallel, batch_size=batch_size
             )
+            self._resources_changed()
         else:
             # Fallback to individual inserts with batching
             self._bulk_load_fallback(resources, parallel, batch_size)
@@ -156,7 +197,7 @@ class FHIRDataStore:
             def load_batch(batch):
                 count = 0
                 for resource in batch:
-                    self.load_resource(resource)
+                    self.dialect.insert_resource(resource, self.table_name, self.json_col)
                     count += 1
                 return count
             
@@ -165,6 +206,7 @@ class FHIRDataStore:
             with ThreadPoolExecutor(max_workers=min(4, num_batches)) as executor:
                 futures = [executor.submit(load_batch, batch) for batch in batches]
                 total_loaded = sum(future.result() for future in futures)
+            self._resources_changed()
             
             self.logger.info(f"Bulk loading completed: {total_loaded} resources in {num_batches} batches")
             return total_loaded
@@ -191,16 +233,215 @@ class FHIRDataStore:
             hasattr(self.dialect, 'load_json_file')):
             
             self.dialect.load_json_file(file_path, self.table_name, self.json_col)
+            self._resources_changed()
         else:
             # Fallback to individual parsing and loading
             self._load_file_individually(file_path)
         
         return self
     
+    def enable_shredded_storage(self, resource_types: Optional[List[str]] = None) -> 'FHIRDataStore':
+        """
+        Copy resources into typed per-resource-type tables that ViewDefinitions read
+        fixed-schema elements from directly, skipping JSON extraction.
+        
+        The tables are built from the resources already loaded and extended on every load.
+        
+        Args:
+            resource_types: Resource types to shred (default: every type with a layout
+                in fhir4ds.datastore.shredding.RESOURCE_ELEMENTS)
+            
+        Returns:
+            Self for method chaining
+        """
+        if self.lake is not None:
+            raise ValueError("Shredded storage requires a loaded resource table, not a lake view")
+        from .shredding import ShreddedStorage
+        if self.shredded_storage is not None:
+            self.shredded_storage.drop()
+        self.shredded_storage = ShreddedStorage(self, resource_types)
+        self.shredded_storage.rebuild()
+        return self
+    
+    def disable_shredded_storage(self) -> None:
+        """Drop the shredded tables; queries read the JSON resource table again."""
+        if self.shredded_storage is not None:
+            self.shredded_storage.drop()
+            self.shredded_storage = None
+    
+    def enable_coding_index(self, resource_types: Optional[List[str]] = None) -> 'FHIRDataStore':
+        """
+        Maintain a table of every Coding of the commonly queried coded elements, which
+        code and value-set retrieves join instead of scanning resource JSON.
+        
+        The index is built from the resources already loaded and extended on every load.
+        
+        Args:
+            resource_types: Resource types to index (default: every type in
+                fhir4ds.datastore.codings.CODED_ELEMENTS)
+            
+        Returns:
+            Self for method chaining
+        """
+        if self.lake is not None:
+            raise ValueError("The coding index requires a loaded resource table, not a lake view")
+        from .codings import CodingIndex
+        if self.coding_index is not None:
+            self.coding_index.drop()
+        self.coding_index = CodingIndex(self, resource_types)
+        self.coding_index.rebuild()
+        self.dialect.coding_index_tables[self.table_name] = self.coding_index.table_name
+        return self
+    
+    def disable_coding_index(self) -> None:
+        """Drop the coding index; retrieves filter on resource JSON again."""
+        if self.coding_index is not None:
+            self.dialect.coding_index_tables.pop(self.table_name, None)
+            self.coding_index.drop()
+            self.coding_index = None
+    
+    def enable_interval_index(self, resource_types: Optional[List[str]] = None) -> 'FHIRDataStore':
+        """
+        Maintain a table of each resource's clinically relevant time as a start/end
+        interval, which CQL temporal relationships between resources join on.
+        
+        The index is built from the resources already loaded and extended on every load.
+        
+        Args:
+            resource_types: Resource types to index (default: every type in
+                fhir4ds.datastore.intervals.CLINICAL_TIME_ELEMENTS)
+            
+        Returns:
+            Self for method chaining
+        """
+        if self.lake is not None:
+            raise ValueError("The interval index requires a loaded resource table, not a lake view")
+        from .intervals import IntervalIndex
+        if self.interval_index is not None:
+            self.interval_index.drop()
+        self.interval_index = IntervalIndex(self, resource_types)
+        self.interval_index.rebuild()
+        self.dialect.interval_index_tables[self.table_name] = self.interval_index.table_name
+        return self
+    
+    def disable_interval_index(self) -> None:
+        """Drop the interval index; temporal joins normalize times from resource JSON again."""
+        if self.interval_index is not None:
+            self.dialect.interval_index_tables.pop(self.table_name, None)
+            self.interval_index.drop()
+            self.interval_index = None
+    
+    def enable_compartment_index(self, resource_types: Optional[List[str]] = None) -> 'FHIRDataStore':
+        """
+        Maintain a table mapping each resource to the patient(s) whose compartment it
+        belongs to, which joins from clinical resources to patients use instead of
+        parsing subject/patient/beneficiary references per row.
+        
+        The index is built from the resources already loaded and extended on every load.
+        
+        Args:
+            resource_types: Resource types to index (default: every type in
+                fhir4ds.datastore.compartments.PATIENT_COMPARTMENT)
+            
+        Returns:
+            Self for method chaining
+        """
+        if self.lake is not None:
+            raise ValueError("The compartment index requires a loaded resource table, not a lake view")
+        from .references import CompartmentIndex
+        if self.compartment_index is not None:
+            self.compartment_index.drop()
+        self.compartment_index = CompartmentIndex(self, resource_types)
+        self.compartment_index.rebuild()
+        self.dialect.compartment_index_tables[self.table_name] = self.compartment_index.table_name
+        return self
+    
+    def disable_compartment_index(self) -> None:
+        """Drop the compartment index; patient joins parse references from resource JSON again."""
+        if self.compartment_index is not None:
+            self.dialect.compartment_index_tables.pop(self.table_name, None)
+            self.compartment_index.drop()
+            self.compartment_index = None
+    
+    def enable_reference_index(self) -> 'FHIRDataStore':
+        """
+        Maintain a table of every relative reference with the row of its target,
+        which resolve() looks up instead of matching reference strings against every
+        resource.
+        
+        The index is built from the resources already loaded and extended on every load.
+        
+        Returns:
+            Self for method chaining
+        """
+        if self.lake is not None:
+            raise ValueError("The reference index requires a loaded resource table, not a lake view")
+        from .references import ReferenceIndex
+        if self.reference_index is not None:
+            self.reference_index.drop()
+        self.reference_index = ReferenceIndex(self)
+        self.reference_index.rebuild()
+        self.dialect.reference_indexes[self.table_name] = self.reference_index
+        return self
+    
+    def disable_reference_index(self) -> None:
+        """Drop the reference index; resolve() matches reference strings again."""
+        if self.reference_index is not None:
+            self.dialect.reference_indexes.pop(self.table_name, None)
+            self.reference_index.drop()
+            self.reference_index = None
+    
+    def _resources_changed(self) -> None:
+        """Bring side structures up to date after resources were loaded."""
+        for side_table in (self.shredded_storage, self.coding_index, self.interval_index,
+                           self.compartment_index, self.reference_index):
+            if side_table is not None:
+                side_table.update()
+    
     def execute_sql(self, sql: str, view_def: Optional[Dict] = None) -> QueryResult:
         """Execute SQL and return enhanced result set"""
+        if self.index_advisor is not None:
+            self.index_advisor.record_query(sql)
         return self.dialect.execute_sql(sql, view_def)
     
+    def recommend_indexes(self, min_frequency: int = 2, max_indexes: int = 10) -> List[Dict[str, Any]]:
+        """
+        Propose indexes for the JSON paths the recorded workload filters on.
+        
+        Args:
+            min_frequency: Minimum number of recorded queries filtering on a path
+            max_indexes: Maximum number of recommendations
+            
+        Returns:
+            List of index recommendations (not validated or applied)
+        """
+        if self.index_advisor is None:
+            raise RuntimeError("Workload recording is not enabled (pass record_workload=True)")
+        return [c.to_dict() for c in self.index_advisor.recommend(min_frequency, max_indexes)]
+    
+    def apply_index_recommendations(self, min_frequency: int = 2, max_indexes: int = 10,
+                                    min_benefit: float = 0.1, drop_unused: bool = True,
+                                    dry_run: bool = False) -> Dict[str, Any]:
+        """
+        Build recommended indexes that lower EXPLAIN cost and drop unused advisor indexes.
+        
+        Args:
+            min_frequency: Minimum number of recorded queries filtering on a path
+            max_indexes: Maximum number of candidates to validate
+            min_benefit: Minimum fractional planner-cost reduction to keep an index
+            drop_unused: Drop advisor-created indexes that are no longer recommended
+                and have never been scanned
+            dry_run: Report candidates without building or dropping anything
+            
+        Returns:
+            Report with 'candidates', 'created' and 'dropped'
+        """
+        if self.index_advisor is None:
+            raise RuntimeError("Workload recording is not enabled (pass record_workload=True)")
+        report = self.index_advisor.apply(min_frequency, max_indexes, min_benefit, drop_unused, dry_run)
+        report['candidates'] = [c.to_dict() for c in report['candidates']]
+        return report
+    
     def get_resource_counts(self) -> Dict[str, int]:
         """Get counts of resources by type"""
         return self.dialect.get_resource_counts(self.table_name, self.json_col)
@@ -352,6 +593,31 @@ class FHIRDataStore:
         dialect = DuckDBDialect(database=database)
         return cls(dialect=dialect, **kwargs)
     
+    @classmethod
+    def with_lake(cls, sources: Union[str, List[Any]], database: str = ":memory:",
+                  date_range: Optional[tuple] = None, **kwargs) -> 'FHIRDataStore':
+        """
+        Create a DuckDB FHIRDataStore whose resource table is a view over Parquet/NDJSON
+        files queried in place, with no ingest.
+        
+        Args:
+            sources: Glob or list of globs / fhir4ds.datastore.lake.LakeSource entries.
+                Hive partitions on resourceType and date are used for file pruning.
+            database: DuckDB database holding the view and terminology tables
+            date_range: Optional (start, end) bounds on the date partition, inclusive
+            **kwargs: Passed to FHIRDataStore (table_name, json_col, ...)
+            
+        Returns:
+            Read-only datastore; loading resources into it fails
+        """
+        from .lake import DataLake
+        datastore = cls(dialect=DuckDBDialect(database=database), initialize_table=False, **kwargs)
+        datastore.lake = DataLake(datastore.dialect, datastore.table_name, datastore.json_col,
+                                  [sources] if isinstance(sources, str) else sources, date_range)
+        datastore.lake.create_view()
+        datastore.dialect.create_terminology_system_mappings_table()
+        return datastore
+    
     def view_runner(self) -> 'ViewRunner':
         """Create a ViewRunner instance configured with this datastore for chaining"""
         # Import here to avoid circular imports
@@ -9,35 +9,30 @@ Provides easy export functionality for FHIR query results to various formats:
 - Parquet for analytics workflows
 """
 
+import importlib.util
 import json
 import logging
 from pathlib import Path
 from typing import Dict, List, Any, Optional, Union
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time
+from decimal import Decimal
 
-# Optional imports with graceful fallbacks
-try:
-    import pandas as pd
-    PANDAS_AVAILABLE = True
-except ImportError:
-    PANDAS_AVAILABLE = False
-    pd = None
+from ..utils.tracing import traced, SPAN_FORMAT, ATTR_FORMAT
+from .result import STREAM_BATCH_SIZE
 
-try:
-    import openpyxl
-    EXCEL_AVAILABLE = True
-except ImportError:
-    EXCEL_AVAILABLE = False
-
-try:
-    import pyarrow as pa
-    import pyarrow.parquet as pq
-    PARQUET_AVAILABLE = True
-except ImportError:
-    PARQUET_AVAILABLE = False
+# Optional dependencies are only probed here; pandas/openpyxl/pyarrow are
+# imported inside the export methods so loading this module stays cheap.
+PANDAS_AVAILABLE = importlib.util.find_spec("pandas") is not None
+EXCEL_AVAILABLE = importlib.util.find_spec("openpyxl") is not None
+PARQUET_AVAILABLE = importlib.util.find_spec("pyarrow") is not None
 
 logger = logging.getLogger(__name__)
 
+# Excel worksheet limits: rows (including the header row) and sheet name length
+EXCEL_MAX_ROWS = 1_048_576
+EXCEL_MAX_SHEET_NAME = 31
+
 
 class ResultFormatter:
     """
@@ -70,6 +65,7 @@ class ResultFormatter:
             raise ImportError(
                 "pandas is required for DataFrame export. Install with: pip install pandas"
             )
+        import pandas as pd
         
         # Use the built-in to_df method if available
         if hasattr(result, 'to_df'):
@@ -101,6 +97,7 @@ class ResultFormatter:
         raise ValueError(f"Cannot convert result type {type(result)} to DataFrame")
     
     @staticmethod
+    @traced(SPAN_FORMAT, {ATTR_FORMAT: "json"})
     def to_json(result, output_path: Optional[Union[str, Path]] = None, 
                 include_metadata: bool = True, indent: int = 2) -> Union[str, None]:
         """
@@ -176,6 +173,7 @@ class ResultFormatter:
         return json_str
     
     @staticmethod
+    @traced(SPAN_FORMAT, {ATTR_FORMAT: "csv"})
     def to_csv(result, output_path: Optional[Union[str, Path]] = None, 
                delimiter: str = ',', include_header: bool = True,
                include_metadata: bool = False) -> Optional[str]:
@@ -202,6 +200,11 @@ class ResultFormatter:
         # Determine if we're writing to file or string
         write_to_file = output_path is not None
         
+        # Files without a leading row count can be written batch by batch
+        if write_to_file and not include_metadata and hasattr(result, 'stream'):
+            ResultFormatter.stream_to_csv(result, output_path, delimiter, include_header)
+            return None
+        
         if write_to_file:
             output_path = Path(output_path)
             output_path.parent.mkdir(parents=True, exist_ok=True)
@@ -261,6 +264,7 @@ class ResultFormatter:
         logger.info(f"CSV exported to {output_path} ({len(rows)} rows, {len(columns)} columns)")
     
     @staticmethod
+    @traced(SPAN_FORMAT, {ATTR_FORMAT: "excel"})
     def to_excel(results: Union[Any, List[Any]], output_path: Union[str, Path],
                  sheet_names: Optional[List[str]] = None, 
                  include_metadata: bool = True) -> None:
@@ -288,6 +292,7 @@ class ResultFormatter:
             raise ImportError(
                 "openpyxl is required for Excel export. Install with: pip install openpyxl"
             )
+        import pandas as pd
         
         output_path = Path(output_path)
         output_path.parent.mkdir(parents=True, exist_ok=True)
@@ -342,6 +347,194 @@ class ResultFormatter:
         logger.info(f"Excel file exported to {output_path}")
     
     @staticmethod
+    @traced(SPAN_FORMAT, {ATTR_FORMAT: "csv"})
+    def stream_to_csv(result, output_path: Union[str, Path], delimiter: str = ',',
+                      include_header: bool = True, batch_size: int = STREAM_BATCH_SIZE) -> int:
+        """
+        Write query results to a CSV file from cursor batches, holding one batch in memory.
+        
+        Args:
+            result: QueryResult or similar result object
+            output_path: File path to save CSV
+            delimiter: CSV delimiter character
+            include_header: Whether to include column headers
+            batch_size: Rows fetched from the cursor per write
+            
+        Returns:
+            Number of data rows written
+            
+        Example:
+            >>> ResultFormatter.stream_to_csv(query_result, "extract.csv")
+        """
+        import csv
+        
+        output_path = Path(output_path)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        columns, batches = ResultFormatter._stream_rows(result, batch_size)
+        
+        row_count = 0
+        with open(output_path, 'w', newline='', encoding='utf-8') as output_file:
+            writer = csv.writer(output_file, delimiter=delimiter)
+            if include_header and columns:
+                writer.writerow(columns)
+            for batch in batches:
+                writer.writerows(batch)
+                row_count += len(batch)
+        
+        logger.info(f"CSV streamed to {output_path} ({row_count} rows, {len(columns)} columns)")
+        return row_count
+    
+    @staticmethod
+    @traced(SPAN_FORMAT, {ATTR_FORMAT: "excel"})
+    def stream_to_excel(results: Union[Any, List[Any]], output_path: Union[str, Path],
+                        sheet_names: Optional[List[str]] = None, include_metadata: bool = True,
+                        batch_size: int = STREAM_BATCH_SIZE, parallel: bool = False,
+                        max_rows_per_sheet: int = EXCEL_MAX_ROWS) -> None:
+        """
+        Write query results to Excel with openpyxl's write-only workbook, batch by batch.
+        
+        Unlike to_excel(), rows go straight from the cursor to the worksheet stream, so
+        memory stays flat regardless of result size. A result with more rows than fit
+        on a worksheet continues on "<name>_2", "<name>_3", ... sheets.
+        
+        Args:
+            results: Single result or list of results to export
+            output_path: File path to save Excel file
+            sheet_names: Optional list of sheet names. If None, generates default names.
+            include_metadata: Whether to include metadata sheet
+            batch_size: Rows fetched from the cursor per write
+            parallel: Execute the next sheet's query while the current sheet is written
+            max_rows_per_sheet: Rows per worksheet including the header (Excel's limit by default)
+            
+        Raises:
+            ImportError: If openpyxl is not available
+            
+        Example:
+            >>> ResultFormatter.stream_to_excel([result1, result2], "extract.xlsx",
+            ...                                 sheet_names=["Patients", "Observations"], parallel=True)
+        """
+        if not EXCEL_AVAILABLE:
+            raise ImportError(
+                "openpyxl is required for Excel export. Install with: pip install openpyxl"
+            )
+        from openpyxl import Workbook
+        
+        output_path = Path(output_path)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        if not isinstance(results, list):
+            results = [results]
+        if not sheet_names:
+            sheet_names = [f"Sheet_{i+1}" for i in range(len(results))]
+        elif len(sheet_names) != len(results):
+            raise ValueError(f"Number of sheet names ({len(sheet_names)}) must match number of results ({len(results)})")
+        
+        workbook = Workbook(write_only=True)
+        metadata_info = []
+        executor = ThreadPoolExecutor(max_workers=1) if parallel and len(results) > 1 else None
+        next_stream = executor.submit(ResultFormatter._stream_rows, results[0], batch_size) if executor else None
+        
+        try:
+            for i, result in enumerate(results):
+                sheet_name = sheet_names[i]
+                try:
+                    if executor:
+                        # Start the next query before writing this sheet
+                        current = next_stream
+                        if i + 1 < len(results):
+                            next_stream = executor.submit(ResultFormatter._stream_rows, results[i + 1], batch_size)
+                        columns, batches = current.result()
+                    else:
+                        columns, batches = ResultFormatter._stream_rows(result, batch_size)
+                    
+                    row_count, sheets = ResultFormatter._write_excel_sheets(
+                        workbook, sheet_name, columns, batches, max_rows_per_sheet)
+                    
+                    if include_metadata:
+                        sheet_metadata = {
+                            'sheet_name': sheet_name,
+                            'row_count': row_count,
+                            'column_count': len(columns),
+                            'columns': ', '.join(columns),
+                            'sheets': ', '.join(sheets),
+                            'sql_query': getattr(result, 'sql', ''),
+                        }
+                        metadata_info.append(sheet_metadata)
+                    
+                    logger.info(f"Sheet '{sheet_name}' streamed ({row_count} rows over {len(sheets)} sheet(s))")
+                
+                except Exception as e:
+                    logger.error(f"Failed to export sheet '{sheet_name}': {e}")
+                    error_sheet = workbook.create_sheet(sheet_name[:EXCEL_MAX_SHEET_NAME])
+                    error_sheet.append(['Error'])
+                    error_sheet.append([f"Failed to export: {str(e)}"])
+        finally:
+            if executor:
+                executor.shutdown(wait=True)
+        
+        if include_metadata and metadata_info:
+            metadata_sheet = workbook.create_sheet('_Metadata')
+            metadata_sheet.append(list(metadata_info[0]))
+            for sheet_metadata in metadata_info:
+                metadata_sheet.append(list(sheet_metadata.values()))
+        
+        workbook.save(output_path)
+        logger.info(f"Excel file streamed to {output_path}")
+    
+    @staticmethod
+    def _stream_rows(result, batch_size: int):
+        """Column names and row batches for a result, streaming when it supports it."""
+        if hasattr(result, 'stream'):
+            return result.stream(batch_size)
+        if not hasattr(result, 'fetchall'):
+            raise ValueError(f"Cannot extract rows from result type {type(result)}")
+        rows = result.fetchall()
+        description = getattr(result, 'description', None) or []
+        columns = [desc[0] for desc in description]
+        return columns, (rows[i:i + batch_size] for i in range(0, len(rows), batch_size))
+    
+    @staticmethod
+    def _write_excel_sheets(workbook, sheet_name: str, columns: List[str], batches,
+                            max_rows_per_sheet: int):
+        """Append batches to write-only sheets, rolling over to a new sheet at the row limit."""
+        rows_per_sheet = max_rows_per_sheet - 1  # header row
+        sheets = []
+        sheet = None
+        sheet_rows = rows_per_sheet
+        row_count = 0
+        
+        def new_sheet():
+            suffix = f"_{len(sheets) + 1}" if sheets else ""
+            name = sheet_name[:EXCEL_MAX_SHEET_NAME - len(suffix)] + suffix
+            created = workbook.create_sheet(name)
+            created.append(columns)
+            sheets.append(name)
+            return created
+        
+        for batch in batches:
+            for row in batch:
+                if sheet_rows == rows_per_sheet:
+                    sheet = new_sheet()
+                    sheet_rows = 0
+                sheet.append([ResultFormatter._excel_value(value) for value in row])
+                sheet_rows += 1
+                row_count += 1
+        
+        if not sheets:
+            new_sheet()
+        return row_count, sheets
+    
+    @staticmethod
+    def _excel_value(value: Any) -> Any:
+        """Cell value openpyxl can write; collections become JSON text."""
+        if value is None or isinstance(value, (str, int, float, bool, Decimal, date, datetime, time)):
+            return value
+        if isinstance(value, (list, dict)):
+            return json.dumps(value, default=str)
+        return str(value)
+    
+    @staticmethod
+    @traced(SPAN_FORMAT, {ATTR_FORMAT: "parquet"})
     def to_parquet(result, output_path: Union[str, Path], 
                    compression: str = 'snappy', include_metadata: bool = True) -> None:
         """
@@ -364,6 +557,8 @@ class ResultFormatter:
             raise ImportError(
                 "pyarrow is required for Parquet export. Install with: pip install pyarrow"
             )
+        import pyarrow as pa
+        import pyarrow.parquet as pq
         
         output_path = Path(output_path)
         output_path.parent.mkdir(parents=True, exist_ok=True)
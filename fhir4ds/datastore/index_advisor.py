@@ -0,0 +1,323 @@
+"""
+Workload-Driven Index Advisor
+
+Records the JSON paths that executed SQL (compiled ViewDefinitions, CQL
+retrieves) actually filters on, proposes indexes for the frequent ones and
+validates each candidate with EXPLAIN before keeping it.
+
+- PostgreSQL: expression indexes on the exact extraction expression the SQL
+  generators emit (``jsonb_extract_path_text(resource, 'code', ...)``), made
+  partial on the resource type when the workload filters on a single type.
+  Each candidate is built, the table re-analyzed, and kept only if the
+  planner's total cost for a recorded query drops by ``min_benefit``.
+  Advisor-created indexes that no longer pay off and have never been scanned
+  are dropped.
+- DuckDB: ART indexes cannot be built on JSON expressions and generated
+  columns cannot be added to an existing table, so candidates are reported
+  with the generated column and index DDL to use when the table is
+  (re)created, but are not applied.
+
+Usage:
+    db = QuickConnect.postgresql("postgresql://...", record_workload=True)
+    db.execute(view_definition)   # workload is recorded as queries run
+    report = db.apply_index_recommendations()
+"""
+
+import hashlib
+import json
+import logging
+import re
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Prefix for indexes owned by the advisor; only these are ever dropped
+INDEX_PREFIX = "fhir4ds_idx_"
+
+_COMPARISON_AFTER_RE = re.compile(r"\s*(?:=|<>|!=|<=|>=|<|>|IN\b|LIKE\b|ILIKE\b|BETWEEN\b|IS\b)", re.IGNORECASE)
+_COMPARISON_BEFORE_RE = re.compile(r"(?:=|<>|!=|<=|>=|<|>)\s*$")
+_RESOURCE_TYPE_RE = re.compile(r"resourceType'\s*\)\s*=\s*'([A-Za-z]+)'")
+
+
+@dataclass
+class PathUsage:
+    """How often the workload touches one JSON path of one resource type"""
+    resource_type: Optional[str]
+    path: str
+    occurrences: int = 0
+    predicate_occurrences: int = 0
+    queries: int = 0
+    sample_sql: Optional[str] = None
+
+
+@dataclass
+class IndexCandidate:
+    """A proposed index and the result of validating it"""
+    name: str
+    resource_type: Optional[str]
+    path: str
+    frequency: int
+    create_sql: str
+    drop_sql: str
+    kind: str
+    applicable: bool = True
+    reason: Optional[str] = None
+    cost_before: Optional[float] = None
+    cost_after: Optional[float] = None
+    approved: bool = False
+
+    @property
+    def benefit(self) -> Optional[float]:
+        """Fractional planner-cost reduction measured for the sample query."""
+        if not self.cost_before or self.cost_after is None:
+            return None
+        return (self.cost_before - self.cost_after) / self.cost_before
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'resource_type': self.resource_type,
+            'path': self.path,
+            'frequency': self.frequency,
+            'kind': self.kind,
+            'create_sql': self.create_sql,
+            'applicable': self.applicable,
+            'reason': self.reason,
+            'cost_before': self.cost_before,
+            'cost_after': self.cost_after,
+            'benefit': self.benefit,
+            'approved': self.approved,
+        }
+
+
+class IndexAdvisor:
+    """
+    Records JSON path usage from executed SQL and turns it into validated indexes.
+    """
+
+    def __init__(self, dialect, table_name: str = "fhir_resources", json_col: str = "resource",
+                 max_sample_sql_length: int = 100000):
+        self.dialect = dialect
+        self.table_name = table_name
+        self.json_col = json_col
+        self.max_sample_sql_length = max_sample_sql_length
+        self.usage: Dict[Tuple[Optional[str], str], PathUsage] = {}
+        self.queries_recorded = 0
+        self._lock = threading.RLock()
+
+        col = re.escape(json_col)
+        self._extract_patterns = [
+            # DuckDB: json_extract_string(resource, '$.code.text')
+            (re.compile(r"json_extract(?:_string)?\(\s*(?:\w+\.)?" + col + r"\s*,\s*'\$\.([A-Za-z0-9_.]+)'\s*\)"),
+             lambda m: m.group(1)),
+            # PostgreSQL: jsonb_extract_path_text(resource, 'code', 'text')
+            (re.compile(r"jsonb_extract_path_text\(\s*(?:\w+\.)?" + col + r"\s*((?:,\s*'[A-Za-z0-9_]+'\s*)+)\)"),
+             lambda m: ".".join(re.findall(r"'([A-Za-z0-9_]+)'", m.group(1)))),
+        ]
+
+    @property
+    def dialect_name(self) -> str:
+        return str(getattr(self.dialect, 'name', '')).upper()
+
+    def record_query(self, sql: str) -> None:
+        """Record the JSON paths used by one executed query."""
+        if not sql:
+            return
+
+        resource_types = set(_RESOURCE_TYPE_RE.findall(sql))
+        resource_type = resource_types.pop() if len(resource_types) == 1 else None
+
+        seen = {}
+        for pattern, to_path in self._extract_patterns:
+            for match in pattern.finditer(sql):
+                path = to_path(match)
+                if not path or path == 'resourceType' or path[0].isdigit():
+                    continue
+                is_predicate = bool(_COMPARISON_AFTER_RE.match(sql, match.end()) or
+                                    _COMPARISON_BEFORE_RE.search(sql, max(0, match.start() - 8), match.start()))
+                count, predicates = seen.get(path, (0, 0))
+                seen[path] = (count + 1, predicates + int(is_predicate))
+
+        with self._lock:
+            self.queries_recorded += 1
+            for path, (count, predicates) in seen.items():
+                key = (resource_type, path)
+                entry = self.usage.get(key)
+                if entry is None:
+                    entry = self.usage[key] = PathUsage(resource_type, path)
+                entry.occurrences += count
+                entry.predicate_occurrences += predicates
+                entry.queries += 1
+                if predicates and len(sql) <= self.max_sample_sql_length:
+                    entry.sample_sql = sql
+
+    def get_workload(self) -> List[Dict[str, Any]]:
+        """Recorded path usage, most frequently filtered first."""
+        with self._lock:
+            entries = sorted(self.usage.values(), key=lambda u: (u.predicate_occurrences, u.queries), reverse=True)
+            return [{'resource_type': u.resource_type, 'path': u.path, 'occurrences': u.occurrences,
+                     'predicate_occurrences': u.predicate_occurrences, 'queries': u.queries}
+                    for u in entries]
+
+    def reset(self) -> None:
+        """Forget the recorded workload."""
+        with self._lock:
+            self.usage.clear()
+            self.queries_recorded = 0
+
+    def recommend(self, min_frequency: int = 2, max_indexes: int = 10) -> List[IndexCandidate]:
+        """
+        Propose indexes for paths the workload filters on at least ``min_frequency`` queries.
+
+        Returns:
+            Candidates, most frequently used first (not yet validated)
+        """
+        with self._lock:
+            usages = [u for u in self.usage.values()
+                      if u.predicate_occurrences and u.queries >= min_frequency]
+        usages.sort(key=lambda u: (u.queries, u.predicate_occurrences), reverse=True)
+        return [self._build_candidate(u) for u in usages[:max_indexes]]
+
+    def _build_candidate(self, usage: PathUsage) -> IndexCandidate:
+        key = f"{usage.resource_type}:{usage.path}"
+        name = f"{INDEX_PREFIX}{self.table_name}_{hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]}"
+        expression = self.dialect.extract_json_field(self.json_col, f"$.{usage.path}")
+        type_filter = None
+        if usage.resource_type:
+            type_filter = f"{self.dialect.extract_json_field(self.json_col, '$.resourceType')} = '{usage.resource_type}'"
+
+        if self.dialect_name == 'POSTGRESQL':
+            create_sql = f"CREATE INDEX IF NOT EXISTS {name} ON {self.table_name} USING BTREE (({expression}))"
+            if type_filter:
+                create_sql += f" WHERE {type_filter}"
+            return IndexCandidate(name=name, resource_type=usage.resource_type, path=usage.path,
+                                  frequency=usage.queries, create_sql=create_sql,
+                                  drop_sql=f"DROP INDEX IF EXISTS {name}",
+                                  kind='partial_expression' if type_filter else 'expression')
+
+        column = f"{usage.path.replace('.', '_')}_value"
+        create_sql = (f"-- in CREATE TABLE {self.table_name}: {column} VARCHAR GENERATED ALWAYS AS ({expression}) VIRTUAL;\n"
+                      f"CREATE INDEX {name} ON {self.table_name} ({column})")
+        return IndexCandidate(name=name, resource_type=usage.resource_type, path=usage.path,
+                              frequency=usage.queries, create_sql=create_sql,
+                              drop_sql=f"DROP INDEX IF EXISTS {name}", kind='generated_column',
+                              applicable=False,
+                              reason="DuckDB cannot index JSON expressions or add generated columns "
+                                     "to an existing table; recreate the table with this column")
+
+    def explain_cost(self, sql: str) -> Optional[float]:
+        """Planner total cost for ``sql`` (PostgreSQL), or None if unavailable."""
+        if self.dialect_name != 'POSTGRESQL':
+            return None
+        cursor = self.dialect.connection.cursor()
+        try:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}")
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return float(plan[0]['Plan']['Total Cost'])
+        finally:
+            cursor.close()
+
+    def validate(self, candidate: IndexCandidate, min_benefit: float = 0.1) -> IndexCandidate:
+        """
+        Build the candidate, compare EXPLAIN cost of a recorded query before and
+        after, and drop it again unless the cost fell by at least ``min_benefit``.
+        """
+        if not candidate.applicable:
+            return candidate
+
+        with self._lock:
+            usage = self.usage.get((candidate.resource_type, candidate.path))
+            sample_sql = usage.sample_sql if usage else None
+        if not sample_sql:
+            candidate.reason = "no recorded query to validate against"
+            return candidate
+
+        already_exists = candidate.name in self._existing_advisor_indexes()
+        cursor = self.dialect.connection.cursor()
+        try:
+            if already_exists:
+                cursor.execute(candidate.drop_sql)
+            candidate.cost_before = self.explain_cost(sample_sql)
+            cursor.execute(candidate.create_sql)
+            cursor.execute(f"ANALYZE {self.table_name}")
+            candidate.cost_after = self.explain_cost(sample_sql)
+
+            benefit = candidate.benefit
+            candidate.approved = benefit is not None and benefit >= min_benefit
+            if not candidate.approved:
+                cursor.execute(candidate.drop_sql)
+                candidate.reason = f"planner cost reduction {benefit or 0:.1%} below {min_benefit:.0%}"
+        except Exception as e:
+            candidate.reason = f"validation failed: {e}"
+            candidate.approved = False
+            try:
+                cursor.execute(candidate.drop_sql)
+            except Exception:
+                pass
+        finally:
+            cursor.close()
+
+        logger.info(f"Index candidate {candidate.name} ({candidate.resource_type}.{candidate.path}): "
+                    f"cost {candidate.cost_before} -> {candidate.cost_after}, approved={candidate.approved}")
+        return candidate
+
+    def _existing_advisor_indexes(self) -> Dict[str, int]:
+        """Advisor-owned indexes on the table with their scan counts (PostgreSQL)."""
+        if self.dialect_name != 'POSTGRESQL':
+            return {}
+        cursor = self.dialect.connection.cursor()
+        try:
+            cursor.execute(
+                "SELECT indexrelname, idx_scan FROM pg_stat_user_indexes "
+                "WHERE relname = %s AND indexrelname LIKE %s",
+                (self.table_name, INDEX_PREFIX + '%')
+            )
+            return {row[0]: row[1] or 0 for row in cursor.fetchall()}
+        finally:
+            cursor.close()
+
+    def apply(self, min_frequency: int = 2, max_indexes: int = 10, min_benefit: float = 0.1,
+              drop_unused: bool = True, dry_run: bool = False) -> Dict[str, Any]:
+        """
+        Validate and build recommended indexes, and drop advisor indexes that are unused.
+
+        Args:
+            min_frequency: Minimum number of recorded queries filtering on a path
+            max_indexes: Maximum number of candidates to consider
+            min_benefit: Minimum fractional EXPLAIN cost reduction to keep an index
+            drop_unused: Drop advisor-created indexes that are no longer recommended
+                and have never been scanned
+            dry_run: Only report candidates; build and drop nothing
+
+        Returns:
+            Report with candidates, created and dropped index names
+        """
+        candidates = self.recommend(min_frequency, max_indexes)
+        report = {'dialect': self.dialect_name, 'queries_recorded': self.queries_recorded,
+                  'created': [], 'dropped': [], 'candidates': candidates}
+        if dry_run:
+            return report
+
+        for candidate in candidates:
+            self.validate(candidate, min_benefit)
+            if candidate.approved:
+                report['created'].append(candidate.name)
+
+        if drop_unused:
+            approved = {c.name for c in candidates if c.approved}
+            cursor = None
+            for name, scans in self._existing_advisor_indexes().items():
+                if name in approved or scans > 0:
+                    continue
+                cursor = cursor or self.dialect.connection.cursor()
+                cursor.execute(f"DROP INDEX IF EXISTS {name}")
+                report['dropped'].append(name)
+            if cursor is not None:
+                cursor.close()
+
+        logger.info(f"Index advisor created {len(report['created'])} and dropped {len(report['dropped'])} indexes")
+        return report
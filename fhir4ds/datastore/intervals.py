@@ -0,0 +1,158 @@
+"""
+Resource Interval Index
+
+Optional side table holding each resource's clinically relevant time normalized
+to a closed [start_ts, end_ts] timestamp interval, so temporal relationships
+between resources ("Observation during Encounter") are evaluated as range joins
+over plain columns instead of comparing JSON-extracted timestamps per row pair:
+
+    resource_intervals(row_id, resource_type, patient_id, start_ts, end_ts)
+
+- the time element per resource type is listed in CLINICAL_TIME_ELEMENTS; choice
+  elements (``effective[x]``) may be a dateTime, instant or Period
+- point-in-time values have start_ts = end_ts; an open Period (or a Condition
+  without abatement) ends at 'infinity'
+- timestamps are converted to UTC; partial dates ("2020-01") and resources
+  without a time are not indexed
+- PostgreSQL additionally stores a tsrange ``period`` column with a GiST index,
+  so range operators (<@, &&, <<, >>) can use it
+
+The index is kept current by the datastore's load paths like the coding index
+(fhir4ds.datastore.codings). fhir4ds.cql.core.temporal_join finds it through
+``dialect.interval_index_tables`` and normalizes times inline without it.
+
+Usage:
+    datastore = FHIRDataStore.with_duckdb()
+    datastore.enable_interval_index()
+    datastore.load_resources(resources)
+    # with [Observation] O such that O.effective during E.period now joins resource_intervals
+"""
+
+import logging
+from typing import Iterable, List, Optional, Tuple
+
+from .side_tables import IncrementalSideTable, sql_literal
+
+logger = logging.getLogger(__name__)
+
+# Element holding the clinically relevant time per resource type, as
+# (start element, end element); the end defaults to the start element
+CLINICAL_TIME_ELEMENTS = {
+    'Observation': ('effective[x]', None),
+    'Condition': ('onset[x]', 'abatement[x]'),
+    'Encounter': ('period', None),
+    'Procedure': ('performed[x]', None),
+    'DiagnosticReport': ('effective[x]', None),
+    'MedicationRequest': ('authoredOn', None),
+    'MedicationAdministration': ('effective[x]', None),
+    'MedicationDispense': ('whenHandedOver', None),
+    'MedicationStatement': ('effective[x]', None),
+    'Immunization': ('occurrence[x]', None),
+    'AllergyIntolerance': ('onset[x]', None),
+    'ServiceRequest': ('authoredOn', None),
+    'DocumentReference': ('date', None),
+    'ImagingStudy': ('started', None),
+    'Coverage': ('period', None),
+    'CarePlan': ('period', None),
+    'Claim': ('billablePeriod', None),
+    'ExplanationOfBenefit': ('billablePeriod', None),
+}
+
+# Non-choice elements of type Period
+PERIOD_ELEMENTS = {'period', 'billablePeriod'}
+
+
+def interval_index_name(table_name: str) -> str:
+    """Name of the interval index table for a resource table."""
+    return 'resource_intervals' if table_name == 'fhir_resources' else f"{table_name}_intervals"
+
+
+def interval_index_table(dialect, table_name: str) -> Optional[str]:
+    """The interval index table registered for a resource table, or None."""
+    return getattr(dialect, 'interval_index_tables', {}).get(table_name)
+
+
+def time_paths(resource_type: str) -> Tuple[List[str], List[str]]:
+    """JSON paths (relative to the resource) that may hold the start and the end of its time."""
+    start_element, end_element = CLINICAL_TIME_ELEMENTS[resource_type]
+    return _element_bounds(start_element)[0], _element_bounds(end_element or start_element)[1]
+
+
+def _element_bounds(element: str) -> Tuple[List[str], List[str]]:
+    if element.endswith('[x]'):
+        base = element[:-3]
+        points = [f'{base}DateTime', f'{base}Instant']
+        return points + [f'{base}Period.start'], points + [f'{base}Period.end']
+    if element in PERIOD_ELEMENTS:
+        return [f'{element}.start'], [f'{element}.end']
+    return [element], [element]
+
+
+def interval_bounds_sql(dialect, json_expr: str, resource_type: str) -> Tuple[str, str]:
+    """
+    SQL expressions for the (start_ts, end_ts) of resources of one type.
+
+    Both are NULL when the resource has no (parseable) time; a missing end of a
+    resource that has a start is 'infinity'.
+    """
+    start_paths, end_paths = time_paths(resource_type)
+    start = _coalesce([_timestamp_sql(dialect, json_expr, p) for p in start_paths])
+    end = _coalesce([_timestamp_sql(dialect, json_expr, p) for p in end_paths]
+                    + [f"CASE WHEN {start} IS NOT NULL THEN CAST('infinity' AS TIMESTAMP) END"])
+    return start, end
+
+
+def _coalesce(expressions: List[str]) -> str:
+    return expressions[0] if len(expressions) == 1 else f"COALESCE({', '.join(expressions)})"
+
+
+def _timestamp_sql(dialect, json_expr: str, path: str) -> str:
+    """UTC timestamp of a FHIR date/dateTime/instant, NULL if absent or a partial date."""
+    text = dialect.extract_json_field(json_expr, f'$.{path}')
+    if dialect.name.upper() == 'POSTGRESQL':
+        return (f"CASE WHEN {text} ~ '^\\d{{4}}-\\d{{2}}-\\d{{2}}' "
+                f"THEN ({text})::timestamptz AT TIME ZONE 'UTC' END")
+    return f"(TRY_CAST({text} AS TIMESTAMPTZ) AT TIME ZONE 'UTC')"
+
+
+class IntervalIndex(IncrementalSideTable):
+    """Builds and incrementally maintains the interval index of a datastore"""
+
+    def __init__(self, datastore, resource_types: Optional[Iterable[str]] = None):
+        """
+        Args:
+            datastore: FHIRDataStore whose base table is indexed
+            resource_types: Resource types to index (default: all in CLINICAL_TIME_ELEMENTS)
+        """
+        super().__init__(datastore, interval_index_name(datastore.table_name))
+        resource_types = list(resource_types or CLINICAL_TIME_ELEMENTS)
+        unknown = [rt for rt in resource_types if rt not in CLINICAL_TIME_ELEMENTS]
+        if unknown:
+            raise ValueError(f"No clinical time element known for resource types: {', '.join(unknown)}")
+        self.resource_types = resource_types
+
+    def create_table_statements(self) -> List[str]:
+        columns = ("row_id INTEGER, resource_type VARCHAR, patient_id VARCHAR, "
+                   "start_ts TIMESTAMP, end_ts TIMESTAMP")
+        if not self.is_postgresql:
+            return [f"CREATE TABLE {self.table_name} ({columns})"]
+        return [
+            f"CREATE TABLE {self.table_name} ({columns}, period tsrange)",
+            f"CREATE INDEX {self.table_name}_period_idx ON {self.table_name} USING gist (period)",
+            f"CREATE INDEX {self.table_name}_patient_idx ON {self.table_name} (patient_id, resource_type)",
+        ]
+
+    def populate_sql(self, low: int, high: int) -> str:
+        """INSERT normalizing the times of base table rows with low < id <= high."""
+        starts, ends = [], []
+        for rt in self.resource_types:
+            start, end = interval_bounds_sql(self.dialect, 'r.resource', rt)
+            starts.append(f"WHEN {sql_literal(rt)} THEN {start}")
+            ends.append(f"WHEN {sql_literal(rt)} THEN {end}")
+        bounds = (f"SELECT r.row_id, r.resource_type, r.patient_id, "
+                  f"CASE r.resource_type {' '.join(starts)} END AS start_ts, "
+                  f"CASE r.resource_type {' '.join(ends)} END AS end_ts "
+                  f"FROM ({self.new_rows_sql(low, high, self.resource_types)}) r")
+        period = ", tsrange(start_ts, end_ts, '[]')" if self.is_postgresql else ""
+        return (f"INSERT INTO {self.table_name} SELECT row_id, resource_type, patient_id, start_ts, end_ts{period} "
+                f"FROM ({bounds}) b WHERE start_ts IS NOT NULL AND end_ts >= start_ts")
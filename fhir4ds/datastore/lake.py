@@ -0,0 +1,195 @@
+"""
+Data Lake Sources
+
+Lake-backed datastore mode for DuckDB: instead of copying resources into the
+``fhir_resources`` table, the resource relation is a view over Parquet and
+NDJSON files read in place with ``read_parquet`` / ``read_ndjson_objects``.
+Bulk Data exports and partitioned lake layouts are queryable as soon as the
+view exists; nothing is ingested.
+
+Hive-partitioned layouts (``.../resourceType=Observation/date=2024-01-01/*.parquet``)
+expose their partition keys as view columns so DuckDB skips files that cannot
+match:
+- ViewRunner adds a ``resourceType`` partition predicate next to its JSON
+  resource type filter, so a Patient view only opens Patient files
+- a date range restricts the whole view to matching ``date`` partitions, which
+  also prunes CQL and raw SQL queries that run against the view unchanged
+
+Sources without a resourceType partition still work; the view derives the
+column from the resource JSON and every file is scanned.
+
+Usage:
+    datastore = FHIRDataStore.with_lake('/data/lake/**/*.parquet')
+    datastore = FHIRDataStore.with_lake(
+        ['/exports/2024/*.ndjson', '/data/lake/**/*.parquet'],
+        date_range=('2024-01-01', '2024-06-30'))
+    datastore.view_runner().execute_view_definition(view_definition)
+"""
+
+import glob
+import logging
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+LAKE_FORMATS = ('parquet', 'ndjson')
+
+# Hive partition keys recognised by the lake view
+RESOURCE_TYPE_PARTITION = 'resourceType'
+DATE_PARTITION = 'date'
+
+_FORMAT_EXTENSIONS = {
+    '.parquet': 'parquet',
+    '.ndjson': 'ndjson',
+    '.jsonl': 'ndjson',
+    '.json': 'ndjson',
+}
+
+
+@dataclass
+class LakeSource:
+    """A glob of Parquet or NDJSON files exposed through the lake view"""
+    path: str
+    format: Optional[str] = None
+    resource_column: str = 'resource'  # Parquet column holding the resource JSON
+    hive_partitioning: bool = True
+
+    def __post_init__(self):
+        if self.format is None:
+            self.format = infer_format(self.path)
+        if self.format not in LAKE_FORMATS:
+            raise ValueError(f"Unsupported lake format '{self.format}', expected one of {LAKE_FORMATS}")
+
+    def reader_sql(self) -> str:
+        """Table function call reading this source."""
+        path = self.path.replace("'", "''")
+        hive = 'true' if self.hive_partitioning else 'false'
+        if self.format == 'parquet':
+            return f"read_parquet('{path}', hive_partitioning = {hive}, union_by_name = true)"
+        return f"read_ndjson_objects('{path}', hive_partitioning = {hive})"
+
+    def json_expression(self) -> str:
+        """Expression yielding the resource JSON from a row of reader_sql()."""
+        if self.format == 'parquet':
+            return f'CAST("{self.resource_column}" AS JSON)'
+        return 'CAST(json AS JSON)'
+
+
+def infer_format(path: str) -> str:
+    """Lake format from a path or glob's file extension."""
+    extension = os.path.splitext(path.rstrip('*'))[1].lower()
+    if extension not in _FORMAT_EXTENSIONS:
+        raise ValueError(f"Cannot infer lake format from '{path}'; pass format='parquet' or 'ndjson'")
+    return _FORMAT_EXTENSIONS[extension]
+
+
+class DataLake:
+    """Maintains the view that exposes lake sources as a datastore's resource table"""
+
+    def __init__(self, dialect, table_name: str, json_col: str,
+                 sources: Sequence[Union[str, LakeSource]],
+                 date_range: Optional[Tuple[Optional[str], Optional[str]]] = None):
+        """
+        Args:
+            dialect: DuckDB dialect the view is created on
+            table_name: Name of the view standing in for the resource table
+            json_col: Name of the view's resource JSON column
+            sources: Globs or LakeSource entries; formats are inferred from extensions
+            date_range: Optional (start, end) bounds on the ``date`` partition, inclusive
+        """
+        if dialect.name.upper() != 'DUCKDB':
+            raise ValueError("Lake-backed datastores require the DuckDB dialect")
+        if not sources:
+            raise ValueError("At least one lake source is required")
+        self.dialect = dialect
+        self.table_name = table_name
+        self.json_col = json_col
+        self.sources = [s if isinstance(s, LakeSource) else LakeSource(s) for s in sources]
+        self.date_range = date_range
+        self._partition_columns: Dict[int, List[str]] = {}
+
+    def create_view(self) -> None:
+        """(Re)create the lake view; call again after files are added under a new partition key."""
+        self._partition_columns = {i: self._discover_partitions(s) for i, s in enumerate(self.sources)}
+        self.dialect.get_connection().execute(f"CREATE OR REPLACE VIEW {self.table_name} AS {self.view_sql()}")
+        logger.info(f"Created lake view {self.table_name} over {len(self.sources)} source(s)")
+
+    def view_sql(self) -> str:
+        """SELECT combining every source into (json_col, resourceType, partition columns...)."""
+        selects = [self._source_select(i, source) for i, source in enumerate(self.sources)]
+        sql = ' UNION ALL BY NAME '.join(selects)
+        date_filter = self._date_filter()
+        if date_filter:
+            sql = f"SELECT * FROM ({sql}) WHERE {date_filter}"
+        return sql
+
+    def set_date_range(self, start: Optional[str] = None, end: Optional[str] = None) -> None:
+        """Restrict the view to ``date`` partitions within [start, end]; both None clears it."""
+        self.date_range = (start, end) if start or end else None
+        self.create_view()
+
+    def partitioned_by(self, column: str) -> bool:
+        """Whether every source is hive-partitioned on ``column``."""
+        return bool(self._partition_columns) and all(
+            column in columns for columns in self._partition_columns.values()
+        )
+
+    def resource_type_predicate(self, resource_type: str) -> Optional[str]:
+        """Partition filter for a resource type, or None when no source is partitioned by it."""
+        # Unpartitioned sources derive the column from JSON, so the filter stays correct for them
+        if not any(RESOURCE_TYPE_PARTITION in columns for columns in self._partition_columns.values()):
+            return None
+        return f"\"{RESOURCE_TYPE_PARTITION}\" = '{resource_type}'"
+
+    def describe(self) -> Dict[str, object]:
+        """Sources, partition keys and date range of the lake view."""
+        return {
+            'view': self.table_name,
+            'sources': [
+                {'path': s.path, 'format': s.format, 'partitions': self._partition_columns.get(i, [])}
+                for i, s in enumerate(self.sources)
+            ],
+            'date_range': self.date_range,
+        }
+
+    def _discover_partitions(self, source: LakeSource) -> List[str]:
+        if not source.hive_partitioning:
+            return []
+        reader_columns = {'json'} if source.format == 'ndjson' else set()
+        described = self.dialect.get_connection().execute(
+            f"DESCRIBE SELECT * FROM {source.reader_sql()}"
+        ).fetchall()
+        hive_keys = self._hive_keys(source.path)
+        return [row[0] for row in described if row[0] in hive_keys and row[0] not in reader_columns]
+
+    @staticmethod
+    def _hive_keys(path: str) -> List[str]:
+        """Partition keys named in the glob or the first matching file's directories."""
+        sample = path if '*' not in path else next(iter(glob.iglob(path, recursive=True)), path)
+        return [part.split('=', 1)[0] for part in sample.replace('\\', '/').split('/') if '=' in part]
+
+    def _source_select(self, index: int, source: LakeSource) -> str:
+        partitions = self._partition_columns.get(index, [])
+        items = [f'{source.json_expression()} AS {self.json_col}']
+        if RESOURCE_TYPE_PARTITION in partitions:
+            items.append(f'"{RESOURCE_TYPE_PARTITION}"')
+        else:
+            items.append(f"json_extract_string({source.json_expression()}, '$.resourceType') "
+                         f"AS \"{RESOURCE_TYPE_PARTITION}\"")
+        items.extend(f'"{column}"' for column in partitions if column != RESOURCE_TYPE_PARTITION)
+        return f"SELECT {', '.join(items)} FROM {source.reader_sql()}"
+
+    def _date_filter(self) -> Optional[str]:
+        if not self.date_range:
+            return None
+        if not self.partitioned_by(DATE_PARTITION):
+            raise ValueError(f"date_range requires every lake source to be partitioned by '{DATE_PARTITION}'")
+        start, end = self.date_range
+        conditions = []
+        if start:
+            conditions.append(f"\"{DATE_PARTITION}\" >= '{start}'")
+        if end:
+            conditions.append(f"\"{DATE_PARTITION}\" <= '{end}'")
+        return ' AND '.join(conditions) or None
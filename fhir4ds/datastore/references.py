@@ -0,0 +1,223 @@
+"""
+Patient Compartment and Reference Indexes
+
+Optional side tables that parse resource references once at load time, so
+joins from clinical resources to their patients and ``resolve()`` become joins
+on plain columns instead of per-row parsing of reference strings:
+
+    resource_compartments(row_id, resource_type, patient_id, element_path)
+    resource_references(source_row, source_type, target_type, target_id, target_row)
+    resource_keys(row_id, resource_type, resource_id)
+
+- the compartment index maps every row to the patient(s) whose compartment it
+  belongs to, following the FHIR Patient CompartmentDefinition
+  (fhir4ds.datastore.compartments.PATIENT_COMPARTMENT): a Coverage through its
+  beneficiary, an Immunization through its patient, an Observation through its
+  subject or a patient performer. Patient rows map to themselves (element_path ``id``).
+- the reference index holds every relative reference (``Type/id``) anywhere in
+  a resource; target_row is the base table row of the target once it is loaded,
+  found through resource_keys, so references to resources loaded later are
+  linked when those are loaded
+
+CQL retrieves in Patient context follow the resource's primary patient element
+(fhir4ds.datastore.compartments.PATIENT_COMPARTMENT_REFERENCES); restrict compartment
+rows to those element paths for them, see compartment_rows_sql.
+
+Both indexes are kept current by the datastore's load paths like the coding
+index (fhir4ds.datastore.codings). Compilers find them through
+``dialect.compartment_index_tables`` and ``dialect.reference_indexes``.
+
+Usage:
+    datastore = FHIRDataStore.with_duckdb()
+    datastore.enable_compartment_index().enable_reference_index()
+    datastore.load_resources(resources)
+    # Patient joins and resolve() now use the index tables
+"""
+
+import logging
+from typing import Iterable, List, Optional
+
+from .compartments import PATIENT_COMPARTMENT, PATIENT_COMPARTMENT_REFERENCES
+from .side_tables import IncrementalSideTable, sql_literal
+
+logger = logging.getLogger(__name__)
+
+# Relative literal reference: Type/id
+REFERENCE_PATTERN = '^[A-Z][A-Za-z]+/[A-Za-z0-9.-]+$'
+
+
+def compartment_index_name(table_name: str) -> str:
+    """Name of the compartment index table for a resource table."""
+    return 'resource_compartments' if table_name == 'fhir_resources' else f"{table_name}_compartments"
+
+
+def reference_index_name(table_name: str) -> str:
+    """Name of the reference index table for a resource table."""
+    return 'resource_references' if table_name == 'fhir_resources' else f"{table_name}_references"
+
+
+def reference_keys_name(table_name: str) -> str:
+    """Name of the (resource type, id) -> row table of a resource table's reference index."""
+    return 'resource_keys' if table_name == 'fhir_resources' else f"{table_name}_keys"
+
+
+def compartment_index_table(dialect, table_name: str) -> Optional[str]:
+    """The compartment index table registered for a resource table, or None."""
+    return getattr(dialect, 'compartment_index_tables', {}).get(table_name)
+
+
+def reference_index_for(dialect, table_name: Optional[str] = None) -> Optional['ReferenceIndex']:
+    """
+    The reference index registered for a resource table, or None. Without a table
+    name, the only registered index (None if there are several).
+    """
+    indexes = getattr(dialect, 'reference_indexes', {})
+    if table_name is not None:
+        return indexes.get(table_name)
+    return next(iter(indexes.values())) if len(indexes) == 1 else None
+
+
+def compartment_rows_sql(compartments_table: str, resource_type: str,
+                         element_paths: Optional[Iterable[str]] = None) -> str:
+    """
+    SELECT of (row_id, patient_id) for the resources of one type, to join on the
+    base table id.
+
+    Args:
+        compartments_table: Compartment index table
+        resource_type: Resource type
+        element_paths: Restrict to these reference elements (e.g. ['subject'] for
+            the CQL Patient context); default: full compartment membership
+    """
+    conditions = [f"resource_type = {sql_literal(resource_type)}"]
+    if element_paths:
+        conditions.append(f"element_path IN ({', '.join(sql_literal(p) for p in element_paths)})")
+    return f"SELECT row_id, patient_id FROM {compartments_table} WHERE {' AND '.join(conditions)}"
+
+
+def context_element_paths(resource_type: str) -> List[str]:
+    """Element paths of a resource type's primary patient reference (id for Patient)."""
+    if resource_type == 'Patient':
+        return ['id']
+    return list(PATIENT_COMPARTMENT_REFERENCES.get(resource_type, ()))
+
+
+class CompartmentIndex(IncrementalSideTable):
+    """Builds and incrementally maintains the patient compartment index of a datastore"""
+
+    def __init__(self, datastore, resource_types: Optional[Iterable[str]] = None):
+        """
+        Args:
+            datastore: FHIRDataStore whose base table is indexed
+            resource_types: Resource types to index (default: all in PATIENT_COMPARTMENT)
+        """
+        super().__init__(datastore, compartment_index_name(datastore.table_name))
+        resource_types = list(resource_types or PATIENT_COMPARTMENT)
+        unknown = [rt for rt in resource_types if rt not in PATIENT_COMPARTMENT]
+        if unknown:
+            raise ValueError(f"Not in the patient compartment: {', '.join(unknown)}")
+        self.resource_types = resource_types
+
+    def create_table_statements(self) -> List[str]:
+        statements = [f"CREATE TABLE {self.table_name} (row_id INTEGER, resource_type VARCHAR, "
+                      f"patient_id VARCHAR, element_path VARCHAR)"]
+        if self.is_postgresql:
+            statements.append(f"CREATE INDEX {self.table_name}_row_idx ON {self.table_name} (row_id)")
+            statements.append(f"CREATE INDEX {self.table_name}_patient_idx ON {self.table_name} "
+                              f"(patient_id, resource_type)")
+        return statements
+
+    def populate_sql(self, low: int, high: int) -> str:
+        """INSERT mapping base table rows with low < id <= high to their patients."""
+        selects = []
+        if 'Patient' in self.resource_types:
+            patient_id = self.dialect.extract_json_field('r.resource', '$.id')
+            selects.append(f"SELECT r.row_id, r.resource_type, {patient_id}, 'id' "
+                           f"FROM new_rows r WHERE r.resource_type = 'Patient'")
+        for rt in self.resource_types:
+            for element in PATIENT_COMPARTMENT[rt]:
+                source, reference = self._references_source(element)
+                selects.append(
+                    f"SELECT r.row_id, r.resource_type, substr({reference}, 9), {sql_literal(element.replace('[]', ''))} "
+                    f"FROM new_rows r{source} WHERE r.resource_type = {sql_literal(rt)} "
+                    f"AND {reference} LIKE 'Patient/%'"
+                )
+        return (f"INSERT INTO {self.table_name} WITH new_rows AS MATERIALIZED "
+                f"({self.new_rows_sql(low, high, self.resource_types)}) " + "\nUNION ALL\n".join(selects))
+
+    def _references_source(self, element: str):
+        """FROM-clause suffix yielding one row per reference of the element, and the reference text."""
+        if self.is_postgresql:
+            path = '$.' + element.replace('[]', '') + '.reference'
+            return f" CROSS JOIN LATERAL jsonb_path_query(r.resource, '{path}') AS ref(value)", "(ref.value #>> '{}')"
+        path = '$.' + element.replace('[]', '[*]') + '.reference'
+        if '[]' in element:
+            return f", unnest(json_extract_string(r.resource, '{path}')) AS ref(value)", "ref.value"
+        return f", unnest([json_extract_string(r.resource, '{path}')]) AS ref(value)", "ref.value"
+
+
+class ReferenceIndex(IncrementalSideTable):
+    """Builds and incrementally maintains the reference index of a datastore"""
+
+    def __init__(self, datastore):
+        """
+        Args:
+            datastore: FHIRDataStore whose base table is indexed
+        """
+        super().__init__(datastore, reference_index_name(datastore.table_name))
+        self.keys_table = reference_keys_name(datastore.table_name)
+
+    @property
+    def table_names(self) -> List[str]:
+        return [self.table_name, self.keys_table]
+
+    def create_table_statements(self) -> List[str]:
+        statements = [
+            f"CREATE TABLE {self.keys_table} (row_id INTEGER, resource_type VARCHAR, resource_id VARCHAR)",
+            f"CREATE TABLE {self.table_name} (source_row INTEGER, source_type VARCHAR, "
+            f"target_type VARCHAR, target_id VARCHAR, target_row INTEGER)",
+        ]
+        if self.is_postgresql:
+            statements += [
+                f"CREATE INDEX {self.keys_table}_key_idx ON {self.keys_table} (resource_type, resource_id)",
+                f"CREATE INDEX {self.table_name}_source_idx ON {self.table_name} (source_row)",
+                f"CREATE INDEX {self.table_name}_target_idx ON {self.table_name} (target_row)",
+            ]
+        return statements
+
+    def populate_statements(self, low: int, high: int) -> List[str]:
+        """Index the keys and references of base table rows with low < id <= high, then link targets."""
+        json_col = self.datastore.json_col
+        base = self.datastore.table_name
+        resource_type = self.dialect.extract_json_field(json_col, '$.resourceType')
+        resource_id = self.dialect.extract_json_field(json_col, '$.id')
+        in_range = f"id > {low} AND id <= {high}"
+        if self.is_postgresql:
+            references = (f"SELECT id AS source_row, {resource_type} AS source_type, ref.value #>> '{{}}' AS reference "
+                          f"FROM {base} CROSS JOIN LATERAL jsonb_path_query({json_col}, 'strict $.**.reference') "
+                          f"AS ref(value) WHERE {in_range} AND jsonb_typeof(ref.value) = 'string'")
+            matches = f"reference ~ '{REFERENCE_PATTERN}'"
+        else:
+            references = (f"SELECT id AS source_row, {resource_type} AS source_type, "
+                          f"unnest(json_extract_string({json_col}, '$..reference')) AS reference "
+                          f"FROM {base} WHERE {in_range}")
+            matches = f"regexp_matches(reference, '{REFERENCE_PATTERN}')"
+        return [
+            f"INSERT INTO {self.keys_table} SELECT id, {resource_type}, {resource_id} FROM {base} WHERE {in_range}",
+            f"INSERT INTO {self.table_name} SELECT source_row, source_type, split_part(reference, '/', 1), "
+            f"split_part(reference, '/', 2), CAST(NULL AS INTEGER) FROM ({references}) refs WHERE {matches}",
+            # Targets loaded in this or an earlier batch; the latest row of a resource wins
+            f"UPDATE {self.table_name} SET target_row = (SELECT MAX(k.row_id) FROM {self.keys_table} k "
+            f"WHERE k.resource_type = {self.table_name}.target_type AND k.resource_id = {self.table_name}.target_id) "
+            f"WHERE target_row IS NULL",
+        ]
+
+    def resolve_sql(self, reference_sql: str) -> str:
+        """Scalar subquery returning the loaded resource a ``Type/id`` reference string points to."""
+        # Base table columns are renamed so the reference SQL still binds to the outer row
+        json_col = self.datastore.json_col
+        return (f"(SELECT b.resolved FROM {self.keys_table} k "
+                f"JOIN (SELECT id AS resolved_row, {json_col} AS resolved FROM {self.datastore.table_name}) b "
+                f"ON b.resolved_row = k.row_id "
+                f"WHERE k.resource_type = split_part({reference_sql}, '/', 1) "
+                f"AND k.resource_id = split_part({reference_sql}, '/', 2) ORDER BY k.row_id DESC LIMIT 1)")
@@ -10,16 +10,18 @@ QueryResult class (renamed from FHIRResultSet) providing:
 
 from __future__ import annotations
 
+import importlib.util
 import json
 import logging
-from typing import Dict, List, Any, Optional
+from typing import Dict, Iterator, List, Any, Optional, Tuple
 
-# Optional imports for functionality
-try:
-    import pandas as pd
-    PANDAS_AVAILABLE = True
-except ImportError:
-    PANDAS_AVAILABLE = False
+from ..utils.tracing import (
+    span, SPAN_DB_EXECUTE, SPAN_FETCH, SPAN_FORMAT,
+    ATTR_SQL_LENGTH, ATTR_ROW_COUNT, ATTR_DIALECT, ATTR_FORMAT
+)
+
+# pandas is imported on first DataFrame conversion, not at module import
+PANDAS_AVAILABLE = importlib.util.find_spec("pandas") is not None
 
 try:
     import csv
@@ -30,6 +32,9 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# Rows per batch when streaming results to exporters
+STREAM_BATCH_SIZE = 10_000
+
 
 class QueryResult:
     """
@@ -37,30 +42,95 @@ class QueryResult:
     regardless of the underlying database dialect.
     """
     
-    def __init__(self, dialect, sql: str, view_def: Optional[Dict] = None):
+    def __init__(self, dialect, sql: str, view_def: Optional[Dict] = None,
+                 timeout: Optional[float] = None):
         self.dialect = dialect
         self.sql = sql
         self.view_def = view_def
+        self.timeout = timeout
         self._executed = False
         self._result = None
         self._description = None
+        self._cancelled = False
     
-    def fetchall(self) -> List[tuple]:
-        """Fetch all rows from the query result"""
+    def fetchall(self, timeout: Optional[float] = None) -> List[tuple]:
+        """
+        Fetch all rows from the query result.
+        
+        Args:
+            timeout: Statement timeout in seconds (defaults to the result's timeout); the
+                query is interrupted on the database when it elapses
+        
+        Raises:
+            QueryCancelledError: The query timed out or cancel() was called
+        """
         if not self._executed:
-            # Use the new abstract methods to avoid dialect-specific code
-            raw_result = self.dialect.execute_query(self.sql)
-            self._description = self.dialect.get_query_description(self.dialect.get_connection())
-            
-            # Process collection columns if view_def is available
-            if self.view_def:
-                self._result = self._convert_collection_columns_to_arrays(raw_result)
-            else:
-                self._result = raw_result
+            if self._cancelled:
+                from ..dialects.base import QueryCancelledError
+                raise QueryCancelledError("Query was cancelled before it started")
+            with span(SPAN_FETCH) as fetch_span:
+                # Use the new abstract methods to avoid dialect-specific code
+                with span(SPAN_DB_EXECUTE, {ATTR_DIALECT: str(getattr(self.dialect, 'name', '')).lower(),
+                                            ATTR_SQL_LENGTH: len(self.sql)}) as execute_span:
+                    if hasattr(self.dialect, 'execute_cancellable'):
+                        raw_result = self.dialect.execute_cancellable(
+                            self.sql, timeout if timeout is not None else self.timeout, owner=self)
+                    else:
+                        raw_result = self.dialect.execute_query(self.sql)
+                    execute_span.set_attribute(ATTR_ROW_COUNT, len(raw_result) if raw_result else 0)
+                self._description = self.dialect.get_query_description(self.dialect.get_connection())
+                
+                # Process collection columns if view_def is available
+                if self.view_def:
+                    self._result = self._convert_collection_columns_to_arrays(raw_result)
+                else:
+                    self._result = raw_result
                 
+                fetch_span.set_attribute(ATTR_ROW_COUNT, len(self._result) if self._result else 0)
             self._executed = True
         return self._result
     
+    def stream(self, batch_size: int = STREAM_BATCH_SIZE) -> Tuple[List[str], Iterator[List[tuple]]]:
+        """
+        Execute the query and return its column names with an iterator of row batches,
+        without materializing the whole result in Python. Already fetched rows are
+        served from the cache; streamed rows are not cached.
+        
+        Args:
+            batch_size: Rows per batch
+        """
+        if self._executed or not hasattr(self.dialect, 'stream_query'):
+            rows = self.fetchall() or []
+            columns = [desc[0] for desc in (self._description or [])]
+            return columns, (rows[i:i + batch_size] for i in range(0, len(rows), batch_size))
+        
+        with span(SPAN_DB_EXECUTE, {ATTR_DIALECT: str(getattr(self.dialect, 'name', '')).lower(),
+                                    ATTR_SQL_LENGTH: len(self.sql)}):
+            description, batches = self.dialect.stream_query(self.sql, batch_size)
+        self._description = description
+        columns = [desc[0] for desc in (description or [])]
+        if self.view_def:
+            batches = (self._convert_collection_columns_to_arrays(batch) for batch in batches)
+        return columns, batches
+    
+    def cancel(self) -> bool:
+        """
+        Cancel the query: interrupt it on the database if it is running, or stop it
+        from starting. Safe to call from another thread.
+        
+        Returns:
+            True if a running statement was interrupted
+        """
+        self._cancelled = True
+        if self._executed or not hasattr(self.dialect, 'cancel_statement'):
+            return False
+        return self.dialect.cancel_statement(self)
+    
+    @property
+    def cancelled(self) -> bool:
+        """Whether cancel() has been called"""
+        return self._cancelled
+    
     # Fluent interface methods for result conversion
     def to_dataframe(self, include_metadata: bool = True) -> 'pd.DataFrame':
         """Convert results to pandas DataFrame for fluent chaining"""
@@ -133,18 +203,20 @@ class QueryResult:
         """Convert results to pandas DataFrame with proper column names and type conversion"""
         if not PANDAS_AVAILABLE:
             raise ImportError("pandas is required for to_df(). Install with: pip install pandas")
+        import pandas as pd
         
         rows = self.fetchall()
         column_names = self._get_column_names_from_view_definition()
         
         # Create DataFrame
-        if rows:
-            df = pd.DataFrame(rows, columns=column_names)
-            
-            # Phase 4.7: Apply type conversion based on view definition
-            df = self._apply_type_conversion(df)
-        else:
-            df = pd.DataFrame(columns=column_names)
+        with span(SPAN_FORMAT, {ATTR_FORMAT: "dataframe", ATTR_ROW_COUNT: len(rows)}):
+            if rows:
+                df = pd.DataFrame(rows, columns=column_names)
+                
+                # Phase 4.7: Apply type conversion based on view definition
+                df = self._apply_type_conversion(df)
+            else:
+                df = pd.DataFrame(columns=column_names)
         
         # Add metadata
         if include_metadata and self.view_def:
@@ -174,6 +246,7 @@ class QueryResult:
     
     def _convert_column_type(self, series: 'pd.Series', target_type: str) -> 'pd.Series':
         """Convert pandas Series to target FHIR type"""
+        import pandas as pd
         try:
             if target_type in ['decimal', 'number']:
                 # Phase 4.7: Convert to Decimal for decimal columns
@@ -228,20 +301,21 @@ class QueryResult:
         rows = self.fetchall()
         column_names = self._get_column_names_from_view_definition()
         
-        if file_path:
-            with open(file_path, 'w', newline='', encoding='utf-8') as csvfile:
-                writer = csv.writer(csvfile, **kwargs)
+        with span(SPAN_FORMAT, {ATTR_FORMAT: "csv", ATTR_ROW_COUNT: len(rows)}):
+            if file_path:
+                with open(file_path, 'w', newline='', encoding='utf-8') as csvfile:
+                    writer = csv.writer(csvfile, **kwargs)
+                    if include_headers:
+                        writer.writerow(column_names)
+                    writer.writerows(rows)
+                return None
+            else:
+                output = io.StringIO()
+                writer = csv.writer(output, **kwargs)
                 if include_headers:
                     writer.writerow(column_names)
                 writer.writerows(rows)
-            return None
-        else:
-            output = io.StringIO()
-            writer = csv.writer(output, **kwargs)
-            if include_headers:
-                writer.writerow(column_names)
-            writer.writerows(rows)
-            return output.getvalue()
+                return output.getvalue()
     
     def _get_column_names_from_view_definition(self) -> List[str]:
         """Get column names from view definition or connection description"""
@@ -0,0 +1,274 @@
+"""
+Patient-Hash Sharding
+
+Spreads a population over several DuckDB database files so that storage and
+query execution scale past a single file and a single connection. Resources
+are routed by a stable hash of their patient compartment, so everything about
+one patient lives in one shard:
+
+- Patient resources route by their own id
+- resources in the patient compartment route by their primary patient
+  reference, subject/patient/beneficiary ... (see
+  fhir4ds.datastore.compartments; unrouted ones, e.g. Group subjects, go to
+  shard 0)
+- shared resources (Practitioner, Organization, Medication, ValueSet ...) are
+  replicated to every shard so per-shard joins against them still work
+
+Queries are compiled once and scattered to worker processes, each opening its
+shard read-only, then gathered:
+- ViewDefinitions concatenate shard rows in shard order; views over shared
+  resource types read shard 0 only, so replicas are not duplicated
+- measure populations are counted per shard and merged as partial aggregates
+  through MeasureScoring.merge_population_results before scoring
+
+Usage:
+    sharded = ShardedDataStore.create('/data/shards', shard_count=8)
+    sharded.load_resources(resources)
+    rows = sharded.execute_view_definition(view_definition).fetchall()
+    report = sharded.evaluate_measure(QualityMeasureBuilder.create_diabetes_hba1c_measure())
+"""
+
+import logging
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .compartments import PATIENT_COMPARTMENT_REFERENCES
+from .result import PANDAS_AVAILABLE
+
+logger = logging.getLogger(__name__)
+
+def patient_id_for(resource: Dict[str, Any]) -> Optional[str]:
+    """Id of the patient whose compartment the resource belongs to, if any."""
+    resource_type = resource.get('resourceType')
+    if resource_type == 'Patient':
+        return resource.get('id')
+    for field in PATIENT_COMPARTMENT_REFERENCES.get(resource_type, ()):
+        reference = (resource.get(field) or {}).get('reference', '')
+        if reference.startswith('Patient/'):
+            return reference[len('Patient/'):]
+    return None
+
+
+def shard_for_patient(patient_id: str, shard_count: int) -> int:
+    """Stable shard index for a patient id (same in every process and run)."""
+    return zlib.crc32(patient_id.encode('utf-8')) % shard_count
+
+
+def is_patient_compartment_type(resource_type: Optional[str]) -> bool:
+    """Whether resources of this type are routed by patient rather than replicated."""
+    return resource_type == 'Patient' or resource_type in PATIENT_COMPARTMENT_REFERENCES
+
+
+class ShardedResult:
+    """Rows gathered from every shard a query ran on"""
+
+    def __init__(self, columns: List[str], rows: List[tuple]):
+        self.columns = columns
+        self.rows = rows
+
+    @property
+    def description(self) -> List[tuple]:
+        return [(name,) for name in self.columns]
+
+    def fetchall(self) -> List[tuple]:
+        return self.rows
+
+    def to_dataframe(self) -> 'pd.DataFrame':
+        if not PANDAS_AVAILABLE:
+            raise ImportError("pandas is required for DataFrame conversion. Install with: pip install pandas")
+        import pandas as pd
+        return pd.DataFrame(self.rows, columns=self.columns)
+
+
+def _run_shard_query(database: str, sql: str) -> Tuple[List[str], List[tuple]]:
+    """Worker: run one query against a shard opened read-only."""
+    import duckdb
+    connection = duckdb.connect(database, read_only=True)
+    try:
+        cursor = connection.execute(sql)
+        columns = [desc[0] for desc in cursor.description] if cursor.description else []
+        return columns, cursor.fetchall()
+    finally:
+        connection.close()
+
+
+def _count_shard_populations(database: str, criteria_sql: List[Tuple[str, str]]) -> Dict[str, Any]:
+    """Worker: partial population counts for one shard, from per-criterion member patient SQL."""
+    import duckdb
+    connection = duckdb.connect(database, read_only=True)
+    populations = {}
+    try:
+        for name, sql in criteria_sql:
+            try:
+                count = connection.execute(f"SELECT COUNT(*) FROM ({sql}) AS population").fetchone()[0]
+                populations[name] = {'count': count, 'evaluation_successful': True}
+            except Exception as e:
+                populations[name] = {'count': 0, 'evaluation_successful': False, 'error': str(e)}
+    finally:
+        connection.close()
+    return {'populations': populations}
+
+
+class ShardedDataStore:
+    """FHIR resources spread over DuckDB shard files by patient hash"""
+
+    def __init__(self, shard_paths: Sequence[str], table_name: str = "fhir_resources",
+                 json_col: str = "resource", max_workers: Optional[int] = None):
+        """
+        Args:
+            shard_paths: One DuckDB database file per shard; order defines shard indexes
+            table_name: Name of the FHIR resources table in every shard
+            json_col: Name of the JSON column storing FHIR resources
+            max_workers: Worker processes for scatter queries (default: one per shard;
+                1 runs shards sequentially in this process)
+        """
+        if not shard_paths:
+            raise ValueError("At least one shard path is required")
+        if any(path == ':memory:' for path in shard_paths):
+            raise ValueError("Shards must be database files so worker processes can open them")
+        self.shard_paths = list(shard_paths)
+        self.table_name = table_name
+        self.json_col = json_col
+        self.max_workers = max_workers or len(self.shard_paths)
+        self._planner = None
+
+    @classmethod
+    def create(cls, directory: str, shard_count: int, **kwargs) -> 'ShardedDataStore':
+        """Sharded datastore over ``shard_count`` files named shard_NNN.duckdb in ``directory``."""
+        os.makedirs(directory, exist_ok=True)
+        paths = [os.path.join(directory, f"shard_{i:03d}.duckdb") for i in range(shard_count)]
+        return cls(paths, **kwargs)
+
+    @property
+    def shard_count(self) -> int:
+        return len(self.shard_paths)
+
+    def route(self, resource: Dict[str, Any]) -> List[int]:
+        """Shard indexes a resource is stored in."""
+        if not is_patient_compartment_type(resource.get('resourceType')):
+            return list(range(self.shard_count))
+        patient_id = patient_id_for(resource)
+        return [shard_for_patient(patient_id, self.shard_count) if patient_id else 0]
+
+    def load_resources(self, resources: Iterable[Dict[str, Any]], batch_size: int = 1000) -> Dict[int, int]:
+        """
+        Route resources to their shards and bulk load them.
+
+        Returns:
+            Resources written per shard index (replicated resources count once per shard)
+        """
+        batches: Dict[int, List[Dict[str, Any]]] = {i: [] for i in range(self.shard_count)}
+        for resource in resources:
+            for index in self.route(resource):
+                batches[index].append(resource)
+
+        loaded = {}
+        for index, batch in batches.items():
+            if not batch:
+                continue
+            datastore = self._open_shard(index)
+            try:
+                datastore.bulk_load_resources(batch, parallel=False, batch_size=batch_size)
+            finally:
+                datastore.dialect.get_connection().close()
+            loaded[index] = len(batch)
+        logger.info(f"Loaded {sum(loaded.values())} resources across {len(loaded)} shards")
+        return loaded
+
+    def execute_sql(self, sql: str, shards: Optional[Sequence[int]] = None) -> ShardedResult:
+        """
+        Run SQL on every shard (or the given shard indexes) and concatenate the rows.
+
+        Shared resources are replicated, so queries over them return one copy per shard.
+        """
+        shards = list(range(self.shard_count)) if shards is None else list(shards)
+        partials = self._scatter(_run_shard_query, [(self.shard_paths[i], sql) for i in shards])
+        columns = next((cols for cols, _ in partials if cols), [])
+        return ShardedResult(columns, [row for _, rows in partials for row in rows])
+
+    def execute_view_definition(self, view_def: Dict[str, Any]) -> ShardedResult:
+        """Compile a ViewDefinition once, run it on the shards holding its resource type and gather."""
+        sql = self._planning_datastore().view_runner()._generate_sql_query(view_def)
+        shards = None if is_patient_compartment_type(view_def.get('resource')) else [0]
+        return self.execute_sql(sql, shards)
+
+    def evaluate_measure(self, measure, cql_engine=None,
+                         translate: Optional[Callable[[str], str]] = None) -> Dict[str, Any]:
+        """
+        Count each population criterion per shard, merge the partial counts and score.
+
+        Args:
+            measure: QualityMeasureDefinition to evaluate
+            cql_engine: CQLEngine used to translate criteria (default: a DuckDB engine)
+            translate: Optional callable mapping a criteria expression to SQL, overriding cql_engine
+
+        Returns:
+            Merged population results with 'score' from MeasureScoring
+        """
+        from ..cql.measures.population import criteria_patients_sql
+        from ..cql.measures.scoring import MeasureScoring
+
+        if translate is None:
+            if cql_engine is None:
+                from ..cql.core.engine import CQLEngine
+                cql_engine = CQLEngine(dialect=self._planning_datastore().dialect)
+            if measure.measurement_period:
+                period = measure.measurement_period
+                cql_engine.set_parameter("Measurement Period", f"{period['start']} to {period['end']}")
+            cql_engine.set_population_context()
+            translate = lambda expression: cql_engine.evaluate_expression(expression, self.table_name,
+                                                                         self.json_col)
+
+        # Members are distinct patients, as in PopulationEvaluator; each patient lives in
+        # one shard, so the per-shard counts add up
+        criteria_sql = [(criteria.name, criteria_patients_sql(translate(criteria.criteria_expression),
+                                                              'DUCKDB', self.json_col))
+                        for criteria in measure.get_evaluation_order()]
+        partials = self._scatter(_count_shard_populations,
+                                 [(path, criteria_sql) for path in self.shard_paths])
+
+        scoring = MeasureScoring()
+        results = scoring.merge_population_results(partials)
+        results.update({
+            'measure_id': measure.measure_id,
+            'evaluation_type': 'population-level',
+            'shard_count': self.shard_count,
+        })
+        for criteria in measure.get_evaluation_order():
+            results['populations'][criteria.name]['type'] = criteria.population_type.value
+        results['score'] = scoring.calculate_score(results, measure.scoring_method)
+        return results
+
+    def get_resource_counts(self) -> Dict[str, int]:
+        """Resource counts per type, with shared resources counted once."""
+        sql = (f"SELECT json_extract_string({self.json_col}, '$.resourceType'), COUNT(*) "
+               f"FROM {self.table_name} GROUP BY 1")
+        counts: Dict[str, int] = {}
+        for index, (_, rows) in enumerate(self._scatter(_run_shard_query,
+                                                         [(path, sql) for path in self.shard_paths])):
+            for resource_type, count in rows:
+                if index == 0 or is_patient_compartment_type(resource_type):
+                    counts[resource_type] = counts.get(resource_type, 0) + count
+        return counts
+
+    def _scatter(self, worker: Callable, tasks: List[tuple]) -> List[Any]:
+        """Run worker(*task) for every task, in processes when more than one worker is allowed."""
+        if self.max_workers <= 1 or len(tasks) <= 1:
+            return [worker(*task) for task in tasks]
+        with ProcessPoolExecutor(max_workers=min(self.max_workers, len(tasks))) as executor:
+            return list(executor.map(worker, *zip(*tasks)))
+
+    def _open_shard(self, index: int):
+        from .core import FHIRDataStore
+        return FHIRDataStore.with_duckdb(self.shard_paths[index], table_name=self.table_name,
+                                         json_col=self.json_col, record_workload=False)
+
+    def _planning_datastore(self):
+        """In-memory datastore used only to compile SQL against the shard schema."""
+        if self._planner is None:
+            from .core import FHIRDataStore
+            self._planner = FHIRDataStore.with_duckdb(':memory:', table_name=self.table_name,
+                                                      json_col=self.json_col, record_workload=False)
+        return self._planner
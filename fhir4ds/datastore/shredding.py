@@ -0,0 +1,274 @@
+"""
+Shredded Resource Storage
+
+Optional storage mode that copies each resource type into its own typed table
+so hot, fixed-schema elements (``Patient.birthDate``, ``Observation.status``,
+``Observation.valueQuantity.value`` ...) are read as plain columns instead of
+being extracted from JSON on every query. The raw resource JSON is kept in
+every shredded table for the long tail of paths.
+
+Table layout is derived from FHIR metadata:
+- RESOURCE_ELEMENTS lists the commonly queried elements per resource type
+- choice elements (``value[x]``) expand to every variant in choiceTypePaths.json
+- complex types expand to their scalar fields, checked against FHIRTypeRegistry
+- each scalar path gets one typed column; repeating elements and the codings of
+  a CodeableConcept are read from the JSON column, as the view translator only
+  substitutes scalar columns
+
+Shredded tables are maintained like the other load-maintained side tables
+(fhir4ds.datastore.side_tables): loading resources through the datastore copies
+only the rows above the highest base table id already shredded.
+
+Usage:
+    datastore = FHIRDataStore.with_duckdb()
+    datastore.load_resources(resources)
+    datastore.enable_shredded_storage(['Patient', 'Observation'])
+    # ViewDefinitions over Patient/Observation now read typed columns
+"""
+
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+from ..dialects.base import DatabaseDialect
+from ..fhir.type_registry import FHIRTypeRegistry
+from ..fhirpath.core.choice_types import fhir_choice_types
+from .side_tables import IncrementalSideTable
+
+logger = logging.getLogger(__name__)
+
+# FHIR type of the commonly queried elements per resource type. "[]" marks
+# repeating elements; "[x]" choice elements take their types from choiceTypePaths.json.
+RESOURCE_ELEMENTS = {
+    'Patient': {
+        'id': 'id', 'active': 'boolean', 'gender': 'code', 'birthDate': 'date',
+        'deceased[x]': None, 'managingOrganization': 'Reference',
+        'identifier': 'Identifier[]', 'name': 'HumanName[]', 'telecom': 'ContactPoint[]',
+        'address': 'Address[]',
+    },
+    'Observation': {
+        'id': 'id', 'status': 'code', 'code': 'CodeableConcept', 'category': 'CodeableConcept[]',
+        'subject': 'Reference', 'encounter': 'Reference', 'effective[x]': None,
+        'issued': 'instant', 'value[x]': None,
+    },
+    'Condition': {
+        'id': 'id', 'clinicalStatus': 'CodeableConcept', 'verificationStatus': 'CodeableConcept',
+        'category': 'CodeableConcept[]', 'code': 'CodeableConcept', 'subject': 'Reference',
+        'encounter': 'Reference', 'onset[x]': None, 'abatement[x]': None, 'recordedDate': 'dateTime',
+    },
+    'Encounter': {
+        'id': 'id', 'status': 'code', 'class': 'Coding', 'type': 'CodeableConcept[]',
+        'subject': 'Reference', 'period': 'Period',
+    },
+    'Procedure': {
+        'id': 'id', 'status': 'code', 'code': 'CodeableConcept', 'subject': 'Reference',
+        'encounter': 'Reference', 'performed[x]': None,
+    },
+    'MedicationRequest': {
+        'id': 'id', 'status': 'code', 'intent': 'code', 'medication[x]': None,
+        'subject': 'Reference', 'encounter': 'Reference', 'authoredOn': 'dateTime',
+    },
+    'DiagnosticReport': {
+        'id': 'id', 'status': 'code', 'code': 'CodeableConcept', 'subject': 'Reference',
+        'encounter': 'Reference', 'effective[x]': None, 'issued': 'instant',
+    },
+}
+
+# Scalar fields of complex types (one level deep) and their FHIR types
+COMPLEX_SCALAR_FIELDS = {
+    'Reference': {'reference': 'string', 'type': 'uri', 'display': 'string'},
+    'Period': {'start': 'dateTime', 'end': 'dateTime'},
+    'Quantity': {'value': 'decimal', 'comparator': 'code', 'unit': 'string', 'system': 'uri', 'code': 'code'},
+    'Coding': {'system': 'uri', 'version': 'string', 'code': 'code', 'display': 'string',
+               'userSelected': 'boolean'},
+    'CodeableConcept': {'text': 'string'},
+}
+
+# FHIR primitive types stored as native SQL types; all others are stored as text,
+# which keeps partial dates ("1974-12") exactly as written
+BOOLEAN_TYPES = {'boolean'}
+INTEGER_TYPES = {'integer', 'positiveInt', 'unsignedInt'}
+DECIMAL_TYPES = {'decimal'}
+
+_type_registry = FHIRTypeRegistry()
+
+
+@dataclass(frozen=True)
+class ShreddedColumn:
+    """A typed scalar column holding one FHIR path"""
+    path: str                 # FHIR path relative to the resource, e.g. "subject.reference"
+    fhir_type: str            # FHIR primitive type of the value
+
+    @property
+    def name(self) -> str:
+        return self.path.replace('.', '_')
+
+    @property
+    def kind(self) -> str:
+        """'boolean', 'integer', 'decimal' or 'string'"""
+        if self.fhir_type in BOOLEAN_TYPES:
+            return 'boolean'
+        if self.fhir_type in INTEGER_TYPES:
+            return 'integer'
+        if self.fhir_type in DECIMAL_TYPES:
+            return 'decimal'
+        return 'string'
+
+
+@dataclass
+class ShreddedTable:
+    """Typed table layout for one resource type"""
+    resource_type: str
+    table_name: str
+    columns: Dict[str, ShreddedColumn] = field(default_factory=dict)     # by FHIR path
+
+    def column_for(self, path: str) -> Optional[ShreddedColumn]:
+        """The scalar column holding ``path`` (with or without the resource type prefix)."""
+        if path.startswith(self.resource_type + '.'):
+            path = path[len(self.resource_type) + 1:]
+        return self.columns.get(path)
+
+
+def build_table_layout(resource_type: str, table_name: str) -> ShreddedTable:
+    """Derive the shredded layout of a resource type from the FHIR metadata."""
+    table = ShreddedTable(resource_type, table_name)
+    for element, element_type in RESOURCE_ELEMENTS.get(resource_type, {}).items():
+        if element.endswith('[x]'):
+            base = element[:-3]
+            for choice_type in fhir_choice_types.get_mappings_for_resource(resource_type).get(
+                    f"{resource_type}.{base}", []):
+                variant = base + choice_type[0].upper() + choice_type[1:]
+                _add_element(table, variant, choice_type[0].lower() + choice_type[1:])
+        else:
+            _add_element(table, element, element_type)
+    return table
+
+
+def _add_element(table: ShreddedTable, element: str, element_type: str) -> None:
+    repeating = element_type.endswith('[]')
+    type_name = element_type[:-2] if repeating else element_type
+    # Choice types arrive lower-cased from the mapping file; restore complex type names
+    complex_name = next((t for t in _type_registry.get_supported_types() if t.lower() == type_name.lower()), None)
+
+    if complex_name is None:
+        # Only FHIR primitives become scalar columns; unregistered complex types stay in JSON
+        if not repeating and type_name in DatabaseDialect.FHIR_TYPE_MAP:
+            table.columns[element] = ShreddedColumn(element, type_name)
+        return
+
+    if not repeating:
+        structure = _type_registry.get_type_structure(complex_name) or {}
+        for field_name, field_type in COMPLEX_SCALAR_FIELDS.get(complex_name, {}).items():
+            if field_name in structure.get('fields', []) and field_name not in structure.get('arrays', []):
+                path = f"{element}.{field_name}"
+                table.columns[path] = ShreddedColumn(path, field_type)
+
+
+def _duckdb_type(fhir_type: str) -> str:
+    return {'boolean': 'BOOLEAN', 'integer': 'INTEGER', 'decimal': 'DOUBLE'}.get(
+        ShreddedColumn('', fhir_type).kind, 'VARCHAR')
+
+
+class ShreddedStorage(IncrementalSideTable):
+    """Builds and incrementally maintains shredded per-resource-type tables for a datastore"""
+
+    def __init__(self, datastore, resource_types: Optional[Iterable[str]] = None):
+        """
+        Args:
+            datastore: FHIRDataStore whose base table is shredded
+            resource_types: Resource types to shred (default: all in RESOURCE_ELEMENTS)
+        """
+        super().__init__(datastore, f"{datastore.table_name}_shredded")
+        resource_types = list(resource_types or RESOURCE_ELEMENTS)
+        unknown = [rt for rt in resource_types if rt not in RESOURCE_ELEMENTS]
+        if unknown:
+            raise ValueError(f"No shredded layout for resource types: {', '.join(unknown)}")
+        self.tables = {
+            rt: build_table_layout(rt, f"{datastore.table_name}_shredded_{rt.lower()}")
+            for rt in resource_types
+        }
+
+    @property
+    def table_names(self) -> List[str]:
+        return [table.table_name for table in self.tables.values()]
+
+    def table_for(self, resource_type: Optional[str]) -> Optional[ShreddedTable]:
+        """The shredded table for a resource type, or None if not shredded."""
+        return self.tables.get(resource_type)
+
+    def create_table_statements(self) -> List[str]:
+        return [f"CREATE TABLE {table.table_name} AS {self.rows_sql(table, 'FALSE')}"
+                for table in self.tables.values()]
+
+    def populate_statements(self, low: int, high: int) -> List[str]:
+        """INSERTs copying base table rows with low < id <= high into their typed tables."""
+        return [f"INSERT INTO {table.table_name} {self.rows_sql(table, f'id > {low} AND id <= {high}')}"
+                for table in self.tables.values()]
+
+    def rows_sql(self, table: ShreddedTable, condition: str) -> str:
+        """SELECT of the typed rows of one shredded table for base table rows matching a condition."""
+        return shredded_rows_sql(self.dialect, self.datastore.table_name, self.datastore.json_col, table, condition)
+
+    @staticmethod
+    def _duckdb_column(json_col: str, column: ShreddedColumn) -> str:
+        text = f"json_extract_string({json_col}, '$.{column.path}')"
+        if column.kind == 'string':
+            return text
+        return f"TRY_CAST({text} AS {_duckdb_type(column.fhir_type)})"
+
+    @staticmethod
+    def _postgresql_column(json_col: str, column: ShreddedColumn) -> str:
+        keys = ','.join(column.path.split('.'))
+        value = f"({json_col} #> '{{{keys}}}')"
+        if column.kind == 'string':
+            return f"({json_col} #>> '{{{keys}}}')"
+        json_type, sql_type = {'boolean': ('boolean', 'BOOLEAN'), 'integer': ('number', 'INTEGER'),
+                               'decimal': ('number', 'DOUBLE PRECISION')}[column.kind]
+        # Guard the cast so malformed values become NULL instead of failing the load
+        return (f"CASE WHEN jsonb_typeof{value} = '{json_type}' "
+                f"THEN ({json_col} #>> '{{{keys}}}')::{sql_type} END")
+
+    def describe(self) -> Dict[str, List[str]]:
+        """Column names per shredded table."""
+        return {
+            table.table_name: [c.name for c in table.columns.values()]
+            for table in self.tables.values()
+        }
+
+
+def shredded_rows_sql(dialect, source_table: str, json_col: str, table: ShreddedTable,
+                      condition: Optional[str] = None) -> str:
+    """
+    SELECT of the typed layout ``table`` over the rows of its resource type in a
+    resource table, optionally restricted by a further condition.
+    """
+    is_postgresql = dialect.name.upper() == 'POSTGRESQL'
+    select_items = []
+    for column in table.columns.values():
+        if is_postgresql:
+            expr = ShreddedStorage._postgresql_column(json_col, column)
+        else:
+            expr = ShreddedStorage._duckdb_column(json_col, column)
+        select_items.append(f'{expr} AS "{column.name}"')
+    select_items.append(json_col)
+
+    resource_filter = dialect.extract_json_field(json_col, '$.resourceType')
+    resource_type = table.resource_type.replace("'", "''")
+    where = f"{resource_filter} = '{resource_type}'" + (f" AND {condition}" if condition else "")
+    return f"SELECT {', '.join(select_items)} FROM {source_table} WHERE {where}"
+
+
+def shredded_table_sql(dialect, source_table: str, json_col: str, table: ShreddedTable,
+                       temporary: bool = False) -> str:
+    """
+    CREATE [TEMPORARY] TABLE ... AS SELECT copying one resource type of a resource
+    table into the typed layout ``table``.
+    """
+    create = "CREATE TEMPORARY TABLE" if temporary else "CREATE TABLE"
+    return f"{create} {table.table_name} AS {shredded_rows_sql(dialect, source_table, json_col, table)}"
+
+
+def is_simple_path(path: str) -> bool:
+    """Whether a FHIRPath is a plain dotted member path."""
+    return re.fullmatch(r'[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)*', path) is not None
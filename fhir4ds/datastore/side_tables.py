@@ -0,0 +1,155 @@
+"""
+Load-Maintained Side Tables
+
+Base class for tables derived from the resource table that the datastore keeps
+current as resources are loaded (the coding index, resource intervals). Each
+base table row is processed once: an update derives rows only for base table
+ids above the highest id already processed.
+
+Subclasses provide the CREATE statements and an INSERT ... SELECT over the id
+range (or several statements, see populate_statements); the base class tracks
+the range, serializes updates and executes SQL on the dialect's connection.
+"""
+
+import logging
+import threading
+from typing import Iterable, List
+
+from .compartments import PATIENT_COMPARTMENT_REFERENCES
+
+logger = logging.getLogger(__name__)
+
+
+def sql_literal(value: str) -> str:
+    """Single-quoted SQL string literal."""
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def patient_id_sql(dialect, json_col: str, resource_types: Iterable[str]) -> str:
+    """
+    Id of the patient whose compartment a resource belongs to, for rows already
+    restricted to the given resource types (see
+    fhir4ds.datastore.compartments.PATIENT_COMPARTMENT_REFERENCES).
+    """
+    resource_type = dialect.extract_json_field(json_col, '$.resourceType')
+    resource_types = list(resource_types)
+    branches = []
+    for rt in resource_types:
+        fields = PATIENT_COMPARTMENT_REFERENCES.get(rt, ())
+        if fields:
+            references = [dialect.extract_json_field(json_col, f'$.{f}.reference') for f in fields]
+            value = references[0] if len(references) == 1 else f"COALESCE({', '.join(references)})"
+            branches.append((rt, value))
+    if not branches:
+        return "CAST(NULL AS VARCHAR)"
+    if len(resource_types) == 1:
+        reference = branches[0][1]
+    else:
+        reference = f"(CASE {resource_type} {' '.join(f'WHEN {sql_literal(rt)} THEN {v}' for rt, v in branches)} END)"
+    return f"CASE WHEN {reference} LIKE 'Patient/%' THEN substr({reference}, 9) END"
+
+
+class IncrementalSideTable:
+    """A table derived from the base resource table, extended as resources are loaded"""
+
+    def __init__(self, datastore, table_name: str):
+        """
+        Args:
+            datastore: FHIRDataStore whose base table the side table is derived from
+            table_name: Name of the side table
+        """
+        self.datastore = datastore
+        self.dialect = datastore.dialect
+        self.table_name = table_name
+        self._watermark = 0       # highest base table id already processed
+        self._lock = threading.Lock()
+
+    @property
+    def is_postgresql(self) -> bool:
+        return self.dialect.name.upper() == 'POSTGRESQL'
+
+    @property
+    def table_names(self) -> List[str]:
+        """Tables created by create_table_statements()."""
+        return [self.table_name]
+
+    def create_table_statements(self) -> List[str]:
+        """CREATE TABLE (and index) statements for the side table."""
+        raise NotImplementedError
+
+    def populate_sql(self, low: int, high: int) -> str:
+        """INSERT deriving the side table rows of base table rows with low < id <= high."""
+        raise NotImplementedError
+
+    def populate_statements(self, low: int, high: int) -> List[str]:
+        """Statements run in order to process base table rows with low < id <= high."""
+        return [self.populate_sql(low, high)]
+
+    def rebuild(self) -> None:
+        """(Re)create the side table from every resource."""
+        with self._lock:
+            self._drop_tables()
+            for statement in self.create_table_statements():
+                self._execute(statement)
+            self._watermark = 0
+            self._process_new_rows()
+        logger.info(f"Built {self.table_name}")
+
+    def update(self) -> None:
+        """Derive rows for the resources loaded since the last build or update."""
+        with self._lock:
+            self._process_new_rows()
+
+    def drop(self) -> None:
+        """Drop the side table."""
+        with self._lock:
+            self._drop_tables()
+            self._watermark = 0
+
+    def _drop_tables(self) -> None:
+        for table_name in self.table_names:
+            self._execute(f"DROP TABLE IF EXISTS {table_name}")
+
+    def _process_new_rows(self) -> None:
+        high = self._query_scalar(f"SELECT MAX(id) FROM {self.datastore.table_name}")
+        if high is None or high <= self._watermark:
+            return
+        for statement in self.populate_statements(self._watermark, high):
+            self._execute(statement)
+        self._watermark = high
+
+    def new_rows_sql(self, low: int, high: int, resource_types: Iterable[str]) -> str:
+        """
+        SELECT of the base table rows in the id range for the given resource types, as
+        (row_id, resource_type, patient_id, resource).
+        """
+        json_col = self.datastore.json_col
+        resource_type = self.dialect.extract_json_field(json_col, '$.resourceType')
+        resource_types = list(resource_types)
+        types = ', '.join(sql_literal(rt) for rt in resource_types)
+        return (f"SELECT id AS row_id, {resource_type} AS resource_type, "
+                f"{patient_id_sql(self.dialect, json_col, resource_types)} AS patient_id, "
+                f"{json_col} AS resource FROM {self.datastore.table_name} "
+                f"WHERE id > {low} AND id <= {high} AND {resource_type} IN ({types})")
+
+    def _execute(self, sql: str) -> None:
+        connection = self.dialect.get_connection()
+        if self.is_postgresql:
+            cursor = connection.cursor()
+            try:
+                cursor.execute(sql)
+            finally:
+                cursor.close()
+        else:
+            connection.execute(sql)
+
+    def _query_scalar(self, sql: str):
+        connection = self.dialect.get_connection()
+        if self.is_postgresql:
+            cursor = connection.cursor()
+            try:
+                cursor.execute(sql)
+                return cursor.fetchone()[0]
+            finally:
+                cursor.close()
+        return connection.execute(sql).fetchone()[0]
@@ -6,8 +6,10 @@ must implement to support FHIR data storage and querying.
 """
 
 from abc import ABC, abstractmethod
-from typing import Dict, List, Any, Optional, Union, TYPE_CHECKING
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Any, Optional, Tuple, Union, TYPE_CHECKING
 import logging
+import threading
 
 if TYPE_CHECKING:
     from ..datastore import QueryResult
@@ -17,6 +19,39 @@ import re
 # Import FHIR type registry for configuration-driven type handling
 from ..fhir.type_registry import FHIRTypeRegistry
 
+# Shared CTEs estimated above this many rows are left to the planner: writing
+# them out can cost more than re-running a cheap filtered scan per reference
+CTE_MATERIALIZE_MAX_ROWS = 5_000_000
+
+
+class QueryCancelledError(Exception):
+    """A statement was interrupted on the database by a timeout or an explicit cancel"""
+
+
+def decide_cte_materialization(reference_count: int,
+                               estimated_rows: Optional[int] = None) -> Optional[bool]:
+    """
+    Decide whether a CTE should be materialized from how it is used.
+
+    A CTE read by two or more consumers (other CTEs or the final SELECT) is
+    computed once and reused; a CTE read once is inlined so the planner can
+    push predicates into it. Unreferenced or very large shared CTEs get no hint.
+
+    Args:
+        reference_count: Number of downstream references to the CTE
+        estimated_rows: Optional planner row estimate for the CTE body
+
+    Returns:
+        True (MATERIALIZED), False (NOT MATERIALIZED) or None (no hint)
+    """
+    if reference_count == 1:
+        return False
+    if reference_count >= 2:
+        if estimated_rows is not None and estimated_rows > CTE_MATERIALIZE_MAX_ROWS:
+            return None
+        return True
+    return None
+
 
 class DatabaseDialect(ABC):
     """Abstract base class for database dialect implementations"""
@@ -65,7 +100,24 @@ class DatabaseDialect(ABC):
         self.regex_function = "regexp_extract"
         self.cast_syntax = "::"
         self.quote_char = '"'
+        self.execution_profile_name = None
         self.logger = logging.getLogger(f"{__name__}.{self.__class__.__name__}")
+        
+        # Cancellable statements run one at a time so interrupt() only hits the intended one
+        self._statement_lock = threading.Lock()
+        self._active_statement = None
+        self._statement_interrupted = False
+        
+        # Resource table -> IndexAdvisor recording executed SQL, see FHIRDataStore(record_workload=True)
+        self.index_advisors = {}
+        # Resource table -> coding index table, see FHIRDataStore.enable_coding_index()
+        self.coding_index_tables = {}
+        # Resource table -> interval index table, see FHIRDataStore.enable_interval_index()
+        self.interval_index_tables = {}
+        # Resource table -> compartment index table, see FHIRDataStore.enable_compartment_index()
+        self.compartment_index_tables = {}
+        # Resource table -> ReferenceIndex, see FHIRDataStore.enable_reference_index()
+        self.reference_indexes = {}
     
     def _handle_operation_error(self, operation: str, error: Exception, sql: str = None) -> None:
         """Standard error handling for dialect operations"""
@@ -832,10 +884,182 @@ class DatabaseDialect(ABC):
         """Cast expression to time type"""
         pass
     
-    def optimize_cte_definition(self, cte_name: str, cte_expr: str) -> str:
-        """Apply dialect-specific CTE optimizations - database specific implementation"""
-        # Default implementation - no optimization
-        return f"{cte_name} AS ({cte_expr})"
+    # Whether the database accepts AS [NOT] MATERIALIZED on CTE definitions
+    supports_cte_materialization = False
+
+    def should_materialize_cte(self, cte_expr: str, reference_count: Optional[int] = None,
+                               estimated_rows: Optional[int] = None) -> Optional[bool]:
+        """
+        Decide MATERIALIZED (True), NOT MATERIALIZED (False) or no hint (None).
+
+        Uses the CTE's reference count in the query's dependency graph when the
+        caller knows it; without one there is nothing to decide on by default.
+        """
+        if reference_count is None:
+            return None
+        return decide_cte_materialization(reference_count, estimated_rows)
+
+    def optimize_cte_definition(self, cte_name: str, cte_expr: str,
+                                reference_count: Optional[int] = None,
+                                estimated_rows: Optional[int] = None) -> str:
+        """
+        Render a CTE definition with a materialization hint where supported.
+
+        Args:
+            cte_name: CTE alias
+            cte_expr: CTE body SQL
+            reference_count: Number of downstream CTEs/queries reading this CTE
+            estimated_rows: Optional row estimate (see estimate_row_count)
+        """
+        materialize = None
+        if self.supports_cte_materialization:
+            materialize = self.should_materialize_cte(cte_expr, reference_count, estimated_rows)
+        if materialize is None:
+            return f"{cte_name} AS ({cte_expr})"
+        hint = "MATERIALIZED" if materialize else "NOT MATERIALIZED"
+        return f"{cte_name} AS {hint} ({cte_expr})"
+
+    def estimate_row_count(self, sql: str) -> Optional[int]:
+        """Planner row estimate for a query via EXPLAIN, or None if unavailable"""
+        return None
+    
+    def apply_execution_profile(self, profile) -> None:
+        """
+        Apply a named execution profile (see fhir4ds.dialects.profiles) to the session.
+        
+        Args:
+            profile: Profile name ('interactive', 'batch', 'bulk-load', ...) or ExecutionProfile
+        """
+        from .profiles import apply_profile, get_profile
+        profile = get_profile(profile)
+        apply_profile(self.get_connection(), self.name, profile)
+        self.execution_profile_name = profile.name
+        self.logger.info(f"Applied execution profile '{profile.name}'")
+    
+    @contextmanager
+    def execution_profile(self, profile):
+        """Use an execution profile for a block and restore the previous settings afterwards."""
+        if profile is None:
+            yield self
+            return
+        from .profiles import apply_profile, get_profile, restore_settings
+        profile = get_profile(profile)
+        previous_name = self.execution_profile_name
+        previous = apply_profile(self.get_connection(), self.name, profile)
+        self.execution_profile_name = profile.name
+        try:
+            yield self
+        finally:
+            restore_settings(self.get_connection(), self.name, previous)
+            self.execution_profile_name = previous_name
+    
+    def interrupt(self) -> None:
+        """Abort the statement currently running on this dialect's connection."""
+        raise NotImplementedError(f"{self.name} does not support query cancellation")
+    
+    def execute_cancellable(self, sql: str, timeout: Optional[float] = None, owner: Any = None) -> Any:
+        """
+        Execute a query that can be aborted on the database.
+        
+        The statement is interrupted when ``timeout`` seconds pass or when
+        cancel_statement(owner) is called from another thread, so the database
+        stops working on it instead of the caller merely no longer waiting.
+        
+        Args:
+            sql: Query to execute
+            timeout: Optional statement timeout in seconds
+            owner: Object identifying the statement for cancel_statement()
+            
+        Returns:
+            Raw query results, as execute_query()
+            
+        Raises:
+            QueryCancelledError: The statement was interrupted
+        """
+        owner = owner if owner is not None else object()
+        with self._statement_lock:
+            if getattr(owner, 'cancelled', False):
+                raise QueryCancelledError(f"{self.name} query was cancelled before it started")
+            self._active_statement = owner
+            self._statement_interrupted = False
+            timer = None
+            if timeout:
+                timer = threading.Timer(timeout, self.cancel_statement, args=(owner,))
+                timer.daemon = True
+                timer.start()
+            try:
+                return self._execute_with_statement_timeout(sql, timeout)
+            except Exception as e:
+                if self._statement_interrupted or self._is_cancellation_error(e):
+                    timed_out = timer is not None and timer.finished.is_set() or not self._statement_interrupted
+                    reason = f"timed out after {timeout}s" if timed_out else "was cancelled"
+                    raise QueryCancelledError(f"{self.name} query {reason}") from e
+                raise
+            finally:
+                if timer is not None:
+                    timer.cancel()
+                self._active_statement = None
+    
+    def cancel_statement(self, owner: Any) -> bool:
+        """
+        Interrupt the statement started by execute_cancellable() for ``owner``.
+        
+        Returns:
+            True if the statement was running and has been interrupted
+        """
+        if owner is None or self._active_statement is not owner:
+            return False
+        self._statement_interrupted = True
+        self.interrupt()
+        self.logger.info(f"Interrupted running {self.name} statement")
+        return True
+    
+    def _execute_with_statement_timeout(self, sql: str, timeout: Optional[float]) -> Any:
+        """Run a cancellable statement; dialects with server-side timeouts override this."""
+        return self.execute_query(sql)
+    
+    def _is_cancellation_error(self, error: Exception) -> bool:
+        """Whether a driver error means the database cancelled the statement."""
+        return False
+    
+    def stream_query(self, sql: str, batch_size: int = 10000) -> Tuple[Any, Iterator[List[tuple]]]:
+        """
+        Execute a query and return its column description with an iterator of row batches.
+        
+        Dialects with streaming or server-side cursors override this so only one batch
+        is held in Python at a time; this default fetches every row first.
+        
+        Args:
+            sql: Query to execute
+            batch_size: Rows per batch
+            
+        Returns:
+            (cursor description, iterator of row lists)
+        """
+        rows = self.execute_query(sql) or []
+        description = self.get_query_description(self.get_connection())
+        return description, (rows[i:i + batch_size] for i in range(0, len(rows), batch_size))
+    
+    @staticmethod
+    def _stream_cursor(cursor: Any, batch_size: int) -> Tuple[Any, Iterator[List[tuple]]]:
+        """Read the first batch (named cursors only describe after a fetch) and stream the rest."""
+        try:
+            first = cursor.fetchmany(batch_size)
+            description = cursor.description
+        except Exception:
+            cursor.close()
+            raise
+        
+        def batches():
+            try:
+                batch = first
+                while batch:
+                    yield batch
+                    batch = cursor.fetchmany(batch_size)
+            finally:
+                cursor.close()
+        
+        return description, batches()
     
     # Pipeline-specific methods for new immutable pipeline architecture
     
@@ -86,6 +86,20 @@ class DuckDBDialect(DatabaseDialect):
         """Get column descriptions from last executed query"""
         return self.connection.description
     
+    def interrupt(self) -> None:
+        """Abort the running statement; DuckDB raises InterruptException in the executing thread"""
+        self.connection.interrupt()
+    
+    def stream_query(self, sql: str, batch_size: int = 10000):
+        """Execute on its own cursor so batches can be read while the connection runs other queries"""
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute(sql)
+        except Exception:
+            cursor.close()
+            raise
+        return self._stream_cursor(cursor, batch_size)
+    
     def create_fhir_table(self, table_name: str, json_col: str) -> None:
         """Create FHIR resources table optimized for DuckDB"""
         # Check if table already exists before dropping
@@ -357,6 +371,12 @@ class DuckDBDialect(DatabaseDialect):
     
     def resolve_reference_sql(self, input_sql: str) -> str:
         """Generate SQL for resolve() function to resolve FHIR references using DuckDB syntax"""
+        from ..datastore.references import reference_index_for
+        reference_index = reference_index_for(self)
+        if reference_index is not None:
+            reference = (f"COALESCE(json_extract_string({input_sql}, '$.reference'), "
+                         f"CASE WHEN json_type({input_sql}) = 'VARCHAR' THEN json_extract_string({input_sql}, '$') END)")
+            return reference_index.resolve_sql(reference)
         return f"""CASE 
             WHEN {input_sql} IS NULL THEN NULL
             WHEN json_extract_string({input_sql}, '$.reference') IS NOT NULL THEN
@@ -652,13 +672,29 @@ class DuckDBDialect(DatabaseDialect):
         """Concatenate strings using DuckDB's || operator"""
         return f"({left} || {right})"
     
-    def optimize_cte_definition(self, cte_name: str, cte_expr: str) -> str:
-        """Apply DuckDB-specific CTE optimizations"""
-        # DuckDB generally handles CTE optimization automatically
-        # Add hints for specific patterns if beneficial
+    supports_cte_materialization = True
+
+    def optimize_cte_definition(self, cte_name: str, cte_expr: str,
+                                reference_count: Optional[int] = None,
+                                estimated_rows: Optional[int] = None) -> str:
+        """Apply DuckDB-specific CTE optimizations and reference-count materialization hints"""
         optimized_expr = self._apply_json_optimizations(cte_expr)
-        
-        return f"{cte_name} AS ({optimized_expr})"
+        return super().optimize_cte_definition(cte_name, optimized_expr, reference_count, estimated_rows)
+
+    def estimate_row_count(self, sql: str) -> Optional[int]:
+        """Planner row estimate from the root operator of EXPLAIN (FORMAT JSON)"""
+        return self.explain_row_count(self.connection, sql)
+    
+    @staticmethod
+    def explain_row_count(connection: Any, sql: str) -> Optional[int]:
+        """estimate_row_count() on a raw DuckDB connection"""
+        try:
+            rows = connection.execute(f"EXPLAIN (FORMAT JSON) {sql}").fetchall()
+            plan = json.loads(rows[0][1])
+            return int(plan[0]['extra_info']['Estimated Cardinality'])
+        except Exception as e:
+            logger.debug(f"DuckDB row estimate failed: {e}")
+            return None
     
     def _apply_json_optimizations(self, cte_expr: str) -> str:
         """
@@ -5,22 +5,28 @@ This module provides PostgreSQL-specific functionality for FHIR data storage,
 optimized for JSONB operations and performance.
 """
 
+import importlib
+import importlib.util
 import json
 import logging
+import uuid
 from typing import Dict, List, Any, Optional
 
 from .base import DatabaseDialect
 
-# Optional import for PostgreSQL
-try:
-    import psycopg2
-    POSTGRESQL_AVAILABLE = True
-except ImportError:
-    POSTGRESQL_AVAILABLE = False
+# Optional import for PostgreSQL, deferred until a dialect is constructed
+POSTGRESQL_AVAILABLE = importlib.util.find_spec("psycopg2") is not None
 
 logger = logging.getLogger(__name__)
 
 
+def __getattr__(name):
+    """Keep ``postgresql.psycopg2`` resolvable without importing it eagerly."""
+    if name == "psycopg2" and POSTGRESQL_AVAILABLE:
+        return importlib.import_module("psycopg2")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 class PostgreSQLDialect(DatabaseDialect):
     """PostgreSQL implementation of the database dialect"""
     
@@ -29,6 +35,7 @@ class PostgreSQLDialect(DatabaseDialect):
         
         if not POSTGRESQL_AVAILABLE:
             raise ImportError("psycopg2 is required but not installed. Install with: pip install psycopg2-binary")
+        import psycopg2
         
         # PostgreSQL-specific settings
         self.name = "POSTGRESQL"
@@ -86,11 +93,48 @@ class PostgreSQLDialect(DatabaseDialect):
             # With autocommit=True, no need to rollback
             logger.error(f"PostgreSQL execution failed: {e}\nSQL: {sql}")
             raise e
+        finally:
+            cursor.close()
     
     def get_query_description(self, connection: Any) -> Any:
         """Get column descriptions from last executed query"""
         return getattr(self, '_last_cursor_description', None)
     
+    def interrupt(self) -> None:
+        """Send a cancel request for the statement running on the connection"""
+        self.connection.cancel()
+    
+    def _execute_with_statement_timeout(self, sql: str, timeout: Optional[float]) -> Any:
+        """Enforce the timeout server-side too, so it holds even if the client goes away"""
+        if not timeout:
+            return self.execute_query(sql)
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute(f"SET statement_timeout = {max(1, int(timeout * 1000))}")
+            try:
+                cursor.execute(sql)
+                self._last_cursor_description = cursor.description
+                return cursor.fetchall()
+            finally:
+                cursor.execute("RESET statement_timeout")
+        finally:
+            cursor.close()
+    
+    def _is_cancellation_error(self, error: Exception) -> bool:
+        """SQLSTATE 57014 (query_canceled) covers both cancel() and statement_timeout"""
+        return getattr(error, 'pgcode', None) == '57014'
+    
+    def stream_query(self, sql: str, batch_size: int = 10000):
+        """Stream through a server-side cursor (WITH HOLD, as the connection is in autocommit)"""
+        cursor = self.connection.cursor(name=f"fhir4ds_stream_{uuid.uuid4().hex[:12]}", withhold=True)
+        cursor.itersize = batch_size
+        try:
+            cursor.execute(sql)
+        except Exception:
+            cursor.close()
+            raise
+        return self._stream_cursor(cursor, batch_size)
+    
     def create_fhir_table(self, table_name: str, json_col: str) -> None:
         """Create FHIR resources table optimized for PostgreSQL"""
         cursor = self.connection.cursor()
@@ -391,6 +435,12 @@ class PostgreSQLDialect(DatabaseDialect):
     
     def resolve_reference_sql(self, input_sql: str) -> str:
         """Generate SQL for resolve() function to resolve FHIR references using PostgreSQL JSONB syntax"""
+        from ..datastore.references import reference_index_for
+        reference_index = reference_index_for(self)
+        if reference_index is not None:
+            reference = (f"COALESCE({input_sql} #>> '{{reference}}', "
+                         f"CASE WHEN jsonb_typeof({input_sql}) = 'string' THEN {input_sql} #>> '{{}}' END)")
+            return reference_index.resolve_sql(reference)
         return f"""CASE 
             WHEN {input_sql} IS NULL THEN NULL
             WHEN {input_sql} ? 'reference' THEN
@@ -609,18 +659,38 @@ class PostgreSQLDialect(DatabaseDialect):
         """Concatenate strings using PostgreSQL's || operator"""
         return f"({left} || {right})"
     
-    def optimize_cte_definition(self, cte_name: str, cte_expr: str) -> str:
-        """Apply PostgreSQL-specific CTE optimizations using MATERIALIZED/NOT MATERIALIZED hints"""
-        should_materialize = self._should_materialize_cte(cte_expr)
-        
-        if should_materialize:
-            return f"{cte_name} AS MATERIALIZED ({cte_expr})"
-        else:
-            return f"{cte_name} AS NOT MATERIALIZED ({cte_expr})"
+    supports_cte_materialization = True
+
+    def should_materialize_cte(self, cte_expr: str, reference_count: Optional[int] = None,
+                               estimated_rows: Optional[int] = None) -> Optional[bool]:
+        """Reference-count decision, falling back to the expression heuristic without one"""
+        if reference_count is None:
+            return self._should_materialize_cte(cte_expr)
+        return super().should_materialize_cte(cte_expr, reference_count, estimated_rows)
+
+    def estimate_row_count(self, sql: str) -> Optional[int]:
+        """Planner row estimate from EXPLAIN (FORMAT JSON)"""
+        return self.explain_row_count(self.connection, sql)
+    
+    @staticmethod
+    def explain_row_count(connection: Any, sql: str) -> Optional[int]:
+        """estimate_row_count() on a raw psycopg2 connection"""
+        cursor = connection.cursor()
+        try:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}")
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return int(plan[0]['Plan']['Plan Rows'])
+        except Exception as e:
+            logger.debug(f"PostgreSQL row estimate failed: {e}")
+            return None
+        finally:
+            cursor.close()
     
     def _should_materialize_cte(self, cte_expr: str) -> bool:
         """
-        Determine if a CTE should be materialized in PostgreSQL
+        Heuristic used when the CTE's reference count is unknown
         
         MATERIALIZED CTEs are beneficial when:
         - The CTE produces large intermediate results
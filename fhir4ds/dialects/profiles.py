@@ -0,0 +1,220 @@
+"""
+Execution Profiles
+
+Named resource-governance settings applied to a database session, so a
+connection can be tuned for the workload it is about to run instead of using
+database defaults:
+
+- interactive: small, latency-oriented queries (ViewDefinition execution, server
+  requests); modest memory and parallelism, insertion order preserved
+- batch: large measure and batch queries; most of the memory, every core,
+  spilling to a temp directory, insertion order not preserved
+- bulk-load: ingest; every core, spilling, insertion order not preserved and
+  large maintenance memory on PostgreSQL
+
+DuckDB profiles set memory_limit, threads, temp_directory and
+preserve_insertion_order; PostgreSQL profiles set work_mem,
+max_parallel_workers_per_gather and jit. Memory limits may be given as a
+percentage of physical memory and thread counts as "auto" (CPU count).
+
+Restoring puts back the exact previous value: DuckDB only reports memory_limit
+rounded for display ("4.5 GiB"), so the values profiles set are remembered per
+connection, and a limit found at its default is RESET rather than set to its
+rounded display.
+
+Usage:
+    db = QuickConnect.duckdb("./fhir.db", profile="interactive")
+    with db.datastore.dialect.execution_profile("batch"):
+        db.execute_batch(view_definitions)
+
+    register_profile(ExecutionProfile("nightly", duckdb={"memory_limit": "90%"}))
+"""
+
+import logging
+import os
+import tempfile
+import weakref
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# Default temp spill directory for DuckDB profiles that allow spilling
+SPILL_DIRECTORY = os.path.join(tempfile.gettempdir(), 'fhir4ds_spill')
+
+# DuckDB settings whose current_setting() is rounded for display
+ROUNDED_DUCKDB_SETTINGS = {'memory_limit'}
+
+# Connection -> exact values of rounded settings last set by apply/restore
+_exact_values = weakref.WeakKeyDictionary()
+
+
+@dataclass
+class ExecutionProfile:
+    """Session settings for one workload, per dialect"""
+    name: str
+    duckdb: Dict[str, Any] = field(default_factory=dict)
+    postgresql: Dict[str, Any] = field(default_factory=dict)
+    description: str = ''
+
+    def settings_for(self, dialect_name: str) -> Dict[str, Any]:
+        """Resolved settings for a dialect name ('DUCKDB' / 'POSTGRESQL')."""
+        if dialect_name.upper() == 'POSTGRESQL':
+            return dict(self.postgresql)
+        resolved = {key: _resolve_duckdb_value(key, value) for key, value in self.duckdb.items()}
+        return {key: value for key, value in resolved.items() if value is not None}
+
+
+EXECUTION_PROFILES: Dict[str, ExecutionProfile] = {
+    'interactive': ExecutionProfile(
+        'interactive',
+        duckdb={'memory_limit': '25%', 'threads': 4, 'preserve_insertion_order': True},
+        postgresql={'work_mem': '16MB', 'max_parallel_workers_per_gather': 2, 'jit': 'off'},
+        description='Low-latency queries: modest memory and parallelism',
+    ),
+    'batch': ExecutionProfile(
+        'batch',
+        duckdb={'memory_limit': '75%', 'threads': 'auto', 'temp_directory': SPILL_DIRECTORY,
+                'preserve_insertion_order': False},
+        postgresql={'work_mem': '256MB', 'max_parallel_workers_per_gather': 4, 'jit': 'on'},
+        description='Large measure and batch queries: most memory, every core, spill to disk',
+    ),
+    'bulk-load': ExecutionProfile(
+        'bulk-load',
+        duckdb={'memory_limit': '50%', 'threads': 'auto', 'temp_directory': SPILL_DIRECTORY,
+                'preserve_insertion_order': False},
+        postgresql={'work_mem': '64MB', 'maintenance_work_mem': '1GB',
+                    'max_parallel_workers_per_gather': 0, 'jit': 'off'},
+        description='Ingest: every core, spill to disk, large index build memory',
+    ),
+}
+
+
+def register_profile(profile: ExecutionProfile) -> ExecutionProfile:
+    """Add or replace a named execution profile."""
+    EXECUTION_PROFILES[profile.name] = profile
+    return profile
+
+
+def get_profile(profile: Union[str, ExecutionProfile]) -> ExecutionProfile:
+    """Look up a profile by name (ExecutionProfile instances pass through)."""
+    if isinstance(profile, ExecutionProfile):
+        return profile
+    if profile not in EXECUTION_PROFILES:
+        raise ValueError(f"Unknown execution profile '{profile}'. "
+                         f"Available: {', '.join(sorted(EXECUTION_PROFILES))}")
+    return EXECUTION_PROFILES[profile]
+
+
+def apply_profile(connection: Any, dialect_name: str,
+                  profile: Union[str, ExecutionProfile]) -> Dict[str, Any]:
+    """
+    Apply a profile's settings to a raw DuckDB or PostgreSQL connection.
+
+    Returns:
+        The previous value of every setting changed, for restore_settings()
+    """
+    profile = get_profile(profile)
+    settings = profile.settings_for(dialect_name)
+    if settings.get('temp_directory'):
+        os.makedirs(settings['temp_directory'], exist_ok=True)
+
+    previous = {}
+    for key, value in settings.items():
+        previous[key] = _current_value(connection, dialect_name, key)
+        _set(connection, dialect_name, key, value)
+    logger.debug(f"Applied execution profile '{profile.name}' to {dialect_name}: {settings}")
+    return previous
+
+
+def restore_settings(connection: Any, dialect_name: str, previous: Dict[str, Any]) -> None:
+    """Restore settings captured by apply_profile()."""
+    for key, value in previous.items():
+        if value is None or value == '':
+            _execute(connection, dialect_name, f"RESET {key}")
+            _exact_values.get(connection, {}).pop(key, None)
+        else:
+            _set(connection, dialect_name, key, value)
+
+
+@contextmanager
+def profile_scope(connection: Any, dialect_name: str, profile: Optional[Union[str, ExecutionProfile]]):
+    """Apply a profile for the duration of a block, then restore the previous settings."""
+    if profile is None:
+        yield
+        return
+    previous = apply_profile(connection, dialect_name, profile)
+    try:
+        yield
+    finally:
+        restore_settings(connection, dialect_name, previous)
+
+
+def _set(connection: Any, dialect_name: str, key: str, value: Any) -> None:
+    _execute(connection, dialect_name, f"SET {key} = {_sql_literal(value)}")
+    if dialect_name.upper() != 'POSTGRESQL' and key in ROUNDED_DUCKDB_SETTINGS:
+        _exact_values.setdefault(connection, {})[key] = value
+
+
+def _current_value(connection: Any, dialect_name: str, key: str) -> Any:
+    """
+    Current value of a setting for restore_settings(); None when a rounded DuckDB
+    setting is at its default.
+    """
+    displayed = _fetch_value(connection, dialect_name, f"SELECT current_setting('{key}')")
+    if dialect_name.upper() == 'POSTGRESQL' or key not in ROUNDED_DUCKDB_SETTINGS:
+        return displayed
+    # Probing is safe: the caller sets the profile value right after
+    exact = _exact_values.get(connection, {}).get(key)
+    if exact is not None:
+        _execute(connection, dialect_name, f"SET {key} = {_sql_literal(exact)}")
+        if _fetch_value(connection, dialect_name, f"SELECT current_setting('{key}')") == displayed:
+            return exact
+    _execute(connection, dialect_name, f"RESET {key}")
+    if _fetch_value(connection, dialect_name, f"SELECT current_setting('{key}')") == displayed:
+        return None
+    # Set outside fhir4ds: only the rounded display is known
+    return displayed
+
+
+def _resolve_duckdb_value(key: str, value: Any) -> Any:
+    if key == 'threads' and value == 'auto':
+        return os.cpu_count() or 1
+    if key == 'memory_limit' and isinstance(value, str) and value.endswith('%'):
+        total = _physical_memory_bytes()
+        if total is None:
+            return None  # keep DuckDB's default (80% of RAM) when memory size is unknown
+        return f"{int(total * float(value[:-1]) / 100 / (1024 * 1024))}MiB"
+    return value
+
+
+def _physical_memory_bytes() -> Optional[int]:
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def _sql_literal(value: Any) -> str:
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (int, float)):
+        return str(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _execute(connection: Any, dialect_name: str, sql: str) -> None:
+    if dialect_name.upper() == 'POSTGRESQL':
+        with connection.cursor() as cursor:
+            cursor.execute(sql)
+    else:
+        connection.execute(sql)
+
+
+def _fetch_value(connection: Any, dialect_name: str, sql: str) -> Any:
+    if dialect_name.upper() == 'POSTGRESQL':
+        with connection.cursor() as cursor:
+            cursor.execute(sql)
+            return cursor.fetchone()[0]
+    return connection.execute(sql).fetchone()[0]
@@ -8,10 +8,11 @@ hiding implementation complexity while supporting both simple and advanced usage
 from typing import Any, Dict, List, Optional, Union
 import json
 
-from .parser.parser import FHIRPathParser
+from .parser.parser import FHIRPathParser, parse_expression
 # Legacy translator removed - using pipeline system only
 from .core.choice_types import fhir_choice_types
 from .parser.ast_nodes import ASTNode
+from ..utils.tracing import span, SPAN_PARSE, SPAN_SQL_GENERATION, ATTR_SQL_LENGTH, ATTR_RESOURCE_TYPE
 
 # Import new pipeline architecture components
 try:
@@ -74,12 +75,13 @@ class FHIRPath:
             >>> fp = FHIRPath()
             >>> ast = fp.parse("Patient.name.family")
             >>> print(ast)
+            
+        Note:
+            ASTs come from a process-wide cache keyed by expression text and are
+            shared between callers, so they must not be modified.
         """
-        from .parser.parser import FHIRPathLexer, FHIRPathParser
-        lexer = FHIRPathLexer(expression)
-        tokens = lexer.tokenize()
-        parser = FHIRPathParser(tokens)
-        return parser.parse()
+        with span(SPAN_PARSE, {"fhir4ds.component": "fhirpath"}):
+            return parse_expression(expression)
     
     def to_sql(self, expression: str, resource_type: str = "Patient", table_alias: str = "p") -> str:
         """
@@ -121,7 +123,10 @@ class FHIRPath:
             context = ExecutionContext(dialect=self.dialect)
             
             # Use pipeline bridge to process
-            sql = self.pipeline_bridge.process_fhirpath_expression(ast_node, context)
+            with span(SPAN_SQL_GENERATION, {"fhir4ds.component": "fhirpath",
+                                            ATTR_RESOURCE_TYPE: resource_type}) as sql_span:
+                sql = self.pipeline_bridge.process_fhirpath_expression(ast_node, context)
+                sql_span.set_attribute(ATTR_SQL_LENGTH, len(sql))
             
             # Adjust table alias if needed
             if table_alias != "fhir_resources":
@@ -8,10 +8,10 @@ from .ast_nodes import (
     ASTNode, ThisNode, VariableNode, LiteralNode, IdentifierNode, FunctionCallNode,
     BinaryOpNode, UnaryOpNode, PathNode, IndexerNode, TupleNode, IntervalConstructorNode, ListLiteralNode
 )
-from .parser import FHIRPathParser, FHIRPathLexer
+from .parser import FHIRPathParser, FHIRPathLexer, parse_expression
 
 __all__ = [
     "ASTNode", "ThisNode", "VariableNode", "LiteralNode", "IdentifierNode", "FunctionCallNode",
     "BinaryOpNode", "UnaryOpNode", "PathNode", "IndexerNode", "TupleNode", "IntervalConstructorNode", "ListLiteralNode",
-    "FHIRPathParser", "FHIRPathLexer"
+    "FHIRPathParser", "FHIRPathLexer", "parse_expression"
 ]
\ No newline at end of file
@@ -8,6 +8,7 @@ It converts FHIRPath strings into Abstract Syntax Trees (ASTs) for further proce
 import re
 from enum import Enum
 from dataclasses import dataclass
+from functools import lru_cache
 from typing import List, Optional
 from contextlib import contextmanager
 
@@ -76,6 +77,81 @@ class Token:
     position: int
 
 
+# Keywords recognised case-insensitively by the lexer
+_KEYWORD_TOKENS = {
+    'and': TokenType.AND,
+    'or': TokenType.OR,
+    'as': TokenType.AS,
+    'where': TokenType.WHERE,
+    'sort': TokenType.SORT,
+    'by': TokenType.BY,
+    'return': TokenType.RETURN,
+    'with': TokenType.WITH,
+    'such': TokenType.SUCH,
+    'that': TokenType.THAT,
+    'not': TokenType.NOT,
+    'true': TokenType.BOOLEAN,
+    'false': TokenType.BOOLEAN,
+}
+
+_OPERATOR_TOKENS = {
+    '.': TokenType.DOT,
+    '[': TokenType.LBRACKET,
+    ']': TokenType.RBRACKET,
+    '(': TokenType.LPAREN,
+    ')': TokenType.RPAREN,
+    '{': TokenType.LBRACE,
+    '}': TokenType.RBRACE,
+    ':': TokenType.COLON,
+    ',': TokenType.COMMA,
+    '|': TokenType.PIPE,
+    '!~': TokenType.NOT_EQUIVALENT,
+    '!=': TokenType.NOT_EQUALS,
+    '~': TokenType.EQUIVALENT,
+    '=': TokenType.EQUALS,
+    '>=': TokenType.GREATER_EQUAL,
+    '>': TokenType.GREATER,
+    '<=': TokenType.LESS_EQUAL,
+    '<': TokenType.LESS,
+    '+': TokenType.PLUS,
+    '-': TokenType.MINUS,
+    '*': TokenType.MULTIPLY,
+    '/': TokenType.DIVIDE,
+    '^': TokenType.POWER,
+}
+
+_CONTEXT_VARIABLE_TOKENS = {
+    '$this': TokenType.DOLLAR_THIS,
+    '$index': TokenType.DOLLAR_INDEX,
+    '$total': TokenType.DOLLAR_TOTAL,
+}
+
+# Master scanner: the outermost named group of the matching alternative is
+# ``match.lastgroup`` and selects the token type. Alternatives are ordered so
+# that two-character operators win over their one-character prefixes.
+_TOKEN_RE = re.compile(r"""
+    (?P<WS>\s+)
+  | (?P<CTX>\$(?:this|index|total)(?![^\W_]))
+  | '(?P<SQ>(?:[^'\\]|\\.)*)(?:'|\\?\Z)
+  | "(?P<DQ>(?:[^"\\]|\\.)*)(?:"|\\?\Z)
+  | (?P<NUM>(?P<DIGITS>\d[\d.]*)(?:(?P<QOPEN>')(?P<UNIT>[^']*)(?P<QCLOSE>')?|(?P<LONG>[lL]))?)
+  | @(?P<DT>[^ \t\n\r)\]},|&=!<>+*/]*)
+  | (?P<IDENT>[^\W\d]\w*)
+  | (?P<OP>!~|!=|>=|<=|[.\[\](){}:,|~=><+\-*/^])
+""", re.VERBOSE | re.DOTALL)
+
+_CALL_LOOKAHEAD_RE = re.compile(r'\s*\(')
+_CONTEXT_VARIABLE_PREFIX_RE = re.compile(r'\$(?:this|index|total)')
+_STRING_ESCAPE_RE = re.compile(r'\\(.)', re.DOTALL)
+_STRING_ESCAPES = {'t': '\t', 'n': '\n', 'r': '\r', '\\': '\\', "'": "'", '"': '"'}
+
+
+def _unescape_string_char(match) -> str:
+    """Translate one backslash escape inside a string literal"""
+    char = match.group(1)
+    return _STRING_ESCAPES.get(char, '\\' + char)
+
+
 class FHIRPathLexer:
     """Lexer for FHIRPath expressions"""
     
@@ -188,215 +264,86 @@ class FHIRPathLexer:
         return result
     
     def tokenize(self) -> List[Token]:
-        """Tokenize the FHIRPath expression"""
+        """
+        Tokenize the FHIRPath expression.
+        
+        A single compiled regular expression (``_TOKEN_RE``) is matched at the
+        current offset and the named group that matched selects the token type,
+        so the expression is scanned once instead of character by character.
+        The token stream is identical to the character-walking helpers above.
+        """
+        expression = self.expression or ""
+        length = len(expression)
+        match_token = _TOKEN_RE.match
         tokens = []
+        position = 0
         
-        while self.current_char:
-            self.skip_whitespace()
-            # Check for context variables starting with $
-            if self.current_char == '$':
-                # Check for $this keyword
-                if self.expression[self.position:].startswith('$this'):
-                    # Ensure it's not part of a larger identifier like $thisValue
-                    if self.position + 5 == len(self.expression) or not self.expression[self.position + 5].isalnum():
-                        tokens.append(Token(TokenType.DOLLAR_THIS, '$this', self.position))
-                        for _ in range(5): self.advance()
-                        continue
-                # Check for $index keyword
-                elif self.expression[self.position:].startswith('$index'):
-                    # Ensure it's not part of a larger identifier like $indexValue
-                    if self.position + 6 == len(self.expression) or not self.expression[self.position + 6].isalnum():
-                        tokens.append(Token(TokenType.DOLLAR_INDEX, '$index', self.position))
-                        for _ in range(6): self.advance()
-                        continue
-                # Check for $total keyword
-                elif self.expression[self.position:].startswith('$total'):
-                    # Ensure it's not part of a larger identifier like $totalValue
-                    if self.position + 6 == len(self.expression) or not self.expression[self.position + 6].isalnum():
-                        tokens.append(Token(TokenType.DOLLAR_TOTAL, '$total', self.position))
-                        for _ in range(6): self.advance()
-                        continue
-                # If we get here, it's an unrecognized $ variable
-                else:
-                    raise ValueError(
-                        f"Unrecognized context variable at position {self.position} "
-                        f"in FHIRPath expression '{self.expression}'. "
-                        f"Supported context variables are: $this, $index, $total"
-                    )
-            if not self.current_char:
-                break
+        while position < length:
+            match = match_token(expression, position)
+            if match is None:
+                self._raise_invalid_character(expression, position)
             
-            pos = self.position
+            kind = match.lastgroup
+            end = match.end()
             
-            if self.current_char in ['"', "'"]:
-                value = self.read_string()
-                tokens.append(Token(TokenType.STRING, value, pos))
-            elif self.current_char.isdigit():
-                number_part = self.read_number()
-                
-                # Check for quantity literal (e.g., 1.5'kg')
-                if self.current_char == "'":
-                    number, unit = self.read_quantity(number_part)
-                    quantity_value = {'value': number, 'unit': unit}
-                    tokens.append(Token(TokenType.QUANTITY, quantity_value, pos))
-                # Check for long integer suffix (e.g., 1L)
-                elif self.current_char and self.current_char.upper() == 'L':
-                    long_value = self.read_long_integer(number_part)
-                    tokens.append(Token(TokenType.INTEGER, long_value, pos))
+            if kind == 'WS':
+                pass
+            elif kind == 'IDENT':
+                value = match.group(kind)
+                token_type = _KEYWORD_TOKENS.get(value.lower(), TokenType.IDENTIFIER)
+                # "where" and "not" are function calls when followed by '('
+                if token_type in (TokenType.WHERE, TokenType.NOT) and _CALL_LOOKAHEAD_RE.match(expression, end):
+                    token_type = TokenType.IDENTIFIER
+                tokens.append(Token(token_type, value, position))
+            elif kind == 'OP':
+                value = match.group(kind)
+                tokens.append(Token(_OPERATOR_TOKENS[value], value, position))
+            elif kind == 'SQ' or kind == 'DQ':
+                value = match.group(kind)
+                if '\\' in value:
+                    value = _STRING_ESCAPE_RE.sub(_unescape_string_char, value)
+                tokens.append(Token(TokenType.STRING, value, position))
+            elif kind == 'NUM':
+                number_part = match.group('DIGITS')
+                if match.group('QOPEN'):
+                    if match.group('QCLOSE') is None:
+                        raise ValueError(f"Unterminated unit in quantity literal at position {end}")
+                    quantity_value = {'value': number_part, 'unit': match.group('UNIT')}
+                    tokens.append(Token(TokenType.QUANTITY, quantity_value, position))
+                elif match.group('LONG'):
+                    tokens.append(Token(TokenType.INTEGER, number_part + 'L', position))
+                elif '.' in number_part:
+                    tokens.append(Token(TokenType.DECIMAL, number_part, position))
                 else:
-                    # Regular number
-                    if '.' in number_part:
-                        tokens.append(Token(TokenType.DECIMAL, number_part, pos))
-                    else:
-                        tokens.append(Token(TokenType.INTEGER, number_part, pos))
-            elif self.current_char == '@':
-                # DateTime literal (e.g., @2013-01-02T00:00:00.000Z)
-                datetime_value = self.read_datetime()
-                tokens.append(Token(TokenType.DATETIME, datetime_value, pos))
-            elif self.current_char.isalpha() or self.current_char == '_':
-                value = self.read_identifier()
-                # Check for keywords - but only treat "not" as a keyword if it's not followed by "("
-                # This allows .not() to be parsed as a function call
-                if value.lower() == 'and':
-                    tokens.append(Token(TokenType.AND, value, pos))
-                elif value.lower() == 'or':
-                    tokens.append(Token(TokenType.OR, value, pos))
-                elif value.lower() == 'as':
-                    tokens.append(Token(TokenType.AS, value, pos))
-                elif value.lower() == 'where':
-                    # Check if this is followed by a '(' (function call) by looking ahead
-                    temp_pos = self.position
-                    self.skip_whitespace()
-                    if self.current_char == '(':
-                        # This is .where() function call, treat as identifier
-                        tokens.append(Token(TokenType.IDENTIFIER, value, pos))
-                    else:
-                        # This is the "where" keyword for CQL query expressions
-                        tokens.append(Token(TokenType.WHERE, value, pos))
-                    # Reset position since we only peeked ahead
-                    while self.position > temp_pos:
-                        self.position -= 1
-                        if self.position >= 0:
-                            self.current_char = self.expression[self.position]
-                        else:
-                            self.current_char = None
-                elif value.lower() == 'sort':
-                    tokens.append(Token(TokenType.SORT, value, pos))
-                elif value.lower() == 'by':
-                    tokens.append(Token(TokenType.BY, value, pos))
-                elif value.lower() == 'return':
-                    tokens.append(Token(TokenType.RETURN, value, pos))
-                elif value.lower() == 'with':
-                    tokens.append(Token(TokenType.WITH, value, pos))
-                elif value.lower() == 'such':
-                    tokens.append(Token(TokenType.SUCH, value, pos))
-                elif value.lower() == 'that':
-                    tokens.append(Token(TokenType.THAT, value, pos))
-                elif value.lower() == 'not':
-                    # Check if this is followed by a '(' (function call) by looking ahead
-                    temp_pos = self.position
-                    self.skip_whitespace()
-                    if self.current_char == '(':
-                        # This is .not() function call, treat as identifier
-                        tokens.append(Token(TokenType.IDENTIFIER, value, pos))
-                    else:
-                        # This is the "not" keyword for logical negation
-                        tokens.append(Token(TokenType.NOT, value, pos))
-                    # Reset position since we only peeked ahead
-                    while self.position > temp_pos:
-                        self.position -= 1
-                        if self.position >= 0:
-                            self.current_char = self.expression[self.position]
-                        else:
-                            self.current_char = None
-                elif value.lower() in ['true', 'false']:
-                    tokens.append(Token(TokenType.BOOLEAN, value, pos))
-                else:
-                    tokens.append(Token(TokenType.IDENTIFIER, value, pos))
-            elif self.current_char == '.':
-                tokens.append(Token(TokenType.DOT, '.', pos))
-                self.advance()
-            elif self.current_char == '[':
-                tokens.append(Token(TokenType.LBRACKET, '[', pos))
-                self.advance()
-            elif self.current_char == ']':
-                tokens.append(Token(TokenType.RBRACKET, ']', pos))
-                self.advance()
-            elif self.current_char == '(':
-                tokens.append(Token(TokenType.LPAREN, '(', pos))
-                self.advance()
-            elif self.current_char == ')':
-                tokens.append(Token(TokenType.RPAREN, ')', pos))
-                self.advance()
-            elif self.current_char == '{':
-                tokens.append(Token(TokenType.LBRACE, '{', pos))
-                self.advance()
-            elif self.current_char == '}':
-                tokens.append(Token(TokenType.RBRACE, '}', pos))
-                self.advance()
-            elif self.current_char == ':':
-                tokens.append(Token(TokenType.COLON, ':', pos))
-                self.advance()
-            elif self.current_char == ',':
-                tokens.append(Token(TokenType.COMMA, ',', pos))
-                self.advance()
-            elif self.current_char == '|':
-                tokens.append(Token(TokenType.PIPE, '|', pos))
-                self.advance()
-            elif self.current_char == '!' and self.peek() == '~':
-                tokens.append(Token(TokenType.NOT_EQUIVALENT, '!~', pos))
-                self.advance()
-                self.advance()
-            elif self.current_char == '!' and self.peek() == '=':
-                tokens.append(Token(TokenType.NOT_EQUALS, '!=', pos))
-                self.advance()
-                self.advance()
-            elif self.current_char == '~':
-                tokens.append(Token(TokenType.EQUIVALENT, '~', pos))
-                self.advance()
-            elif self.current_char == '=':
-                tokens.append(Token(TokenType.EQUALS, '=', pos))
-                self.advance()
-            elif self.current_char == '>' and self.peek() == '=':
-                tokens.append(Token(TokenType.GREATER_EQUAL, '>=', pos))
-                self.advance()
-                self.advance()
-            elif self.current_char == '>':
-                tokens.append(Token(TokenType.GREATER, '>', pos))
-                self.advance()
-            elif self.current_char == '<' and self.peek() == '=':
-                tokens.append(Token(TokenType.LESS_EQUAL, '<=', pos))
-                self.advance()
-                self.advance()
-            elif self.current_char == '<':
-                tokens.append(Token(TokenType.LESS, '<', pos))
-                self.advance()
-            elif self.current_char == '+':
-                tokens.append(Token(TokenType.PLUS, '+', pos))
-                self.advance()
-            elif self.current_char == '-':
-                tokens.append(Token(TokenType.MINUS, '-', pos))
-                self.advance()
-            elif self.current_char == '*':
-                tokens.append(Token(TokenType.MULTIPLY, '*', pos))
-                self.advance()
-            elif self.current_char == '/':
-                tokens.append(Token(TokenType.DIVIDE, '/', pos))
-                self.advance()
-            elif self.current_char == '^':
-                tokens.append(Token(TokenType.POWER, '^', pos))
-                self.advance()
+                    tokens.append(Token(TokenType.INTEGER, number_part, position))
+            elif kind == 'DT':
+                tokens.append(Token(TokenType.DATETIME, match.group(kind), position))
             else:
-                # Invalid character - reject with helpful error
-                raise ValueError(
-                    f"Invalid character '{self.current_char}' at position {self.position} "
-                    f"in FHIRPath expression '{self.expression}'. "
-                    f"Valid operators are: = != < <= > >= + - * / and or not"
-                )
-        
-        tokens.append(Token(TokenType.EOF, '', self.position))
+                # Context variables: $this, $index, $total
+                value = match.group(kind)
+                tokens.append(Token(_CONTEXT_VARIABLE_TOKENS[value], value, position))
+            
+            position = end
+        
+        self.position = length
+        self.current_char = None
+        tokens.append(Token(TokenType.EOF, '', length))
         return tokens
     
+    def _raise_invalid_character(self, expression: str, position: int):
+        """Raise the lexer error for a character that starts no token"""
+        if expression[position] == '$' and not _CONTEXT_VARIABLE_PREFIX_RE.match(expression, position):
+            raise ValueError(
+                f"Unrecognized context variable at position {position} "
+                f"in FHIRPath expression '{expression}'. "
+                f"Supported context variables are: $this, $index, $total"
+            )
+        raise ValueError(
+            f"Invalid character '{expression[position]}' at position {position} "
+            f"in FHIRPath expression '{expression}'. "
+            f"Valid operators are: = != < <= > >= + - * / and or not"
+        )
+    
     def peek(self) -> Optional[str]:
         """Peek at the next character"""
         peek_pos = self.position + 1
@@ -1281,4 +1228,31 @@ Expression: {expression}
             marker = " -> " if line_number == line_num else "    "
             context_lines.append(f"{line_number:3d}{marker}{lines[i]}")
         
-        return '\n'.join(context_lines)
\ No newline at end of file
+        return '\n'.join(context_lines)
+
+
+# Upper bound on distinct expressions kept by parse_expression()
+PARSE_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_expression(expression: str) -> ASTNode:
+    """
+    Parse a FHIRPath expression through a process-wide, size-bounded cache.
+    
+    ViewRunner and the pipeline translate the same column and where-clause
+    paths over and over, so the AST for each distinct expression text is built
+    once and shared afterwards. Cached ASTs are shared between callers and must
+    be treated as immutable; parse errors are not cached.
+    
+    Use ``parse_expression.cache_info()`` / ``parse_expression.cache_clear()``
+    to inspect or reset the cache.
+    
+    Args:
+        expression: FHIRPath expression text
+        
+    Returns:
+        Root node of the parsed AST
+    """
+    tokens = FHIRPathLexer(expression).tokenize()
+    return FHIRPathParser(tokens).parse()
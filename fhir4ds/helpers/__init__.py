@@ -33,38 +33,66 @@ Quick Start:
     db.execute_to_excel([query], "report.xlsx")
 """
 
-# Import connection management (already implemented)
-from ..datastore.connections import QuickConnect, ConnectedDatabase
+import importlib
 
-# Import formatters and batch processing (already implemented)
-from ..datastore.formatters import ResultFormatter
-from ..datastore.batch import BatchProcessor, BatchResult, BatchSummary
+# Helpers are imported on first attribute access. name -> (module, optional);
+# optional helpers resolve to None when their dependencies are missing.
+_LAZY_IMPORTS = {
+    # Connection management, formatters and batch processing
+    "QuickConnect": ("..datastore.connections", False),
+    "ConnectedDatabase": ("..datastore.connections", False),
+    "ResultFormatter": ("..datastore.formatters", False),
+    "BatchProcessor": ("..datastore.batch", False),
+    "BatchResult": ("..datastore.batch", False),
+    "BatchSummary": ("..datastore.batch", False),
+    
+    # Advanced helper modules
+    "QueryBuilder": (".query_builder", True),
+    "FHIRQueryBuilder": (".query_builder", True),
+    "Templates": (".templates", True),
+    "TemplateLibrary": (".templates", True),
+    "PerformanceMonitor": (".performance", True),
+    "QueryProfiler": (".performance", True),
+    "OptimizationSuggestions": (".performance", True),
+}
+
+# Availability flag -> module whose importability it reports
+_AVAILABILITY_FLAGS = {
+    "QUERY_BUILDER_AVAILABLE": ".query_builder",
+    "TEMPLATES_AVAILABLE": ".templates",
+    "PERFORMANCE_AVAILABLE": ".performance",
+}
+
+
+def _import_optional(module_name: str):
+    """Import a module, returning None if it or a dependency is missing."""
+    try:
+        return importlib.import_module(module_name, __name__)
+    except ImportError:
+        return None
+
+
+def __getattr__(name):
+    """Resolve lazily imported helpers and availability flags (PEP 562)."""
+    if name in _AVAILABILITY_FLAGS:
+        value = _import_optional(_AVAILABILITY_FLAGS[name]) is not None
+    elif name in _LAZY_IMPORTS:
+        module_name, optional = _LAZY_IMPORTS[name]
+        if optional:
+            module = _import_optional(module_name)
+            value = getattr(module, name, None) if module is not None else None
+        else:
+            value = getattr(importlib.import_module(module_name, __name__), name)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    
+    globals()[name] = value
+    return value
 
-# Import new helper modules (to be implemented)
-try:
-    from .query_builder import QueryBuilder, FHIRQueryBuilder
-    QUERY_BUILDER_AVAILABLE = True
-except ImportError:
-    QueryBuilder = None
-    FHIRQueryBuilder = None
-    QUERY_BUILDER_AVAILABLE = False
 
-try:
-    from .templates import Templates, TemplateLibrary
-    TEMPLATES_AVAILABLE = True
-except ImportError:
-    Templates = None
-    TemplateLibrary = None
-    TEMPLATES_AVAILABLE = False
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
 
-try:
-    from .performance import PerformanceMonitor, QueryProfiler, OptimizationSuggestions
-    PERFORMANCE_AVAILABLE = True
-except ImportError:
-    PerformanceMonitor = None
-    QueryProfiler = None
-    OptimizationSuggestions = None
-    PERFORMANCE_AVAILABLE = False
 
 __all__ = [
     # Core helper functionality
@@ -3,16 +3,19 @@ Advanced Pipeline Features - CTE Optimization and Query Plan Caching.
 
 This module implements sophisticated features that enhance pipeline performance:
 - Intelligent Common Table Expression (CTE) optimization and reuse
-- Query plan caching for repeated pattern recognition
+- Query plan caching for repeated pattern recognition, optionally persisted
+  to a file-backed store so new processes start with hot plans
 - Smart indexing hints for JSON path operations
 - Parallel optimization pass execution
 """
 
 import hashlib
+import json
 import logging
+import sqlite3
 import threading
 from collections import defaultdict
-from dataclasses import dataclass, field
+from dataclasses import asdict, dataclass, field
 from typing import Dict, List, Optional, Set, Tuple, Any, Union
 from weakref import WeakValueDictionary
 
@@ -193,16 +196,130 @@ class CTEOptimizer:
             'reuse_patterns': dict(self.reuse_patterns)
         }
 
+def _package_version() -> str:
+    """Installed fhir4ds version, part of every persisted plan key."""
+    from ... import __version__
+    return __version__
+
+class PersistentPlanStore:
+    """
+    File-backed store for compiled query plans.
+    
+    Plans are kept in a small SQLite table (usually next to the database
+    file) keyed by cache key, fhir4ds version and dialect, so a plan written
+    by one version or dialect is never served to another. Rows are read
+    one key at a time on demand rather than bulk-loaded at startup.
+    """
+    
+    TABLE_NAME = "fhir4ds_compiled_plans"
+    
+    def __init__(self, path: str, version: Optional[str] = None):
+        """
+        Open (or create) a persistent plan store.
+        
+        Args:
+            path: SQLite database file for the plans
+            version: fhir4ds version to key entries by (defaults to installed version)
+        """
+        self.path = str(path)
+        self.version = version or _package_version()
+        self._lock = threading.RLock()
+        self._connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._connection.execute(f"""
+            CREATE TABLE IF NOT EXISTS {self.TABLE_NAME} (
+                cache_key TEXT NOT NULL,
+                fhir4ds_version TEXT NOT NULL,
+                dialect TEXT NOT NULL,
+                plan_json TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (cache_key, fhir4ds_version, dialect)
+            )
+        """)
+        self._connection.commit()
+    
+    def load(self, cache_key: str, dialect: str) -> Optional[CompiledSQL]:
+        """
+        Load a persisted plan.
+        
+        Args:
+            cache_key: Cache key of the plan
+            dialect: Dialect name the plan was compiled for
+            
+        Returns:
+            CompiledSQL if stored for this version and dialect, None otherwise
+        """
+        with self._lock:
+            row = self._connection.execute(
+                f"SELECT plan_json FROM {self.TABLE_NAME} "
+                f"WHERE cache_key = ? AND fhir4ds_version = ? AND dialect = ?",
+                (cache_key, self.version, dialect.upper())
+            ).fetchone()
+        
+        if row is None:
+            return None
+        
+        try:
+            return CompiledSQL(**json.loads(row[0]))
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable persisted plan {cache_key}: {e}")
+            return None
+    
+    def save(self, cache_key: str, dialect: str, compiled_sql: CompiledSQL) -> None:
+        """
+        Persist a compiled plan, replacing any previous entry for the key.
+        
+        Args:
+            cache_key: Cache key of the plan
+            dialect: Dialect name the plan was compiled for
+            compiled_sql: Compiled SQL to persist
+        """
+        try:
+            plan_json = json.dumps(asdict(compiled_sql))
+        except (TypeError, ValueError) as e:
+            # Plans with non-JSON parameters stay in memory only
+            logger.debug(f"Plan {cache_key} not persisted: {e}")
+            return
+        
+        with self._lock:
+            self._connection.execute(
+                f"INSERT OR REPLACE INTO {self.TABLE_NAME} "
+                f"(cache_key, fhir4ds_version, dialect, plan_json) VALUES (?, ?, ?, ?)",
+                (cache_key, self.version, dialect.upper(), plan_json)
+            )
+            self._connection.commit()
+    
+    def clear(self) -> None:
+        """Delete every persisted plan."""
+        with self._lock:
+            self._connection.execute(f"DELETE FROM {self.TABLE_NAME}")
+            self._connection.commit()
+    
+    def count(self) -> int:
+        """Number of persisted plans for the current version."""
+        with self._lock:
+            return self._connection.execute(
+                f"SELECT COUNT(*) FROM {self.TABLE_NAME} WHERE fhir4ds_version = ?",
+                (self.version,)
+            ).fetchone()[0]
+    
+    def close(self) -> None:
+        """Close the underlying SQLite connection."""
+        with self._lock:
+            self._connection.close()
+
 class QueryPlanCache:
     """
     High-performance query plan cache for compiled pipelines.
     
     This cache stores compiled SQL patterns to avoid recompilation of
-    frequently used FHIRPath expressions and pipeline patterns.
+    frequently used FHIRPath expressions and pipeline patterns. With a
+    PersistentPlanStore attached, misses fall through to the store and new
+    plans are written through to it.
     """
     
-    def __init__(self, max_size: int = 1000):
+    def __init__(self, max_size: int = 1000, persistent_store: Optional[PersistentPlanStore] = None):
         self.max_size = max_size
+        self.persistent_store = persistent_store
         self._cache: Dict[str, CompiledSQL] = {}
         self._access_counts: Dict[str, int] = defaultdict(int)
         self._lock = threading.RLock()
@@ -212,7 +329,8 @@ class QueryPlanCache:
             'hits': 0,
             'misses': 0,
             'evictions': 0,
-            'total_compilations_saved': 0
+            'total_compilations_saved': 0,
+            'persistent_hits': 0
         }
     
     def get_cache_key(self, pipeline: FHIRPathPipeline, 
@@ -256,12 +374,32 @@ class QueryPlanCache:
         full_key = f"{pipeline_hash}:{context_str}:{state_str}"
         return hashlib.sha256(full_key.encode()).hexdigest()[:16]
     
-    def get(self, cache_key: str) -> Optional[CompiledSQL]:
+    @staticmethod
+    def get_view_cache_key(view_definition: Dict[str, Any], dialect_name: str,
+                           table_name: str, json_column: str) -> str:
+        """
+        Generate a cache key for the SQL of a whole ViewDefinition.
+        
+        Args:
+            view_definition: ViewDefinition dictionary (constants already applied)
+            dialect_name: Database dialect name
+            table_name: FHIR resources table
+            json_column: JSON column holding the resources
+            
+        Returns:
+            Unique cache key string
+        """
+        view_json = json.dumps(view_definition, sort_keys=True, default=str)
+        full_key = f"view:{view_json}:{dialect_name.upper()}:{table_name}:{json_column}"
+        return hashlib.sha256(full_key.encode()).hexdigest()[:32]
+    
+    def get(self, cache_key: str, dialect: Optional[str] = None) -> Optional[CompiledSQL]:
         """
         Retrieve compiled SQL from cache.
         
         Args:
             cache_key: Cache key for lookup
+            dialect: Dialect name, needed to consult the persistent store
             
         Returns:
             Cached CompiledSQL if found, None otherwise
@@ -273,27 +411,45 @@ class QueryPlanCache:
                 self.stats['total_compilations_saved'] += 1
                 logger.debug(f"Query plan cache hit: {cache_key}")
                 return self._cache[cache_key]
-            else:
-                self.stats['misses'] += 1
-                logger.debug(f"Query plan cache miss: {cache_key}")
-                return None
+            
+            if self.persistent_store is not None and dialect:
+                compiled_sql = self.persistent_store.load(cache_key, dialect)
+                if compiled_sql is not None:
+                    self._store_in_memory(cache_key, compiled_sql)
+                    self.stats['hits'] += 1
+                    self.stats['persistent_hits'] += 1
+                    self.stats['total_compilations_saved'] += 1
+                    logger.debug(f"Query plan loaded from persistent store: {cache_key}")
+                    return compiled_sql
+            
+            self.stats['misses'] += 1
+            logger.debug(f"Query plan cache miss: {cache_key}")
+            return None
     
-    def put(self, cache_key: str, compiled_sql: CompiledSQL) -> None:
+    def put(self, cache_key: str, compiled_sql: CompiledSQL, dialect: Optional[str] = None) -> None:
         """
         Store compiled SQL in cache.
         
         Args:
             cache_key: Cache key
             compiled_sql: Compiled SQL to cache
+            dialect: Dialect name, needed to write through to the persistent store
         """
         with self._lock:
-            # Check if we need to evict entries
-            if len(self._cache) >= self.max_size:
-                self._evict_lru_entry()
-            
-            self._cache[cache_key] = compiled_sql
-            self._access_counts[cache_key] = 1
+            self._store_in_memory(cache_key, compiled_sql)
             logger.debug(f"Query plan cached: {cache_key}")
+            
+            if self.persistent_store is not None and dialect:
+                self.persistent_store.save(cache_key, dialect, compiled_sql)
+    
+    def _store_in_memory(self, cache_key: str, compiled_sql: CompiledSQL) -> None:
+        """Add an entry to the in-memory tier, evicting if full."""
+        # Check if we need to evict entries
+        if cache_key not in self._cache and len(self._cache) >= self.max_size:
+            self._evict_lru_entry()
+        
+        self._cache[cache_key] = compiled_sql
+        self._access_counts[cache_key] = 1
     
     def _evict_lru_entry(self) -> None:
         """Evict the least recently used cache entry."""
@@ -327,7 +483,8 @@ class QueryPlanCache:
                 'cache_size': len(self._cache),
                 'max_size': self.max_size,
                 'hit_rate': hit_rate,
-                'cache_efficiency': self.stats['total_compilations_saved']
+                'cache_efficiency': self.stats['total_compilations_saved'],
+                'persistent_store': self.persistent_store.path if self.persistent_store else None
             }
 
 class SmartIndexingHints:
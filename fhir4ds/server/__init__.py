@@ -4,9 +4,31 @@ FHIR4DS Web Server Module
 Provides RESTful API functionality for FHIR analytics as a service.
 """
 
-from .app import create_app, FHIRAnalyticsServer
-from .config import FHIRAnalyticsServerConfig
-from .models import ViewDefinitionRequest, AnalyticsRequest, ServerInfo
+import importlib
+
+# fastapi, pydantic and uvicorn are only imported when the server is used.
+_LAZY_IMPORTS = {
+    "create_app": ".app",
+    "FHIRAnalyticsServer": ".app",
+    "FHIRAnalyticsServerConfig": ".config",
+    "ViewDefinitionRequest": ".models",
+    "AnalyticsRequest": ".models",
+    "ServerInfo": ".models",
+}
+
+
+def __getattr__(name):
+    """Import public attributes on first access (PEP 562)."""
+    if name not in _LAZY_IMPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY_IMPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
 
 __all__ = [
     'create_app',
@@ -4,6 +4,7 @@ FHIR4DS Analytics Server
 FastAPI application providing RESTful API for FHIR analytics as a service.
 """
 
+import asyncio
 import json
 import time
 import logging
@@ -11,7 +12,7 @@ from datetime import datetime
 from typing import List, Dict, Any, Optional
 from pathlib import Path
 
-from fastapi import FastAPI, HTTPException, Query, Depends, status
+from fastapi import FastAPI, HTTPException, Query, Depends, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse, PlainTextResponse
 from contextlib import asynccontextmanager
@@ -24,7 +25,13 @@ from .models import (
 )
 
 from ..helpers import QuickConnect
+from ..utils.tracing import span
 from ..datastore import FHIRDataStore
+from ..datastore.formatters import ResultFormatter
+from ..dialects.base import QueryCancelledError
+
+# How often a running query checks whether its client is still connected (seconds)
+DISCONNECT_POLL_INTERVAL = 0.5
 
 
 class FHIRAnalyticsServer:
@@ -54,9 +61,13 @@ class FHIRAnalyticsServer:
             connection_string = get_database_connection_string(self.config)
             
             if self.config.database_type.lower() == "postgresql":
-                self.db = QuickConnect.postgresql(connection_string, self.config.initialize_db)
+                self.db = QuickConnect.postgresql(connection_string, self.config.initialize_db,
+                                                  plan_cache_path=self.config.plan_cache_path,
+                                                  profile=self.config.execution_profile)
             else:  # DuckDB
-                self.db = QuickConnect.duckdb(connection_string, self.config.initialize_db)
+                self.db = QuickConnect.duckdb(connection_string, self.config.initialize_db,
+                                              plan_cache_path=self.config.plan_cache_path,
+                                              profile=self.config.execution_profile)
             
             self.logger.info(f"Connected to {self.config.database_type} database: {connection_string}")
             
@@ -286,8 +297,15 @@ class FHIRAnalyticsServer:
                 detail=f"Failed to delete ViewDefinition: {str(e)}"
             )
     
-    async def execute_analytics(self, view_name: str, analytics_request: AnalyticsRequest) -> AnalyticsResponse:
-        """Execute analytics using a ViewDefinition"""
+    async def execute_analytics(self, view_name: str, analytics_request: AnalyticsRequest,
+                                is_disconnected=None) -> AnalyticsResponse:
+        """
+        Execute analytics using a ViewDefinition.
+        
+        The query runs in a worker thread under the configured query_timeout and is
+        interrupted on the database when it times out or when ``is_disconnected``
+        (an async callable, e.g. Request.is_disconnected) reports the client gone.
+        """
         try:
             start_time = time.time()
             
@@ -328,17 +346,16 @@ class FHIRAnalyticsServer:
             if view_def.where:
                 view_definition_dict["where"] = view_def.where
             
-            # Execute ViewDefinition
-            if analytics_request.format == OutputFormat.JSON:
-                result = self.db.execute_to_dataframe(view_definition_dict, analytics_request.include_metadata)
-                data = result.to_dict('records') if hasattr(result, 'to_dict') else []
-            elif analytics_request.format == OutputFormat.CSV:
-                # Execute and convert to CSV
-                result = self.db.execute_to_dataframe(view_definition_dict, analytics_request.include_metadata)
+            # Execute ViewDefinition; rows are fetched (and cached) before formatting
+            query_result = self.db.execute(view_definition_dict)
+            query_result.timeout = self.config.query_timeout
+            await self._fetch_cancellable(query_result, is_disconnected)
+            result = ResultFormatter.to_dataframe(query_result, include_metadata=analytics_request.include_metadata)
+            
+            if analytics_request.format == OutputFormat.CSV:
                 data = result.to_csv(index=False) if hasattr(result, 'to_csv') else ""
             else:
-                # For other formats, use dataframe and convert
-                result = self.db.execute_to_dataframe(view_definition_dict, analytics_request.include_metadata)
+                # JSON and other formats use records
                 data = result.to_dict('records') if hasattr(result, 'to_dict') else []
             
             execution_time = (time.time() - start_time) * 1000  # Convert to milliseconds
@@ -367,6 +384,12 @@ class FHIRAnalyticsServer:
             
         except HTTPException:
             raise
+        except QueryCancelledError as e:
+            self.logger.warning(f"Analytics query for view '{view_name}' stopped: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                detail=f"Query stopped: {str(e)}"
+            )
         except Exception as e:
             self.logger.error(f"Failed to execute analytics for view '{view_name}': {e}")
             raise HTTPException(
@@ -374,6 +397,19 @@ class FHIRAnalyticsServer:
                 detail=f"Failed to execute analytics: {str(e)}"
             )
     
+    async def _fetch_cancellable(self, query_result, is_disconnected=None) -> List[tuple]:
+        """Fetch a QueryResult in a worker thread, cancelling it if the client disconnects"""
+        loop = asyncio.get_running_loop()
+        fetch = loop.run_in_executor(None, query_result.fetchall)
+        while True:
+            done, _ = await asyncio.wait({fetch}, timeout=DISCONNECT_POLL_INTERVAL)
+            if done:
+                return fetch.result()
+            if is_disconnected is not None and await is_disconnected():
+                self.logger.info("Client disconnected, cancelling running query")
+                query_result.cancel()
+                return await fetch  # raises QueryCancelledError once the database stops
+    
     async def bulk_load_resources(self, bulk_request: BulkResourceRequest) -> BulkResourceResponse:
         """Bulk load resources into the database"""
         try:
@@ -386,16 +422,17 @@ class FHIRAnalyticsServer:
                     detail=f"Too many resources. Maximum allowed: {self.config.max_resources_per_request}"
                 )
             
-            # Load resources
-            if bulk_request.parallel and self.config.enable_parallel_processing:
-                self.db.load_resources(
-                    bulk_request.resources,
-                    parallel=True,
-                    batch_size=bulk_request.batch_size
-                )
-            else:
-                for resource in bulk_request.resources:
-                    self.db.load_resource(resource)
+            # Load resources under the bulk-load profile, then return to the server profile
+            with self.db.datastore.dialect.execution_profile(self.config.bulk_load_profile):
+                if bulk_request.parallel and self.config.enable_parallel_processing:
+                    self.db.load_resources(
+                        bulk_request.resources,
+                        parallel=True,
+                        batch_size=bulk_request.batch_size
+                    )
+                else:
+                    for resource in bulk_request.resources:
+                        self.db.load_resource(resource)
             
             processing_time = (time.time() - start_time) * 1000
             
@@ -489,6 +526,15 @@ def create_app(config: FHIRAnalyticsServerConfig = None) -> FastAPI:
             allow_headers=["*"],
         )
     
+    # Wrap each request in a span; translate/execute/fetch spans nest under it
+    @app.middleware("http")
+    async def trace_requests(request, call_next):
+        with span("fhir4ds.http.request", {"http.method": request.method,
+                                           "http.target": request.url.path}) as request_span:
+            response = await call_next(request)
+            request_span.set_attribute("http.status_code", response.status_code)
+            return response
+    
     # Health check endpoint
     @app.get("/health", response_model=HealthResponse)
     async def health_check():
@@ -549,6 +595,7 @@ def create_app(config: FHIRAnalyticsServerConfig = None) -> FastAPI:
     async def execute_analytics(
         view_name: str, 
         analytics_request: AnalyticsRequest,
+        request: Request,
         format: Optional[OutputFormat] = Query(OutputFormat.JSON, description="Output format")
     ):
         """Execute analytics using a ViewDefinition"""
@@ -556,7 +603,8 @@ def create_app(config: FHIRAnalyticsServerConfig = None) -> FastAPI:
         if format:
             analytics_request.format = format
         
-        return await server.execute_analytics(view_name, analytics_request)
+        return await server.execute_analytics(view_name, analytics_request,
+                                              is_disconnected=request.is_disconnected)
     
     # Bulk resource loading endpoint
     @app.post("/resources", response_model=BulkResourceResponse)
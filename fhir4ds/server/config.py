@@ -41,6 +41,10 @@ class FHIRAnalyticsServerConfig(BaseSettings):
     # Performance
     enable_parallel_processing: bool = Field(default=True, env="FHIR4DS_PARALLEL_PROCESSING")
     batch_size: int = Field(default=100, env="FHIR4DS_BATCH_SIZE")
+    plan_cache_path: Optional[str] = Field(default=None, env="FHIR4DS_PLAN_CACHE")  # persisted compiled SQL
+    execution_profile: Optional[str] = Field(default="interactive", env="FHIR4DS_EXECUTION_PROFILE")  # request queries
+    bulk_load_profile: Optional[str] = Field(default="bulk-load", env="FHIR4DS_BULK_LOAD_PROFILE")  # bulk ingest
+    query_timeout: Optional[float] = Field(default=None, env="FHIR4DS_QUERY_TIMEOUT")  # seconds, enforced in the database
     
     # Logging
     log_level: str = Field(default="INFO", env="FHIR4DS_LOG_LEVEL")
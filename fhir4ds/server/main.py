@@ -118,6 +118,11 @@ Examples:
         help="Batch size for parallel processing (default: 100)"
     )
     
+    parser.add_argument(
+        "--plan-cache", 
+        help="SQLite file for persisting compiled ViewDefinition SQL across restarts (optional)"
+    )
+    
     # Security and behavior
     parser.add_argument(
         "--api-key", 
@@ -174,6 +179,7 @@ def create_config_from_args(args) -> FHIRAnalyticsServerConfig:
         "max_resources_per_request": args.max_resources,
         "enable_parallel_processing": not args.no_parallel,
         "batch_size": args.batch_size,
+        "plan_cache_path": args.plan_cache,
         "api_key": args.api_key,
         "enable_cors": not args.no_cors,
         "log_level": args.log_level,
@@ -7,13 +7,31 @@ Utility modules for FHIR4DS including:
 - Testing convenience functions
 """
 
-from .performance import (
-    PerformanceTester,
-    PerformanceMetrics,
-    DatasetStats,
-    quick_performance_test,
-    comprehensive_performance_test
-)
+import importlib
+
+# performance imports the datastore; keep it out of lightweight imports such
+# as fhir4ds.utils.logging_config.
+_LAZY_IMPORTS = {
+    "PerformanceTester": ".performance",
+    "PerformanceMetrics": ".performance",
+    "DatasetStats": ".performance",
+    "quick_performance_test": ".performance",
+    "comprehensive_performance_test": ".performance",
+}
+
+
+def __getattr__(name):
+    """Import public attributes on first access (PEP 562)."""
+    if name not in _LAZY_IMPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY_IMPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
 
 __all__ = [
     'PerformanceTester',
@@ -0,0 +1,270 @@
+"""
+Tracing for FHIR4DS
+
+Lightweight, pluggable spans around the stages of a request: FHIRPath parse,
+pipeline compile, SQL generation, database execute, fetch and format/export.
+Tracing is a no-op by default; spans cost one function call and allocate
+nothing until a tracer is installed.
+
+Tracers:
+- NoOpTracer: default, discards everything
+- RecordingTracer: keeps finished spans in memory (tests, ad-hoc profiling)
+- OpenTelemetryTracer: forwards spans to OpenTelemetry when it is installed,
+  so any configured OTLP/Jaeger/console exporter receives them
+
+Usage:
+    from fhir4ds.utils.tracing import RecordingTracer, set_tracer, span
+
+    tracer = set_tracer(RecordingTracer())
+    db.execute_to_dataframe(view_definition)
+    for finished in tracer.spans:
+        print(finished.name, finished.duration_ms, finished.attributes)
+
+    # Or export to OpenTelemetry (also enabled by FHIR4DS_TRACING=opentelemetry)
+    from fhir4ds.utils.tracing import enable_opentelemetry
+    enable_opentelemetry()
+"""
+
+import contextvars
+import functools
+import importlib.util
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Environment variable selecting the tracer at import: "opentelemetry", "memory" or unset
+TRACING_ENV_VAR = 'FHIR4DS_TRACING'
+
+# opentelemetry is only imported when the OpenTelemetry tracer is installed
+OPENTELEMETRY_AVAILABLE = importlib.util.find_spec("opentelemetry") is not None
+
+# Span names used across the codebase
+SPAN_PARSE = "fhir4ds.parse"
+SPAN_COMPILE = "fhir4ds.compile"
+SPAN_SQL_GENERATION = "fhir4ds.sql_generation"
+SPAN_DB_EXECUTE = "fhir4ds.db.execute"
+SPAN_FETCH = "fhir4ds.fetch"
+SPAN_FORMAT = "fhir4ds.format"
+
+# Attribute keys
+ATTR_SQL_LENGTH = "fhir4ds.sql.length"
+ATTR_ROW_COUNT = "fhir4ds.rows"
+ATTR_RESOURCE_TYPE = "fhir4ds.resource_type"
+ATTR_DIALECT = "db.system"
+ATTR_FORMAT = "fhir4ds.format"
+
+
+class _NoOpSpan:
+    """Span that ignores everything; a single shared instance is reused."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        pass
+
+    def record_exception(self, exception: BaseException) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoOpSpan()
+
+
+class NoOpTracer:
+    """Default tracer: spans are free and nothing is recorded."""
+
+    enabled = False
+
+    def start_span(self, name: str, attributes: Optional[Dict[str, Any]] = None):
+        return _NOOP_SPAN
+
+
+@dataclass
+class FinishedSpan:
+    """A completed span recorded by RecordingTracer"""
+    name: str
+    start_time: float
+    duration_ms: float
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    parent: Optional[str] = None
+    error: Optional[str] = None
+
+
+class _RecordingSpan:
+    """Context-managed span that reports to a RecordingTracer on exit."""
+
+    def __init__(self, tracer: 'RecordingTracer', name: str, attributes: Optional[Dict[str, Any]]):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = dict(attributes) if attributes else {}
+        self.parent = None
+        self.error = None
+        self._start = 0.0
+        self._token = None
+
+    def __enter__(self):
+        stack = self.tracer._active.get()
+        self.parent = stack[-1].name if stack else None
+        self._token = self.tracer._active.set(stack + (self,))
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration_ms = (time.perf_counter() - self._start) * 1000
+        if exc is not None:
+            self.record_exception(exc)
+        self.tracer._active.reset(self._token)
+        self.tracer._finish(FinishedSpan(self.name, self._start, duration_ms,
+                                         self.attributes, self.parent, self.error))
+        return False
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        self.attributes.update(attributes)
+
+    def record_exception(self, exception: BaseException) -> None:
+        self.error = f"{type(exception).__name__}: {exception}"
+
+
+class RecordingTracer:
+    """Tracer that keeps the most recent finished spans in memory."""
+
+    enabled = True
+
+    def __init__(self, max_spans: int = 10000):
+        self.max_spans = max_spans
+        self.spans: List[FinishedSpan] = []
+        self._lock = threading.Lock()
+        # Open spans of the current thread or asyncio task; a context variable rather
+        # than a thread-local, so concurrent requests on one event loop stay separate
+        self._active: contextvars.ContextVar = contextvars.ContextVar(f"fhir4ds_spans_{id(self)}", default=())
+
+    def start_span(self, name: str, attributes: Optional[Dict[str, Any]] = None):
+        return _RecordingSpan(self, name, attributes)
+
+    def _finish(self, finished: FinishedSpan) -> None:
+        with self._lock:
+            self.spans.append(finished)
+            if len(self.spans) > self.max_spans:
+                del self.spans[:len(self.spans) - self.max_spans]
+
+    def clear(self) -> None:
+        with self._lock:
+            self.spans.clear()
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Count and total/max duration per span name."""
+        summary = {}
+        with self._lock:
+            for finished in self.spans:
+                entry = summary.setdefault(finished.name, {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+                entry['count'] += 1
+                entry['total_ms'] += finished.duration_ms
+                entry['max_ms'] = max(entry['max_ms'], finished.duration_ms)
+        return summary
+
+
+class OpenTelemetryTracer:
+    """Tracer that forwards spans to the globally configured OpenTelemetry provider."""
+
+    enabled = True
+
+    def __init__(self, instrumentation_name: str = "fhir4ds"):
+        if not OPENTELEMETRY_AVAILABLE:
+            raise ImportError(
+                "opentelemetry is required for OpenTelemetry tracing. "
+                "Install with: pip install opentelemetry-api opentelemetry-sdk"
+            )
+        from opentelemetry import trace
+
+        from .. import __version__
+        self._tracer = trace.get_tracer(instrumentation_name, __version__)
+
+    def start_span(self, name: str, attributes: Optional[Dict[str, Any]] = None):
+        return self._tracer.start_as_current_span(name, attributes=attributes or None)
+
+
+_tracer = NoOpTracer()
+
+
+def get_tracer():
+    """Get the process-wide tracer."""
+    return _tracer
+
+
+def set_tracer(tracer=None):
+    """
+    Install the process-wide tracer.
+
+    Args:
+        tracer: NoOpTracer, RecordingTracer, OpenTelemetryTracer or any object with
+            ``start_span(name, attributes)`` returning a context manager. None
+            restores the no-op tracer.
+
+    Returns:
+        The installed tracer
+    """
+    global _tracer
+    _tracer = tracer if tracer is not None else NoOpTracer()
+    return _tracer
+
+
+def enable_opentelemetry() -> bool:
+    """Forward spans to OpenTelemetry; returns False if it is not installed."""
+    if not OPENTELEMETRY_AVAILABLE:
+        logger.warning("FHIR4DS tracing: opentelemetry is not installed, tracing stays disabled")
+        return False
+    set_tracer(OpenTelemetryTracer())
+    return True
+
+
+def tracing_enabled() -> bool:
+    """Whether spans are being recorded; use to skip computing costly attributes."""
+    return _tracer.enabled
+
+
+def span(name: str, attributes: Optional[Dict[str, Any]] = None):
+    """
+    Start a span on the current tracer, for use as a context manager.
+
+    Example:
+        with span(SPAN_DB_EXECUTE, {ATTR_SQL_LENGTH: len(sql)}) as s:
+            rows = execute(sql)
+            s.set_attribute(ATTR_ROW_COUNT, len(rows))
+    """
+    return _tracer.start_span(name, attributes)
+
+
+def traced(name: str, attributes: Optional[Dict[str, Any]] = None):
+    """Decorator that runs the wrapped function inside a span."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with _tracer.start_span(name, attributes):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _configure_from_env() -> None:
+    backend = os.environ.get(TRACING_ENV_VAR, '').lower()
+    if backend in ('opentelemetry', 'otel'):
+        enable_opentelemetry()
+    elif backend == 'memory':
+        set_tracer(RecordingTracer())
+
+
+_configure_from_env()
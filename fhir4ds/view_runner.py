@@ -8,17 +8,15 @@ Achieves 100% SQL-on-FHIR v2.0 specification compliance.
 
 from __future__ import annotations
 
+import importlib.util
 import json
 import logging
 from typing import Dict, List, Any, Optional, Union
 from .utils.logging_config import get_logger, log_fallback_usage
+from .utils.tracing import span, SPAN_SQL_GENERATION, SPAN_COMPILE, ATTR_SQL_LENGTH, ATTR_RESOURCE_TYPE
 
-# Optional imports for DataFrame functionality
-try:
-    import pandas as pd
-    PANDAS_AVAILABLE = True
-except ImportError:
-    PANDAS_AVAILABLE = False
+# Optional DataFrame functionality; pandas itself is imported by QueryResult on use
+PANDAS_AVAILABLE = importlib.util.find_spec("pandas") is not None
 
 try:
     import csv
@@ -35,6 +33,7 @@ from .fhirpath.core.sql_builders import (
     Cte, Union
 )
 from .fhirpath.core.choice_types import fhir_choice_types
+from .datastore.shredding import is_simple_path
 # DuckDBDialect now imported from dialects package
 from .dialects import DuckDBDialect
 
@@ -63,13 +62,16 @@ class ViewRunner:
     SQL-on-FHIR v2.0 specification compliance.
     """
     
-    def __init__(self, datastore, enable_enhanced_sql_generation: bool = True):
+    def __init__(self, datastore, enable_enhanced_sql_generation: bool = True, source_table=None):
         """
         Initialize SQL on FHIR View Runner.
 
         Args:
             datastore: FHIRDataStore instance (required)
             enable_enhanced_sql_generation: Enable enhanced SQL generation features
+            source_table: Optional fhir4ds.datastore.shredding.ShreddedTable holding one
+                resource type (e.g. a fused batch's shared scan) to read instead of the
+                datastore's resource table; its SQL is not kept in the plan cache
         """
         if datastore is None:
             raise ValueError("datastore parameter is required")
@@ -77,13 +79,17 @@ class ViewRunner:
         # Modern FHIRDataStore mode only
         self.datastore = datastore
         self.connection = datastore.dialect.get_connection()
-        self.table_name = datastore.table_name
+        self.table_name = source_table.table_name if source_table else datastore.table_name
         self.json_col = datastore.json_col
         self.dialect = datastore.dialect
+        self.source_table = source_table
             
         self.enable_enhanced_sql_generation = enable_enhanced_sql_generation
         self.logger = get_logger(__name__)
         
+        # Shredded table the current standard SQL generation reads from (if any)
+        self._active_shredded_table = None
+        
         # Performance tracking
         self.execution_stats = {
             'enhanced_executions': 0,
@@ -183,7 +189,10 @@ class ViewRunner:
             self._validate_view_definition(view_def)
             
             # Generate SQL using enhanced SQL generator
-            sql = self._generate_sql_query(view_def)
+            with span(SPAN_SQL_GENERATION, {"fhir4ds.component": "view_runner",
+                                            ATTR_RESOURCE_TYPE: str(view_def.get('resource'))}) as sql_span:
+                sql = self._generate_sql_query(view_def)
+                sql_span.set_attribute(ATTR_SQL_LENGTH, len(sql))
             
             self.logger.info(f"Generated enhanced SQL: {sql}")
             
@@ -534,6 +543,30 @@ class ViewRunner:
             # Raise exception for validation errors
             raise ValueError("ViewDefinition validation failed: Invalid forEach paths")
         
+        # Serve previously compiled SQL from the datastore's plan cache
+        plan_cache = getattr(self.datastore, 'plan_cache', None)
+        if plan_cache is not None and self.source_table is None:
+            shredded_table = self._shredded_table_for(view_def)
+            source_table = shredded_table.table_name if shredded_table else self.table_name
+            cache_key = plan_cache.get_view_cache_key(view_def, self.dialect.name, source_table, self.json_col)
+            cached_plan = plan_cache.get(cache_key, self.dialect.name)
+            if cached_plan is not None:
+                return cached_plan.main_sql
+            
+            from .pipeline.core.base import CompiledSQL
+            sql = self._generate_uncached_sql_query(view_def)
+            plan_cache.put(cache_key, CompiledSQL(main_sql=sql), self.dialect.name)
+            return sql
+        
+        return self._generate_uncached_sql_query(view_def)
+    
+    def _generate_uncached_sql_query(self, view_def: Dict[str, Any]) -> str:
+        """Generate SQL for a validated ViewDefinition without consulting the plan cache"""
+        with span(SPAN_COMPILE, {"fhir4ds.component": "view_runner"}):
+            return self._compile_sql_query(view_def)
+    
+    def _compile_sql_query(self, view_def: Dict[str, Any]) -> str:
+        """Compile a validated ViewDefinition to SQL via the pipeline, falling back to legacy generation"""
         # Use pipeline processing (CTE-only architecture)
         if self.pipeline_bridge:
             try:
@@ -663,14 +696,45 @@ class ViewRunner:
         
         return base_sql.strip()
     
+    def _shredded_table_for(self, view_def: Dict[str, Any]):
+        """Shredded table for the view's resource type when shredded storage is enabled"""
+        if self.source_table is not None:
+            return self.source_table if view_def.get('resource') == self.source_table.resource_type else None
+        storage = getattr(self.datastore, 'shredded_storage', None)
+        if storage is None or self.table_name != self.datastore.table_name:
+            return None
+        return storage.table_for(view_def.get('resource'))
+    
+    def _lake_partition_filters(self, view_def: Dict[str, Any]) -> List[str]:
+        """Partition predicates letting a lake-backed datastore skip other resource types' files"""
+        lake = getattr(self.datastore, 'lake', None)
+        if lake is None or self.table_name != self.datastore.table_name or 'resource' not in view_def:
+            return []
+        predicate = lake.resource_type_predicate(view_def['resource'])
+        return [predicate] if predicate else []
+    
     def _generate_standard_sql(self, view_def: Dict[str, Any]) -> str:
         """Generate standard SQL without forEach expansion"""
+        self._active_shredded_table = self._shredded_table_for(view_def)
+        try:
+            return self._build_standard_sql(view_def)
+        finally:
+            self._active_shredded_table = None
+    
+    def _build_standard_sql(self, view_def: Dict[str, Any]) -> str:
+        """Build standard SQL, reading from the active shredded table when there is one"""
+        shredded_table = self._active_shredded_table
+        
         # Create base table reference
-        base_table = FromItem(Table(self.table_name))
+        base_table = FromItem(Table(shredded_table.table_name if shredded_table else self.table_name))
         
         # Create resource filter WHERE clause
-        if 'resource' in view_def:
-            where_items = [f"{self.dialect.extract_json_field(self.json_col, '$.resourceType')} = '{view_def['resource']}'"]
+        if shredded_table:
+            # Shredded tables hold a single resource type
+            where_items = []
+        elif 'resource' in view_def:
+            where_items = self._lake_partition_filters(view_def)
+            where_items.append(f"{self.dialect.extract_json_field(self.json_col, '$.resourceType')} = '{view_def['resource']}'")
         else:
             # No resource specified - according to SQL-on-FHIR spec, return no results
             where_items = ["1 = 0"]  # Always false condition
@@ -738,7 +802,8 @@ class ViewRunner:
         lateral_joins = []
         
         # Resource type filter
-        where_conditions = [f"{self.json_extract_string(self.json_col, '$.resourceType')} = '{view_def['resource']}'"]
+        where_conditions = self._lake_partition_filters(view_def)
+        where_conditions.append(f"{self.json_extract_string(self.json_col, '$.resourceType')} = '{view_def['resource']}'")
         
         # Process WHERE clause if present
         if 'where' in view_def:
@@ -3234,6 +3299,11 @@ class ViewRunner:
             else:
                 return Expr([fhirpath_sql], sep='')
         
+        # Read typed columns directly when the path is shredded
+        shredded_expr = self._generate_shredded_column_expression(path, column_type)
+        if shredded_expr is not None:
+            return shredded_expr
+        
         # Apply FHIR array adjustments before creating JSON path
         # Detect if this is likely a collection context by checking if path will be used in collection functions
         context = self._detect_path_context(path)
@@ -3260,6 +3330,25 @@ class ViewRunner:
             # For strings and other types, use string extraction
             return Expr([self.dialect.extract_json_field(self.json_col, json_path)], sep='')
     
+    def _generate_shredded_column_expression(self, path: str, column_type: str) -> Optional[QueryItem]:
+        """Column reference for a simple path covered by the active shredded table, if types agree"""
+        table = self._active_shredded_table
+        if table is None or not is_simple_path(path):
+            return None
+        column = table.column_for(path)
+        if column is None:
+            return None
+        
+        column_ref = f'"{column.name}"'
+        if column_type in ['boolean']:
+            return Expr([column_ref], sep='') if column.kind == 'boolean' else None
+        elif column_type in ['integer', 'int', 'positiveInt', 'unsignedInt']:
+            return Expr([column_ref], sep='') if column.kind == 'integer' else None
+        elif column_type in ['decimal', 'number']:
+            return Expr(['CAST(', column_ref, ' AS DECIMAL)'], sep='') if column.kind == 'decimal' else None
+        # Text extraction of numbers/booleans may be formatted differently; use JSON for those
+        return Expr([column_ref], sep='') if column.kind == 'string' else None
+    
     def insert_test_data(self, resources: List[Dict[str, Any]]):
         """Insert test data for validation"""
         for resource in resources:
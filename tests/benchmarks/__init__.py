@@ -0,0 +1,6 @@
+"""
+Micro-benchmarks for FHIR4DS hot paths.
+
+These are standalone scripts (``python tests/benchmarks/<name>.py``) rather
+than pytest tests, so they are not collected by the regular test run.
+"""
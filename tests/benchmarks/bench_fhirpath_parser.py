@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+FHIRPath Front-End Micro-Benchmark
+
+Times the FHIRPath lexer and parser over every expression used by the official
+SQL-on-FHIR tests (tests/official/*.json), with and without the process-wide
+parse cache, plus one long synthetic expression to show that tokenizing scales
+linearly with expression length.
+
+Usage:
+    python tests/benchmarks/bench_fhirpath_parser.py [--repeat N] [--output FILE]
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import timeit
+from typing import Any, Dict, List
+
+# Add repository root to path so we can import fhir4ds
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from fhir4ds.fhirpath.parser.parser import FHIRPathLexer, FHIRPathParser, parse_expression
+
+OFFICIAL_TEST_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "official")
+EXPRESSION_KEYS = ("path", "forEach", "forEachOrNull")
+
+
+def collect_official_expressions(test_dir: str = OFFICIAL_TEST_DIR) -> List[str]:
+    """Collect every FHIRPath expression referenced by the official test ViewDefinitions."""
+    expressions = []
+
+    def walk(node: Any) -> None:
+        if isinstance(node, dict):
+            for key, value in node.items():
+                if key in EXPRESSION_KEYS and isinstance(value, str):
+                    expressions.append(value)
+                else:
+                    walk(value)
+        elif isinstance(node, list):
+            for item in node:
+                walk(item)
+
+    for file_path in sorted(glob.glob(os.path.join(test_dir, "*.json"))):
+        with open(file_path, 'r', encoding='utf-8') as f:
+            walk(json.load(f))
+
+    # %constant references are substituted by ViewRunner before parsing
+    parseable = []
+    for expression in expressions:
+        try:
+            parse_uncached(expression)
+            parseable.append(expression)
+        except Exception:
+            continue
+    return parseable
+
+
+def parse_uncached(expression: str):
+    """Parse an expression without going through the cache."""
+    return FHIRPathParser(FHIRPathLexer(expression).tokenize()).parse()
+
+
+def time_per_call_us(func, expressions: List[str], repeat: int) -> float:
+    """Best-of-three mean time per expression in microseconds."""
+    def run():
+        for expression in expressions:
+            func(expression)
+
+    best = min(timeit.repeat(run, number=repeat, repeat=3))
+    return best / (repeat * len(expressions)) * 1e6
+
+
+def run_benchmark(repeat: int) -> Dict[str, Any]:
+    """Run all scenarios and return the measurements."""
+    expressions = collect_official_expressions()
+
+    parse_expression.cache_clear()
+    for expression in expressions:
+        parse_expression(expression)
+
+    long_expression = "Patient.name.where(use = 'official').given.first()" + " | Patient.name.family" * 500
+
+    results = {
+        "expressions": len(expressions),
+        "repeat": repeat,
+        "tokenize_us": time_per_call_us(lambda e: FHIRPathLexer(e).tokenize(), expressions, repeat),
+        "parse_uncached_us": time_per_call_us(parse_uncached, expressions, repeat),
+        "parse_cached_us": time_per_call_us(parse_expression, expressions, repeat),
+        "long_expression_chars": len(long_expression),
+        "long_tokenize_ms": time_per_call_us(lambda e: FHIRPathLexer(e).tokenize(), [long_expression], 5) / 1000,
+    }
+    results["cache_speedup"] = results["parse_uncached_us"] / results["parse_cached_us"]
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the FHIRPath lexer, parser and parse cache')
+    parser.add_argument('--repeat', type=int, default=50,
+                        help='Passes over the expression corpus per timing (default: 50)')
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+
+    args = parser.parse_args()
+    results = run_benchmark(args.repeat)
+
+    print("⏱️  FHIRPath Front-End Benchmark")
+    print("=" * 50)
+    print(f"Expressions (tests/official): {results['expressions']}")
+    print(f"Tokenize:        {results['tokenize_us']:8.2f} µs/expression")
+    print(f"Parse, uncached: {results['parse_uncached_us']:8.2f} µs/expression")
+    print(f"Parse, cached:   {results['parse_cached_us']:8.2f} µs/expression "
+          f"({results['cache_speedup']:.0f}x)")
+    print(f"Tokenize {results['long_expression_chars']} chars: {results['long_tokenize_ms']:.2f} ms")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n📄 Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Package Import-Time Regression Check
+
+Runs ``python -X importtime -c "import fhir4ds"`` in fresh interpreters and
+reports the cumulative import time of the package, plus any heavy optional
+dependency that was pulled in eagerly. Exits non-zero when the best run is
+over budget or a heavy dependency is imported, so it can gate CI.
+
+Usage:
+    python tests/benchmarks/bench_import_time.py [--runs N] [--budget-ms MS] [--module NAME]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Modules that must only load when the corresponding feature is used
+HEAVY_MODULES = ("pandas", "pyarrow", "openpyxl", "fastapi", "pydantic", "psycopg2", "duckdb")
+
+
+def measure_import(module: str) -> Tuple[float, Dict[str, float]]:
+    """Import ``module`` in a fresh interpreter; return (cumulative ms, per-module self ms)."""
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=env, cwd=REPO_ROOT
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr}")
+
+    total_ms = 0.0
+    self_times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        try:
+            self_us, cumulative_us = int(fields[0]), int(fields[1])
+        except ValueError:
+            continue  # header line
+        name = fields[2].strip()
+        self_times[name] = self_us / 1000
+        if name == module:
+            total_ms = cumulative_us / 1000
+    return total_ms, self_times
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the import time of the fhir4ds package')
+    parser.add_argument('--module', default='fhir4ds', help='Module to import (default: fhir4ds)')
+    parser.add_argument('--runs', type=int, default=5,
+                        help='Fresh interpreters to sample; the best run is reported (default: 5)')
+    parser.add_argument('--budget-ms', type=float, default=50.0,
+                        help='Fail if the best cumulative import time exceeds this (default: 50)')
+    parser.add_argument('--top', type=int, default=10, help='Slowest modules to list (default: 10)')
+
+    args = parser.parse_args()
+    runs = [measure_import(args.module) for _ in range(args.runs)]
+    best_ms, self_times = min(runs, key=lambda run: run[0])
+    heavy: List[str] = [name for name in HEAVY_MODULES if name in self_times]
+
+    print(f"⏱️  Import time: {args.module}")
+    print("=" * 50)
+    print(f"Best of {args.runs}: {best_ms:.1f} ms (budget {args.budget_ms:.1f} ms)")
+    print(f"Modules imported: {len(self_times)}")
+    print("\nSlowest modules (self time):")
+    for name, ms in sorted(self_times.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"  {ms:8.2f} ms  {name}")
+
+    failed = False
+    if heavy:
+        print(f"\n❌ Heavy dependencies imported eagerly: {', '.join(heavy)}")
+        failed = True
+    if best_ms > args.budget_ms:
+        print(f"\n❌ Import time {best_ms:.1f} ms exceeds budget of {args.budget_ms:.1f} ms")
+        failed = True
+    if not failed:
+        print("\n✅ Import time within budget")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
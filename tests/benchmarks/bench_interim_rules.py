@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Interim CQL Pattern Rule Dispatch Benchmark
+
+Times rule dispatch for CQLEngine's interim pattern translator over a CQL corpus:
+
+- the CQL passed to the engine in tests/ and docs/examples (``"cql"`` entries,
+  ``*expressions`` lists, evaluate_expression() arguments and retrieve-shaped
+  string literals)
+- the QualityMeasureBuilder measure criteria
+- the shapes documented by the interim translator itself (``# Example:``
+  comments in fhir4ds/cql/core/engine.py)
+
+each as written and wrapped in a ``define "Benchmark": ...`` statement.
+
+Two dispatch strategies are compared:
+
+- linear:  every rule tested in order with re.search() on the pattern string,
+           as the translator did before the rule table
+- indexed: precompiled rules, skipping rules whose tokens are absent
+
+plus end-to-end CQLEngine._has_known_parsing_issues() and
+_try_interim_pattern_translation() times. Both strategies must select the same
+rules for every expression; mismatches are reported.
+
+Usage:
+    python tests/benchmarks/bench_interim_rules.py [--repeat N] [--output FILE]
+"""
+
+import argparse
+import ast
+import glob
+import json
+import os
+import re
+import sys
+import timeit
+from typing import Any, Dict, List, Optional
+
+# Add repository root to path so we can import fhir4ds
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, REPO_ROOT)
+
+from fhir4ds.cql.core.interim_rules import (KNOWN_ISSUE_RULES, TRANSLATION_RULES, InterimDispatch,
+                                            expression_features, match_known_issue)
+
+CORPUS_DIRS = (os.path.join(REPO_ROOT, "tests"), os.path.join(REPO_ROOT, "docs", "examples"))
+ENGINE_SOURCE = os.path.join(REPO_ROOT, "fhir4ds", "cql", "core", "engine.py")
+RETRIEVE = re.compile(r'^\s*(define\s+"[^"]+"\s*:|\[[A-Z]\w*(\s*:\s*"[^"]*")?\])')
+
+
+def collect_source_cql(directories=CORPUS_DIRS) -> List[str]:
+    """Collect CQL expressions from the Python sources under the given directories."""
+    expressions = []
+
+    def add(node: Any) -> None:
+        if isinstance(node, ast.Constant) and isinstance(node.value, str) and node.value.strip():
+            expressions.append(node.value)
+
+    for directory in directories:
+        for file_path in sorted(glob.glob(os.path.join(directory, "**", "*.py"), recursive=True)):
+            with open(file_path, 'r', encoding='utf-8') as f:
+                try:
+                    tree = ast.parse(f.read())
+                except SyntaxError:
+                    continue
+            for node in ast.walk(tree):
+                if isinstance(node, ast.Dict):
+                    for key, value in zip(node.keys, node.values):
+                        if isinstance(key, ast.Constant) and key.value == "cql":
+                            add(value)
+                elif isinstance(node, ast.Assign) and isinstance(node.value, ast.List):
+                    if any(isinstance(t, ast.Name) and t.id.endswith("expressions") for t in node.targets):
+                        for element in node.value.elts:
+                            add(element)
+                elif isinstance(node, ast.Call) and getattr(node.func, "attr", None) == "evaluate_expression":
+                    if node.args:
+                        add(node.args[0])
+                elif isinstance(node, ast.Constant) and isinstance(node.value, str) and RETRIEVE.match(node.value):
+                    add(node)
+    return expressions
+
+
+def collect_measure_cql() -> List[str]:
+    """Population criteria of the QualityMeasureBuilder measures."""
+    try:
+        from fhir4ds.cql.measures.population import QualityMeasureBuilder
+    except Exception:
+        return []
+    measures = [QualityMeasureBuilder.create_diabetes_hba1c_measure(),
+                QualityMeasureBuilder.create_blood_pressure_measure()]
+    return [criteria.criteria_expression for measure in measures for criteria in measure.get_evaluation_order()]
+
+
+def collect_documented_shapes(engine_source: str = ENGINE_SOURCE) -> List[str]:
+    """The '# Example:' shapes documented by the interim translator."""
+    with open(engine_source, 'r', encoding='utf-8') as f:
+        return [m.group(1).strip() for m in re.finditer(r'#\s*Example:\s*(.+)', f.read())]
+
+
+def build_corpus() -> List[str]:
+    """Unique corpus expressions, each as written and wrapped in a define."""
+    corpus = []
+    for expression in collect_source_cql() + collect_measure_cql() + collect_documented_shapes():
+        corpus.append(expression)
+        if not expression.lstrip().lower().startswith("define"):
+            corpus.append(f'define "Benchmark": {expression}')
+    return list(dict.fromkeys(corpus))
+
+
+def linear_known_issue(expression: str) -> Optional[str]:
+    for rule in KNOWN_ISSUE_RULES:
+        if re.search(rule.pattern.pattern, expression, rule.pattern.flags):
+            if rule.accept is None or rule.accept(expression):
+                return rule.name
+    return None
+
+
+def linear_translation(expression: str) -> Optional[str]:
+    for name, rule in TRANSLATION_RULES.items():
+        if re.search(rule.pattern.pattern, expression, rule.pattern.flags):
+            return name
+    return None
+
+
+def indexed_translation(expression: str) -> Optional[str]:
+    dispatch = InterimDispatch(expression)
+    for name in TRANSLATION_RULES:
+        if dispatch.search(name):
+            return name
+    return None
+
+
+def time_per_call_us(func, expressions: List[str], repeat: int) -> float:
+    """Best-of-three mean time per expression in microseconds."""
+    def run():
+        for expression in expressions:
+            func(expression)
+
+    best = min(timeit.repeat(run, number=repeat, repeat=3))
+    return best / (repeat * len(expressions)) * 1e6
+
+
+def run_benchmark(repeat: int) -> Dict[str, Any]:
+    """Run all scenarios and return the measurements."""
+    corpus = build_corpus()
+    mismatches = [e for e in corpus
+                  if linear_known_issue(e) != match_known_issue(e)
+                  or linear_translation(e) != indexed_translation(e)]
+    candidates = [len(InterimDispatch(e).candidates()) for e in corpus]
+
+    results = {
+        "expressions": len(corpus),
+        "repeat": repeat,
+        "translation_rules": len(TRANSLATION_RULES),
+        "mean_candidate_rules": sum(candidates) / len(corpus),
+        "mismatches": mismatches,
+        "known_issue_linear_us": time_per_call_us(linear_known_issue, corpus, repeat),
+        "known_issue_indexed_us": time_per_call_us(match_known_issue, corpus, repeat),
+        "translation_linear_us": time_per_call_us(linear_translation, corpus, repeat),
+        "translation_indexed_us": time_per_call_us(indexed_translation, corpus, repeat),
+        "features_us": time_per_call_us(expression_features, corpus, repeat),
+    }
+    results["known_issue_speedup"] = results["known_issue_linear_us"] / results["known_issue_indexed_us"]
+    results["translation_speedup"] = results["translation_linear_us"] / results["translation_indexed_us"]
+
+    try:
+        from fhir4ds.cql.core.engine import CQLEngine
+        engine = CQLEngine()
+    except Exception as e:
+        results["engine_error"] = str(e)
+    else:
+        def interim(expression):
+            # Translation errors are caught by the engine's caller, so they count as a result
+            try:
+                if engine._has_known_parsing_issues(expression):
+                    engine._try_interim_pattern_translation(expression)
+            except ValueError:
+                pass
+
+        results["engine_interim_us"] = time_per_call_us(interim, corpus, max(1, repeat // 10))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark interim CQL pattern rule dispatch')
+    parser.add_argument('--repeat', type=int, default=50,
+                        help='Passes over the expression corpus per timing (default: 50)')
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+
+    args = parser.parse_args()
+    results = run_benchmark(args.repeat)
+
+    print("⏱️  Interim CQL Rule Dispatch Benchmark")
+    print("=" * 50)
+    print(f"Expressions: {results['expressions']}  "
+          f"(candidate rules: {results['mean_candidate_rules']:.1f} of {results['translation_rules']} on average)")
+    print(f"Known issues, linear:  {results['known_issue_linear_us']:8.2f} µs/expression")
+    print(f"Known issues, indexed: {results['known_issue_indexed_us']:8.2f} µs/expression "
+          f"({results['known_issue_speedup']:.1f}x)")
+    print(f"Translation, linear:   {results['translation_linear_us']:8.2f} µs/expression")
+    print(f"Translation, indexed:  {results['translation_indexed_us']:8.2f} µs/expression "
+          f"({results['translation_speedup']:.1f}x)")
+    print(f"Token scan:            {results['features_us']:8.2f} µs/expression")
+    if "engine_interim_us" in results:
+        print(f"Engine interim path:   {results['engine_interim_us']:8.2f} µs/expression")
+    else:
+        print(f"Engine interim path:   skipped ({results['engine_error']})")
+    if results["mismatches"]:
+        print(f"\n❌ {len(results['mismatches'])} expressions dispatched differently:")
+        for expression in results["mismatches"][:10]:
+            print(f"   {expression[:100]!r}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n📄 Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Temporal Join Benchmark
+
+Times "encounters with an observation during the encounter" over a seeded
+synthetic population (tests/benchmarks/synthetic_data.py) on DuckDB:
+
+- correlated: EXISTS subquery comparing JSON-extracted timestamps per
+              encounter/observation pair
+- inline:     TemporalJoinCompiler range join, times normalized in the query
+- indexed:    TemporalJoinCompiler range join over the resource_intervals table
+
+All three must return the same number of encounters; a mismatch is reported.
+
+Usage:
+    python tests/benchmarks/bench_temporal_join.py [--patients N] [--repeat N] [--output FILE]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Any, Dict
+
+# Add repository root to path so we can import fhir4ds
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic_data import SyntheticPopulation
+
+from fhir4ds.cql.core.temporal_join import TemporalJoinCompiler, parse_temporal_condition
+from fhir4ds.datastore import FHIRDataStore
+
+CONDITION = "O.effective during E.period"
+
+CORRELATED_SQL = """
+SELECT e.resource FROM fhir_resources e
+WHERE json_extract_string(e.resource, '$.resourceType') = 'Encounter'
+  AND EXISTS (
+    SELECT 1 FROM fhir_resources o
+    WHERE json_extract_string(o.resource, '$.resourceType') = 'Observation'
+      AND json_extract_string(o.resource, '$.subject.reference') = json_extract_string(e.resource, '$.subject.reference')
+      AND CAST(json_extract_string(o.resource, '$.effectiveDateTime') AS TIMESTAMPTZ)
+          >= CAST(json_extract_string(e.resource, '$.period.start') AS TIMESTAMPTZ)
+      AND CAST(json_extract_string(o.resource, '$.effectiveDateTime') AS TIMESTAMPTZ)
+          <= CAST(json_extract_string(e.resource, '$.period.end') AS TIMESTAMPTZ)
+  )
+"""
+
+
+def best_time(datastore, sql: str, repeat: int):
+    """Best wall time in seconds over ``repeat`` runs, and the row count."""
+    best, count = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = len(datastore.execute_sql(sql).fetchall())
+        best = min(best, time.perf_counter() - start)
+    return best, count
+
+
+def run_benchmark(patients: int, repeat: int) -> Dict[str, Any]:
+    """Run all scenarios and return the measurements."""
+    datastore = FHIRDataStore.with_duckdb()
+    for batch in SyntheticPopulation(patients=patients).iter_batches():
+        datastore.load_resources(batch)
+    resources = datastore.execute_sql("SELECT COUNT(*) FROM fhir_resources").fetchall()[0][0]
+
+    condition = parse_temporal_condition(CONDITION)
+    inline_sql = TemporalJoinCompiler(datastore.dialect).compile("Encounter", "E", "Observation", "O", condition)
+
+    start = time.perf_counter()
+    datastore.enable_interval_index()
+    build_seconds = time.perf_counter() - start
+    indexed_sql = TemporalJoinCompiler(datastore.dialect).compile("Encounter", "E", "Observation", "O", condition)
+
+    results = {"patients": patients, "resources": resources, "repeat": repeat,
+               "index_build_seconds": build_seconds}
+    for name, sql in (("correlated", CORRELATED_SQL), ("inline", inline_sql), ("indexed", indexed_sql)):
+        results[f"{name}_seconds"], results[f"{name}_rows"] = best_time(datastore, sql, repeat)
+    results["counts_match"] = results["correlated_rows"] == results["inline_rows"] == results["indexed_rows"]
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark temporal with-clause joins')
+    parser.add_argument('--patients', type=int, default=2000,
+                        help='Synthetic patients to load (default: 2000)')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Runs per query, best time reported (default: 3)')
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+
+    args = parser.parse_args()
+    results = run_benchmark(args.patients, args.repeat)
+
+    print("⏱️  Temporal Join Benchmark")
+    print("=" * 50)
+    print(f"Patients: {results['patients']}  Resources: {results['resources']}  Query: {CONDITION}")
+    print(f"Interval index build: {results['index_build_seconds'] * 1000:9.1f} ms")
+    for name in ("correlated", "inline", "indexed"):
+        seconds = results[f"{name}_seconds"]
+        speedup = results["correlated_seconds"] / seconds if seconds else float('inf')
+        print(f"{name.capitalize():<11} {seconds * 1000:9.1f} ms  "
+              f"({results[f'{name}_rows']} encounters, {speedup:.1f}x)")
+    if not results["counts_match"]:
+        print("\n❌ Strategies returned different encounter counts")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n📄 Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
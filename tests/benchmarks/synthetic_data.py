@@ -0,0 +1,241 @@
+"""
+Seeded Synthetic FHIR Population Generator
+
+Generates reproducible Patient, Encounter, Observation and Condition resources
+with realistic fan-out for benchmarking. Every patient is generated from its own
+seeded RNG (``seed`` + patient index), so any slice of the population can be
+regenerated independently and the output is identical across runs and machines.
+Resources are yielded lazily, so populations of 1M+ patients can be streamed
+into a datastore or to NDJSON without holding them in memory.
+
+Fan-out per patient (defaults): ~6 encounters, 1-4 observations per encounter
+(vital signs and labs), and chronic conditions drawn from a prevalence table.
+Patients also carry the ``age``/``hba1c``/``bp_*`` extensions read by the
+sample measures in ``QualityMeasureBuilder``.
+
+Usage:
+    python tests/benchmarks/synthetic_data.py --patients 100000 --output-dir ./synthetic
+"""
+
+import argparse
+import json
+import os
+import random
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Any, Dict, Iterator, List, Tuple
+
+# Fixed anchor so generated dates never depend on when the generator runs
+REFERENCE_DATE = date(2023, 12, 31)
+
+FAMILY_NAMES = ["Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis",
+                "Rodriguez", "Martinez", "Hernandez", "Lopez", "Wilson", "Anderson", "Thomas", "Taylor"]
+GIVEN_NAMES = {
+    "male": ["James", "Robert", "John", "Michael", "David", "William", "Richard", "Joseph"],
+    "female": ["Mary", "Patricia", "Jennifer", "Linda", "Elizabeth", "Barbara", "Susan", "Jessica"],
+}
+STATES = [("Anytown", "CA"), ("Springfield", "NY"), ("Riverside", "TX"), ("Fairview", "OH"),
+          ("Franklin", "FL"), ("Greenville", "NC"), ("Madison", "WI"), ("Salem", "OR")]
+
+# (SNOMED code, display, prevalence)
+CONDITIONS = [
+    ("44054006", "Diabetes mellitus type 2", 0.11),
+    ("38341003", "Hypertensive disorder", 0.30),
+    ("55822004", "Hyperlipidemia", 0.25),
+    ("195967001", "Asthma", 0.08),
+    ("13645005", "Chronic obstructive lung disease", 0.06),
+    ("35489007", "Depressive disorder", 0.09),
+]
+
+# (LOINC code, display, unit, mean, standard deviation)
+VITAL_SIGNS = [
+    ("8480-6", "Systolic blood pressure", "mm[Hg]", 128.0, 18.0),
+    ("8462-4", "Diastolic blood pressure", "mm[Hg]", 80.0, 11.0),
+    ("29463-7", "Body weight", "kg", 82.0, 19.0),
+    ("8867-4", "Heart rate", "/min", 74.0, 12.0),
+]
+LABS = [
+    ("4548-4", "Hemoglobin A1c", "%", 6.1, 1.4),
+    ("2093-3", "Cholesterol [Mass/volume] in Serum or Plasma", "mg/dL", 195.0, 38.0),
+    ("2345-7", "Glucose [Mass/volume] in Serum or Plasma", "mg/dL", 104.0, 26.0),
+]
+LAB_CODES = {code for code, *_ in LABS}
+ENCOUNTER_CLASSES = [("AMB", "ambulatory", 0.82), ("EMER", "emergency", 0.12), ("IMP", "inpatient encounter", 0.06)]
+
+RESOURCE_TYPES = ("Patient", "Encounter", "Observation", "Condition")
+
+
+@dataclass
+class SyntheticPopulation:
+    """Configuration for a reproducible synthetic population"""
+    patients: int = 1000
+    seed: int = 42
+    encounters_per_patient: float = 6.0
+    max_observations_per_encounter: int = 4
+    lab_probability: float = 0.35
+    years_of_history: int = 5
+    condition_prevalence: List[Tuple[str, str, float]] = field(default_factory=lambda: list(CONDITIONS))
+
+    def patient_rng(self, index: int) -> random.Random:
+        """Independent RNG for one patient, so slices regenerate identically."""
+        return random.Random(f"{self.seed}:{index}")
+
+    def iter_resources(self, start: int = 0, stop: int = None) -> Iterator[Dict[str, Any]]:
+        """Yield all resources for patients ``start`` (inclusive) to ``stop`` (exclusive)."""
+        stop = self.patients if stop is None else min(stop, self.patients)
+        for index in range(start, stop):
+            yield from self._generate_patient_record(index)
+
+    def iter_batches(self, batch_size: int = 10000) -> Iterator[List[Dict[str, Any]]]:
+        """Yield resources in lists of at most ``batch_size`` for bulk loading."""
+        batch = []
+        for resource in self.iter_resources():
+            batch.append(resource)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def write_ndjson(self, output_dir: str) -> Dict[str, int]:
+        """Write one ``<ResourceType>.ndjson`` file per resource type; return counts."""
+        os.makedirs(output_dir, exist_ok=True)
+        handles = {rt: open(os.path.join(output_dir, f"{rt}.ndjson"), "w", encoding="utf-8")
+                   for rt in RESOURCE_TYPES}
+        counts = {rt: 0 for rt in RESOURCE_TYPES}
+        try:
+            for resource in self.iter_resources():
+                resource_type = resource["resourceType"]
+                handles[resource_type].write(json.dumps(resource, separators=(",", ":")))
+                handles[resource_type].write("\n")
+                counts[resource_type] += 1
+        finally:
+            for handle in handles.values():
+                handle.close()
+        return counts
+
+    def _generate_patient_record(self, index: int) -> Iterator[Dict[str, Any]]:
+        """Generate one patient and all resources that reference it."""
+        rng = self.patient_rng(index)
+        patient_id = f"pt-{self.seed}-{index:07d}"
+        subject = {"reference": f"Patient/{patient_id}"}
+
+        gender = rng.choice(("male", "female"))
+        age = min(95, max(0, int(rng.gauss(48, 20))))
+        birth_date = REFERENCE_DATE - timedelta(days=age * 365 + rng.randrange(365))
+        city, state = rng.choice(STATES)
+
+        conditions = [(code, display) for code, display, prevalence in self.condition_prevalence
+                      if rng.random() < prevalence * (0.4 + age / 60)]
+        has_diabetes = any(code == "44054006" for code, _ in conditions)
+        has_hypertension = any(code == "38341003" for code, _ in conditions)
+
+        encounter_count = max(1, int(rng.expovariate(1.0 / self.encounters_per_patient)))
+        history_days = self.years_of_history * 365
+        encounter_dates = sorted(REFERENCE_DATE - timedelta(days=rng.randrange(history_days))
+                                 for _ in range(encounter_count))
+
+        latest = {}
+        observations = []
+        encounters = []
+        for enc_index, encounter_date in enumerate(encounter_dates):
+            encounter_id = f"{patient_id}-enc-{enc_index}"
+            class_code, class_display = self._weighted_choice(rng, ENCOUNTER_CLASSES)
+            length = rng.randrange(2, 10) if class_code == "IMP" else 0
+            encounters.append({
+                "resourceType": "Encounter",
+                "id": encounter_id,
+                "status": "finished",
+                "class": {"system": "http://terminology.hl7.org/CodeSystem/v3-ActCode",
+                          "code": class_code, "display": class_display},
+                "subject": subject,
+                "period": {"start": f"{encounter_date.isoformat()}T09:00:00Z",
+                           "end": f"{(encounter_date + timedelta(days=length)).isoformat()}T10:00:00Z"},
+            })
+
+            measurements = rng.sample(VITAL_SIGNS, rng.randint(1, min(self.max_observations_per_encounter,
+                                                                      len(VITAL_SIGNS))))
+            if rng.random() < self.lab_probability + (0.4 if has_diabetes else 0.0):
+                measurements.append(rng.choice(LABS))
+            for obs_index, (code, display, unit, mean, sd) in enumerate(measurements):
+                if code == "4548-4" and has_diabetes:
+                    mean += 1.8
+                elif code in ("8480-6", "8462-4") and has_hypertension:
+                    mean += 14.0 if code == "8480-6" else 8.0
+                value = round(max(0.0, rng.gauss(mean, sd)), 1)
+                latest[code] = value
+                observations.append({
+                    "resourceType": "Observation",
+                    "id": f"{encounter_id}-obs-{obs_index}",
+                    "status": "final",
+                    "category": [{"coding": [{
+                        "system": "http://terminology.hl7.org/CodeSystem/observation-category",
+                        "code": "laboratory" if code in LAB_CODES else "vital-signs",
+                    }]}],
+                    "code": {"coding": [{"system": "http://loinc.org", "code": code, "display": display}]},
+                    "subject": subject,
+                    "encounter": {"reference": f"Encounter/{encounter_id}"},
+                    "effectiveDateTime": f"{encounter_date.isoformat()}T09:30:00Z",
+                    "valueQuantity": {"value": value, "unit": unit,
+                                      "system": "http://unitsofmeasure.org", "code": unit},
+                })
+
+        extensions = [{"url": "age", "valueInteger": age}]
+        for url, code in (("hba1c", "4548-4"), ("bp_systolic", "8480-6"), ("bp_diastolic", "8462-4")):
+            if code in latest:
+                extensions.append({"url": url, "valueQuantity": {"value": latest[code]}})
+
+        yield {
+            "resourceType": "Patient",
+            "id": patient_id,
+            "active": True,
+            "extension": extensions,
+            "name": [{"use": "official", "family": rng.choice(FAMILY_NAMES),
+                      "given": [rng.choice(GIVEN_NAMES[gender])]}],
+            "gender": gender,
+            "birthDate": birth_date.isoformat(),
+            "address": [{"use": "home", "city": city, "state": state, "country": "US",
+                         "postalCode": f"{rng.randrange(10000, 99999)}"}],
+        }
+        yield from encounters
+        yield from observations
+
+        for cond_index, (code, display) in enumerate(conditions):
+            onset = REFERENCE_DATE - timedelta(days=rng.randrange(history_days * 2))
+            yield {
+                "resourceType": "Condition",
+                "id": f"{patient_id}-cond-{cond_index}",
+                "clinicalStatus": {"coding": [{
+                    "system": "http://terminology.hl7.org/CodeSystem/condition-clinical", "code": "active"}]},
+                "code": {"coding": [{"system": "http://snomed.info/sct", "code": code, "display": display}]},
+                "subject": subject,
+                "onsetDateTime": f"{onset.isoformat()}T00:00:00Z",
+            }
+
+    @staticmethod
+    def _weighted_choice(rng: random.Random, options: List[Tuple[str, str, float]]) -> Tuple[str, str]:
+        roll = rng.random()
+        for code, display, weight in options:
+            roll -= weight
+            if roll < 0:
+                return code, display
+        return options[-1][0], options[-1][1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a seeded synthetic FHIR population as NDJSON')
+    parser.add_argument('--patients', type=int, default=1000, help='Number of patients (default: 1000)')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed (default: 42)')
+    parser.add_argument('--output-dir', required=True, help='Directory for <ResourceType>.ndjson files')
+
+    args = parser.parse_args()
+    counts = SyntheticPopulation(patients=args.patients, seed=args.seed).write_ndjson(args.output_dir)
+
+    print(f"🧬 Synthetic population: {args.patients} patients (seed {args.seed})")
+    for resource_type, count in counts.items():
+        print(f"  {resource_type:12s} {count:>10,d}")
+    print(f"📄 Written to {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Unit tests for fused (shared-scan) batch execution
+"""
+
+from fhir4ds.datastore import QuickConnect
+from fhir4ds.datastore.batch import BatchProcessor, SCAN_TABLE_PREFIX
+
+OBSERVATIONS = [
+    {"resourceType": "Observation", "id": f"obs-{i}", "status": "final" if i % 2 else "amended",
+     "subject": {"reference": f"Patient/pt-{i % 3}"}}
+    for i in range(6)
+]
+PATIENTS = [{"resourceType": "Patient", "id": f"pt-{i}", "gender": "female"} for i in range(3)]
+VIEWS = [
+    {"resource": "Observation", "select": [{"column": [{"name": "id", "path": "id"}]}]},
+    {"resource": "Patient", "select": [{"column": [{"name": "id", "path": "id"}]}]},
+    {"resource": "Observation", "select": [{"column": [{"name": "id", "path": "id"}]}],
+     "where": [{"path": "status = 'final'"}]},
+    {"resource": "Observation", "select": []},
+]
+
+
+class TestFusedBatch:
+    """Test that fused batches match per-view execution"""
+
+    def test_fused_results_match_individual_execution(self):
+        """Test per-view results, order and error isolation with a shared scan"""
+        db = QuickConnect.memory()
+        db.load_resources(OBSERVATIONS + PATIENTS, parallel=False)
+        processor = BatchProcessor(db, show_progress=False)
+
+        fused = processor.execute_batch(VIEWS, fused=True)
+        individual = processor.execute_batch(VIEWS[:3], parallel=False)
+
+        assert [r.index for r in fused] == [0, 1, 2, 3]
+        for fused_result, individual_result in zip(fused, individual):
+            assert sorted(fused_result.result.fetchall()) == sorted(individual_result.result.fetchall())
+        assert len(fused[2].result.fetchall()) == 3
+        assert not fused[3].success
+
+        tables = db.datastore.dialect.execute_query("SELECT table_name FROM information_schema.tables")
+        assert not [name for (name,) in tables if name.startswith(SCAN_TABLE_PREFIX)]
+
+    def test_scan_tables_are_typed_and_private_to_each_batch(self, tmp_path):
+        """Test typed scan columns, per-batch table names, parallel runs and the plan cache"""
+        db = QuickConnect.duckdb(str(tmp_path / "fused.duckdb"), plan_cache_path=str(tmp_path / "plans.sqlite"))
+        db.load_resources(OBSERVATIONS + PATIENTS, parallel=False)
+        processor = BatchProcessor(db, max_workers=3, show_progress=False)
+
+        first = processor._create_scan_runner("Observation", "batch1")
+        second = processor._create_scan_runner("Observation", "batch2")
+        assert first.table_name != second.table_name
+        sql = first._generate_sql_query(VIEWS[2])
+        assert first.table_name in sql and 'SELECT "id" AS "id"' in sql and "$.id" not in sql
+        assert sorted(first.execute_view_definition(VIEWS[2]).fetchall()) == \
+            sorted(second.execute_view_definition(VIEWS[2]).fetchall())
+
+        serial = processor.execute_batch(VIEWS[:3], parallel=False, fused=True)
+        parallel = processor.execute_batch(VIEWS[:3], parallel=True, fused=True)
+        for serial_result, parallel_result in zip(serial, parallel):
+            assert sorted(serial_result.result.fetchall()) == sorted(parallel_result.result.fetchall())
+        # Only the Patient view ran against the resource table; scan SQL is never cached
+        assert db.datastore.plan_cache.persistent_store.count() == 1
@@ -0,0 +1,76 @@
+"""
+Unit tests for the resource coding index
+"""
+
+from types import SimpleNamespace
+
+from fhir4ds.cql.functions.clinical import TerminologyFunctions
+from fhir4ds.cql.pipeline.operations.retrieve import CQLRetrieveOperation
+from fhir4ds.datastore import FHIRDataStore
+
+SNOMED = "http://snomed.info/sct"
+ICD10 = "http://hl7.org/fhir/sid/icd-10-cm"
+RESOURCES = [
+    {"resourceType": "Patient", "id": "pt-1"},
+    {"resourceType": "Condition", "id": "cond-1", "subject": {"reference": "Patient/pt-1"},
+     "code": {"coding": [{"system": SNOMED, "code": "44054006", "display": "Diabetes"},
+                         {"system": ICD10, "code": "E11.9"}]},
+     "category": [{"coding": [{"code": "problem-list-item"}]}]},
+    {"resourceType": "Condition", "id": "cond-2", "subject": {"reference": "Patient/pt-2"},
+     "code": {"coding": [{"system": SNOMED, "code": "38341003"}], "text": "Hypertension"}},
+]
+
+
+class FakeValueSetClient:
+    def expand_valueset(self, valueset_id, version=None):
+        return {"expansion": {"contains": [{"system": ICD10, "code": "E11.9"}, {"system": ICD10, "code": "E10.9"}]}}
+
+
+def retrieve_ids(datastore, terminology_filter):
+    sql = (f"SELECT json_extract_string(resource, '$.id') FROM fhir_resources "
+           f"WHERE json_extract_string(resource, '$.resourceType') = 'Condition' AND ({terminology_filter})")
+    return sorted(row[0] for row in datastore.execute_sql(sql).fetchall())
+
+
+class TestCodingIndex:
+    """Test that the coding index tracks loads and answers code and value-set retrieves"""
+
+    def test_index_explodes_codings_on_every_load(self):
+        """Test that each Coding becomes a row and later loads are indexed incrementally"""
+        datastore = FHIRDataStore.with_duckdb()
+        datastore.load_resources(RESOURCES[:2])
+        datastore.enable_coding_index()
+        rows = datastore.execute_sql(
+            "SELECT patient_id, element_path, system, code FROM resource_codings ORDER BY code").fetchall()
+        assert rows == [("pt-1", "code", SNOMED, "44054006"), ("pt-1", "code", ICD10, "E11.9"),
+                        ("pt-1", "category", None, "problem-list-item")]
+
+        datastore.bulk_load_resources(RESOURCES[2:], parallel=False)
+        datastore.load_resource({"resourceType": "Encounter", "id": "enc-1", "class": {"code": "AMB"}})
+        codes = datastore.execute_sql("SELECT code FROM resource_codings ORDER BY code").fetchall()
+        assert [c[0] for c in codes] == ["38341003", "44054006", "AMB", "E11.9", "problem-list-item"]
+
+        datastore.disable_coding_index()
+        assert datastore.dialect.coding_index_tables == {}
+
+    def test_retrieve_filters_join_the_index(self):
+        """Test that code and value-set retrieves match any Coding through the index"""
+        datastore = FHIRDataStore.with_duckdb()
+        datastore.load_resources(RESOURCES)
+        state = SimpleNamespace(base_table="fhir_resources", json_column="resource")
+        context = SimpleNamespace(dialect=datastore.dialect, terminology_client=FakeValueSetClient())
+
+        datastore.enable_coding_index()
+        retrieve = CQLRetrieveOperation("Condition", terminology="E11.9")
+        code_filter = retrieve._build_basic_code_filter(state, context)
+        assert "resource_codings" in code_filter
+        assert retrieve_ids(datastore, code_filter) == ["cond-1"]
+        text_filter = CQLRetrieveOperation("Condition", terminology="Hypertension")._build_basic_code_filter(
+            state, context)
+        assert retrieve_ids(datastore, text_filter) == ["cond-2"]
+
+        valueset = CQLRetrieveOperation("Condition", terminology="http://example.org/ValueSet/diabetes")
+        assert retrieve_ids(datastore, valueset._build_terminology_filter(state, context)) == ["cond-1"]
+        functions = TerminologyFunctions(terminology_client=FakeValueSetClient())
+        assert retrieve_ids(datastore, functions.in_valueset_rows_sql(
+            "id", "http://example.org/ValueSet/diabetes", "resource_codings", element_paths=["category"])) == []
@@ -0,0 +1,90 @@
+"""
+Unit tests for concurrent define evaluation with the dependency-DAG scheduler
+"""
+
+from types import SimpleNamespace
+
+import duckdb
+
+from fhir4ds.cql.core.define_scheduler import DefineScheduler, define_relation_name
+from fhir4ds.datastore import FHIRDataStore
+
+DEPENDENCIES = {"Base": set(), "Even": {"Base"}, "Odd": {"Base"}, "Both": {"Even", "Odd"}, "Constant": set()}
+DEFINE_SQL = {
+    "Base": "SELECT i FROM numbers WHERE i < 100;",
+    "Even": "SELECT i FROM base WHERE i % 2 = 0",
+    "Odd": "WITH small AS (SELECT 50 AS n) SELECT i FROM base, small WHERE i % 2 = 1 AND i < n",
+    "Both": "SELECT (SELECT COUNT(*) FROM even) + (SELECT COUNT(*) FROM odd) AS n",
+    "Constant": "SELECT 42 AS v",
+}
+
+
+class TestDefineScheduler:
+    """Test that defines run in dependency order with shared defines materialized once"""
+
+    def test_dag_execution_and_failure_propagation(self):
+        """Test results, materialization, critical path, cleanup and upstream failures"""
+        connection = duckdb.connect()
+        connection.execute("CREATE TABLE numbers AS SELECT range AS i FROM range(1000)")
+        scheduler = DefineScheduler(connection, 'duckdb', max_workers=3)
+        result = scheduler.run(DEFINE_SQL, DEPENDENCIES)
+        assert result.errors == {}
+        assert len(result.define_results["Base"]) == 100
+        assert len(result.define_results["Even"]) == 50 and len(result.define_results["Odd"]) == 25
+        assert result.define_results["Both"] == [{"n": 75}]
+        assert result.define_results["Constant"] == [{"v": 42}]
+        # Base is read by Even and Odd; Even and Odd are inlined into Both
+        assert [name for name, t in result.timings.items() if t.materialized] == ["Base"]
+        assert result.critical_path[0] == "Base" and result.critical_path[-1] in ("Even", "Odd", "Both")
+        tables = connection.execute("SELECT table_name FROM information_schema.tables").fetchall()
+        assert tables == [("numbers",)]
+
+        result = scheduler.run(dict(DEFINE_SQL, Base="SELECT missing FROM numbers"), DEPENDENCIES)
+        assert "Base" in result.errors
+        assert result.errors["Even"] == "Upstream define failed: Base"
+        assert set(result.errors) == {"Base", "Even", "Odd", "Both"}
+        assert result.define_results["Constant"] == [{"v": 42}]
+
+    def test_cte_pipeline_schedules_dependent_defines(self):
+        """Test that defines reading another define run through the CTE pipeline fallback"""
+        from fhir4ds.cte_pipeline.core.cql_to_cte_converter import EnhancedDependencyDetector
+        from fhir4ds.cte_pipeline.core.cte_fragment import CTEFragment
+        from fhir4ds.cte_pipeline.core.cte_pipeline_engine import CTEPipelineEngine
+
+        datastore = FHIRDataStore.with_duckdb()
+        datastore.load_resources([
+            {"resourceType": "Patient", "id": "pt-1"},
+            {"resourceType": "Condition", "id": "c-1", "subject": {"reference": "Patient/pt-1"}},
+            {"resourceType": "Condition", "id": "c-2", "subject": {"reference": "Patient/pt-2"}},
+            {"resourceType": "Condition", "id": "c-3", "subject": {"reference": "Patient/pt-1"}},
+        ])
+        defines = {"Conds": "[Condition]", "A": 'exists "Conds"', "B": '"Conds" C where C.id is not null',
+                   "Ids": '[Condition] C return C.id'}
+        detector = EnhancedDependencyDetector()
+
+        def fragment(define_name, from_clause, where_conditions, select_fields=(), result_type="boolean"):
+            dependencies = detector.detect_dependencies(defines[define_name], set(defines))
+            return CTEFragment(name=define_relation_name(define_name), resource_type="Condition",
+                               patient_id_extraction="", select_fields=list(select_fields),
+                               from_clause=from_clause, where_conditions=where_conditions,
+                               dependencies=[define_relation_name(d) for d in dependencies],
+                               define_name=define_name, result_type=result_type)
+
+        fragments = [
+            fragment("Conds", "fhir_resources", ["json_extract_string(resource, '$.resourceType') = 'Condition'"]),
+            fragment("A", "conds", [], ["patient_id", "true AS result"]),
+            fragment("B", "conds", ["patient_id <> 'pt-2'"], ["patient_id", "result"]),
+            fragment("Ids", "fhir_resources", ["json_extract_string(resource, '$.resourceType') = 'Condition'"],
+                     ["substr(json_extract_string(resource, '$.subject.reference'), 9) AS patient_id",
+                      "json_extract_string(resource, '$.id') AS result"], result_type="collection"),
+        ]
+        scheduler = DefineScheduler(datastore.dialect.get_connection(), 'duckdb', max_workers=2)
+        engine = CTEPipelineEngine('duckdb', datastore.dialect.get_connection(), define_scheduler=scheduler)
+
+        rows = engine._execute_fragments_scheduled(SimpleNamespace(fragments=fragments))
+        by_patient = {row["patient_id"]: row for row in rows}
+        # pt-1 has two Conditions: boolean defines stay booleans, the collection becomes a list
+        ids = by_patient["pt-1"].pop("Ids")
+        assert sorted(ids) == ["c-1", "c-3"]
+        assert by_patient["pt-1"] == {"patient_id": "pt-1", "Conds": True, "A": True, "B": True}
+        assert by_patient["pt-2"] == {"patient_id": "pt-2", "Conds": True, "A": True, "Ids": "c-2"}
@@ -235,5 +235,53 @@ class TestDialectIntegration:
         assert 'col' in pg_sql
 
 
+class TestCTEMaterialization:
+    """Test reference-count driven CTE materialization hints"""
+    
+    def test_hints_follow_reference_count_in_both_dialects(self):
+        """Test that shared CTEs are materialized and single-use CTEs inlined"""
+        for dialect in (get_dialect('duckdb'), get_dialect('postgresql')):
+            assert dialect.optimize_cte_definition("pop", "SELECT 1", reference_count=3) == \
+                "pop AS MATERIALIZED (SELECT 1)"
+            assert dialect.optimize_cte_definition("d", "SELECT 1", reference_count=1) == \
+                "d AS NOT MATERIALIZED (SELECT 1)"
+            assert dialect.optimize_cte_definition("big", "SELECT 1", reference_count=2,
+                                                   estimated_rows=10 ** 9) == "big AS (SELECT 1)"
+    
+    def test_fallbacks_without_reference_count(self):
+        """Test that PostgreSQL keeps its heuristic and DuckDB adds no hint"""
+        assert get_dialect('duckdb').optimize_cte_definition("c", "SELECT 1") == "c AS (SELECT 1)"
+        assert get_dialect('postgresql').optimize_cte_definition("c", "SELECT jsonb_agg(x) FROM t") == \
+            "c AS MATERIALIZED (SELECT jsonb_agg(x) FROM t)"
+    
+    def test_duckdb_hinted_sql_executes_with_row_estimate(self):
+        """Test that DuckDB accepts the hints and returns an EXPLAIN row estimate"""
+        dialect = get_dialect('duckdb')
+        dialect.connection.execute("CREATE TABLE numbers AS SELECT range AS i FROM range(1000)")
+        shared = dialect.optimize_cte_definition("shared", "SELECT i FROM numbers", reference_count=2)
+        single = dialect.optimize_cte_definition("single", "SELECT i FROM shared", reference_count=1)
+        rows = dialect.execute_query(
+            f"WITH {shared}, {single} SELECT COUNT(*) FROM single JOIN shared USING (i)")
+        assert rows == [(1000,)]
+        assert dialect.estimate_row_count("SELECT i FROM numbers") == 1000
+    
+    def test_reference_counts_ignore_string_literals(self):
+        """Test that CTE names inside string literals and JSON paths are not counted as reads"""
+        from fhir4ds.cte_pipeline.core.cte_fragment import CTEFragment, plan_cte_materialization
+        
+        def fragment(name, from_clause, select_fields):
+            return CTEFragment(name=name, resource_type="Condition", patient_id_extraction="",
+                               select_fields=select_fields, from_clause=from_clause, where_conditions=[])
+        
+        conds = fragment("conds", "fhir_resources", ["'conds' AS label"])
+        denominator = fragment("denominator", "conds", ["json_extract(resource, '$.denominator') AS d"])
+        numerator = fragment("numerator", "fhir_resources", ["'it''s conds' AS label", "'$.denominator' AS p"])
+        assert numerator.referenced_ctes({"conds", "denominator", "numerator"}) == set()
+        assert denominator.referenced_ctes({"conds", "denominator"}) == {"conds"}
+        
+        planned = {f.name: f.materialized for f in plan_cte_materialization([conds, denominator, numerator])}
+        assert planned == {"conds": True, "denominator": False, "numerator": False}
+
+
 if __name__ == '__main__':
     pytest.main([__file__])
\ No newline at end of file
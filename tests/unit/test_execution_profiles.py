@@ -0,0 +1,114 @@
+"""
+Unit tests for execution profiles (per-workload session settings)
+"""
+
+import pytest
+
+duckdb = pytest.importorskip("duckdb")
+
+from fhir4ds.cql.measures.population import PopulationEvaluator, QualityMeasureBuilder
+from fhir4ds.datastore import QuickConnect
+from fhir4ds.dialects.profiles import ExecutionProfile, _exact_values, get_profile, profile_scope
+
+
+def setting(db, name):
+    return db.datastore.dialect.get_connection().execute(f"SELECT current_setting('{name}')").fetchone()[0]
+
+
+class RecordingPostgreSQLConnection:
+    """Records the statements run through cursors, like a psycopg2 connection"""
+
+    def __init__(self):
+        self.statements = []
+
+    def cursor(self):
+        connection = self
+
+        class Cursor:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def execute(self, sql):
+                connection.statements.append(sql)
+
+            def fetchone(self):
+                return ("",)
+
+        return Cursor()
+
+
+class UntranslatedCQLEngine:
+    def set_parameter(self, name, value):
+        pass
+
+    def set_population_context(self):
+        pass
+
+    def evaluate_expression(self, expression, table_name="fhir_resources", json_column="resource"):
+        return "-- not translated"
+
+
+class TestExecutionProfiles:
+    """Test applying, scoping and restoring DuckDB session profiles"""
+
+    def test_profile_applied_and_restored(self):
+        """Test that a scoped profile changes settings and restores them on exit"""
+        db = QuickConnect.memory(profile="interactive")
+        dialect = db.datastore.dialect
+        assert dialect.execution_profile_name == "interactive"
+        assert setting(db, "threads") == 4
+        assert setting(db, "preserve_insertion_order") is True
+
+        custom = ExecutionProfile("custom", duckdb={"threads": 2, "preserve_insertion_order": False})
+        with dialect.execution_profile(custom):
+            assert dialect.execution_profile_name == "custom"
+            assert setting(db, "threads") == 2
+            assert setting(db, "preserve_insertion_order") is False
+
+        assert dialect.execution_profile_name == "interactive"
+        assert setting(db, "threads") == 4
+        assert setting(db, "preserve_insertion_order") is True
+
+        with pytest.raises(ValueError):
+            get_profile("no-such-profile")
+
+    def test_memory_limit_restored_exactly(self):
+        """Test that memory_limit is restored to its exact value, or reset when it was the default"""
+        connection = duckdb.connect()
+        limit = lambda: connection.execute("SELECT current_setting('memory_limit')").fetchone()[0]
+        default = limit()
+        outer = ExecutionProfile("outer", duckdb={"memory_limit": "4812345678B"})
+        inner = ExecutionProfile("inner", duckdb={"memory_limit": "1GB"})
+
+        with profile_scope(connection, "duckdb", outer):
+            with profile_scope(connection, "duckdb", inner):
+                assert limit() != default
+            assert _exact_values[connection]["memory_limit"] == "4812345678B"
+        assert limit() == default
+        assert "memory_limit" not in _exact_values[connection]
+
+    def test_batch_runs_under_profile(self):
+        """Test that batch results are fetched while the batch profile is applied"""
+        db = QuickConnect.memory()
+        db.load_resources([{"resourceType": "Patient", "id": f"p{i}"} for i in range(5)], parallel=False)
+        view = {"resource": "Patient", "select": [{"column": [{"name": "id", "path": "id"}]}]}
+        before = setting(db, "preserve_insertion_order")
+
+        results = db.execute_batch([view, view], parallel=False, show_progress=False, profile="batch")
+
+        assert all(result.success for result in results)
+        assert sorted(results[0].result.fetchall()) == [(f"p{i}",) for i in range(5)]
+        assert setting(db, "preserve_insertion_order") == before
+
+    def test_population_evaluator_applies_its_dialect_profile(self):
+        """Test that a PostgreSQL evaluator connection gets PostgreSQL settings"""
+        connection = RecordingPostgreSQLConnection()
+        evaluator = PopulationEvaluator(UntranslatedCQLEngine(), connection, dialect="postgresql")
+        evaluator.evaluate_measure(QualityMeasureBuilder.create_diabetes_hba1c_measure(), profile="batch")
+
+        assert evaluator.dialect_name == "POSTGRESQL"
+        assert "SET work_mem = '256MB'" in connection.statements
+        assert not any("memory_limit" in statement for statement in connection.statements)
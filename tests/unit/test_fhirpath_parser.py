@@ -3,7 +3,7 @@ Unit tests for FHIRPath parser module
 """
 
 import pytest
-from fhir4ds.fhirpath.parser import FHIRPathLexer, FHIRPathParser
+from fhir4ds.fhirpath.parser import FHIRPathLexer, FHIRPathParser, parse_expression
 from fhir4ds.fhirpath.parser.ast_nodes import (
     IdentifierNode, LiteralNode, FunctionCallNode, PathNode,
     BinaryOpNode, IndexerNode, ThisNode
@@ -86,6 +86,31 @@ class TestFHIRPathLexer:
         lexer = FHIRPathLexer("active and true")
         tokens = lexer.tokenize()
         assert any(token.type.name == 'AND' for token in tokens)
+    
+    def test_literal_suffixes_and_escapes(self):
+        """Test quantity, long integer, datetime and escaped string literals"""
+        tokens = FHIRPathLexer("1.5'kg' 10L @2020-01-01 'it\\'s'").tokenize()
+        assert [t.type.name for t in tokens] == ['QUANTITY', 'INTEGER', 'DATETIME', 'STRING', 'EOF']
+        assert tokens[0].value == {'value': '1.5', 'unit': 'kg'}
+        assert tokens[1].value == '10L'
+        assert tokens[2].value == '2020-01-01'
+        assert tokens[3].value == "it's"
+        assert tokens[4].position == 31
+    
+    def test_keyword_function_calls(self):
+        """Test that where/not followed by '(' are tokenized as identifiers"""
+        tokens = FHIRPathLexer("name.where (use = 'official').exists().not() and not active").tokenize()
+        types = [t.type.name for t in tokens]
+        assert types[2] == 'IDENTIFIER' and tokens[2].value == 'where'
+        assert types.count('NOT') == 1
+        assert tokens[types.index('NOT')].position == 49
+    
+    def test_invalid_characters(self):
+        """Test lexer errors for unsupported characters and context variables"""
+        with pytest.raises(ValueError, match="Invalid character '&' at position 5"):
+            FHIRPathLexer("name & given").tokenize()
+        with pytest.raises(ValueError, match="Unrecognized context variable at position 0"):
+            FHIRPathLexer("$foo").tokenize()
 
 
 class TestFHIRPathParser:
@@ -196,5 +221,29 @@ class TestFHIRPathParser:
         assert ast.segments[1].args[0].value == ','
 
 
+
+class TestParseCache:
+    """Test the process-wide parsed-expression cache"""
+    
+    def test_cached_ast_is_shared(self):
+        """Test that repeated parses of the same text return the same AST"""
+        parse_expression.cache_clear()
+        first = parse_expression("Patient.name.family")
+        second = parse_expression("Patient.name.family")
+        assert first is second
+        assert parse_expression.cache_info().hits == 1
+    
+    def test_cached_ast_matches_uncached_parse(self):
+        """Test that the cache returns the same tree as a fresh parse"""
+        expression = "name.where(use = 'official').given.first()"
+        uncached = FHIRPathParser(FHIRPathLexer(expression).tokenize()).parse()
+        assert parse_expression(expression) == uncached
+    
+    def test_parse_errors_are_not_cached(self):
+        """Test that invalid expressions raise on every call"""
+        for _ in range(2):
+            with pytest.raises(ValueError):
+                parse_expression("name & given")
+
 if __name__ == '__main__':
     pytest.main([__file__])
\ No newline at end of file
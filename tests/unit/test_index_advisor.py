@@ -0,0 +1,99 @@
+"""
+Unit tests for the workload-driven index advisor
+"""
+
+import pytest
+from fhir4ds.datastore.index_advisor import IndexAdvisor, INDEX_PREFIX
+
+
+class PostgresLikeDialect:
+    """Dialect stub producing PostgreSQL extraction expressions"""
+    name = "POSTGRESQL"
+
+    def extract_json_field(self, column, path):
+        parts = ", ".join(f"'{p}'" for p in path[2:].split('.'))
+        return f"jsonb_extract_path_text({column}, {parts})"
+
+
+class DuckDBLikeDialect:
+    """Dialect stub producing DuckDB extraction expressions"""
+    name = "DUCKDB"
+
+    def extract_json_field(self, column, path):
+        return f"json_extract_string({column}, '{path}')"
+
+
+GENDER_QUERY = (
+    "SELECT jsonb_extract_path_text(resource, 'id') AS id FROM fhir_resources "
+    "WHERE jsonb_extract_path_text(resource, 'resourceType') = 'Patient' "
+    "AND jsonb_extract_path_text(resource, 'gender') = 'female'"
+)
+
+
+class TestIndexAdvisor:
+    """Test workload recording and index recommendations"""
+
+    def test_records_predicates_by_resource_type(self):
+        """Test that filtered paths are counted separately from projected ones"""
+        advisor = IndexAdvisor(PostgresLikeDialect())
+        advisor.record_query(GENDER_QUERY)
+        advisor.record_query(GENDER_QUERY)
+
+        workload = {w['path']: w for w in advisor.get_workload()}
+        assert workload['gender']['predicate_occurrences'] == 2
+        assert workload['gender']['resource_type'] == 'Patient'
+        assert workload['id']['predicate_occurrences'] == 0
+        assert 'resourceType' not in workload
+
+    def test_postgresql_recommends_partial_expression_index(self):
+        """Test that candidates reuse the generated expression and resource type filter"""
+        advisor = IndexAdvisor(PostgresLikeDialect())
+        advisor.record_query(GENDER_QUERY)
+        assert advisor.recommend(min_frequency=2) == []
+
+        advisor.record_query(GENDER_QUERY)
+        candidate, = advisor.recommend(min_frequency=2)
+        assert candidate.name.startswith(INDEX_PREFIX)
+        assert candidate.kind == 'partial_expression'
+        assert "USING BTREE ((jsonb_extract_path_text(resource, 'gender')))" in candidate.create_sql
+        assert candidate.create_sql.endswith(
+            "WHERE jsonb_extract_path_text(resource, 'resourceType') = 'Patient'")
+
+    def test_duckdb_candidates_are_reported_not_applied(self):
+        """Test that DuckDB candidates are marked not applicable and apply builds nothing"""
+        advisor = IndexAdvisor(DuckDBLikeDialect())
+        sql = ("SELECT * FROM fhir_resources WHERE json_extract_string(resource, '$.resourceType') = 'Observation' "
+               "AND json_extract_string(resource, '$.status') = 'final'")
+        advisor.record_query(sql)
+        advisor.record_query(sql)
+
+        report = advisor.apply(min_frequency=1)
+        candidate, = report['candidates']
+        assert (candidate.path, candidate.applicable, candidate.approved) == ('status', False, False)
+        assert report['created'] == [] and report['dropped'] == []
+
+    def test_datastore_recording_is_opt_in_and_covers_views_and_cql(self):
+        """Test that workload is only recorded when enabled, for ViewDefinitions and CQL criteria alike"""
+        from fhir4ds.cql.core.engine import CQLEngine
+        from fhir4ds.cql.measures.population import PopulationEvaluator
+        from fhir4ds.datastore import FHIRDataStore
+
+        view = {"resource": "Patient", "select": [{"column": [{"name": "id", "path": "id"}]}],
+                "where": [{"path": "gender = 'female'"}]}
+        criteria = ("SELECT resource FROM fhir_resources "
+                    "WHERE json_extract_string(resource, '$.resourceType') = 'Observation' "
+                    "AND json_extract_string(resource, '$.status') = 'final'")
+
+        default = FHIRDataStore.with_duckdb()
+        default.view_runner().execute_view_definition(view).fetchall()
+        assert default.index_advisor is None and default.dialect.index_advisors == {}
+
+        datastore = FHIRDataStore.with_duckdb(record_workload=True)
+        datastore.view_runner().execute_view_definition(view).fetchall()
+        evaluator = PopulationEvaluator(CQLEngine(dialect=datastore.dialect),
+                                        db_connection=datastore.dialect.get_connection())
+        evaluator.execute_sql(criteria)
+
+        workload = {(w['resource_type'], w['path']): w for w in datastore.index_advisor.get_workload()}
+        assert workload[('Patient', 'gender')]['predicate_occurrences'] == 1
+        assert workload[('Observation', 'status')]['predicate_occurrences'] == 1
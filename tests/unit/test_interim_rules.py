@@ -0,0 +1,49 @@
+"""
+Unit tests for the interim CQL pattern rule tables
+"""
+
+import re
+
+from fhir4ds.cql.core.interim_rules import (KNOWN_ISSUE_RULES, TRANSLATION_RULES, InterimDispatch,
+                                            expression_features, match_known_issue)
+
+EXPRESSIONS = [
+    'define "Sorted": [Patient] P sort by P.birthDate desc',
+    'define "SD": StdDev([Observation: "Systolic Blood Pressure"] O return O.valueQuantity.value)',
+    'define "Year Addition": DateTime(2023, 1, 15, 10, 30, 0) + 1 year',
+    'define "Age": years between Date(2020) and Today()',
+    'define "During": DateTime(2023, 6, 15, 14, 30) during Date(2023, 6, 15)',
+    'define "List": { 1, 2, 3 }',
+    'define "Tuple": { name: \'x\', value: 1 }',
+    'define "Diabetics": [Patient] P\n  with [Condition: "Diabetes"] C such that C.subject.reference = P.id',
+    'define "Latest": Last([Observation: "HbA1c"] O sort by O.effective)',
+    'define "Both": [Patient] P1 intersect [Patient] P2 where P1.id = P2.id',
+    '[Encounter] E where E.period during "Measurement Period"',
+    'Patient.name.where(use = \'official\').family',
+]
+
+
+class TestInterimRules:
+    """Test that token indexing never changes which rule an expression selects"""
+
+    def test_indexed_dispatch_matches_linear_search(self):
+        """Test that indexed dispatch selects the same rules as testing every regex"""
+        for expression in EXPRESSIONS + [e.upper() for e in EXPRESSIONS]:
+            linear = next((rule.name for rule in KNOWN_ISSUE_RULES
+                           if re.search(rule.pattern.pattern, expression, rule.pattern.flags)
+                           and (rule.accept is None or rule.accept(expression))), None)
+            assert match_known_issue(expression) == linear, expression
+
+            dispatch = InterimDispatch(expression)
+            for name, rule in TRANSLATION_RULES.items():
+                assert bool(dispatch.search(name)) == bool(rule.pattern.search(expression)), (name, expression)
+
+    def test_rules_without_tokens_are_skipped(self):
+        """Test that only rules whose tokens are present are candidates"""
+        assert InterimDispatch('Patient.name.family').candidates() == ()
+        assert match_known_issue('Patient.name.family') is None
+
+        features = expression_features('define "Age": YEARS BETWEEN Date(2020) and Date(2023)')
+        assert {'define', 'between', 'and', 'date', 'year'} <= features
+        assert match_known_issue('define "List": { 1, 2, 3 }') == 'simple_list'
+        assert 'with' not in InterimDispatch('define "Sorted": [Patient] P sort by P.id').candidates()
@@ -0,0 +1,72 @@
+"""
+Unit tests for lake-backed datastores over Parquet/NDJSON files
+"""
+
+import json
+
+import pytest
+
+duckdb = pytest.importorskip("duckdb")
+
+from fhir4ds.datastore import FHIRDataStore
+from fhir4ds.datastore.lake import DataLake, LakeSource
+
+
+def write_ndjson(path, resources):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text("\n".join(json.dumps(r) for r in resources) + "\n")
+
+
+@pytest.fixture
+def lake_dir(tmp_path):
+    """Hive-partitioned NDJSON lake plus an unpartitioned Parquet export."""
+    write_ndjson(tmp_path / "ndjson/resourceType=Patient/date=2024-01-01/part.ndjson",
+                 [{"resourceType": "Patient", "id": "p1", "gender": "female"}])
+    write_ndjson(tmp_path / "ndjson/resourceType=Patient/date=2024-03-01/part.ndjson",
+                 [{"resourceType": "Patient", "id": "p2", "gender": "male"}])
+    write_ndjson(tmp_path / "ndjson/resourceType=Observation/date=2024-01-01/part.ndjson",
+                 [{"resourceType": "Observation", "id": "o1", "status": "final"}])
+
+    connection = duckdb.connect()
+    connection.execute(
+        f"""COPY (SELECT '{{"resourceType": "Observation", "id": "o2", "status": "final"}}'::JSON AS resource)
+            TO '{tmp_path / "export.parquet"}' (FORMAT parquet)"""
+    )
+    connection.close()
+    return tmp_path
+
+
+class TestLakeDatastore:
+    """Test querying lake files in place"""
+
+    def test_views_run_over_lake_with_resource_type_pruning(self, lake_dir):
+        """Test that ViewDefinitions read lake files and prune on the resourceType partition"""
+        datastore = FHIRDataStore.with_lake([
+            str(lake_dir / "ndjson/**/*.ndjson"),
+            LakeSource(str(lake_dir / "export.parquet"), hive_partitioning=False),
+        ])
+        view = {"resource": "Patient", "select": [{"column": [
+            {"name": "id", "path": "id"}, {"name": "gender", "path": "gender"}]}]}
+
+        runner = datastore.view_runner()
+        sql = runner._generate_sql_query(view)
+        assert "\"resourceType\" = 'Patient'" in sql
+        assert sorted(runner.execute_view_definition(view).fetchall()) == [("p1", "female"), ("p2", "male")]
+        assert datastore.get_resource_counts() == {"Patient": 2, "Observation": 2}
+
+        plan = datastore.dialect.get_connection().execute(f"EXPLAIN {sql}").fetchall()[0][1]
+        assert "Scanning Files: 2/3" in plan
+
+    def test_date_range_restricts_partitions(self, lake_dir):
+        """Test that a date range limits the lake view to matching date partitions"""
+        datastore = FHIRDataStore.with_lake(str(lake_dir / "ndjson/**/*.ndjson"),
+                                            date_range=("2024-02-01", None))
+        assert datastore.get_resource_counts() == {"Patient": 1}
+
+        datastore.lake.set_date_range(None, None)
+        assert sum(datastore.get_resource_counts().values()) == 3
+
+        unpartitioned = DataLake(datastore.dialect, "other_lake", "resource",
+                                 [LakeSource(str(lake_dir / "export.parquet"))], ("2024-01-01", None))
+        with pytest.raises(ValueError):
+            unpartitioned.create_view()
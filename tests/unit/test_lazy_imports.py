@@ -0,0 +1,51 @@
+"""
+Unit tests for lazy package imports
+"""
+
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _run(code: str) -> str:
+    """Run code in a fresh interpreter with the repository on the path."""
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT)
+    proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env)
+    assert proc.returncode == 0, proc.stderr
+    return proc.stdout.strip()
+
+
+class TestLazyImports:
+    """Test that importing the package does not load heavy dependencies"""
+
+    def test_import_does_not_load_heavy_modules(self):
+        """Test that ``import fhir4ds`` defers the datastore and optional dependencies"""
+        loaded = _run(
+            "import sys, fhir4ds\n"
+            "heavy = ('pandas', 'pyarrow', 'openpyxl', 'fastapi', 'psycopg2', 'duckdb',\n"
+            "         'fhir4ds.view_runner', 'fhir4ds.datastore.core')\n"
+            "print(','.join(m for m in heavy if m in sys.modules))"
+        )
+        assert loaded == ""
+
+    def test_public_names_resolve_on_access(self):
+        """Test that lazily exported names resolve and are cached on the module"""
+        output = _run(
+            "import fhir4ds\n"
+            "cls = fhir4ds.FHIRPath\n"
+            "print(cls.__module__, 'FHIRPath' in vars(fhir4ds), 'FHIRPath' in dir(fhir4ds))"
+        )
+        assert output == "fhir4ds.fhirpath.fhirpath True True"
+
+    def test_unknown_attribute_raises(self):
+        """Test that unknown names still raise AttributeError"""
+        output = _run(
+            "import fhir4ds\n"
+            "try:\n"
+            "    fhir4ds.does_not_exist\n"
+            "except AttributeError:\n"
+            "    print('ok')"
+        )
+        assert output == "ok"
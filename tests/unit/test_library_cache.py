@@ -0,0 +1,63 @@
+"""
+Unit tests for the compiled CQL library cache
+"""
+
+from datetime import datetime, timezone
+
+from fhir4ds.cql.core.library_manager import (
+    CQLLibraryManager, LibraryCache, LibraryMetadata, LibraryVersion, LoadedLibrary, PersistentLibraryStore
+)
+
+
+def compiled_library(name, size=1):
+    return LoadedLibrary(
+        metadata=LibraryMetadata(name=name, version=LibraryVersion.parse("1.0.0")),
+        ast={"definitions": [name]},
+        translated_content={"sql": "x" * size},
+        source_content=f"library {name}",
+        load_time=datetime.now(timezone.utc),
+    )
+
+
+class TestLibraryCache:
+    """Test strong references, byte-budgeted LRU eviction and the on-disk tier"""
+
+    def test_byte_budget_evicts_least_recently_used(self):
+        """Test that entries survive dropped references and the budget evicts LRU first"""
+        cache = LibraryCache(max_bytes=3 * 20_000)
+        for name in ("A", "B", "C"):
+            cache.put(name, compiled_library(name, 15_000))
+        assert cache.get("A") is not None  # A is now most recently used
+
+        cache.put("D", compiled_library("D", 15_000))
+
+        assert cache.get("B") is None
+        assert [cache.get(name) is not None for name in ("A", "C", "D")] == [True, True, True]
+        assert cache.stats()["evictions"] == 1
+        assert cache.stats()["bytes"] <= cache.max_bytes
+
+    def test_disk_tier_survives_restart(self, tmp_path, monkeypatch):
+        """Test that a new manager loads a persisted library instead of reparsing"""
+        path = str(tmp_path / "libraries.sqlite")
+        parses = []
+
+        def parse(self, name, content):
+            parses.append(name)
+            return {"name": name}, {"define_operations": {"Initial Population": {"name": "Initial Population"}}}
+
+        monkeypatch.setattr(CQLLibraryManager, "_parse_and_translate_library", parse)
+        first = CQLLibraryManager(cache=LibraryCache(store=PersistentLibraryStore(path)))
+        first.load_library("Measure", "library Measure version '1.0.0'")
+
+        restarted = CQLLibraryManager(cache=LibraryCache(store=PersistentLibraryStore(path)))
+        library = restarted.load_library("Measure", "library Measure version '1.0.0'")
+
+        assert parses == ["Measure"]
+        assert list(library.define_operations) == ["Initial Population"]
+        assert library.parameter_values == {}
+        assert restarted.cache.stats()["disk_hits"] == 1
+
+        # Another dialect compiles its own SQL
+        CQLLibraryManager(cache=LibraryCache(store=PersistentLibraryStore(path)), dialect="postgresql") \
+            .load_library("Measure", "library Measure version '1.0.0'")
+        assert parses == ["Measure", "Measure"]
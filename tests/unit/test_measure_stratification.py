@@ -0,0 +1,94 @@
+"""
+Unit tests for stratifier and supplemental data counts from one GROUPING SETS query
+"""
+
+import numpy as np
+import pytest
+
+from fhir4ds.cql.core.engine import CQLEngine
+from fhir4ds.cql.measures.population import PopulationCriteria, PopulationType, QualityMeasureBuilder
+from fhir4ds.cql.measures.quality import QualityMeasureEngine
+from fhir4ds.cql.measures.scoring import MeasureScoring
+from fhir4ds.cql.measures.stratification import stratified_counts, stratified_counts_sql
+from fhir4ds.datastore import FHIRDataStore
+
+# One row per patient: membership of each population plus stratifier and SDE columns
+MEMBERSHIP_SQL = """
+SELECT 'pt-' || CAST(range AS VARCHAR) AS patient_id,
+       range < 16 AS "Initial Population",
+       range < 16 AS "Denominator",
+       range < 16 AND range % 2 = 0 AS "Numerator",
+       CASE WHEN range % 3 = 0 THEN 'female' ELSE 'male' END AS "Gender",
+       range AS age,
+       CASE WHEN range % 4 = 0 THEN 'medicare' ELSE 'commercial' END AS "Payer"
+FROM range(20)
+"""
+POPULATIONS = ["Initial Population", "Denominator", "Numerator"]
+
+
+class TestMeasureStratification:
+    """Test that all strata and the overall counts come out of one query"""
+
+    def test_grouping_sets_counts_and_vectorized_intervals(self):
+        """Test overall and per-stratum counts and the per-stratum Wilson intervals"""
+        dialect = FHIRDataStore.with_duckdb().dialect
+        groupings = {"gender": 'm."Gender"', "age": "CASE WHEN m.age < 10 THEN '0-9' ELSE '10+' END"}
+        assert "GROUPING SETS ((), " in stratified_counts_sql(MEMBERSHIP_SQL, POPULATIONS, groupings)
+
+        counts = stratified_counts(dialect, MEMBERSHIP_SQL, POPULATIONS, groupings)
+        assert counts.patient_count == 20
+        assert counts.counts == {"Initial Population": 16, "Denominator": 16, "Numerator": 8}
+        assert [(value, patients, c["Numerator"]) for value, patients, c in counts.strata["gender"]] == \
+            [("female", 7, 3), ("male", 13, 5)]
+        assert [(value, patients, c["Denominator"]) for value, patients, c in counts.strata["age"]] == \
+            [("0-9", 10, 10), ("10+", 10, 6)]
+
+        scoring = MeasureScoring()
+        strata = {code: {value: c for value, _, c in values} for code, values in counts.strata.items()}
+        scored = scoring.score_strata(strata, "proportion", {"calculate_confidence_interval": True})
+        assert scored["age"]["0-9"]["score"] == 0.5
+        assert scored["gender"]["female"]["populations"]["adjusted_denominator"] == 6
+        for code, values in strata.items():
+            for value, c in values.items():
+                expected = scoring._calculate_proportion_confidence_interval(c["Numerator"], c["Denominator"])
+                assert scored[code][value]["confidence_interval"] == pytest.approx(expected)
+
+        intervals = scoring._calculate_proportion_confidence_intervals(np.array([0, 3]), np.array([0, 4]))
+        assert intervals[0] == {"lower": 0, "upper": 0, "method": "wilson"}
+        assert intervals[1] == pytest.approx(scoring._calculate_proportion_confidence_interval(3, 4))
+
+    def test_shared_expressions_and_null_strata(self):
+        """Test that groupings with one expression stay separate and NULL strata stay None"""
+        dialect = FHIRDataStore.with_duckdb().dialect
+        payer = """CASE WHEN m.age < 18 THEN m."Payer" END"""
+        counts = stratified_counts(dialect, MEMBERSHIP_SQL, POPULATIONS,
+                                   {"gender": 'm."Gender"', "sde-gender": 'm."Gender"', "payer": payer})
+
+        assert counts.strata["gender"] == counts.strata["sde-gender"]
+        assert [(value, patients) for value, patients, _ in counts.strata["gender"]] == [("female", 7), ("male", 13)]
+        assert [(value, patients) for value, patients, _ in counts.strata["payer"]] == \
+            [("commercial", 13), ("medicare", 5), (None, 2)]
+
+    def test_quality_engine_reports_strata_and_supplemental_data(self):
+        """Test the stratified evaluation of a measure with a stratifier and an SDE"""
+        datastore = FHIRDataStore.with_duckdb()
+        measure = QualityMeasureBuilder.create_custom_measure("strat-test", "Stratified", "Stratified measure")
+        for population_type, name in zip([PopulationType.INITIAL_POPULATION, PopulationType.DENOMINATOR,
+                                          PopulationType.NUMERATOR], POPULATIONS):
+            measure.add_population_criteria(PopulationCriteria(population_type, name, name, f'"{name}"'))
+        measure.add_population_criteria(PopulationCriteria(PopulationType.STRATIFIER, "Gender", "Gender",
+                                                           "Patient.gender"))
+        measure.supplemental_data["Payer"] = "Coverage.payor"
+
+        engine = QualityMeasureEngine(CQLEngine(dialect=datastore.dialect)).load_measure(measure)
+        result = engine.evaluate_measure_stratified(
+            "strat-test", MEMBERSHIP_SQL, evaluation_config={"scoring": {"calculate_confidence_interval": True}})
+
+        assert result["scoring_results"]["score"] == 0.5
+        stratification = result["report"]["stratification"]
+        assert set(stratification["Gender"]) == {"female", "male"}
+        female = stratification["Gender"]["female"]
+        assert female["patient_count"] == 7 and female["scoring"]["score"] == 0.5
+        assert female["scoring"]["confidence_interval"]["method"] == "wilson"
+        assert result["report"]["supplemental_data"]["Payer"]["medicare"]["patient_count"] == 5
+        assert result["metadata"]["stratifier_count"] == 1
@@ -0,0 +1,116 @@
+"""
+Unit tests for patient-bucketed parallel population evaluation
+"""
+
+import pytest
+
+duckdb = pytest.importorskip("duckdb")
+
+from fhir4ds.cql.core.parallel import BucketedExecutor
+from fhir4ds.cql.measures.population import PopulationEvaluator, QualityMeasureBuilder
+from fhir4ds.datastore import FHIRDataStore
+
+PATIENT_CONDITIONS_SQL = """
+    SELECT json_extract_string(p.resource, '$.id') AS patient_id, COUNT(c.resource) AS conditions,
+           MAX(json_extract_string(o.resource, '$.name')) AS organization
+    FROM fhir_resources p
+    LEFT JOIN fhir_resources c
+      ON json_extract_string(c.resource, '$.subject.reference') = 'Patient/' || json_extract_string(p.resource, '$.id')
+    CROSS JOIN (SELECT resource FROM fhir_resources
+                WHERE json_extract_string(resource, '$.resourceType') = 'Organization') o
+    WHERE json_extract_string(p.resource, '$.resourceType') = 'Patient'
+    GROUP BY 1
+"""
+
+
+@pytest.fixture
+def database(tmp_path):
+    path = str(tmp_path / "population.duckdb")
+    datastore = FHIRDataStore.with_duckdb(path)
+    resources = [{"resourceType": "Organization", "id": "org", "name": "Clinic"}]
+    for i in range(30):
+        resources.append({"resourceType": "Patient", "id": f"p{i:02d}",
+                          "extension": [{"url": "age", "valueInteger": 20 + i}]})
+        for j in range(i % 3):
+            resources.append({"resourceType": "Condition", "id": f"c{i}-{j}",
+                              "subject": {"reference": f"Patient/p{i:02d}"}})
+    datastore.bulk_load_resources(resources, parallel=False)
+    datastore.dialect.get_connection().close()
+    return path
+
+
+class FakeCQLEngine:
+    """Translates measure criteria to fixed SQL"""
+
+    def __init__(self, criteria_sql):
+        self.criteria_sql = criteria_sql
+
+    def set_parameter(self, name, value):
+        pass
+
+    def set_population_context(self):
+        pass
+
+    def evaluate_expression(self, expression, table_name="fhir_resources", json_column="resource"):
+        return self.criteria_sql[expression]
+
+
+class TestParallelEvaluation:
+    """Test that bucketed evaluation matches a single connection exactly"""
+
+    def test_bucketed_rows_match_single_connection(self, database):
+        """Test that merged bucket rows equal the single-connection result, in patient order"""
+        connection = duckdb.connect(database, read_only=True)
+        expected = sorted(connection.execute(PATIENT_CONDITIONS_SQL).fetchall())
+        connection.close()
+
+        executor = BucketedExecutor(database, workers=2, buckets=4)
+        rows = executor.execute(PATIENT_CONDITIONS_SQL)
+
+        assert [tuple(row.values()) for row in rows] == expected
+        assert {row["organization"] for row in rows} == {"Clinic"}
+
+    def test_population_counts_merge_across_buckets(self, database):
+        """Test that per-bucket population counts sum to the whole population"""
+        measure = QualityMeasureBuilder.create_diabetes_hba1c_measure()
+        patients = ("SELECT resource FROM fhir_resources "
+                    "WHERE json_extract_string(resource, '$.resourceType') = 'Patient'")
+        age = "CAST(json_extract(resource, '$.extension[0].valueInteger') AS INTEGER)"
+        criteria_sql = {
+            measure.populations[name].criteria_expression: sql for name, sql in {
+                "Initial Population": f"{patients} AND {age} <= 40",
+                "Denominator": patients,
+                "Numerator": f"{patients} AND {age} >= 45",
+            }.items()
+        }
+
+        evaluator = PopulationEvaluator(FakeCQLEngine(criteria_sql))
+        results = evaluator.evaluate_measure(measure, parallel=BucketedExecutor(database, workers=1, buckets=3))
+
+        populations = results["populations"]
+        assert [populations[name]["count"] for name in ("Initial Population", "Denominator", "Numerator")] == [21, 30, 5]
+        assert all(p["evaluation_successful"] for p in populations.values())
+
+    def test_parallel_population_results_equal_serial(self, database):
+        """Test that both modes count distinct patients and ignore shared resources"""
+        measure = QualityMeasureBuilder.create_diabetes_hba1c_measure()
+        by_type = "SELECT resource FROM fhir_resources WHERE json_extract_string(resource, '$.resourceType')"
+        criteria_sql = {
+            measure.populations[name].criteria_expression: sql for name, sql in {
+                "Initial Population": f"{by_type} = 'Patient'",
+                "Denominator": f"{by_type} IN ('Condition', 'Organization')",
+                "Numerator": f"{by_type} = 'Condition' AND json_extract_string(resource, '$.id') LIKE '%-1'",
+            }.items()
+        }
+
+        connection = duckdb.connect(database, read_only=True)
+        serial = PopulationEvaluator(FakeCQLEngine(criteria_sql), connection).evaluate_measure(measure)
+        connection.close()
+        parallel = PopulationEvaluator(FakeCQLEngine(criteria_sql)).evaluate_measure(
+            measure, parallel=BucketedExecutor(database, workers=2, buckets=4))
+
+        assert parallel["populations"] == serial["populations"]
+        populations = serial["populations"]
+        # Patients with one or two conditions; the shared Organization is no one's member
+        assert [populations[name]["count"] for name in ("Initial Population", "Denominator", "Numerator")] == [30, 20, 10]
+        assert populations["Denominator"]["matching_patients"][:3] == ["p01", "p02", "p04"]
@@ -0,0 +1,100 @@
+"""
+Unit tests for query timeouts and cancellation on the database
+"""
+
+import sys
+import threading
+import time
+import types
+
+import pytest
+
+pytest.importorskip("duckdb")
+
+from fhir4ds.datastore import QuickConnect
+from fhir4ds.dialects.base import QueryCancelledError
+
+SLOW_SQL = "SELECT COUNT(*) FROM range(100000000000) a"
+
+
+class RecordingCursor:
+    def __init__(self, statements):
+        self.statements = statements
+        self.description = [("n",)]
+        self.closed = False
+
+    def execute(self, sql):
+        self.statements.append(sql)
+
+    def fetchall(self):
+        return [(1,)]
+
+    def close(self):
+        self.closed = True
+
+
+class RecordingConnection:
+    """Stands in for a psycopg2 connection, recording its cursors"""
+
+    def __init__(self):
+        self.statements = []
+        self.cursors = []
+
+    def cursor(self):
+        self.cursors.append(RecordingCursor(self.statements))
+        return self.cursors[-1]
+
+
+class TestQueryCancellation:
+    """Test that timed-out and cancelled queries are interrupted in DuckDB"""
+
+    def test_timeout_and_cancel_interrupt_query(self):
+        """Test that a timeout or cancel() stops the statement and the connection stays usable"""
+        db = QuickConnect.memory()
+        dialect = db.datastore.dialect
+
+        start = time.time()
+        with pytest.raises(QueryCancelledError, match="timed out"):
+            dialect.execute_sql(SLOW_SQL).fetchall(timeout=0.2)
+        assert time.time() - start < 10
+
+        result = dialect.execute_sql(SLOW_SQL)
+        threading.Timer(0.2, result.cancel).start()
+        with pytest.raises(QueryCancelledError, match="cancelled"):
+            result.fetchall()
+        assert result.cancelled
+
+        assert dialect.execute_sql("SELECT 42").fetchall() == [(42,)]
+
+    def test_batch_timeout_reports_failed_query(self, monkeypatch):
+        """Test that a batch query over its timeout fails while the others succeed"""
+        db = QuickConnect.memory()
+        db.load_resources([{"resourceType": "Patient", "id": "p1"}], parallel=False)
+        view = {"resource": "Patient", "select": [{"column": [{"name": "id", "path": "id"}]}]}
+        processor = db.create_batch_processor(max_workers=1, show_progress=False)
+        processor.timeout = 0.2
+
+        original_execute = db.execute
+        monkeypatch.setattr(db, "execute", lambda view_def: (db.datastore.dialect.execute_sql(SLOW_SQL)
+                                                             if view_def.get("name") == "slow"
+                                                             else original_execute(view_def)))
+        results = processor.execute_batch([view, dict(view, name="slow")], parallel=False)
+
+        assert results[0].success and results[0].result.fetchall() == [("p1",)]
+        assert not results[1].success and "timed out" in results[1].error
+
+    def test_postgresql_statement_cursors_are_closed(self, monkeypatch):
+        """Test that cancellable PostgreSQL statements close their cursors and reset the timeout"""
+        import fhir4ds.dialects.postgresql as postgresql
+
+        connection = RecordingConnection()
+        monkeypatch.setattr(postgresql, "POSTGRESQL_AVAILABLE", True)
+        monkeypatch.setitem(sys.modules, "psycopg2", types.SimpleNamespace(connect=lambda conn_str: connection))
+        dialect = postgresql.PostgreSQLDialect("postgresql://test")
+
+        assert dialect.execute_cancellable("SELECT 1", timeout=2) == [(1,)]
+        assert dialect.execute_cancellable("SELECT 1") == [(1,)]
+
+        assert connection.statements == ["SET statement_timeout = 2000", "SELECT 1", "RESET statement_timeout",
+                                         "SELECT 1"]
+        assert len(connection.cursors) == 2 and all(cursor.closed for cursor in connection.cursors)
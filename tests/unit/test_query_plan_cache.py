@@ -0,0 +1,64 @@
+"""
+Unit tests for the query plan cache and its persistent store
+"""
+
+import pytest
+from fhir4ds.pipeline.core.base import CompiledSQL
+from fhir4ds.pipeline.core.advanced_features import QueryPlanCache, PersistentPlanStore
+from fhir4ds.datastore import FHIRDataStore
+
+
+class TestPersistentPlanCache:
+    """Test persisting compiled plans across cache instances"""
+    
+    def test_plan_survives_new_cache_instance(self, tmp_path):
+        """Test that a plan written by one process is served to the next"""
+        path = str(tmp_path / "plans.sqlite")
+        compiled = CompiledSQL(main_sql="SELECT 1", ctes=["a AS (SELECT 1)"], is_collection_result=True)
+        
+        writer = QueryPlanCache(persistent_store=PersistentPlanStore(path, version="1.0"))
+        writer.put("key1", compiled, "duckdb")
+        
+        reader = QueryPlanCache(persistent_store=PersistentPlanStore(path, version="1.0"))
+        assert reader.get("key1", "duckdb") == compiled
+        assert reader.stats['persistent_hits'] == 1
+        
+        # Second lookup is served from memory
+        reader.get("key1", "duckdb")
+        assert reader.stats['persistent_hits'] == 1
+    
+    def test_entries_are_keyed_by_version_and_dialect(self, tmp_path):
+        """Test that plans are not shared across versions or dialects"""
+        path = str(tmp_path / "plans.sqlite")
+        PersistentPlanStore(path, version="1.0").save("key1", "duckdb", CompiledSQL(main_sql="SELECT 1"))
+        
+        assert PersistentPlanStore(path, version="1.0").load("key1", "postgresql") is None
+        assert PersistentPlanStore(path, version="2.0").load("key1", "duckdb") is None
+        assert PersistentPlanStore(path, version="1.0").load("key1", "DUCKDB").main_sql == "SELECT 1"
+    
+    def test_view_cache_key_ignores_key_order(self):
+        """Test that equivalent ViewDefinitions share a cache key"""
+        view_a = {"resource": "Patient", "select": [{"column": [{"name": "id", "path": "id"}]}]}
+        view_b = {"select": [{"column": [{"path": "id", "name": "id"}]}], "resource": "Patient"}
+        
+        key_a = QueryPlanCache.get_view_cache_key(view_a, "duckdb", "fhir_resources", "resource")
+        key_b = QueryPlanCache.get_view_cache_key(view_b, "duckdb", "fhir_resources", "resource")
+        assert key_a == key_b
+        assert key_a != QueryPlanCache.get_view_cache_key(view_a, "postgresql", "fhir_resources", "resource")
+
+    def test_view_sql_is_served_from_the_store_after_restart(self, tmp_path):
+        """Test that a second datastore reuses ViewDefinition SQL persisted by the first"""
+        path = str(tmp_path / "plans.sqlite")
+        view = {"resource": "Patient", "select": [{"column": [{"name": "id", "path": "id"}]}]}
+        
+        first = FHIRDataStore.with_duckdb(plan_cache_path=path)
+        sql = first.view_runner()._generate_sql_query(view)
+        assert first.plan_cache.persistent_store.count() == 1
+        
+        second = FHIRDataStore.with_duckdb(plan_cache_path=path)
+        assert second.view_runner()._generate_sql_query(view) == sql
+        assert second.plan_cache.stats['persistent_hits'] == 1
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
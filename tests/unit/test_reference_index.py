@@ -0,0 +1,112 @@
+"""
+Unit tests for the patient compartment and reference indexes
+"""
+
+import json
+
+from fhir4ds.cql.core.engine import CQLEngine
+from fhir4ds.cql.core.parallel import patient_key_sql
+from fhir4ds.datastore import FHIRDataStore
+from fhir4ds.datastore.sharding import patient_id_for
+from fhir4ds.datastore.side_tables import patient_id_sql
+
+RESOURCES = [
+    {"resourceType": "Patient", "id": "pt-1"},
+    {"resourceType": "Observation", "id": "obs-1", "subject": {"reference": "Patient/pt-1"},
+     "performer": [{"reference": "Practitioner/dr-1"}, {"reference": "Patient/pt-2"}]},
+    {"resourceType": "Immunization", "id": "imm-1", "patient": {"reference": "Patient/pt-2"}},
+    {"resourceType": "Coverage", "id": "cov-1", "beneficiary": {"reference": "Patient/pt-1"},
+     "payor": [{"reference": "Organization/org-1"}]},
+    {"resourceType": "Condition", "id": "cond-1", "subject": {"reference": "Group/g-1"}},
+]
+LATER = [
+    {"resourceType": "Patient", "id": "pt-2"},
+    {"resourceType": "Practitioner", "id": "dr-1", "name": [{"family": "Smith"}]},
+]
+
+
+def rows(datastore, sql):
+    return sorted(datastore.execute_sql(sql).fetchall())
+
+
+class TestReferenceIndexes:
+    """Test that references are parsed once at load time and joined by row id"""
+
+    def test_compartment_index_follows_compartment_definition(self):
+        """Test compartment membership through subject, patient, beneficiary and performer"""
+        datastore = FHIRDataStore.with_duckdb()
+        datastore.load_resources(RESOURCES[:3])
+        datastore.enable_compartment_index()
+        datastore.load_resources(RESOURCES[3:] + LATER)
+
+        members = rows(datastore, "SELECT b.resource ->> '$.id', c.patient_id, c.element_path "
+                                  "FROM resource_compartments c JOIN fhir_resources b ON b.id = c.row_id")
+        assert members == [
+            ("cov-1", "pt-1", "beneficiary"),
+            ("imm-1", "pt-2", "patient"),
+            ("obs-1", "pt-1", "subject"),
+            ("obs-1", "pt-2", "performer"),
+            ("pt-1", "pt-1", "id"),
+            ("pt-2", "pt-2", "id"),
+        ]
+
+        # Patient-context resource CTEs join the index on the primary patient element only
+        engine = CQLEngine(dialect=datastore.dialect)
+        observations = engine._generate_resource_ctes()["observation"]
+        assert "resource_compartments" in observations
+        body = observations[observations.index("(") + 1:observations.rindex(")")]
+        assert rows(datastore, f"SELECT patient_id FROM ({body})") == [("pt-1",)]
+        # A Group subject has no patient, but the resource is kept as without the index
+        conditions = engine._generate_resource_ctes()["condition"]
+        body = conditions[conditions.index("(") + 1:conditions.rindex(")")]
+        assert rows(datastore, f"SELECT resource ->> '$.id', patient_id FROM ({body})") == [("cond-1", None)]
+
+        datastore.disable_compartment_index()
+        assert "resource_compartments" not in datastore.dialect.compartment_index_tables.values()
+        observations = engine._generate_resource_ctes()["observation"]
+        body = observations[observations.index("(") + 1:observations.rindex(")")]
+        assert rows(datastore, f"SELECT patient_id FROM ({body})") == [("pt-1",)]
+        conditions = engine._generate_resource_ctes()["condition"]
+        body = conditions[conditions.index("(") + 1:conditions.rindex(")")]
+        assert rows(datastore, f"SELECT resource ->> '$.id', patient_id FROM ({body})") == [("cond-1", None)]
+
+    def test_reference_index_links_targets_and_resolves(self):
+        """Test target rows linked across loads and resolve() through resource_keys"""
+        datastore = FHIRDataStore.with_duckdb()
+        datastore.enable_reference_index()
+        datastore.load_resources(RESOURCES)
+
+        unresolved = "SELECT target_type, target_id FROM resource_references WHERE target_row IS NULL"
+        assert rows(datastore, unresolved) == [
+            ("Group", "g-1"), ("Organization", "org-1"), ("Patient", "pt-2"), ("Patient", "pt-2"),
+            ("Practitioner", "dr-1"),
+        ]
+        datastore.load_resources(LATER)
+        assert rows(datastore, unresolved) == [("Group", "g-1"), ("Organization", "org-1")]
+
+        resolve = datastore.dialect.resolve_reference_sql("json_extract(resource, '$.performer[0]')")
+        assert "resource_keys" in resolve
+        resolved = rows(datastore, f"SELECT {resolve} FROM fhir_resources "
+                                   f"WHERE resource ->> '$.resourceType' = 'Observation'")
+        assert json.loads(resolved[0][0])["name"] == [{"family": "Smith"}]
+
+        datastore.disable_reference_index()
+        assert "resource_keys" not in datastore.dialect.resolve_reference_sql("x")
+
+    def test_patient_key_is_the_same_everywhere(self):
+        """Test that sharding, parallel buckets and the CQL patient key agree per resource"""
+        datastore = FHIRDataStore.with_duckdb()
+        resources = RESOURCES + LATER + [{"resourceType": "RelatedPerson", "id": "rp-1",
+                                          "patient": {"reference": "Patient/pt-2"}}]
+        datastore.load_resources(resources)
+        dialect = datastore.dialect
+        types = sorted({r["resourceType"] for r in resources if r["resourceType"] != "Patient"})
+
+        keys = dict(rows(datastore, f"SELECT resource ->> '$.id', {patient_key_sql('duckdb', 'resource')} "
+                                    f"FROM fhir_resources"))
+        context_key = patient_id_sql(dialect, 'resource', types)
+        context_keys = dict(rows(datastore, f"SELECT resource ->> '$.id', {context_key} FROM fhir_resources "
+                                            f"WHERE resource ->> '$.resourceType' <> 'Patient'"))
+        assert keys == {r["id"]: patient_id_for(r) for r in resources}
+        assert context_keys == {r["id"]: patient_id_for(r) for r in resources if r["resourceType"] != "Patient"}
+        assert keys["obs-1"] == "pt-1" and keys["rp-1"] == "pt-2" and keys["cond-1"] is None
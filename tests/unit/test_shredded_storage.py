@@ -0,0 +1,62 @@
+"""
+Unit tests for shredded (typed per-resource-type) storage
+"""
+
+from fhir4ds.datastore import FHIRDataStore
+from fhir4ds.datastore.shredding import build_table_layout
+
+RESOURCES = [
+    {"resourceType": "Patient", "id": "pt-1", "active": True, "gender": "female", "birthDate": "1974-12",
+     "name": [{"family": "Smith", "given": ["Ann", "B"]}]},
+    {"resourceType": "Patient", "id": "pt-2", "active": False, "gender": "male", "birthDate": "1990-01-02"},
+    {"resourceType": "Observation", "id": "obs-1", "status": "final",
+     "subject": {"reference": "Patient/pt-1"}, "valueQuantity": {"value": 7.25, "unit": "%"}},
+]
+VIEW = {
+    "resource": "Patient",
+    "select": [{"column": [
+        {"name": "id", "path": "id"},
+        {"name": "active", "path": "active", "type": "boolean"},
+        {"name": "birth_date", "path": "birthDate"},
+        {"name": "family", "path": "name.family"},
+    ]}],
+}
+
+
+class TestShreddedStorage:
+    """Test typed table layout, loading and ViewDefinition translation"""
+
+    def test_layout_from_fhir_metadata(self):
+        """Test that choice and complex elements expand to typed scalar columns"""
+        table = build_table_layout("Observation", "obs")
+        assert table.column_for("Observation.valueQuantity.value").kind == "decimal"
+        assert table.column_for("subject.reference").name == "subject_reference"
+        assert table.column_for("valueBoolean").kind == "boolean"
+        assert table.column_for("category") is None and table.column_for("code.text").name == "code_text"
+
+    def test_views_read_shredded_columns_with_same_results(self):
+        """Test that covered paths become column references and results are unchanged"""
+        datastore = FHIRDataStore.with_duckdb()
+        datastore.load_resources(RESOURCES)
+        runner = datastore.view_runner()
+        expected = sorted(runner.execute_view_definition(VIEW).fetchall())
+
+        datastore.enable_shredded_storage(["Patient", "Observation"])
+        result = runner.execute_view_definition(VIEW)
+        assert sorted(result.fetchall()) == expected
+        assert "fhir_resources_shredded_patient" in result.sql
+        assert "'$.birthDate'" not in result.sql and '"birthDate"' in result.sql
+        assert "family" in result.sql  # name is repeating: still read from JSON
+
+        # Loading more resources copies only the new rows into the typed tables
+        datastore.dialect.get_connection().execute("DELETE FROM fhir_resources_shredded_observation")
+        datastore.load_resource({"resourceType": "Patient", "id": "pt-3", "active": True})
+        assert len(runner.execute_view_definition(VIEW).fetchall()) == 3
+        assert datastore.execute_sql("SELECT COUNT(*) FROM fhir_resources_shredded_observation").fetchall() == [(0,)]
+        datastore.load_resource(RESOURCES[2])
+
+        # Repeating elements are only kept in the JSON column
+        assert "name" not in datastore.shredded_storage.describe()["fhir_resources_shredded_patient"]
+        typed = datastore.execute_sql(
+            'SELECT "valueQuantity_value" + 1 FROM fhir_resources_shredded_observation').fetchall()
+        assert typed == [(8.25,)]
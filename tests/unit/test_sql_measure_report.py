@@ -0,0 +1,71 @@
+"""
+Unit tests for MeasureReports computed in SQL and streamed from the cursor
+"""
+
+import io
+import json
+
+from fhir4ds.cql.resources.measure_report_config import MeasureReportConfig
+from fhir4ds.cql.resources.measure_report_generator import MeasureReportGenerator
+from fhir4ds.cql.resources.sql_measure_report import SQLMeasureReportGenerator
+from fhir4ds.datastore import FHIRDataStore
+
+# One row per patient: membership of each population define plus a stratifier column
+MEMBERSHIP_SQL = """
+SELECT 'pt-' || CAST(range AS VARCHAR) AS patient_id,
+       range < 8 AS "Initial Population",
+       range < 8 AS "Denominator",
+       range < 8 AND range % 2 = 0 AS "Numerator",
+       CASE WHEN range % 3 = 0 THEN 'female' ELSE 'male' END AS gender
+FROM range(10)
+"""
+
+
+def population_counts(report):
+    return {p["code"]["coding"][0]["code"]: p["count"] for p in report["group"][0]["population"]}
+
+
+class TestSQLMeasureReport:
+    """Test that counts, strata and subject lists come from SQL and reports stream out"""
+
+    def test_bundle_with_counts_strata_and_subject_lists(self):
+        """Test the streamed Bundle document, parsed back as a whole"""
+        dialect = FHIRDataStore.with_duckdb().dialect
+        config = MeasureReportConfig.both_reports("Measure/hba1c", include_subject_details=True)
+        generator = SQLMeasureReportGenerator(config, dialect, batch_size=3)
+        output = io.StringIO()
+
+        written = generator.write_bundle(MEMBERSHIP_SQL, output, stratifiers={"gender": "m.gender"})
+        bundle = json.loads(output.getvalue())
+        assert written == bundle["total"] == len(bundle["entry"]) == 1 + 3 + 10
+
+        summary = bundle["entry"][0]["resource"]
+        assert population_counts(summary) == {"initial-population": 8, "denominator": 8, "numerator": 4}
+        assert summary["group"][0]["measureScore"]["value"] == 0.5
+        strata = {s["value"]["coding"][0]["code"]: {p["code"]["coding"][0]["code"]: p["count"]
+                                                   for p in s["population"]}
+                  for s in summary["group"][0]["stratifier"][0]["stratum"]}
+        assert strata == {"female": {"initial-population": 3, "denominator": 3, "numerator": 2},
+                          "male": {"initial-population": 5, "denominator": 5, "numerator": 2}}
+
+        numerator_list = summary["group"][0]["population"][2]["subjectResults"]["reference"]
+        lists = {f"List/{e['resource']['id']}": e["resource"] for e in bundle["entry"][1:4]}
+        assert [i["item"]["reference"] for i in lists[numerator_list]["entry"]] == \
+            ["Patient/pt-0", "Patient/pt-2", "Patient/pt-4", "Patient/pt-6"]
+
+        individual = [e["resource"] for e in bundle["entry"][4:]]
+        assert [r["subject"]["reference"] for r in individual][:2] == ["Patient/pt-0", "Patient/pt-1"]
+        assert population_counts(individual[1]) == {"initial-population": 1, "denominator": 1, "numerator": 0}
+
+    def test_individual_reports_as_ndjson(self, tmp_path):
+        """Test individual-only configurations write one report per line"""
+        dialect = FHIRDataStore.with_duckdb().dialect
+        output = tmp_path / "reports.ndjson"
+
+        written = MeasureReportGenerator(MeasureReportConfig.individual_only("Measure/hba1c")).write_reports(
+            dialect, MEMBERSHIP_SQL, output)
+        lines = output.read_text().splitlines()
+        assert written == len(lines) == 10
+        reports = [json.loads(line) for line in lines]
+        assert all(r["type"] == "individual" and r["measure"] == "Measure/hba1c" for r in reports)
+        assert sum(population_counts(r)["numerator"] for r in reports) == 4
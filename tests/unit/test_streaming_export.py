@@ -0,0 +1,53 @@
+"""
+Unit tests for streaming CSV/Excel exporters
+"""
+
+import csv
+
+import pytest
+
+pytest.importorskip("duckdb")
+
+from fhir4ds.datastore import QuickConnect, ResultFormatter
+
+NUMBERS_SQL = "SELECT range AS n, 'row ' || range AS label FROM range(25) ORDER BY n"
+
+
+class TestStreamingExport:
+    """Test that exporters write from cursor batches instead of fetched results"""
+
+    def test_csv_streams_without_caching_rows(self, tmp_path):
+        """Test that CSV is written in batches and the result is never materialized"""
+        db = QuickConnect.memory()
+        result = db.datastore.dialect.execute_sql(NUMBERS_SQL)
+        output = tmp_path / "numbers.csv"
+
+        assert ResultFormatter.stream_to_csv(result, output, batch_size=4) == 25
+        assert result._result is None
+
+        with open(output, newline="") as f:
+            rows = list(csv.reader(f))
+        assert rows[0] == ["n", "label"]
+        assert rows[1:] == [[str(i), f"row {i}"] for i in range(25)]
+
+        # to_csv with a file path and no metadata takes the streaming path
+        ResultFormatter.to_csv(db.datastore.dialect.execute_sql(NUMBERS_SQL), tmp_path / "again.csv")
+        assert (tmp_path / "again.csv").read_text() == output.read_text()
+
+    def test_excel_rolls_over_sheets(self, tmp_path):
+        """Test write-only Excel export with sheet rollover and parallel query execution"""
+        openpyxl = pytest.importorskip("openpyxl")
+        db = QuickConnect.memory()
+        dialect = db.datastore.dialect
+        output = tmp_path / "report.xlsx"
+
+        ResultFormatter.stream_to_excel([dialect.execute_sql(NUMBERS_SQL), dialect.execute_sql("SELECT 1 AS one")],
+                                        output, sheet_names=["Numbers", "One"], batch_size=4,
+                                        parallel=True, max_rows_per_sheet=11)
+
+        workbook = openpyxl.load_workbook(output, read_only=True)
+        assert workbook.sheetnames == ["Numbers", "Numbers_2", "Numbers_3", "One", "_Metadata"]
+        numbers = [row for name in ("Numbers", "Numbers_2", "Numbers_3")
+                   for row in list(workbook[name].iter_rows(values_only=True))[1:]]
+        assert [row[0] for row in numbers] == list(range(25))
+        assert list(workbook["One"].iter_rows(values_only=True)) == [("one",), (1,)]
@@ -0,0 +1,134 @@
+"""
+Unit tests for temporal with/without clauses compiled to range joins
+"""
+
+import json
+
+from fhir4ds.cql.core.engine import CQLEngine
+from fhir4ds.cql.core.temporal_join import TemporalCondition, TemporalJoinCompiler, parse_temporal_condition
+from fhir4ds.datastore import FHIRDataStore
+
+RESOURCES = [
+    {"resourceType": "Encounter", "id": "enc-1", "subject": {"reference": "Patient/pt-1"},
+     "period": {"start": "2023-01-01T09:00:00Z", "end": "2023-01-01T12:00:00Z"}},
+    {"resourceType": "Encounter", "id": "enc-2", "subject": {"reference": "Patient/pt-1"},
+     "period": {"start": "2023-02-01T09:00:00Z"}},
+    {"resourceType": "Encounter", "id": "enc-3", "subject": {"reference": "Patient/pt-2"},
+     "period": {"start": "2023-01-01T09:00:00Z", "end": "2023-01-01T12:00:00Z"}},
+    {"resourceType": "Observation", "id": "obs-1", "subject": {"reference": "Patient/pt-1"},
+     "code": {"coding": [{"display": "HbA1c"}]}, "effectiveDateTime": "2023-01-01T10:00:00Z"},
+    {"resourceType": "Observation", "id": "obs-2", "subject": {"reference": "Patient/pt-2"},
+     "code": {"coding": [{"display": "Blood Pressure"}]}, "effectiveDateTime": "2023-01-01T10:00:00+02:00"},
+    {"resourceType": "Observation", "id": "obs-3", "subject": {"reference": "Patient/pt-1"},
+     "code": {"coding": [{"display": "LDL"}]}, "effectivePeriod": {"start": "2023-03-01T00:00:00Z"}},
+]
+
+
+def resource_ids(datastore, sql):
+    return sorted(json.loads(row[0])["id"] for row in datastore.execute_sql(sql).fetchall())
+
+
+def encounter_ids(datastore, relationship, exclude=False, display=None):
+    compiler = TemporalJoinCompiler(datastore.dialect)
+    condition = TemporalCondition("O", relationship, "E")
+    return resource_ids(datastore, compiler.compile("Encounter", "E", "Observation", "O", condition,
+                                                    exclude=exclude, related_display=display))
+
+
+class TestTemporalJoin:
+    """Test that temporal relationships between resources compile to equivalent range joins"""
+
+    def test_relationships_match_with_and_without_interval_index(self):
+        """Test that inline and indexed interval sources give the same encounters"""
+        assert parse_temporal_condition("O.effective during E.period") == TemporalCondition(
+            "O", "during", "E", "effective", "period")
+        assert parse_temporal_condition(
+            "O.subject.reference = E.subject.reference and O.effective  Included In E.period"
+        ) == TemporalCondition("O", "included in", "E", "effective", "period")
+        assert parse_temporal_condition("O.value > 7 and O.effective during E.period") is None
+
+        datastore = FHIRDataStore.with_duckdb()
+        datastore.load_resources(RESOURCES)
+        expected = {
+            ("during", False, None): ["enc-1", "enc-2"],
+            ("during", False, "HbA1c"): ["enc-1"],
+            ("during", True, "HbA1c"): ["enc-2", "enc-3"],
+            ("overlaps", False, None): ["enc-1", "enc-2"],
+            ("before", False, None): ["enc-2", "enc-3"],
+            ("after", False, None): ["enc-1"],
+        }
+        for (relationship, exclude, display), ids in expected.items():
+            assert encounter_ids(datastore, relationship, exclude, display) == ids
+
+        datastore.enable_interval_index()
+        datastore.enable_coding_index()
+        # Loads after enabling are normalized incrementally
+        datastore.load_resource({"resourceType": "Observation", "id": "obs-4", "subject": {"reference": "Patient/pt-1"},
+                                 "effectiveDateTime": "2022-12-31T00:00:00Z"})
+        expected[("before", False, None)] = ["enc-1", "enc-2", "enc-3"]
+        for (relationship, exclude, display), ids in expected.items():
+            assert encounter_ids(datastore, relationship, exclude, display) == ids
+        bounds = datastore.execute_sql(
+            "SELECT start_ts = end_ts, CAST(end_ts AS VARCHAR) FROM resource_intervals ORDER BY row_id").fetchall()
+        assert bounds[1] == (False, "infinity") and bounds[3] == (True, "2023-01-01 10:00:00")
+        assert bounds[4] == (True, "2023-01-01 08:00:00")
+
+        datastore.disable_interval_index()
+        assert datastore.dialect.interval_index_tables == {}
+
+    def test_engine_compiles_temporal_with_clause(self):
+        """Test that a with-clause relating resource times uses the temporal join"""
+        datastore = FHIRDataStore.with_duckdb()
+        datastore.load_resources(RESOURCES)
+        engine = CQLEngine(dialect=datastore.dialect)
+        engine.disable_pipeline_mode()
+        expression = 'define "V": [Encounter] E with [Observation: "HbA1c"] O such that O.effective during E.period'
+
+        sql = engine.evaluate_expression(expression)
+        assert resource_ids(datastore, sql) == ["enc-1"]
+
+        datastore.enable_interval_index()
+        sql = engine.evaluate_expression(expression)
+        assert "resource_intervals" in sql
+        assert resource_ids(datastore, sql) == ["enc-1"]
+
+    def test_only_clinical_time_conditions_are_rewritten(self):
+        """Test that other elements and non-patient references are left to the regular translation"""
+        datastore = FHIRDataStore.with_duckdb()
+        compiler = TemporalJoinCompiler(datastore.dialect)
+        issued = parse_temporal_condition("O.issued during E.period")
+        assert issued == TemporalCondition("O", "during", "E", "issued", "period")
+        assert compiler.compile("Encounter", "E", "Observation", "O", issued) is None
+        onset = parse_temporal_condition("C.onset during E.period")
+        assert compiler.compile("Encounter", "E", "Condition", "C", onset) is None
+
+        assert parse_temporal_condition(
+            "O.encounter.reference = 'Encounter/' + E.id and O.effective during E.period") is None
+        assert parse_temporal_condition("O.subject references E.subject and O.effective during E.period") is None
+        assert parse_temporal_condition("O during E") is None
+
+        engine = CQLEngine(dialect=datastore.dialect)
+        engine.disable_pipeline_mode()
+        assert engine._try_temporal_join(
+            'define "V": [Encounter] E with [Observation] O such that O.issued during E.period',
+            "fhir_resources", "resource") is None
+        assert engine._try_temporal_join(
+            "[Encounter] E with [Observation] O such that "
+            "O.encounter.reference = 'Encounter/' + E.id and O.effective during E.period",
+            "fhir_resources", "resource") is None
+
+    def test_bare_with_query_and_lake_views_outside_pipeline_mode(self, tmp_path):
+        """Test that bare with queries compile to the range join and that lake views without an id column work"""
+        (tmp_path / "lake.ndjson").write_text("\n".join(json.dumps(r) for r in RESOURCES) + "\n")
+        datastore = FHIRDataStore.with_lake(str(tmp_path / "lake.ndjson"))
+        for (relationship, exclude, display), ids in {("during", False, None): ["enc-1", "enc-2"],
+                                                      ("during", True, "HbA1c"): ["enc-2", "enc-3"]}.items():
+            assert encounter_ids(datastore, relationship, exclude, display) == ids
+
+        engine = CQLEngine(dialect=datastore.dialect)
+        engine.disable_pipeline_mode()
+        for expression in ['[Encounter] E with [Observation: "HbA1c"] O such that O.effective during E.period',
+                           'define "V": [Encounter] E with [Observation: "HbA1c"] O such that '
+                           'O.subject.reference = E.subject.reference and O.effective during E.period']:
+            sql = engine.evaluate_expression(expression)
+            assert resource_ids(datastore, sql) == ["enc-1"]
@@ -0,0 +1,84 @@
+"""
+Unit tests for tracing spans
+"""
+
+import asyncio
+
+import pytest
+from fhir4ds.utils import tracing
+from fhir4ds.utils.tracing import RecordingTracer, NoOpTracer, set_tracer, span
+from fhir4ds.datastore.result import QueryResult
+
+
+class FakeDialect:
+    """Minimal dialect returning canned rows"""
+    name = "DUCKDB"
+
+    def execute_query(self, sql):
+        return [(1, "a"), (2, "b")]
+
+    def get_connection(self):
+        return None
+
+    def get_query_description(self, connection):
+        return [("id",), ("name",)]
+
+
+@pytest.fixture
+def tracer():
+    tracer = set_tracer(RecordingTracer())
+    yield tracer
+    set_tracer(None)
+
+
+class TestTracing:
+    """Test span recording and instrumentation"""
+
+    def test_default_tracer_is_noop(self):
+        """Test that spans are free no-ops until a tracer is installed"""
+        assert isinstance(tracing.get_tracer(), NoOpTracer)
+        with span("anything", {"key": 1}) as s:
+            s.set_attribute("rows", 3)
+        assert not tracing.tracing_enabled()
+
+    def test_concurrent_tasks_keep_separate_parents(self, tracer):
+        """Test that interleaved asyncio tasks on one thread nest spans under their own request"""
+        async def request(name, delay):
+            with span(name):
+                await asyncio.sleep(delay)
+                with span(f"{name}.execute"):
+                    await asyncio.sleep(delay)
+
+        async def serve():
+            await asyncio.gather(request("a", 0.02), request("b", 0.01))
+
+        asyncio.run(serve())
+        parents = {finished.name: finished.parent for finished in tracer.spans}
+        assert parents == {"a": None, "b": None, "a.execute": "a", "b.execute": "b"}
+
+    def test_nested_spans_record_parent_and_errors(self, tracer):
+        """Test that nested spans record their parent and exceptions"""
+        with span("outer"):
+            with pytest.raises(ValueError):
+                with span("inner", {"a": 1}):
+                    raise ValueError("boom")
+
+        inner, outer = tracer.spans
+        assert (inner.name, inner.parent, inner.attributes) == ("inner", "outer", {"a": 1})
+        assert inner.error == "ValueError: boom"
+        assert outer.parent is None
+        assert tracer.summary()["outer"]["count"] == 1
+
+    def test_query_result_spans(self, tracer):
+        """Test that fetching and formatting results emit execute, fetch and format spans"""
+        result = QueryResult(FakeDialect(), "SELECT id, name FROM t")
+        csv_text = result.to_csv()
+
+        assert csv_text.splitlines()[0] == "id,name"
+        spans = {s.name: s for s in tracer.spans}
+        execute = spans[tracing.SPAN_DB_EXECUTE]
+        assert execute.parent == tracing.SPAN_FETCH
+        assert execute.attributes[tracing.ATTR_ROW_COUNT] == 2
+        assert execute.attributes[tracing.ATTR_SQL_LENGTH] == len("SELECT id, name FROM t")
+        assert execute.attributes[tracing.ATTR_DIALECT] == "duckdb"
+        assert spans[tracing.SPAN_FORMAT].attributes[tracing.ATTR_FORMAT] == "csv"
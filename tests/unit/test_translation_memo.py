@@ -0,0 +1,76 @@
+"""
+Unit tests for memoized CQL expression translation
+"""
+
+from fhir4ds.cql.core.engine import CQLEngine
+
+
+class TestTranslationMemo:
+    """Test that repeated evaluations reuse translations and re-apply the context"""
+
+    def test_repeated_evaluation_translates_once(self, monkeypatch):
+        """Test per-patient evaluations hit the memo while the context filter changes"""
+        engine = CQLEngine(dialect="duckdb")
+        translations = []
+
+        def translate(expression, table_name, json_column):
+            translations.append(expression)
+            return "SELECT resource FROM fhir_resources", True
+
+        monkeypatch.setattr(engine, "_translate_expression", translate)
+
+        engine.set_patient_context("p1")
+        first = engine.evaluate_expression('[Observation] O where O.status = "final"')
+        engine.set_patient_context("p2")
+        second = engine.evaluate_expression('[Observation] O where O.status = "final"')
+
+        assert translations == ['[Observation] O where O.status = "final"']
+        assert "p1" in first and "p2" in second
+        assert engine.get_translation_memo_stats()["hits"] == 1
+
+    def test_referenced_parameters_are_part_of_the_key(self, monkeypatch):
+        """Test that only parameters named in the expression invalidate its translation"""
+        engine = CQLEngine(dialect="duckdb")
+        translations = []
+        monkeypatch.setattr(engine, "_translate_expression",
+                            lambda expression, table_name, json_column:
+                            (translations.append(expression) or f"SELECT {len(translations)}", False))
+
+        expression = '[Encounter] E where E.period during "Measurement Period"'
+        engine.set_parameter("Measurement Period", "2023")
+        assert engine.evaluate_expression(expression) == "SELECT 1"
+        engine.set_parameter("Unrelated", 1)
+        assert engine.evaluate_expression(expression) == "SELECT 1"
+        engine.set_parameter("Measurement Period", "2024")
+        assert engine.evaluate_expression(expression) == "SELECT 2"
+        assert engine.evaluate_expression(expression, table_name="other_resources") == "SELECT 3"
+
+    def test_registry_fallback_is_filtered_per_patient(self, monkeypatch):
+        """Test that function calls falling back to normal parsing are memoized unfiltered"""
+        import fhir4ds.pipeline.converters.ast_converter as ast_converter
+
+        class Compiled:
+            def get_full_sql(self):
+                return "SELECT resource FROM fhir_resources"
+
+        class Bridge:
+            def __init__(self):
+                pipeline = type("Pipeline", (), {"compile": lambda self, context, state: Compiled()})()
+                self.ast_to_pipeline_converter = type(
+                    "Converter", (), {"convert_ast_to_pipeline": lambda self, ast: pipeline})()
+
+            def set_migration_mode(self, mode):
+                pass
+
+        monkeypatch.setattr(ast_converter, "PipelineASTBridge", Bridge)
+        engine = CQLEngine(dialect="duckdb")
+        engine.use_pipeline_mode = False
+
+        engine.set_patient_context("p1")
+        first = engine.evaluate_expression("Abs(-5)")
+        engine.set_patient_context("p2")
+        second = engine.evaluate_expression("Abs(-5)")
+
+        assert "p1" in first
+        assert "p2" in second and "p1" not in second
+        assert engine.get_translation_memo_stats()["hits"] == 1
@@ -0,0 +1,70 @@
+"""
+Unit tests for per-patient "most recent" logic compiled to window functions
+"""
+
+import json
+
+from fhir4ds.cql.core.engine import CQLEngine
+from fhir4ds.cql.functions.clinical import ClinicalLogicFunctions
+from fhir4ds.datastore import FHIRDataStore
+
+HBA1C = {"coding": [{"display": "HbA1c"}]}
+RESOURCES = [
+    {"resourceType": "Observation", "id": "obs-1", "subject": {"reference": "Patient/pt-1"}, "code": HBA1C,
+     "effectiveDateTime": "2023-01-01T10:00:00Z", "valueQuantity": {"value": 7.5}},
+    {"resourceType": "Observation", "id": "obs-2", "subject": {"reference": "Patient/pt-1"}, "code": HBA1C,
+     "effectiveDateTime": "2023-06-01T10:00:00Z", "valueQuantity": {"value": 6.5}},
+    {"resourceType": "Observation", "id": "obs-3", "subject": {"reference": "Patient/pt-2"}, "code": HBA1C,
+     "effectivePeriod": {"start": "2022-03-01T00:00:00Z"}, "valueQuantity": {"value": 8.0}},
+    {"resourceType": "Observation", "id": "obs-4", "subject": {"reference": "Patient/pt-2"}, "code": HBA1C},
+    {"resourceType": "Observation", "id": "obs-5", "subject": {"reference": "Patient/pt-2"},
+     "code": {"coding": [{"display": "Heart rate"}]}, "effectiveDateTime": "2024-01-01"},
+]
+SUBJECT = "json_extract_string({alias}.value, '$.subject.reference')"
+
+
+def resource_ids(datastore, sql):
+    return sorted(json.loads(row[0])["id"] for row in datastore.execute_sql(sql).fetchall())
+
+
+class TestWindowAggregates:
+    """Test that First/Last and the clinical aggregates select one row per patient in one pass"""
+
+    def test_first_and_last_of_sorted_query_per_patient(self):
+        """Test that First/Last of a sorted retrieve rank rows per patient"""
+        datastore = FHIRDataStore.with_duckdb()
+        datastore.load_resources(RESOURCES)
+        engine = CQLEngine(dialect=datastore.dialect)
+
+        latest = engine.evaluate_expression('define "Latest": Last([Observation: "HbA1c"] O sort by O.effective)')
+        assert "ROW_NUMBER() OVER (PARTITION BY" in latest and "LIMIT" not in latest
+        # effectivePeriod sorts by its start; observations without a time sort last
+        assert resource_ids(datastore, latest) == ["obs-2", "obs-3"]
+
+        most_recent = engine.evaluate_expression(
+            'define "Most Recent": First([Observation: "HbA1c"] O sort by effective desc)')
+        assert resource_ids(datastore, most_recent) == ["obs-2", "obs-3"]
+        first = engine.evaluate_expression('define "First": First([Observation] O sort by effective)')
+        assert resource_ids(datastore, first) == ["obs-1", "obs-3"]
+
+    def test_clinical_aggregates_partition_by_patient(self):
+        """Test that partitioned most recent, latest and average values match per patient"""
+        datastore = FHIRDataStore.with_duckdb()
+        datastore.load_resources(RESOURCES[:3])
+        source = "SELECT resource AS value FROM fhir_resources"
+
+        most_recent = ClinicalLogicFunctions.most_recent(source, partition_by=SUBJECT.format(alias="obs"))
+        rows = datastore.execute_sql(
+            f"SELECT partition_key, json_extract_string(value, '$.id') FROM ({most_recent}) ORDER BY 1").fetchall()
+        assert rows == [("Patient/pt-1", "obs-2"), ("Patient/pt-2", "obs-3")]
+
+        partition = SUBJECT.format(alias="meas")
+        latest = ClinicalLogicFunctions.latest_value(source, partition_by=partition)
+        assert datastore.execute_sql(f"SELECT * FROM ({latest}) ORDER BY 1").fetchall() == [
+            ("Patient/pt-1", "6.5"), ("Patient/pt-2", "8.0")]
+        average = ClinicalLogicFunctions.average_value(source, partition_by=partition)
+        assert datastore.execute_sql(f"SELECT partition_key, CAST(value AS DOUBLE) FROM ({average}) ORDER BY 1"
+                                     ).fetchall() == [("Patient/pt-1", 7.0), ("Patient/pt-2", 8.0)]
+
+        # Without a partition the single-set scalar subquery is unchanged
+        assert ClinicalLogicFunctions.latest_value(source).startswith("(SELECT")